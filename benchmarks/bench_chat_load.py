@@ -0,0 +1,150 @@
+"""
+Load test of the chat API against the deterministic fake LLM.
+
+Starts the FastAPI app in-process, drives N concurrent SSE clients for T turns
+each and reports throughput, TTFT and latency percentiles, memory per concurrent
+stream and DB queries per turn. Results are written as JSON and can be compared
+with a previous run to catch regressions.
+
+The cost of checkpointing answers while they stream (`response-checkpoint`) is
+the difference between a /chat run and the same run with `--no-checkpoint`:
+DB queries per turn, throughput and latency.
+
+The /chat endpoint needs a PostgreSQL database: point the config (e.g.
+APP_ENVIRONMENT=local with a local `database` section and DB_PASSWORD) at a local
+instance; tables are created if missing. /purechat runs without a database.
+
+Usage (from the project root):
+    python -m benchmarks.bench_chat_load --endpoint chat --clients 50 --turns 3
+    python -m benchmarks.bench_chat_load --endpoint purechat --clients 200 \\
+        --tokens-per-second 0 --compare benchmarks/results/baseline.json
+    python -m benchmarks.bench_chat_load --endpoint chat --clients 100 --no-checkpoint \\
+        --output benchmarks/results/no-checkpoint.json
+    python -m benchmarks.bench_chat_load --endpoint chat --clients 100 --checkpoint-every-chars 200 \\
+        --compare benchmarks/results/no-checkpoint.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+import src.configs.config
+from src.configs.config import yaml_configs
+
+from benchmarks.harness import (
+    MemoryTracker,
+    QueryCounter,
+    compare,
+    free_port,
+    run_load,
+    save_results,
+    start_server,
+    stop_server,
+    summarize,
+)
+
+
+async def create_conversations(count: int) -> list:
+    """Creates a benchmark user with `count` conversations and returns their ids."""
+    import time
+
+    from src.configs.db import AsyncSessionFactory, get_async_engine
+    from src.dao import conversation_dao, user_dao
+    from src.models.tables import metadata
+    from src.schemas.conversation import ConversationCreateSchema
+    from src.schemas.user import UserCreateSchema
+
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(metadata.create_all)
+    async with AsyncSessionFactory() as session:
+        user = await user_dao.create_user(session, UserCreateSchema(username=f"bench-{time.time_ns()}"))
+        conversation_ids = []
+        for _ in range(count):
+            conv = await conversation_dao.create_conversation(session, ConversationCreateSchema(user_id=user["id"]))
+            conversation_ids.append(conv["id"])
+    return conversation_ids
+
+
+async def main(args) -> dict:
+    yaml_configs["fake-llm"] = {
+        "enabled": True,
+        "response-tokens": args.response_tokens,
+        "chunk-size": args.chunk_size,
+        "tokens-per-second": args.tokens_per_second,
+        "first-token-delay": args.first_token_delay,
+        "failure-rate": args.failure_rate,
+    }
+    yaml_configs.setdefault("generation", {})["mode"] = args.mode
+    yaml_configs["response-checkpoint"] = {
+        "enabled": not args.no_checkpoint,
+        "every-chars": args.checkpoint_every_chars,
+        "every-chars-growth": args.checkpoint_every_chars_growth,
+        "every-seconds": args.checkpoint_every_seconds,
+    }
+
+    from server import app
+    from src.configs.db import get_async_engine
+
+    if args.endpoint == "chat":
+        conversation_ids = await create_conversations(args.clients)
+        payloads = [
+            [{"conversation_id": conv_id, "message": f"turn {turn}", "model": "fake"} for turn in range(args.turns)]
+            for conv_id in conversation_ids
+        ]
+    else:
+        payloads = [[{"message": f"turn {turn}", "model": "fake"} for turn in range(args.turns)] for _ in range(args.clients)]
+
+    port = free_port()
+    server, server_task = await start_server(app, port)
+    query_counter = QueryCounter(get_async_engine())
+    try:
+        if args.trace_memory:
+            with MemoryTracker() as memory:
+                results, wall_time = await run_load(f"http://127.0.0.1:{port}", f"/api/v1/{args.endpoint}", payloads)
+        else:
+            memory = None
+            results, wall_time = await run_load(f"http://127.0.0.1:{port}", f"/api/v1/{args.endpoint}", payloads)
+    finally:
+        query_counter.close()
+        await stop_server(server, server_task)
+
+    return {
+        "scenario": vars(args),
+        "summary": summarize(results, wall_time),
+        "memory_per_stream_bytes": round(memory.peak_bytes / args.clients) if memory else None,
+        "db_queries_per_turn": round(query_counter.count / len(results), 2) if results else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=["chat", "purechat"], default="chat")
+    parser.add_argument("--mode", choices=["worker", "inline"], default="worker", help="generation.mode to run with")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--response-tokens", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=4)
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--first-token-delay", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--checkpoint-every-chars", type=int, default=2000, help="response-checkpoint.every-chars")
+    parser.add_argument("--checkpoint-every-chars-growth", type=float, default=0.25,
+                        help="response-checkpoint.every-chars-growth")
+    parser.add_argument("--checkpoint-every-seconds", type=float, default=5.0, help="response-checkpoint.every-seconds")
+    parser.add_argument("--no-checkpoint", action="store_true", help="write answers once they end (response-checkpoint off)")
+    parser.add_argument("--trace-memory", action="store_true", help="track allocations (slows the run down)")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<endpoint>-<time>.json)")
+    parser.add_argument("--compare", help="baseline result file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change reported as a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {save_results(results, args.output, args.endpoint)}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,113 @@
+"""
+Per-chunk overhead of the Gemini adapters, without network to Google.
+
+Modes:
+- wrapped: GeminiChatModel wrapping ChatGoogleGenerativeAI (transport "grpc_asyncio",
+  the previous default path): two BaseChatModel layers, fed by a fake gRPC client
+  replaying the recorded response (no I/O at all).
+- direct: ChatGoogleGenerativeAI alone on the same fake client (one layer), to
+  isolate the cost of the double wrapping.
+- native: GeminiChatModel with transport "native", streaming SSE over its
+  persistent aiohttp session from the local recorded-response stub
+  (benchmarks/gemini_stub.py). This mode also pays for loopback HTTP.
+
+Usage (from the project root):
+    python -m benchmarks.bench_gemini_adapter --streams 200 --chunks 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.harness import free_port, save_results
+from benchmarks.gemini_stub import FakeGenerativeAsyncClient, start_stub
+
+
+def conversation(turns: int = 10) -> list:
+    messages = []
+    for turn in range(turns):
+        messages.append(HumanMessage(content=f"Question {turn}: how does context caching work?"))
+        messages.append(AIMessage(content=f"Answer {turn}: " + "it reuses tokens already sent. " * 10))
+    messages.append(HumanMessage(content="And what about streaming?"))
+    return messages
+
+
+def build_llm(mode: str, chunks: int, base_url: str):
+    from src.llm.gemini_chat_model import GeminiChatModel
+
+    if mode == "native":
+        return GeminiChatModel(model="gemini-2.5-pro", transport="native", base_url=base_url)
+    wrapped = GeminiChatModel(model="gemini-2.5-pro", transport="grpc_asyncio")
+    client = wrapped._get_client()
+    client.async_client_running = FakeGenerativeAsyncClient(chunks)
+    return wrapped if mode == "wrapped" else client
+
+
+async def run_stream(llm, messages) -> tuple:
+    start = time.perf_counter()
+    first, chunks = None, 0
+    async for chunk in llm.astream(messages):
+        if chunk.content:
+            if first is None:
+                first = time.perf_counter() - start
+            chunks += 1
+    return first, time.perf_counter() - start, chunks
+
+
+async def main(args) -> dict:
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")
+    runner, _, base_url = await start_stub(free_port(), chunks=args.chunks)
+    messages = conversation()
+    results = {}
+    try:
+        for mode in args.modes:
+            llm = build_llm(mode, args.chunks, base_url)
+            for _ in range(args.warmup):
+                await run_stream(llm, messages)
+
+            if args.trace_memory:
+                tracemalloc.start()
+            runs = [await run_stream(llm, messages) for _ in range(args.streams)]
+            peak = None
+            if args.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+            durations = [duration for _, duration, _ in runs]
+            chunks = sum(count for _, _, count in runs)
+            results[mode] = {
+                "chunks_per_stream": chunks // len(runs),
+                "per_chunk_us": round(sum(durations) / chunks * 1e6, 2),
+                "stream_ms": {
+                    "p50": round(statistics.median(durations) * 1e3, 3),
+                    "max": round(max(durations) * 1e3, 3),
+                },
+                "first_chunk_ms_p50": round(statistics.median(first for first, _, _ in runs) * 1e3, 3),
+                "traced_peak_bytes": peak,
+            }
+    finally:
+        from src.llm.http_session import aclose_http_session
+
+        await aclose_http_session()
+        await runner.cleanup()
+    return {"scenario": vars(args), "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=["wrapped", "direct", "native"], default=["wrapped", "direct", "native"])
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--chunks", type=int, default=100, help="text chunks per streamed response")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--trace-memory", action="store_true", help="track allocations (slows the run down)")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/gemini-adapter-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {save_results(results, args.output, 'gemini-adapter')}")
@@ -0,0 +1,142 @@
+"""
+First-turn TTFT with `history-prefetch` off and on.
+
+Starts the app in-process with the deterministic fake LLM answering without
+delay, so that TTFT is the pre-LLM phase of the turn (user-message insert and
+history load, plus the transport). Each of `--clients` concurrent clients does
+what the UI does:
+- open: GET /conversations/{id} of a conversation with `--history` messages, then its first /chat turn,
+- create: POST /conversations/ of a new conversation, then its first /chat turn.
+Only the chat turns are timed. Reports TTFT and latency percentiles of the
+first turns, and the DB queries per turn (opening included).
+
+Needs a PostgreSQL database, like the /chat scenarios of bench_chat_load.
+
+Usage (from the project root):
+    python -m benchmarks.bench_history_prefetch --clients 50 --history 20
+    python -m benchmarks.bench_history_prefetch --scenario create --mode inline
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+import httpx
+
+import src.configs.config
+from src.configs.config import yaml_configs
+
+from benchmarks.bench_chat_load import create_conversations
+from benchmarks.harness import (
+    QueryCounter,
+    TurnResult,
+    free_port,
+    run_turn,
+    save_results,
+    start_server,
+    stop_server,
+    summarize,
+)
+
+
+async def seed_history(conversation_ids: List[int], messages: int) -> None:
+    """Gives every conversation `messages` alternating user and assistant messages."""
+    from src.configs.db import AsyncSessionFactory
+    from src.dao import message_dao
+    from src.schemas.message import MessageCreateSchema
+
+    async with AsyncSessionFactory() as session:
+        for conv_id in conversation_ids:
+            for index in range(messages):
+                role = "user" if index % 2 == 0 else "assistant"
+                await message_dao.create_message(
+                    session, MessageCreateSchema(conversation_id=conv_id, role=role, content=f"{role} message {index} " * 20)
+                )
+
+
+async def open_then_chat(client: httpx.AsyncClient, scenario: str, conversation_id: int, user_id: int) -> TurnResult:
+    if scenario == "open":
+        response = await client.get(f"/api/v1/conversations/{conversation_id}")
+    else:
+        response = await client.post("/api/v1/conversations/", json={"user_id": user_id})
+        conversation_id = response.json().get("id")
+    if response.status_code != 200:
+        return TurnResult(None, 0.0, 0, 0, f"HTTP {response.status_code}")
+    payload = {"conversation_id": conversation_id, "message": "first turn", "model": "fake"}
+    return await run_turn(client, "/api/v1/chat", payload)
+
+
+async def run_first_turns(base_url: str, scenario: str, conversation_ids: List[int], user_id: int) -> tuple:
+    limits = httpx.Limits(max_connections=len(conversation_ids) + 10, max_keepalive_connections=len(conversation_ids) + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(600.0), limits=limits) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(open_then_chat(client, scenario, conv_id, user_id) for conv_id in conversation_ids)
+        )
+        wall_time = time.perf_counter() - start
+    return list(results), wall_time
+
+
+async def main(args) -> dict:
+    yaml_configs["fake-llm"] = {
+        "enabled": True,
+        "response-tokens": args.response_tokens,
+        "chunk-size": 4,
+        "tokens-per-second": 0,
+        "first-token-delay": 0,
+        "failure-rate": 0,
+    }
+    yaml_configs.setdefault("generation", {})["mode"] = args.mode
+
+    from server import app
+    from src.configs.db import AsyncSessionFactory, get_async_engine
+    from src.dao import conversation_dao
+
+    port = free_port()
+    server, server_task = await start_server(app, port)
+    runs = {}
+    try:
+        for prefetch in ("off", "on"):
+            yaml_configs["history-prefetch"] = {"enabled": prefetch == "on", "write-behind": not args.no_write_behind}
+            conversation_ids = await create_conversations(args.clients)
+            async with AsyncSessionFactory() as session:
+                user_id = (await conversation_dao.get_conversation(session, conversation_ids[0]))["user_id"]
+            if args.scenario == "open":
+                await seed_history(conversation_ids, args.history)
+            query_counter = QueryCounter(get_async_engine())
+            try:
+                results, wall_time = await run_first_turns(
+                    f"http://127.0.0.1:{port}", args.scenario, conversation_ids, user_id
+                )
+            finally:
+                query_counter.close()
+            runs[prefetch] = {
+                **summarize(results, wall_time),
+                "db_queries_per_turn": round(query_counter.count / len(results), 2) if results else None,
+            }
+    finally:
+        await stop_server(server, server_task)
+    return {"parameters": vars(args), "runs": runs}
+
+
+def report(results: dict) -> None:
+    print(f"{'prefetch':<9} {'ttft p50':>9} {'ttft p95':>9} {'lat p50':>9} {'queries':>8} {'errors':>7}")
+    for prefetch, run in results["runs"].items():
+        print(f"{prefetch:<9} {run['ttft_s']['p50']:>9} {run['ttft_s']['p95']:>9} {run['latency_s']['p50']:>9} "
+              f"{run['db_queries_per_turn']:>8} {run['errors']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=["open", "create"], default="open", help="how the conversation is reached")
+    parser.add_argument("--mode", choices=["worker", "inline"], default="worker", help="generation.mode to run with")
+    parser.add_argument("--clients", type=int, default=20, help="conversations opened and chatted concurrently")
+    parser.add_argument("--history", type=int, default=20, help="messages already in each opened conversation")
+    parser.add_argument("--response-tokens", type=int, default=20)
+    parser.add_argument("--no-write-behind", action="store_true", help="history-prefetch.write-behind off")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/history-prefetch-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    report(results)
+    print(f"Results written to {save_results(results, args.output, 'history-prefetch')}")
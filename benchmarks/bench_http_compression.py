@@ -0,0 +1,135 @@
+"""
+Bytes on the wire and added latency of the response compression middleware
+(`http-compression`).
+
+Sends a chat SSE stream of `--chunks` chunks (the frames /chat produces, with
+`--chunk-chars` characters of content each) and a conversation JSON of
+`--messages` messages through CompressionMiddleware, once per encoding
+(identity, gzip and, when the package is installed, brotli). Reports the bytes
+sent, the ratio to the identity body and the time the middleware adds per SSE
+chunk (each one compressed and flushed on its own) and per JSON response.
+
+Usage (from the project root):
+    python -m benchmarks.bench_http_compression
+    python -m benchmarks.bench_http_compression --chunks 2000 --chunk-chars 4 --gzip-levels 1 5 9
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import src.configs.config
+from src.configs.http_compression import CompressionMiddleware, brotli
+
+from benchmarks.harness import save_results
+
+
+def sse_frames(count: int, chunk_chars: int, rng: random.Random) -> list:
+    words = "the stream of tokens from the model is sent to the client as it arrives".split()
+    frames = []
+    for _ in range(count):
+        content = "".join(rng.choice(words) + " " for _ in range(chunk_chars // 4 + 1))[:chunk_chars]
+        chunk_data = {
+            "id": "chatcmpl-12345",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": "gemini",
+            "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+        }
+        frames.append(f"data: {json.dumps(chunk_data)}\n\n".encode())
+    frames.append(b"data: [DONE]\n\n")
+    return frames
+
+
+def conversation_body(messages: int, rng: random.Random) -> bytes:
+    words = "what how can you explain the difference between a list and a tuple in python please".split()
+    return json.dumps({
+        "id": 1, "user_id": 1, "name": "benchmark", "created_at": "2024-01-01T00:00:00Z",
+        "messages": [
+            {"id": i, "conversation_id": 1, "role": "user" if i % 2 == 0 else "assistant",
+             "content": " ".join(rng.choice(words) for _ in range(rng.randint(10, 200))),
+             "created_at": "2024-01-01T00:00:00Z"}
+            for i in range(messages)
+        ],
+    }).encode()
+
+
+async def measure(body_messages: list, content_type: bytes, encoding: str, settings: dict) -> dict:
+    """Sends the body messages through the middleware; returns the bytes sent and the time spent sending."""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        for i, body in enumerate(body_messages):
+            await send({"type": "http.response.body", "body": body, "more_body": i < len(body_messages) - 1})
+
+    sent_bytes = 0
+
+    async def send(message):
+        nonlocal sent_bytes
+        sent_bytes += len(message.get("body", b""))
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", encoding.encode())]}
+    start = time.perf_counter()
+    await CompressionMiddleware(app, settings)(scope, None, send)
+    return {"bytes": sent_bytes, "seconds": time.perf_counter() - start}
+
+
+async def main(args) -> dict:
+    rng = random.Random(args.seed)
+    frames = sse_frames(args.chunks, args.chunk_chars, rng)
+    conversation = conversation_body(args.messages, rng)
+    variants = [("identity", None)] + [("gzip", level) for level in args.gzip_levels]
+    if brotli is not None:
+        variants += [("br", quality) for quality in args.brotli_qualities]
+
+    rows = []
+    for encoding, level in variants:
+        settings = {"min-bytes": 0, "gzip-level": level or 5, "brotli-quality": level or 4}
+        for name, body_messages, content_type in (
+            ("sse", frames + [b""], b"text/event-stream"),
+            ("json", [conversation], b"application/json"),
+        ):
+            runs = [await measure(body_messages, content_type, encoding, settings) for _ in range(args.repeat)]
+            rows.append({
+                "body": name,
+                "encoding": encoding,
+                "level": level,
+                "bytes": runs[0]["bytes"],
+                "seconds": min(run["seconds"] for run in runs),
+            })
+    for row in rows:
+        identity = next(r for r in rows if r["body"] == row["body"] and r["encoding"] == "identity")
+        row["ratio"] = round(identity["bytes"] / row["bytes"], 2)
+        added = row["seconds"] - identity["seconds"]
+        if row["body"] == "sse":
+            row["added_us_per_chunk"] = round(added / len(frames) * 1e6, 2)
+        else:
+            row["added_ms"] = round(added * 1000, 2)
+    return {"parameters": vars(args), "brotli_installed": brotli is not None, "results": rows}
+
+
+def report(results: dict) -> None:
+    if not results["brotli_installed"]:
+        print("brotli is not installed: gzip only")
+    print(f"{'body':<5} {'encoding':<9} {'level':>5} {'bytes':>10} {'ratio':>6} {'added':>16}")
+    for row in results["results"]:
+        added = f"{row['added_us_per_chunk']} us/chunk" if row["body"] == "sse" else f"{row['added_ms']} ms"
+        print(f"{row['body']:<5} {row['encoding']:<9} {str(row['level'] or '-'):>5} {row['bytes']:>10} "
+              f"{row['ratio']:>6} {added:>16}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000, help="chunks of the SSE stream")
+    parser.add_argument("--chunk-chars", type=int, default=8, help="content characters per chunk")
+    parser.add_argument("--messages", type=int, default=500, help="messages of the conversation JSON")
+    parser.add_argument("--gzip-levels", type=int, nargs="+", default=[1, 5, 9])
+    parser.add_argument("--brotli-qualities", type=int, nargs="+", default=[1, 4, 9])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/http-compression-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    report(results)
+    print(f"Results written to {save_results(results, args.output, 'http-compression')}")
@@ -0,0 +1,152 @@
+"""
+Cost of serialising API responses and SSE payloads with `fast-json` off
+(stdlib json, rows validated through the response models) and on (orjson,
+conversation payloads rendered straight from the DAO rows).
+
+- conversation: GET /api/v1/conversations/{id} of a `--messages` message
+  conversation, through the real router and FastAPI, with the DAO returning
+  rows shaped like decode_row's (no database involved);
+- sse: encoding the `--chunks` frames of a chat stream, as chat_service does.
+
+Reports the time per request and per chunk, and the speed-up.
+
+Usage (from the project root):
+    python -m benchmarks.bench_json_serialization
+    python -m benchmarks.bench_json_serialization --messages 5000 --chunks 2000 --repeat 10
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+
+import httpx
+from fastapi import FastAPI
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.configs.db import get_db_session
+from src.configs.fast_json import sse_frame
+from src.dao import conversation_dao, message_dao
+from src.routers import conversation_router
+
+from benchmarks.harness import save_results
+
+
+def conversation_rows(messages: int, rng: random.Random) -> tuple:
+    words = "what how can you explain the difference between a list and a tuple in python please".split()
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    conversation = {"id": 1, "user_id": 1, "name": "benchmark", "created_at": created_at}
+    rows = [
+        {"id": i, "conversation_id": 1, "role": "user" if i % 2 == 0 else "assistant",
+         "content": " ".join(rng.choice(words) for _ in range(rng.randint(10, 200))),
+         "created_at": created_at, "status": "complete"}
+        for i in range(messages)
+    ]
+    return conversation, rows
+
+
+def chunk_payloads(count: int, chunk_chars: int, rng: random.Random) -> list:
+    words = "the stream of tokens from the model is sent to the client as it arrives".split()
+    return [
+        {
+            "id": "chatcmpl-12345",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": "gemini",
+            "choices": [{
+                "index": 0,
+                "delta": {"content": "".join(rng.choice(words) + " " for _ in range(chunk_chars // 4 + 1))[:chunk_chars]},
+                "finish_reason": None,
+            }],
+        }
+        for _ in range(count)
+    ]
+
+
+def conversation_app(conversation: dict, rows: list) -> FastAPI:
+    async def get_conversation(db, conversation_id):
+        return conversation
+
+    async def get_messages_by_conversation(db, conversation_id, limit=None):
+        return rows
+
+    async def no_session():
+        yield None
+
+    conversation_dao.get_conversation = get_conversation
+    message_dao.get_messages_by_conversation = get_messages_by_conversation
+    app = FastAPI()
+    app.include_router(conversation_router.router)
+    app.dependency_overrides[get_db_session] = no_session
+    return app
+
+
+async def time_conversation(app: FastAPI, repeat: int) -> tuple:
+    """Best time of `repeat` GETs of the conversation, and the response size."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = await client.get("/api/v1/conversations/1")
+            times.append(time.perf_counter() - start)
+            response.raise_for_status()
+    return min(times), len(response.content)
+
+
+def time_sse(payloads: list, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            sse_frame(payload)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+async def main(args) -> dict:
+    rng = random.Random(args.seed)
+    conversation, rows = conversation_rows(args.messages, rng)
+    payloads = chunk_payloads(args.chunks, args.chunk_chars, rng)
+    app = conversation_app(conversation, rows)
+
+    runs = {}
+    for enabled in (False, True):
+        yaml_configs["fast-json"] = {"enabled": enabled}
+        conversation_seconds, body_bytes = await time_conversation(app, args.repeat)
+        sse_seconds = time_sse(payloads, args.repeat)
+        runs["orjson" if enabled else "stdlib"] = {
+            "conversation_ms": round(conversation_seconds * 1000, 2),
+            "conversation_bytes": body_bytes,
+            "sse_us_per_chunk": round(sse_seconds / len(payloads) * 1e6, 2),
+        }
+    speedup = {
+        "conversation": round(runs["stdlib"]["conversation_ms"] / runs["orjson"]["conversation_ms"], 2),
+        "sse": round(runs["stdlib"]["sse_us_per_chunk"] / runs["orjson"]["sse_us_per_chunk"], 2),
+    }
+    return {"parameters": vars(args), "runs": runs, "speedup": speedup}
+
+
+def report(results: dict) -> None:
+    print(f"{'serialiser':<11} {'conversation':>14} {'bytes':>10} {'sse chunk':>12}")
+    for name, run in results["runs"].items():
+        print(f"{name:<11} {run['conversation_ms']:>11} ms {run['conversation_bytes']:>10} "
+              f"{run['sse_us_per_chunk']:>9} us")
+    speedup = results["speedup"]
+    print(f"speed-up: conversation x{speedup['conversation']}, sse x{speedup['sse']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000, help="messages of the conversation")
+    parser.add_argument("--chunks", type=int, default=2000, help="chunks of the SSE stream")
+    parser.add_argument("--chunk-chars", type=int, default=8, help="content characters per chunk")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/json-serialization-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    report(results)
+    print(f"Results written to {save_results(results, args.output, 'json-serialization')}")
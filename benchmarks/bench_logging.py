@@ -0,0 +1,82 @@
+"""
+Stream throughput with logging off vs. the synchronous and enqueued JSON pipelines.
+
+Streams a long fake answer through `stream_pure_chat_response` and reports the
+chunks per second for each logging mode. Log output goes to /dev/null;
+`--write-latency-us` simulates a slow stdout pipe (e.g. a congested log agent),
+which is where the enqueued mode pays off.
+
+Usage (from the project root):
+    APP_ENVIRONMENT=dev python -m benchmarks.bench_logging --chunks 20000 --write-latency-us 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from loguru import logger
+
+import src.configs.config
+from src.configs.log_config import flush_logs, setup_logging
+from src.schemas.chat import PureChatRequest
+from src.services.chat_service import stream_pure_chat_response
+from src.services.llm_service import LLMService
+
+MODES = {
+    "off": None,
+    "sync-json": {"level": "DEBUG", "enqueue": False, "chunk-log-every": 1},
+    "enqueued-json": {"level": "DEBUG", "enqueue": True, "chunk-log-every": 1},
+    "enqueued-json-sampled": {"level": "DEBUG", "enqueue": True, "chunk-log-every": 50},
+}
+
+
+class SlowStream:
+    """A file-like object whose writes block for a fixed time."""
+
+    def __init__(self, stream, latency_seconds: float):
+        self.stream = stream
+        self.latency_seconds = latency_seconds
+
+    def write(self, data: str):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        self.stream.write(data)
+
+    def isatty(self) -> bool:
+        return False
+
+
+async def run_stream(chunks: int) -> float:
+    text = " ".join(f"token{i}" for i in range(chunks))
+    llm_service = LLMService(llm=GenericFakeChatModel(messages=iter([text])))
+    request = PureChatRequest(message="benchmark", model="fake")
+
+    start = time.perf_counter()
+    async for _ in stream_pure_chat_response(request, llm_service):
+        pass
+    return time.perf_counter() - start
+
+
+async def main(chunks: int, write_latency_us: float) -> dict:
+    results = {}
+    with open(os.devnull, "w") as devnull:
+        stream = SlowStream(devnull, write_latency_us / 1_000_000)
+        for mode, logging_config in MODES.items():
+            if logging_config is None:
+                logger.remove()
+            else:
+                setup_logging("dev", logging_config, stream=stream)
+            elapsed = await run_stream(chunks)
+            flush_logs()
+            results[mode] = {"seconds": round(elapsed, 4), "chunks_per_second": round(chunks / elapsed, 1)}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--write-latency-us", type=float, default=0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.chunks, args.write_latency_us)), indent=2))
@@ -0,0 +1,189 @@
+"""
+Storage and CPU trade-off of compressing message bodies (`message-compression`).
+
+Offline (default): for synthetic assistant-style bodies (prose, code, JSON and
+incompressible base64) of several sizes, reports the zstd ratio, the cost of
+compressing and decompressing per level, and the bytes an insert still sends:
+the compressed body plus the plain text its search vector is built from (the
+first SEARCH_MAX_CHARS characters).
+
+With `--db`: writes the same conversation plain and compressed through
+message_dao, then times history loads (last 20 messages) and full exports
+(every message, as GET /conversations/{id} does) for both, and compares the
+bytes actually stored. PostgreSQL already compresses large TEXT values (TOAST,
+pglz or lz4), so this is the number to decide on.
+
+Usage (from the project root):
+    python -m benchmarks.bench_message_compression
+    python -m benchmarks.bench_message_compression --db --messages 200 --size 16384
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+
+import zstandard
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.dao.message_codec import SEARCH_MAX_CHARS
+
+from benchmarks.harness import percentile, save_results
+
+_WORDS = (
+    "the a of to and in is that for it with as on be this are by can you use your from or an not "
+    "function value request response connection pool database query stream token model history "
+    "message context cache error retry timeout server client worker thread async await return list "
+    "python example configuration default should would could first then each when which if"
+).split()
+
+
+def make_body(kind: str, size: int, rng: random.Random) -> str:
+    """A synthetic message body of roughly `size` UTF-8 bytes."""
+    parts, length = [], 0
+    while length < size:
+        if kind == "prose":
+            sentence = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 20)))
+            part = sentence.capitalize() + ". " + ("\n\n" if rng.random() < 0.2 else "")
+        elif kind == "code":
+            name = "_".join(rng.sample(_WORDS, 2))
+            part = (
+                f"def {name}({rng.choice(_WORDS)}, {rng.choice(_WORDS)}=None):\n"
+                f"    if {rng.choice(_WORDS)} is None:\n"
+                f"        return {rng.randint(0, 1000)}\n"
+                f"    result = [{rng.choice(_WORDS)} for _ in range({rng.randint(1, 50)})]\n"
+                f"    return result\n\n"
+            )
+        elif kind == "json":
+            part = json.dumps({
+                "id": rng.randint(1, 10**9),
+                "event": rng.choice(_WORDS),
+                "tags": rng.sample(_WORDS, 3),
+                "latency_ms": round(rng.random() * 500, 3),
+            }) + "\n"
+        else:
+            part = base64.b64encode(rng.randbytes(96)).decode() + "\n"
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:size]
+
+
+def time_per_call(func, arg, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - start) / repeat
+
+
+def offline(args) -> dict:
+    rng = random.Random(args.seed)
+    rows = []
+    for kind in ("prose", "code", "json", "base64"):
+        for size in args.sizes:
+            body = make_body(kind, size, rng)
+            raw = body.encode()
+            indexed = len(body[:SEARCH_MAX_CHARS].encode())
+            for level in args.levels:
+                compressor = zstandard.ZstdCompressor(level=level)
+                compressed = compressor.compress(raw)
+                decompressor = zstandard.ZstdDecompressor()
+                repeat = max(10, 2_000_000 // max(size, 1))
+                rows.append({
+                    "kind": kind,
+                    "bytes": len(raw),
+                    "level": level,
+                    "ratio": round(len(raw) / len(compressed), 2),
+                    "insert_bytes": len(compressed) + indexed,
+                    "compress_us": round(time_per_call(compressor.compress, raw, repeat) * 1e6, 1),
+                    "decompress_us": round(time_per_call(decompressor.decompress, compressed, repeat) * 1e6, 1),
+                })
+    return {"bodies": rows}
+
+
+async def with_db(args) -> dict:
+    from src.configs.db import AsyncSessionFactory, get_async_engine
+    from src.dao import conversation_dao, message_dao, user_dao
+    from src.models.tables import metadata
+    from src.schemas.conversation import ConversationCreateSchema
+    from src.schemas.message import MessageCreateSchema
+    from src.schemas.user import UserCreateSchema
+    from sqlalchemy import text
+
+    rng = random.Random(args.seed)
+    bodies = [make_body(rng.choice(["prose", "prose", "code", "json"]), args.size, rng) for _ in range(args.messages)]
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(metadata.create_all)
+
+    results = {}
+    async with AsyncSessionFactory() as session:
+        user = await user_dao.create_user(session, UserCreateSchema(username=f"bench-compression-{time.time_ns()}"))
+        for mode in ("plain", "zstd"):
+            yaml_configs["message-compression"] = {"enabled": mode == "zstd", "min-bytes": args.min_bytes, "level": args.level}
+            conv = await conversation_dao.create_conversation(session, ConversationCreateSchema(user_id=user["id"]))
+            write_start = time.perf_counter()
+            for i, body in enumerate(bodies):
+                role = "user" if i % 2 == 0 else "assistant"
+                await message_dao.create_message(session, MessageCreateSchema(conversation_id=conv["id"], role=role, content=body))
+            write_s = time.perf_counter() - write_start
+
+            stored = (await session.execute(
+                text("SELECT sum(pg_column_size(content) + coalesce(pg_column_size(content_compressed), 0)) "
+                     "FROM messages WHERE conversation_id = :id"),
+                {"id": conv["id"]},
+            )).scalar()
+
+            timings = {"history": [], "export": []}
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                await message_dao.get_messages_by_conversation(session, conv["id"], limit=20)
+                timings["history"].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                exported = await message_dao.get_messages_by_conversation(session, conv["id"])
+                timings["export"].append(time.perf_counter() - start)
+            assert [m["content"] for m in exported] == bodies
+
+            results[mode] = {
+                "raw_bytes": sum(len(body.encode()) for body in bodies),
+                "stored_bytes": stored,
+                "write_ms_per_message": round(write_s / len(bodies) * 1000, 3),
+                **{
+                    f"{name}_ms": {f"p{p}": round(percentile(values, p) * 1000, 2) for p in (50, 95)}
+                    for name, values in timings.items()
+                },
+            }
+    return results
+
+
+def report(results: dict) -> None:
+    print(f"{'kind':<8} {'bytes':>7} {'level':>5} {'ratio':>6} {'insert':>7} {'comp us':>9} {'decomp us':>10}")
+    for row in results["bodies"]:
+        print(f"{row['kind']:<8} {row['bytes']:>7} {row['level']:>5} {row['ratio']:>6} {row['insert_bytes']:>7} "
+              f"{row['compress_us']:>9} {row['decompress_us']:>10}")
+    for mode, stats in results.get("db", {}).items():
+        print(f"{mode}: {stats['raw_bytes']} raw bytes stored in {stats['stored_bytes']}, "
+              f"write {stats['write_ms_per_message']} ms/message, "
+              f"history p50 {stats['history_ms']['p50']} ms, export p50 {stats['export_ms']['p50']} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 4096, 16384, 65536])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 3, 9, 19])
+    parser.add_argument("--db", action="store_true", help="also measure history loads against PostgreSQL")
+    parser.add_argument("--messages", type=int, default=100, help="messages of the --db conversation")
+    parser.add_argument("--size", type=int, default=16384, help="bytes per --db message")
+    parser.add_argument("--min-bytes", type=int, default=4096)
+    parser.add_argument("--level", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=50, help="timed loads per mode")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/compression-<time>.json)")
+    args = parser.parse_args()
+
+    results = offline(args)
+    if args.db:
+        results["db"] = asyncio.run(with_db(args))
+    results["parameters"] = vars(args)
+    report(results)
+    print(f"Results written to {save_results(results, args.output, 'compression')}")
@@ -0,0 +1,96 @@
+"""
+Memory and CPU cost of accumulating long streamed answers.
+
+Runs `--streams` concurrent simulated streams, each producing an answer of
+`--size` characters in `--chunk-size` chunks, and accumulates them the way the
+stream loop does: growing a string with `+=` (the previous implementation) or
+appending to a ResponseBuffer. Both hand the answer to a checkpoint every
+`--checkpoint-every` characters, as `response-checkpoint` does. Reports the
+wall time, the CPU time per chunk and the peak traced memory per stream.
+
+Usage (from the project root):
+    python -m benchmarks.bench_response_buffer
+    python -m benchmarks.bench_response_buffer --streams 500 --size 262144 --chunk-size 8
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import src.configs.config
+
+from benchmarks.harness import save_results
+from src.services.response_buffer import ResponseBuffer
+
+
+def make_chunks(size: int, chunk_size: int) -> list:
+    text = ("lorem ipsum dolor sit amet " * (size // 27 + 1))[:size]
+    return [text[i:i + chunk_size] for i in range(0, size, chunk_size)]
+
+
+async def stream_concat(chunks: list, checkpoint_every: int) -> int:
+    content, checkpointed = "", 0
+    for chunk in chunks:
+        content += chunk
+        if len(content) - checkpointed >= checkpoint_every:
+            checkpointed = len(content)
+        await asyncio.sleep(0)
+    return len(content)
+
+
+async def stream_buffer(chunks: list, checkpoint_every: int) -> int:
+    response, checkpointed = ResponseBuffer(), 0
+    for chunk in chunks:
+        response.append(chunk)
+        if len(response) - checkpointed >= checkpoint_every:
+            checkpointed = len(response.getvalue())
+        await asyncio.sleep(0)
+    return len(response.getvalue())
+
+
+async def run(accumulate, args) -> dict:
+    chunks = make_chunks(args.size, args.chunk_size)
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    lengths = await asyncio.gather(*(accumulate(chunks, args.checkpoint_every) for _ in range(args.streams)))
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert all(length == args.size for length in lengths)
+    return {
+        "wall_s": round(wall, 3),
+        "cpu_us_per_chunk": round(cpu / (len(chunks) * args.streams) * 1e6, 3),
+        "peak_bytes_per_stream": round((peak - baseline) / args.streams),
+    }
+
+
+async def main(args) -> dict:
+    return {
+        "parameters": vars(args),
+        "concat": await run(stream_concat, args),
+        "buffer": await run(stream_buffer, args),
+    }
+
+
+def report(results: dict) -> None:
+    params = results["parameters"]
+    print(f"{params['streams']} streams of {params['size']} chars in {params['chunk_size']}-char chunks")
+    print(f"{'accumulator':<12} {'wall s':>8} {'cpu us/chunk':>13} {'peak KB/stream':>15}")
+    for name in ("concat", "buffer"):
+        run = results[name]
+        print(f"{name:<12} {run['wall_s']:>8} {run['cpu_us_per_chunk']:>13} {run['peak_bytes_per_stream'] / 1024:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--size", type=int, default=131072, help="characters per answer")
+    parser.add_argument("--chunk-size", type=int, default=16, help="characters per chunk")
+    parser.add_argument("--checkpoint-every", type=int, default=2000, help="characters between two checkpoints")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/response-buffer-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    report(results)
+    print(f"Results written to {save_results(results, args.output, 'response-buffer')}")
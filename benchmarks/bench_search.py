@@ -0,0 +1,209 @@
+"""
+Benchmark of message full-text search (GET /api/v1/users/{id}/messages/search)
+on a synthetic dataset.
+
+Seeds PostgreSQL with `--messages` messages (default one million) spread over
+`--users` users, generated server-side from a Zipf-like vocabulary so that
+some words are in most conversations and others in a handful. Then times
+message_dao.search_messages for common, mid-frequency, rare, multi-word and
+phrase queries on random users, and reports latency percentiles, the index
+and table sizes and the plan of a sample query (the GIN index on
+messages.content_tsv must be used). `--ilike` also times the naive
+`content ILIKE '%word%'` scan the index replaces.
+
+Needs a PostgreSQL database (see README.md). Seeded rows belong to users named
+`bench-search-*`; pass `--reuse` to benchmark an already seeded database.
+
+Usage (from the project root):
+    python -m benchmarks.bench_search --messages 1000000 --users 1000
+    python -m benchmarks.bench_search --reuse --queries 200 --ilike
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import src.configs.config
+
+from benchmarks.harness import percentile, save_results
+
+_SYLLABLES = [c + v for c in "bcdfghklmnprstvz" for v in ("a", "e", "i", "o", "u", "ai", "ou")]
+
+
+def build_vocabulary(size: int, seed: int = 42) -> list:
+    """Deterministic pronounceable words; index 0 is the most frequent in the dataset."""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words, key=lambda word: rng.random())
+
+
+async def seed(session, args, vocabulary: list) -> None:
+    from sqlalchemy import text
+
+    run = time.strftime("%Y%m%d%H%M%S")
+    await session.execute(
+        text("INSERT INTO users (username) SELECT 'bench-search-' || :run || '-' || g FROM generate_series(1, :users) g"),
+        {"run": run, "users": args.users},
+    )
+    result = await session.execute(
+        text(
+            "INSERT INTO conversations (user_id, name, created_at) "
+            "SELECT u.id, 'conversation ' || g, now() - interval '366 days' FROM users u, generate_series(1, :per_user) g "
+            "WHERE u.username LIKE 'bench-search-' || :run || '-%' RETURNING id"
+        ),
+        {"run": run, "per_user": args.conversations_per_user},
+    )
+    conversation_ids = [row[0] for row in result.fetchall()]
+    await session.commit()
+
+    # Word i is drawn with probability ~ i^(-2/3): power(random(), 3) skews towards the head.
+    insert_messages = text(
+        "INSERT INTO messages (conversation_id, role, content, content_tsv, created_at) "
+        "SELECT conversation_id, role, body, to_tsvector('english', body), created_at FROM ("
+        "  SELECT (CAST(:conversations AS int[]))[1 + g % :conversation_count] AS conversation_id, "
+        "         CASE WHEN g % 2 = 0 THEN 'user' ELSE 'assistant' END AS role, "
+        "         (SELECT string_agg((CAST(:vocabulary AS text[]))[1 + floor(power(random(), 3) * :vocabulary_size)::int], ' ') "
+        "          FROM generate_series(1, :min_words + (random() * :min_words * 2)::int) WHERE g IS NOT NULL) AS body, "
+        "         now() - random() * interval '365 days' AS created_at "
+        "  FROM generate_series(:start, :stop) g"
+        ") generated"
+    )
+    start = time.perf_counter()
+    for batch_start in range(0, args.messages, args.batch_size):
+        await session.execute(insert_messages, {
+            "conversations": conversation_ids,
+            "conversation_count": len(conversation_ids),
+            "vocabulary": vocabulary,
+            "vocabulary_size": len(vocabulary),
+            "min_words": args.words // 2,
+            "start": batch_start,
+            "stop": min(batch_start + args.batch_size, args.messages) - 1,
+        })
+        await session.commit()
+        done = min(batch_start + args.batch_size, args.messages)
+        print(f"  seeded {done}/{args.messages} messages ({time.perf_counter() - start:.0f}s)", file=sys.stderr)
+    await session.execute(text("ANALYZE users, conversations, messages"))
+    await session.commit()
+
+
+def query_mix(vocabulary: list) -> dict:
+    """Search texts per query kind, by vocabulary rank (frequency)."""
+    return {
+        "common": [vocabulary[i] for i in range(5)],
+        "mid": [vocabulary[i] for i in range(200, 220)],
+        "rare": [vocabulary[i] for i in range(len(vocabulary) - 50, len(vocabulary))],
+        "two_words": [f"{vocabulary[i]} {vocabulary[i + 300]}" for i in range(20)],
+        "phrase": [f'"{vocabulary[i]} {vocabulary[i + 1]}"' for i in range(20)],
+    }
+
+
+async def time_queries(session, search, user_ids: list, texts: list, count: int, rng: random.Random) -> dict:
+    latencies, hits = [], []
+    for _ in range(count):
+        start = time.perf_counter()
+        rows = await search(session, rng.choice(user_ids), rng.choice(texts))
+        latencies.append(time.perf_counter() - start)
+        hits.append(len(rows))
+    return {
+        "queries": count,
+        "mean_hits": round(sum(hits) / count, 1),
+        "latency_ms": {f"p{p}": round(percentile(latencies, p) * 1000, 2) for p in (50, 95, 99)},
+    }
+
+
+async def main(args) -> dict:
+    from sqlalchemy import text
+
+    from src.configs.db import AsyncSessionFactory, get_async_engine
+    from src.dao import message_dao
+    from src.models.tables import metadata
+
+    vocabulary = build_vocabulary(args.vocabulary)
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(metadata.create_all)
+
+    async with AsyncSessionFactory() as session:
+        if not args.reuse:
+            print(f"Seeding {args.messages} messages...", file=sys.stderr)
+            await seed(session, args, vocabulary)
+        user_ids = [row[0] for row in (await session.execute(
+            text("SELECT id FROM users WHERE username LIKE 'bench-search-%'")
+        )).fetchall()]
+        if not user_ids:
+            raise SystemExit("No bench-search-* users found: run without --reuse first.")
+
+        sizes = (await session.execute(text(
+            "SELECT count(*), pg_size_pretty(pg_total_relation_size('messages')), "
+            "pg_size_pretty(pg_relation_size('ix_messages_content_tsv')) FROM messages"
+        ))).one()
+        plan = (await session.execute(
+            text(
+                "EXPLAIN SELECT m.id FROM messages m JOIN conversations c ON c.id = m.conversation_id "
+                "WHERE c.user_id = :user_id AND m.content_tsv @@ websearch_to_tsquery('english', :q)"
+            ),
+            {"user_id": user_ids[0], "q": vocabulary[250]},
+        )).fetchall()
+
+        async def search(db, user_id, search_text):
+            return await message_dao.search_messages(db, user_id=user_id, text=search_text, limit=args.limit)
+
+        async def search_ilike(db, user_id, search_text):
+            result = await db.execute(
+                text(
+                    "SELECT m.id, m.content FROM messages m JOIN conversations c ON c.id = m.conversation_id "
+                    "WHERE c.user_id = :user_id AND m.content ILIKE :pattern ORDER BY m.id DESC LIMIT :limit"
+                ),
+                {"user_id": user_id, "pattern": f"%{search_text.strip(chr(34))}%", "limit": args.limit},
+            )
+            return result.fetchall()
+
+        rng = random.Random(args.seed)
+        results = {
+            "parameters": vars(args),
+            "messages": sizes[0],
+            "messages_total_size": sizes[1],
+            "gin_index_size": sizes[2],
+            "plan": [row[0] for row in plan],
+            "fts": {},
+            "ilike": {},
+        }
+        for kind, texts in query_mix(vocabulary).items():
+            results["fts"][kind] = await time_queries(session, search, user_ids, texts, args.queries, rng)
+            if args.ilike:
+                results["ilike"][kind] = await time_queries(session, search_ilike, user_ids, texts, args.queries, rng)
+    return results
+
+
+def report(results: dict) -> None:
+    print(f"{results['messages']} messages, table {results['messages_total_size']}, "
+          f"GIN index {results['gin_index_size']}")
+    print("Plan:\n  " + "\n  ".join(results["plan"]))
+    print(f"{'query':<10} {'engine':<6} {'hits':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for engine in ("fts", "ilike"):
+        for kind, stats in results[engine].items():
+            latency = stats["latency_ms"]
+            print(f"{kind:<10} {engine:<6} {stats['mean_hits']:>6} {latency['p50']:>9} {latency['p95']:>9} {latency['p99']:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--conversations-per-user", type=int, default=10)
+    parser.add_argument("--words", type=int, default=40, help="average words per message")
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=100_000, help="messages inserted per statement")
+    parser.add_argument("--reuse", action="store_true", help="benchmark the already seeded bench-search-* data")
+    parser.add_argument("--queries", type=int, default=100, help="timed queries per query kind")
+    parser.add_argument("--limit", type=int, default=20, help="page size")
+    parser.add_argument("--ilike", action="store_true", help="also time the ILIKE scan baseline")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/search-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    report(results)
+    print(f"Results written to {save_results(results, args.output, 'search')}")
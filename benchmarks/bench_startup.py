@@ -0,0 +1,106 @@
+"""
+Startup cost of the service: wall-clock time of `import server` (which builds the
+app through create_app()) in a fresh interpreter, plus the `python -X importtime`
+breakdown of the slowest modules.
+
+Provider SDKs (langchain_google_genai, langchain_deepseek) are imported lazily on
+the first request for their model, so they should not show up here; the report
+lists them under `provider_modules_imported` if they do.
+
+Usage (from the project root):
+    python -m benchmarks.bench_startup --runs 5 --top 20
+    python -m benchmarks.bench_startup --compare benchmarks/results/startup-baseline.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import save_results
+
+# Modules that must stay out of the startup path.
+PROVIDER_MODULES = ("langchain_google_genai", "langchain_deepseek", "google.genai", "openai")
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def run_import(target: str, importtime: bool = False) -> tuple:
+    """Imports `target` in a fresh interpreter; returns (seconds, stderr)."""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", f"import {target}"]
+    start = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True, env=os.environ.copy())
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"`import {target}` failed:\n{completed.stderr}")
+    return elapsed, completed.stderr
+
+
+def parse_importtime(stderr: str) -> list:
+    """Returns [{module, self_us, cumulative_us, depth}] from `-X importtime` output."""
+    entries = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({
+                "module": module,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": len(indent) // 2,
+            })
+    return entries
+
+
+def measure(target: str, runs: int, top: int) -> dict:
+    timings = [run_import(target)[0] for _ in range(runs)]
+    _, stderr = run_import(target, importtime=True)
+    entries = parse_importtime(stderr)
+    modules = {entry["module"] for entry in entries}
+    top_level = sorted((e for e in entries if e["depth"] == 0), key=lambda e: -e["cumulative_us"])
+    return {
+        "target": target,
+        "runs": runs,
+        "startup_s": {
+            "min": round(min(timings), 4),
+            "median": round(statistics.median(timings), 4),
+        },
+        "import_total_us": sum(e["cumulative_us"] for e in top_level),
+        "top_level_imports": top_level[:top],
+        "slowest_self": sorted(entries, key=lambda e: -e["self_us"])[:top],
+        "provider_modules_imported": sorted(
+            m for m in modules if any(m == p or m.startswith(p + ".") for p in PROVIDER_MODULES)
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="server", help="module to import")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="modules listed in the breakdown")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/startup-<time>.json)")
+    parser.add_argument("--compare", help="baseline result file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change reported as a regression")
+    args = parser.parse_args()
+
+    results = measure(args.target, args.runs, args.top)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {save_results(results, args.output, 'startup')}")
+
+    exit_code = 1 if results["provider_modules_imported"] else 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        base, cur = baseline["startup_s"]["median"], results["startup_s"]["median"]
+        change = (cur - base) / base
+        if change > args.tolerance:
+            print(f"REGRESSION startup_s.median: {base} -> {cur} ({change:+.1%})")
+            exit_code = 1
+    sys.exit(exit_code)
@@ -0,0 +1,146 @@
+"""
+Throughput scaling of the multi-worker server across CPU cores.
+
+For each `--workers` count, starts the server in a subprocess the way
+`python server.py` does (same runtime, configured through WEB_CONCURRENCY, PORT
+and SERVER_* like in the container) with the deterministic fake LLM enabled, drives
+`--clients` concurrent /purechat SSE clients against it and reports turns and
+chunks per second, latency percentiles and the speed-up over the first count.
+/purechat needs no database, so the numbers isolate the HTTP, SSE and
+generation work the workers share out.
+
+With `--tokens-per-second 0` the fake model streams as fast as it can and the
+run is CPU-bound: throughput should grow with workers up to the cores of the
+machine (see `cpus` in the results), and stay flat beyond.
+
+Usage (from the project root):
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --clients 200 --turns 5
+    python -m benchmarks.bench_workers --workers 1 4 --loop asyncio --http h11
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.harness import free_port, run_load, save_results, summarize
+
+# Set in the environment of the server process and inherited by its workers.
+_FAKE_LLM_ENV = "BENCH_FAKE_LLM"
+
+
+def create_app():
+    """App factory of the benchmark server: the production app with the fake LLM enabled."""
+    from src.configs.config import yaml_configs
+
+    yaml_configs["fake-llm"] = json.loads(os.environ[_FAKE_LLM_ENV])
+    from server import app
+    return app
+
+
+def serve() -> None:
+    """Runs the server like `python server.py` does, with the app of create_app()."""
+    import uvicorn
+
+    from src.configs.runtime import get_server_settings, prepare_multiprocess_metrics, uvicorn_options
+    from src.services.lifecycle import get_shutdown_settings
+
+    settings = get_server_settings()
+    prepare_multiprocess_metrics(settings["workers"])
+    uvicorn.run(
+        "benchmarks.bench_workers:create_app",
+        factory=True,
+        log_level="warning",
+        **uvicorn_options(settings, get_shutdown_settings()["graceful-timeout"]),
+    )
+
+
+async def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode} during startup.")
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError("Server did not become ready in time.")
+
+
+async def run_for_workers(workers: int, args) -> dict:
+    port = free_port()
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "PORT": str(port),
+        "SERVER_HOST": "127.0.0.1",
+        "SERVER_LOOP": args.loop,
+        "SERVER_HTTP": args.http,
+        _FAKE_LLM_ENV: json.dumps({
+            "enabled": True,
+            "response-tokens": args.response_tokens,
+            "chunk-size": args.chunk_size,
+            "tokens-per-second": args.tokens_per_second,
+            "first-token-delay": 0,
+            "failure-rate": 0,
+        }),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-c", "from benchmarks.bench_workers import serve; serve()"], env=env,
+        stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_until_ready(base_url, process)
+        payloads = [[{"message": f"turn {turn}", "model": "fake"} for turn in range(args.turns)] for _ in range(args.clients)]
+        # Warm-up: every worker imports, connects and compiles its code paths once.
+        await run_load(base_url, "/api/v1/purechat", [[payloads[0][0]]] * (workers * 4))
+        results, wall_time = await run_load(base_url, "/api/v1/purechat", payloads)
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+    return {"workers": workers, **summarize(results, wall_time)}
+
+
+async def main(args) -> dict:
+    runs = [await run_for_workers(workers, args) for workers in args.workers]
+    baseline = runs[0]["turns_per_s"]
+    for run in runs:
+        run["speedup"] = round(run["turns_per_s"] / baseline, 2) if baseline and run["turns_per_s"] else None
+    from src.configs.runtime import available_cpus
+
+    return {"parameters": vars(args), "cpus": available_cpus(), "runs": runs}
+
+
+def report(results: dict) -> None:
+    print(f"{results['cpus']} CPUs, {results['parameters']['clients']} clients")
+    print(f"{'workers':>7} {'turns/s':>9} {'chunks/s':>10} {'speedup':>8} {'p50 s':>8} {'p99 s':>8} {'errors':>7}")
+    for run in results["runs"]:
+        print(f"{run['workers']:>7} {run['turns_per_s']:>9} {run['chunks_per_s']:>10} {run['speedup']:>8} "
+              f"{run['latency_s']['p50']:>8} {run['latency_s']['p99']:>8} {run['errors']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--response-tokens", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=4)
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="0: stream as fast as possible (CPU-bound)")
+    parser.add_argument("--loop", default="uvloop", help="server.loop of the runs (uvloop, asyncio)")
+    parser.add_argument("--http", default="httptools", help="server.http of the runs (httptools, h11)")
+    parser.add_argument("--verbose", action="store_true", help="show the server logs")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/workers-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    report(results)
+    print(f"Results written to {save_results(results, args.output, 'workers')}")
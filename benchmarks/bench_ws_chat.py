@@ -0,0 +1,135 @@
+"""
+Per-turn overhead of /ws/chat (one WebSocket per conversation) versus /chat
+(one POST and SSE stream per turn).
+
+Starts the app in-process with the deterministic fake LLM answering short
+answers at full speed, so that what is left is the cost of the transport and of
+the work /chat redoes on every turn (request setup, dependency injection, DB
+session checkout, history load). `--clients` conversations each run `--turns`
+sequential turns, first over SSE, then over one WebSocket per conversation.
+Reports throughput, TTFT and latency percentiles and DB queries per turn.
+
+Needs a PostgreSQL database, like the /chat scenarios of bench_chat_load.
+
+Usage (from the project root):
+    python -m benchmarks.bench_ws_chat --clients 50 --turns 20
+    python -m benchmarks.bench_ws_chat --mode inline --response-tokens 5
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+import src.configs.config
+from src.configs.config import yaml_configs
+
+from benchmarks.bench_chat_load import create_conversations
+from benchmarks.harness import (
+    QueryCounter,
+    TurnResult,
+    free_port,
+    run_load,
+    save_results,
+    start_server,
+    stop_server,
+    summarize,
+)
+
+
+async def ws_session(url: str, conversation_id: int, turns: int) -> List[TurnResult]:
+    """Runs `turns` sequential turns over one WebSocket."""
+    import websockets
+
+    results = []
+    async with websockets.connect(f"{url}?conversation_id={conversation_id}", max_size=None) as ws:
+        for turn in range(turns):
+            start = time.perf_counter()
+            ttft, chunks, chars, error = None, 0, 0, None
+            await ws.send(json.dumps({"type": "chat", "turn_id": str(turn), "message": f"turn {turn}", "model": "fake"}))
+            while True:
+                event = json.loads(await ws.recv())
+                if event["type"] == "chunk":
+                    content = event["data"]["choices"][0]["delta"].get("content", "")
+                    if content:
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                        chunks += 1
+                        chars += len(content)
+                elif event["type"] == "done":
+                    break
+                else:
+                    error = event["type"]
+                    break
+            results.append(TurnResult(ttft, time.perf_counter() - start, chunks, chars, error))
+    return results
+
+
+async def run_ws_load(base_url: str, conversation_ids: List[int], turns: int) -> tuple:
+    start = time.perf_counter()
+    per_client = await asyncio.gather(*(ws_session(base_url, conv_id, turns) for conv_id in conversation_ids))
+    wall_time = time.perf_counter() - start
+    return [result for results in per_client for result in results], wall_time
+
+
+async def main(args) -> dict:
+    yaml_configs["fake-llm"] = {
+        "enabled": True,
+        "response-tokens": args.response_tokens,
+        "chunk-size": args.chunk_size,
+        "tokens-per-second": 0,
+        "first-token-delay": 0,
+        "failure-rate": 0,
+    }
+    yaml_configs.setdefault("generation", {})["mode"] = args.mode
+
+    from server import app
+    from src.configs.db import get_async_engine
+
+    port = free_port()
+    server, server_task = await start_server(app, port)
+    runs = {}
+    try:
+        for transport in ("sse", "websocket"):
+            conversation_ids = await create_conversations(args.clients)
+            query_counter = QueryCounter(get_async_engine())
+            try:
+                if transport == "sse":
+                    payloads = [
+                        [{"conversation_id": conv_id, "message": f"turn {turn}", "model": "fake"} for turn in range(args.turns)]
+                        for conv_id in conversation_ids
+                    ]
+                    results, wall_time = await run_load(f"http://127.0.0.1:{port}", "/api/v1/chat", payloads)
+                else:
+                    results, wall_time = await run_ws_load(f"ws://127.0.0.1:{port}/api/v1/ws/chat", conversation_ids, args.turns)
+            finally:
+                query_counter.close()
+            runs[transport] = {
+                **summarize(results, wall_time),
+                "db_queries_per_turn": round(query_counter.count / len(results), 2) if results else None,
+            }
+    finally:
+        await stop_server(server, server_task)
+    return {"parameters": vars(args), "runs": runs}
+
+
+def report(results: dict) -> None:
+    print(f"{'transport':<10} {'turns/s':>9} {'ttft p50':>9} {'lat p50':>9} {'lat p95':>9} {'queries':>8} {'errors':>7}")
+    for transport, run in results["runs"].items():
+        print(f"{transport:<10} {run['turns_per_s']:>9} {run['ttft_s']['p50']:>9} {run['latency_s']['p50']:>9} "
+              f"{run['latency_s']['p95']:>9} {run['db_queries_per_turn']:>8} {run['errors']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["worker", "inline"], default="worker", help="generation.mode to run with")
+    parser.add_argument("--clients", type=int, default=20, help="conversations run concurrently")
+    parser.add_argument("--turns", type=int, default=10, help="sequential turns per conversation")
+    parser.add_argument("--response-tokens", type=int, default=20)
+    parser.add_argument("--chunk-size", type=int, default=4)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/ws-chat-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    report(results)
+    print(f"Results written to {save_results(results, args.output, 'ws-chat')}")
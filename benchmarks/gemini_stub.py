@@ -0,0 +1,96 @@
+"""
+A local stand-in for the Gemini API's streamGenerateContent endpoint that
+replays a recorded SSE response (benchmarks/fixtures/gemini_stream.sse).
+
+The recording's text events are cycled to produce any number of chunks, and
+its final event (finishReason + usage) closes the stream. Also provides a fake
+async gRPC client replaying the same recording, to drive the wrapped
+ChatGoogleGenerativeAI path without network.
+"""
+import asyncio
+import json
+import os
+from typing import List, Optional
+
+from aiohttp import web
+
+RECORDING_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "gemini_stream.sse")
+# Request bodies received by the stub, in order.
+REQUESTS = web.AppKey("requests", list)
+
+
+def load_recording(path: str = RECORDING_PATH) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(line[len("data:"):]) for line in f if line.startswith("data:")]
+
+
+def replay_events(chunks: int, recording: Optional[List[dict]] = None) -> List[dict]:
+    """`chunks` text events cycled from the recording, followed by its final event."""
+    recording = recording or load_recording()
+    text_events, final_event = recording[:-1], recording[-1]
+    return [text_events[i % len(text_events)] for i in range(chunks)] + [final_event]
+
+
+def make_stub_app(chunks: int = 50, error_status: Optional[int] = None, chunk_delay: float = 0.0,
+                  reject_cached_content: bool = False) -> web.Application:
+    """
+    aiohttp app serving POST /v1beta/models/<model>:streamGenerateContent?alt=sse.
+    Request bodies are recorded in app[REQUESTS]. With `reject_cached_content`,
+    requests naming a cachedContent get a 404, as for an expired cache.
+    """
+    payloads = [f"data: {json.dumps(event)}\r\n\r\n".encode() for event in replay_events(chunks)]
+
+    async def stream_generate_content(request: web.Request) -> web.StreamResponse:
+        if not request.match_info["action"].endswith(":streamGenerateContent"):
+            raise web.HTTPNotFound()
+        body = await request.json()
+        request.app[REQUESTS].append(body)
+        if error_status is not None:
+            return web.json_response(
+                {"error": {"code": error_status, "message": "stubbed error", "status": "FAILED_PRECONDITION"}},
+                status=error_status,
+            )
+        if reject_cached_content and "cachedContent" in body:
+            return web.json_response(
+                {"error": {"code": 404, "message": "CachedContent not found", "status": "NOT_FOUND"}}, status=404
+            )
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for payload in payloads:
+            if chunk_delay:
+                await asyncio.sleep(chunk_delay)
+            await response.write(payload)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app[REQUESTS] = []
+    app.router.add_post("/v1beta/models/{action}", stream_generate_content)
+    return app
+
+
+async def start_stub(port: int, **kwargs) -> tuple:
+    """Serves the stub on 127.0.0.1:`port`; returns (runner, app, base_url)."""
+    app = make_stub_app(**kwargs)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, app, f"http://127.0.0.1:{port}/v1beta"
+
+
+class FakeGenerativeAsyncClient:
+    """Replaces ChatGoogleGenerativeAI's async gRPC client, replaying the recording as protos."""
+
+    def __init__(self, chunks: int = 50):
+        from google.ai.generativelanguage_v1beta import GenerateContentResponse
+
+        self._responses = [
+            GenerateContentResponse.from_json(json.dumps(event), ignore_unknown_fields=True)
+            for event in replay_events(chunks)
+        ]
+
+    async def stream_generate_content(self, request=None, **kwargs):
+        async def responses():
+            for response in self._responses:
+                yield response
+        return responses()
@@ -0,0 +1,199 @@
+"""
+Building blocks for load tests: run the FastAPI app in-process with uvicorn,
+drive concurrent SSE clients against it, and summarise/compare the results.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+import httpx
+import uvicorn
+from sqlalchemy import event
+
+
+@dataclass
+class TurnResult:
+    ttft: Optional[float]
+    latency: float
+    chunks: int
+    chars: int
+    error: Optional[str] = None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(app, port: int, **config_kwargs):
+    """Serves `app` on 127.0.0.1:`port` from the current event loop."""
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", **config_kwargs)
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()  # surface startup errors
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def stop_server(server, task):
+    server.should_exit = True
+    await task
+
+
+def parse_sse_content(line: str) -> Optional[str]:
+    """Returns the delta content of an SSE data line, "" for other lines, None at [DONE]."""
+    if not line.startswith("data: "):
+        return ""
+    data = line[len("data: "):]
+    if data == "[DONE]":
+        return None
+    return json.loads(data)["choices"][0]["delta"].get("content", "")
+
+
+async def run_turn(client: httpx.AsyncClient, path: str, payload: dict) -> TurnResult:
+    """Sends one chat turn and reads its SSE stream to the end."""
+    start = time.perf_counter()
+    ttft, chunks, chars = None, 0, 0
+    try:
+        async with client.stream("POST", path, json=payload) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return TurnResult(None, time.perf_counter() - start, 0, 0, f"HTTP {response.status_code}")
+            async for line in response.aiter_lines():
+                content = parse_sse_content(line)
+                if content is None:
+                    break
+                if content:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    chunks += 1
+                    chars += len(content)
+    except httpx.HTTPError as e:
+        return TurnResult(ttft, time.perf_counter() - start, chunks, chars, type(e).__name__)
+    return TurnResult(ttft, time.perf_counter() - start, chunks, chars)
+
+
+async def run_load(base_url: str, path: str, payloads: List[List[dict]]) -> tuple:
+    """
+    Runs one client per entry of `payloads`, each sending its turns sequentially.
+    Returns the flat list of TurnResult and the wall-clock duration.
+    """
+    limits = httpx.Limits(max_connections=len(payloads) + 10, max_keepalive_connections=len(payloads) + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(600.0), limits=limits) as client:
+        async def client_session(turns: List[dict]) -> List[TurnResult]:
+            return [await run_turn(client, path, payload) for payload in turns]
+
+        start = time.perf_counter()
+        per_client = await asyncio.gather(*(client_session(turns) for turns in payloads))
+        wall_time = time.perf_counter() - start
+    return [result for results in per_client for result in results], wall_time
+
+
+class QueryCounter:
+    """Counts SQL statements executed through an (async) engine."""
+
+    def __init__(self, async_engine):
+        self.count = 0
+        self._sync_engine = async_engine.sync_engine
+        event.listen(self._sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def close(self):
+        event.remove(self._sync_engine, "before_cursor_execute", self._on_execute)
+
+
+class MemoryTracker:
+    """Peak traced Python allocations during the run (client and server share the process)."""
+
+    def __enter__(self):
+        tracemalloc.start()
+        self.baseline, _ = tracemalloc.get_traced_memory()
+        return self
+
+    def __exit__(self, *exc):
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.peak_bytes = peak - self.baseline
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(results: List[TurnResult], wall_time: float) -> dict:
+    ok = [r for r in results if r.error is None]
+    ttfts = [r.ttft for r in ok if r.ttft is not None]
+    latencies = [r.latency for r in ok]
+    total_chunks = sum(r.chunks for r in ok)
+
+    def rounded(value):
+        return None if value is None else round(value, 4)
+
+    return {
+        "turns": len(results),
+        "errors": len(results) - len(ok),
+        "error_kinds": sorted({r.error for r in results if r.error}),
+        "wall_time_s": round(wall_time, 3),
+        "turns_per_s": round(len(ok) / wall_time, 2) if wall_time else None,
+        "chunks_per_s": round(total_chunks / wall_time, 1) if wall_time else None,
+        "ttft_s": {f"p{p}": rounded(percentile(ttfts, p)) for p in (50, 95, 99)},
+        "latency_s": {f"p{p}": rounded(percentile(latencies, p)) for p in (50, 95, 99)},
+    }
+
+
+def save_results(results: dict, output: Optional[str], name: str) -> str:
+    if output is None:
+        os.makedirs(os.path.join("benchmarks", "results"), exist_ok=True)
+        output = os.path.join("benchmarks", "results", f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    return output
+
+
+# Metrics compared against a baseline: (path in the summary, True if higher is better).
+_COMPARED_METRICS = [
+    (("summary", "turns_per_s"), True),
+    (("summary", "chunks_per_s"), True),
+    (("summary", "ttft_s", "p50"), False),
+    (("summary", "ttft_s", "p95"), False),
+    (("summary", "latency_s", "p50"), False),
+    (("summary", "latency_s", "p95"), False),
+    (("summary", "latency_s", "p99"), False),
+    (("memory_per_stream_bytes",), False),
+    (("db_queries_per_turn",), False),
+]
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.1) -> List[str]:
+    """Returns a line per metric that regressed by more than `tolerance` (relative)."""
+    regressions = []
+    for path, higher_is_better in _COMPARED_METRICS:
+        cur, base = current, baseline
+        for key in path:
+            cur = cur.get(key) if isinstance(cur, dict) else None
+            base = base.get(key) if isinstance(base, dict) else None
+        if not cur or not base:
+            continue
+        change = (cur - base) / base
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{'.'.join(path)}: {base} -> {cur} ({change:+.1%})")
+    return regressions
+
+
+def as_dicts(results: List[TurnResult]) -> List[dict]:
+    return [asdict(r) for r in results]
@@ -1,16 +1,34 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 from sqlalchemy import text
 from contextlib import asynccontextmanager
+import asyncio
 import os
 
 # Import the routers
-from src.routers import chat_router, user_router, conversation_router
+from src.routers import batch_router, chat_router, user_router, conversation_router, metrics_router
 from src.configs.db import get_async_engine
+from src.configs.fast_json import FastJSONResponse, get_fast_json_settings
+from src.configs.http_compression import CompressionMiddleware, get_http_compression_settings
+from src.configs.config import init_config, yaml_configs
+from src.configs.log_config import RouteLogContextMiddleware
+from src.configs.metrics import mark_metrics_process_dead
+from src.configs.runtime import get_server_settings, prepare_multiprocess_metrics, uvicorn_options
+from src.configs.tracing import setup_tracing
+from src.llm.registry import preload_models
+from src.services.conversation_titles import stop_conversation_titler
+from src.services.lifecycle import drain_and_shutdown, get_shutdown_settings, install_drain_signal_handler
+from src.services.message_storage import start_maintenance
+from src.services.semantic_cache import get_semantic_cache, is_semantic_cache_enabled
+from src.services.task_supervisor import get_task_supervisor
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Runs in every server worker: the engine, LLM clients and caches below are per process.
+    logger.info(f"Starting worker process {os.getpid()}")
+    setup_tracing(yaml_configs.get("tracing"))
     logger.info("Testing database connection...")
     try:
         engine = get_async_engine()
@@ -19,44 +37,92 @@ async def lifespan(app: FastAPI):
         logger.info("Database connection successful!")
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
+    install_drain_signal_handler()
+    # Provider SDKs are imported lazily; optionally warm them up off the event loop
+    # once the server is ready, instead of delaying startup.
+    preload = yaml_configs.get("llm", {}).get("preload") or []
+    if preload:
+        get_task_supervisor().spawn(asyncio.to_thread(preload_models, preload), name="preload-models")
+    if is_semantic_cache_enabled():
+        # Builds the embedder and loads the persisted index.
+        await asyncio.to_thread(get_semantic_cache)
+    # Monthly partitions ahead of time and archival of inactive conversations.
+    maintenance = start_maintenance()
     yield
-    # Clean up code here if needed
-
-# Get root_path from an environment variable. Defaults to "/chat-api-svc" if not set.
-root_path = os.getenv("ROOT_PATH", "/chat-api-svc")
-
-# Initialize the FastAPI app
-app = FastAPI(
-    title="ChatGPT-style Streaming API",
-    description="A simple API to demonstrate streaming chat responses.",
-    version="1.0.0",
-    root_path=root_path,
-    lifespan=lifespan,
-)
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allows all origins
-    allow_credentials=True,
-    allow_methods=["*"],  # Allows all methods
-    allow_headers=["*"],  # Allows all headers
-)
-
-# Include the routers
-app.include_router(chat_router.router)
-app.include_router(user_router.router)
-app.include_router(conversation_router.router)
-
-@app.get("/")
+    if maintenance is not None:
+        maintenance.cancel()
+    # Conversations still waiting for a title keep their empty name.
+    await stop_conversation_titler()
+    # Open HTTP streams have been given `graceful-timeout` by uvicorn at this point;
+    # finish what is still running in the background before the process exits.
+    shutdown_settings = get_shutdown_settings()
+    await drain_and_shutdown(
+        stream_timeout=shutdown_settings["stream-timeout"],
+        flush_timeout=shutdown_settings["flush-timeout"],
+    )
+    mark_metrics_process_dead()
+
 def read_root():
     """A simple root endpoint to confirm the server is running."""
     # logger.debug("Root endpoint was hit.")
     return {"message": "Welcome to the Streaming API. See /docs for details."}
 
+def create_app() -> FastAPI:
+    """
+    Application factory. Configuration and logging are initialised here,
+    explicitly, instead of as a side effect of importing `src.configs.config`.
+    """
+    init_config()
+
+    # Get root_path from an environment variable. Defaults to "/chat-api-svc" if not set.
+    root_path = os.getenv("ROOT_PATH", "/chat-api-svc")
+
+    # Initialize the FastAPI app
+    app = FastAPI(
+        title="ChatGPT-style Streaming API",
+        description="A simple API to demonstrate streaming chat responses.",
+        version="1.0.0",
+        root_path=root_path,
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse if get_fast_json_settings()["enabled"] else JSONResponse,
+    )
+
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Allows all origins
+        allow_credentials=True,
+        allow_methods=["*"],  # Allows all methods
+        allow_headers=["*"],  # Allows all headers
+    )
+
+    # Compress SSE streams and JSON bodies for clients that accept it
+    if get_http_compression_settings()["enabled"]:
+        app.add_middleware(CompressionMiddleware)
+
+    # Bind the request path to log records for per-route log levels
+    app.add_middleware(RouteLogContextMiddleware)
+
+    # Include the routers
+    app.include_router(chat_router.router)
+    app.include_router(user_router.router)
+    app.include_router(conversation_router.router)
+    app.include_router(batch_router.router)
+    app.include_router(metrics_router.router)
+
+    app.add_api_route("/", read_root, methods=["GET"])
+    return app
+
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
-    logger.info("Starting Uvicorn server...")
-    # Disable Uvicorn's default logging to let Loguru take full control
-    # uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    settings = get_server_settings()
+    logger.info(f"Starting Uvicorn server: {settings}")
+    prepare_multiprocess_metrics(settings["workers"])
+    # Workers are separate processes that import the app themselves;
+    # a single worker serves the app already built here.
+    uvicorn.run(
+        "server:app" if settings["workers"] > 1 else app,
+        **uvicorn_options(settings, get_shutdown_settings()["graceful-timeout"]),
+    )
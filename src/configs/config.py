@@ -1,6 +1,7 @@
 import yaml
 import os
 import sys
+from collections.abc import MutableMapping
 from loguru import logger
 from dotenv import load_dotenv
 from .proxy import apply_proxy
@@ -8,77 +9,120 @@ from .log_config import setup_logging
 
 
 
-
-
 #====================== Determine project path and set sys.path =======================
-# append project path to sys.path
 script_path = os.path.abspath(__file__)
 project_path = os.path.dirname(os.path.dirname(os.path.dirname(script_path)))
 
-print("project_path is {}".format(project_path))
+# Set by init_config()
+app_env = None
+_loaded = False
+
+
+
+class LazyConfig(MutableMapping):
+    """
+    The YAML configuration as a dict-like object that loads itself on first access.
+
+    Modules keep doing `from src.configs.config import yaml_configs` at import time;
+    nothing is read from disk until a value is actually needed, or until the app
+    factory calls init_config() explicitly.
+    """
+
+    def __init__(self):
+        self._data = None
+
+    def _ensure_loaded(self) -> dict:
+        if self._data is None:
+            init_config()
+        return self._data
+
+    def __getitem__(self, key):
+        return self._ensure_loaded()[key]
+
+    def __setitem__(self, key, value):
+        self._ensure_loaded()[key] = value
+
+    def __delitem__(self, key):
+        del self._ensure_loaded()[key]
 
-# append project path to sys.path
-sys.path.append(project_path)
+    def __iter__(self):
+        return iter(self._ensure_loaded())
 
+    def __len__(self):
+        return len(self._ensure_loaded())
 
+    def __repr__(self):
+        return f"LazyConfig({'not loaded' if self._data is None else self._data!r})"
 
-#================= Load environment variables from .env file =======================
-load_dotenv(override=True)
 
-# Get the application environment, default to 'dev' if not set
-app_env = os.getenv("APP_ENVIRONMENT", "dev")
+yaml_configs = LazyConfig()
 
 
-# Configure logging
-setup_logging(app_env)
 
+def init_config():
+    """
+    Loads .env, configures logging, loads the YAML file for APP_ENVIRONMENT and
+    applies proxy settings. Idempotent; called by the app factory at startup, or
+    implicitly on the first access to `yaml_configs`.
+    """
+    global app_env, _loaded
+    if _loaded:
+        return yaml_configs
+    _loaded = True
 
-# Debug: Print content of .env file before loading
-try:
-    with open(".env") as f:
-        #logger.debug(f".env file content:\n{f.read()}")
-        pass
-except FileNotFoundError:
-    logger.debug(".env file not found.")
+    # append project path to sys.path
+    if project_path not in sys.path:
+        sys.path.append(project_path)
 
+    #================= Load environment variables from .env file =======================
+    load_dotenv(override=True)
 
+    # Get the application environment, default to 'dev' if not set
+    app_env = os.getenv("APP_ENVIRONMENT", "dev")
 
+    # Configure logging
+    setup_logging(app_env)
+    logger.debug(f"project_path is {project_path}")
 
-logger.info(f"Application Environment (APP_ENVIRONMENT) is set to: '{app_env}'")
+    if not os.path.exists(".env"):
+        logger.debug(".env file not found.")
 
+    logger.info(f"Application Environment (APP_ENVIRONMENT) is set to: '{app_env}'")
 
+    #================= Load YAML configuration based on config.yaml =======================
+    # Dynamically load config file based on the environment
+    config_file_name = f"config_{app_env}.yaml"
+    config_file_path = os.path.join(project_path, "src", "configs", config_file_name)
 
+    logger.info(f"Attempting to load configuration from: {config_file_path}")
 
-#================= Load YAML configuration based on config.yaml =======================
-yaml_configs = None
-# Dynamically load config file based on the environment
-config_file_name = f"config_{app_env}.yaml"
-config_file_path = os.path.join(project_path, "src", "configs", config_file_name)
+    try:
+        with open(config_file_path) as f:
+            yaml_configs._data = yaml.load(f, Loader=yaml.FullLoader) or {}
+        logger.info(f"Successfully loaded configuration from {config_file_name}")
+    except FileNotFoundError:
+        logger.error(f"Configuration file '{config_file_name}' not found. Please ensure it exists.")
+        # Exit or handle the error appropriately
+        sys.exit(1)
 
-logger.info(f"Attempting to load configuration from: {config_file_path}")
+    logger.info("all configs loaded")
 
-try:
-    with open(config_file_path) as f:
-        yaml_configs = yaml.load(f, Loader=yaml.FullLoader)
-    logger.info(f"Successfully loaded configuration from {config_file_name}")
-except FileNotFoundError:
-    logger.error(f"Configuration file '{config_file_name}' not found. Please ensure it exists.")
-    # Exit or handle the error appropriately
-    sys.exit(1)
+    # Re-apply logging with the optional `logging` section (async writer, sampling, per-route levels)
+    if yaml_configs._data.get("logging"):
+        setup_logging(app_env, yaml_configs._data["logging"])
 
-logger.info("all configs loaded")
+    # =================proxy settings apply here =======================
+    if app_env == "local" and "proxy" in yaml_configs._data:
+        # Check LLM provider
+        llm_provider = yaml_configs._data.get("llm", {}).get("provider", "gemini")
 
+        if llm_provider == "deepseek":
+            logger.info("DeepSeek provider selected. Skipping proxy configuration.")
+        else:
+            proxy_settings = yaml_configs._data["proxy"]
+            apply_proxy(
+                http_proxy=proxy_settings.get("http"),
+                https_proxy=proxy_settings.get("https")
+            )
 
-# =================proxy settings apply here =======================
-if app_env == "local" and yaml_configs and "proxy" in yaml_configs:
-    # Check LLM provider
-    llm_provider = yaml_configs.get("llm", {}).get("provider", "gemini")
-    
-    if llm_provider == "deepseek":
-        logger.info("DeepSeek provider selected. Skipping proxy configuration.")
-    else:
-        proxy_settings = yaml_configs["proxy"]
-        apply_proxy(
-            http_proxy=proxy_settings.get("http"),
-            https_proxy=proxy_settings.get("https")
-        )
+    return yaml_configs
@@ -0,0 +1,64 @@
+import json
+from typing import Any, Iterable, Type
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from src.configs.config import yaml_configs
+
+# UTC datetimes end in "Z", as pydantic writes them: the same payload rendered
+# either way gives the same JSON.
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def get_fast_json_settings() -> dict:
+    """
+    Returns the `fast-json` config section:
+    - enabled: REST responses and SSE chunks are serialised with orjson, and
+      conversation payloads are built from the DAO rows without validating
+      them again through the response models. Off, the stdlib json and the
+      pydantic models are used.
+    """
+    fast_json_config = yaml_configs.get("fast-json", {})
+    return {
+        "enabled": bool(fast_json_config.get("enabled", False)),
+    }
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """`obj` as compact JSON bytes; datetimes as ISO 8601 and pydantic models as their JSON dump."""
+    return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def sse_frame(payload: dict) -> str:
+    """An SSE `data:` frame carrying `payload` as JSON."""
+    if get_fast_json_settings()["enabled"]:
+        return f"data: {orjson.dumps(payload).decode()}\n\n"
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def as_schema_dicts(rows: Iterable[dict], schema: Type[BaseModel]) -> list:
+    """
+    The fields of `schema` taken from DAO rows, in the schema's order, without
+    validation: the rows must already hold values of the right types (they come
+    from the database). Optional fields missing from a row get their default.
+    """
+    fields = [
+        (name, None if field.is_required() else field.get_default(call_default_factory=True))
+        for name, field in schema.model_fields.items()
+    ]
+    return [{name: row.get(name, default) for name, default in fields} for row in rows]
@@ -0,0 +1,172 @@
+import zlib
+from typing import Optional
+
+from src.configs.config import yaml_configs
+
+# brotli is optional: without it, clients are answered with gzip.
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Content types worth compressing; others (images, already compressed data) pass through.
+_COMPRESSIBLE_TYPES = ("text/", "application/json")
+# Content types whose body messages must reach the client as soon as they are sent.
+_STREAMING_TYPES = ("text/event-stream",)
+
+
+def get_http_compression_settings() -> dict:
+    """
+    Returns the `http-compression` config section (compression of HTTP response
+    bodies, negotiated with Accept-Encoding):
+    - enabled: off, responses are sent as is,
+    - min-bytes: complete responses smaller than this are sent as is (streamed
+      ones are always compressed),
+    - gzip-level: zlib level, 1 (fastest) to 9,
+    - brotli-quality: 0 (fastest) to 11; brotli is used when installed and
+      accepted by the client, gzip otherwise.
+    """
+    compression_config = yaml_configs.get("http-compression", {})
+    return {
+        "enabled": bool(compression_config.get("enabled", False)),
+        "min-bytes": int(compression_config.get("min-bytes", 1024)),
+        "gzip-level": int(compression_config.get("gzip-level", 5)),
+        "brotli-quality": int(compression_config.get("brotli-quality", 4)),
+    }
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """The encoding to answer a request's Accept-Encoding with: "br", "gzip" or None."""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.partition(";")
+        params = params.replace(" ", "")
+        try:
+            quality = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        out = self._compressor.compress(data)
+        # A sync flush ends the chunk on a byte boundary: the client can decode it
+        # now, and later chunks still reuse the window (the repeated JSON envelope).
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + self._compressor.flush() if flush else out
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies with brotli or gzip, as the
+    request's Accept-Encoding allows.
+
+    Unlike Starlette's GZipMiddleware it compresses streams: each body message
+    of a text/event-stream response is flushed to the client as it is sent, so
+    a chunk is never held back waiting for more data, while the compressor's
+    window spans the whole stream (the JSON envelope repeated by every SSE chunk
+    costs a few bytes after the first one). Complete responses below `min-bytes`
+    and non-text content types are passed through.
+    """
+
+    def __init__(self, app, settings: Optional[dict] = None):
+        self.app = app
+        self.settings = settings or get_http_compression_settings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, _CompressingSender(send, encoding, self.settings))
+
+
+class _CompressingSender:
+    """The `send` of one response: holds its start until the first body message decides."""
+
+    def __init__(self, send, encoding: str, settings: dict):
+        self.send = send
+        self.encoding = encoding
+        self.settings = settings
+        self.start_message = None
+        self.stream = None
+        self.flush_each = False
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if self.passthrough:
+            return await self.send(message)
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = {name.lower(): value for name, value in message.get("headers", [])}
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            if (
+                b"content-encoding" in headers
+                or message["status"] in (204, 304)
+                or not content_type.startswith(_COMPRESSIBLE_TYPES)
+            ):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                self.flush_each = content_type.startswith(_STREAMING_TYPES)
+            return
+        if message["type"] != "http.response.body":
+            return await self.send(message)
+
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        if self.stream is None:
+            if not more_body and len(body) < self.settings["min-bytes"]:
+                # Complete and small: not worth the headers and the CPU.
+                self.passthrough = True
+                await self.send(self.start_message)
+                return await self.send(message)
+            self.stream = (
+                _BrotliStream(self.settings["brotli-quality"]) if self.encoding == "br"
+                else _GzipStream(self.settings["gzip-level"])
+            )
+            await self.send(self._compressed_start())
+        data = self.stream.compress(body, flush=self.flush_each and more_body)
+        if not more_body:
+            data += self.stream.finish()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _compressed_start(self) -> dict:
+        headers = [
+            (name, value) for name, value in self.start_message.get("headers", [])
+            if name.lower() not in (b"content-length", b"vary")
+        ]
+        vary = [value for name, value in self.start_message.get("headers", []) if name.lower() == b"vary"]
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        return {**self.start_message, "headers": headers}
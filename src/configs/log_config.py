@@ -1,7 +1,9 @@
 import sys
 import json
 import os
+import queue
 import logging
+import threading
 from loguru import logger
 
 class EndpointFilter(logging.Filter):
@@ -19,35 +21,174 @@ def health_check_filter(record):
             return False
     return True
 
-def setup_logging(app_env_variable: str = "local"):
+# Log one streamed chunk out of every N (see `should_log_chunk`). Set by setup_logging.
+_chunk_log_every = 1
+
+def should_log_chunk(index: int) -> bool:
+    """
+    Sampling decision for per-chunk log lines in the streaming loops.
+    A cheap modulo check, so the message itself is only built for sampled chunks.
+    """
+    return index % _chunk_log_every == 0
+
+def make_level_filter(base_level: str, route_levels: dict):
+    """
+    Builds a Loguru filter applying `base_level`, or the level configured for the
+    longest matching route prefix when the record carries a `route` (see
+    RouteLogContextMiddleware).
+    """
+    base_level_no = logger.level(base_level).no
+    # Longest prefix first so that "/api/v1/chat" wins over "/api/v1".
+    route_level_nos = sorted(
+        ((prefix, logger.level(level).no) for prefix, level in route_levels.items()),
+        key=lambda item: len(item[0]),
+        reverse=True,
+    )
+
+    def level_filter(record):
+        if not health_check_filter(record):
+            return False
+        threshold = base_level_no
+        route = record["extra"].get("route")
+        if route is not None:
+            for prefix, level_no in route_level_nos:
+                if route.startswith(prefix):
+                    threshold = level_no
+                    break
+        return record["level"].no >= threshold
+
+    return level_filter
+
+def make_gcp_json_sink(stream):
+    """
+    Returns a sink writing one GCP structured-logging JSON entry per record.
+    Building and dumping the entry happens here rather than in a format function,
+    so in the enqueued mode it runs on the BackgroundLogWriter thread, off the event loop.
+    """
+    def gcp_json_sink(message):
+        record = message.record
+        log_entry = {
+            "severity": record["level"].name,
+            "message": record["message"],
+            "timestamp": record["time"].isoformat(),
+            "logging.googleapis.com/sourceLocation": {
+                "file": record["file"].path,
+                "line": record["line"],
+                "function": record["function"],
+            },
+        }
+        stream.write(json.dumps(log_entry) + "\n")
+
+    return gcp_json_sink
+
+class BackgroundLogWriter:
+    """
+    A Loguru sink that only enqueues the message; a daemon thread runs the wrapped
+    (blocking) sink. Unlike Loguru's own `enqueue=True`, records are not pickled
+    through a multiprocessing queue, which keeps the cost on the event loop to a
+    single `queue.put`.
+    """
+
+    def __init__(self, sink):
+        self._sink = sink
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def __call__(self, message):
+        self._queue.put(message)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Blocks until every message queued so far has been written."""
+        written = threading.Event()
+        self._queue.put(written)
+        return written.wait(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        self.flush(timeout)
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            try:
+                self._sink(item)
+            except Exception as e:
+                sys.__stderr__.write(f"Background log writer failed: {e}\n")
+
+# The active background writer, if the enqueued mode is on.
+_background_writer: BackgroundLogWriter | None = None
+
+def flush_logs(timeout: float = 5.0):
+    """Waits for the background log writer (if any) to drain its queue."""
+    if _background_writer is not None:
+        _background_writer.flush(timeout)
+
+class RouteLogContextMiddleware:
+    """
+    ASGI middleware binding the request path to every log record emitted while
+    handling the request (including its streaming body), so per-route level
+    overrides can apply. Implemented as plain ASGI to leave streaming untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        with logger.contextualize(route=scope["path"]):
+            await self.app(scope, receive, send)
+
+def setup_logging(app_env_variable: str = "local", logging_config: dict | None = None, stream=None):
     """
     Configures the Loguru logger based on the application environment.
+
+    `logging_config` is the optional `logging` section of the YAML config:
+    - level: base level (defaults to DEBUG, or INFO under pytest),
+    - enqueue: hand records to a background writer thread instead of writing
+      (and JSON-encoding) them on the caller's thread,
+    - chunk-log-every: log one streamed chunk out of N,
+    - route-levels: mapping of request path prefix to level, e.g. {"/api/v1/chat": "INFO"}.
     """
+    global _chunk_log_every, _background_writer
+    logging_config = logging_config or {}
+
     # Filter uvicorn access logs
     logging.getLogger("uvicorn.access").addFilter(EndpointFilter())
 
     logger.remove()
+    if _background_writer is not None:
+        _background_writer.stop()
+        _background_writer = None
 
     # Determine log level: Use INFO if running under pytest, otherwise DEBUG
-    log_level = "INFO" if "pytest" in sys.modules else "DEBUG"
+    log_level = "INFO" if "pytest" in sys.modules else logging_config.get("level", "DEBUG")
+    route_levels = logging_config.get("route-levels") or {}
+    enqueue = bool(logging_config.get("enqueue", False))
+    _chunk_log_every = max(1, int(logging_config.get("chunk-log-every", 1)))
+
+    # Loguru drops records below the handler level before filters run, so the
+    # handler must accept the most verbose level any route asks for.
+    handler_level = min([logger.level(log_level).no] + [logger.level(level).no for level in route_levels.values()])
+    level_filter = make_level_filter(log_level, route_levels)
 
     if app_env_variable != "local":
-        def gcp_formatter(record):
-            log_entry = {
-                "severity": record["level"].name,
-                "message": record["message"],
-                "timestamp": record["time"].isoformat(),
-                "logging.googleapis.com/sourceLocation": {
-                    "file": record["file"].path,
-                    "line": record["line"],
-                    "function": record["function"],
-                },
-            }
-            record["extra"]["json_message"] = json.dumps(log_entry)
-            return "{extra[json_message]}\n"
-
-        logger.add(sys.stdout, format=gcp_formatter, level=log_level, filter=health_check_filter)
+        sink = make_gcp_json_sink(stream or sys.stdout)
+        if enqueue:
+            sink = _background_writer = BackgroundLogWriter(sink)
+        logger.add(sink, format="{message}", level=handler_level, filter=level_filter)
         logger.info("Loguru configured for custom JSON output to stdout for GCP.")
     else:
-        logger.add(sys.stderr, level=log_level, filter=health_check_filter)
+        stream = stream or sys.stderr
+        sink = stream
+        if enqueue:
+            sink = _background_writer = BackgroundLogWriter(stream.write)
+        logger.add(sink, level=handler_level, filter=level_filter, colorize=stream.isatty())
         logger.info("Loguru configured for standard terminal output.")
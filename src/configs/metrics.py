@@ -0,0 +1,208 @@
+import functools
+import os
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, multiprocess
+
+# --- Chat streaming ---
+# Observed once per stream from local counters, so the per-chunk cost stays at
+# an integer increment.
+
+CHAT_REQUESTS = Counter(
+    "chat_requests_total", "Chat requests received.", ["endpoint", "model"]
+)
+CHAT_REQUESTS_REJECTED = Counter(
+    "chat_requests_rejected_total", "Chat requests rejected before streaming.", ["endpoint", "reason"]
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "chat_time_to_first_token_seconds",
+    "Time from the start of a stream to its first content chunk (includes history load).",
+    ["endpoint", "model"],
+    buckets=(0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 8, 13, 21, 34, 60),
+)
+STREAM_DURATION = Histogram(
+    "chat_stream_duration_seconds",
+    "Total duration of a streamed response.",
+    ["endpoint", "model"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 90, 120, 180, 300, 600),
+)
+RESPONSE_CHUNKS = Histogram(
+    "chat_response_chunks",
+    "Content chunks per streamed response.",
+    ["endpoint", "model"],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+RESPONSE_CHARACTERS = Histogram(
+    "chat_response_characters",
+    "Characters per streamed response.",
+    ["endpoint", "model"],
+    buckets=(100, 500, 1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000),
+)
+RESPONSE_TRUNCATIONS = Counter(
+    "chat_response_truncations_total", "Responses stopped at the response-size limit.", ["endpoint", "model"]
+)
+STREAM_TIMEOUTS = Counter(
+    "chat_stream_timeouts_total", "Streams stopped because the LLM did not send a chunk in time.", ["model"]
+)
+STREAM_CANCELLATIONS = Counter(
+    "chat_stream_cancellations_total", "Streams cancelled (client disconnect or shutdown).", ["model"]
+)
+PARTIAL_SAVES = Counter(
+    "chat_partial_saves_total", "Partial assistant responses scheduled for saving.", ["model", "reason"]
+)
+RESPONSE_CHECKPOINTS = Counter(
+    "chat_response_checkpoints_total", "Background checkpoints of streaming answers, by result (saved, failed).", ["result"]
+)
+IDEMPOTENT_RETRIES = Counter(
+    "chat_idempotent_retries_total",
+    "Chat turns received again with a known idempotency key, by outcome "
+    "(attached, replayed, regenerated, pending).",
+    ["outcome"],
+)
+HISTORY_PREFETCHES = Counter(
+    "chat_history_prefetches_total",
+    "Conversation histories loaded ahead of their first turn, by event (warmed, used, stale, expired, evicted).",
+    ["event"],
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "chat_websocket_connections", "Open /ws/chat connections.", multiprocess_mode="livesum"
+)
+GENERATION_JOBS = Gauge(
+    "generation_jobs_pending", "Generation jobs running or waiting in the worker pool.",
+    multiprocess_mode="livesum",
+)
+
+BATCH_ITEMS = Counter(
+    "batch_items_total", "Batch prompts processed, by outcome (completed, failed).", ["model", "status"]
+)
+CONVERSATION_TITLES = Counter(
+    "conversation_titles_total",
+    "Conversations submitted for an automatic title, by outcome (titled, named, failed, dropped).",
+    ["outcome"],
+)
+TITLE_BATCH_SIZE = Histogram(
+    "conversation_title_batch_size",
+    "Conversations titled per LLM call.",
+    buckets=(1, 2, 4, 8, 16, 32),
+)
+
+# --- Semantic response cache ---
+
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    "semantic_cache_lookups_total", "Semantic cache lookups, by result (hit, miss).", ["model", "result"]
+)
+SEMANTIC_CACHE_SIMILARITY = Histogram(
+    "semantic_cache_similarity",
+    "Similarity of the nearest cached prompt at lookup time (tune the threshold with it).",
+    ["model", "result"],
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99, 1.0),
+)
+SEMANTIC_CACHE_HIT_AGREEMENT = Histogram(
+    "semantic_cache_hit_agreement",
+    "Similarity between a served cached answer and a fresh answer, on sampled hits.",
+    ["model"],
+    buckets=(0.3, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0),
+)
+SEMANTIC_CACHE_EVICTIONS = Counter(
+    "semantic_cache_evictions_total", "Semantic cache entries evicted (capacity, disagreement).", ["model", "reason"]
+)
+SEMANTIC_CACHE_ENTRIES = Gauge(
+    "semantic_cache_entries", "Entries in the semantic cache.", ["model"], multiprocess_mode="livesum"
+)
+
+# --- LLM providers ---
+
+CONTEXT_CACHE_EVENTS = Counter(
+    "llm_context_cache_events_total",
+    "Provider-side context cache events (hit, miss, created, create_failed, fallback, expired, evicted).",
+    ["event"],
+)
+
+# --- Message storage ---
+
+ARCHIVED_CONVERSATIONS = Counter(
+    "message_archive_conversations_total",
+    "Conversations moved to cold storage (archived) or restored from it (rehydrated).",
+    ["event"],
+)
+MESSAGE_CONTENT_BYTES = Counter(
+    "message_content_bytes_total",
+    "UTF-8 size (raw) and stored size (stored) of the message bodies written compressed.",
+    ["kind"],
+)
+
+# --- Conditional GETs ---
+
+CONDITIONAL_GETS = Counter(
+    "http_conditional_gets_total",
+    "GETs of versioned resources, by result (not_modified, full, uncacheable).",
+    ["endpoint", "result"],
+)
+RESOURCE_VERSION_LOOKUPS = Counter(
+    "http_resource_version_lookups_total",
+    "Versions of the resources served with ETags, found in the in-process map (map) or queried (db).",
+    ["source"],
+)
+
+# --- User cache ---
+
+USER_CACHE_LOOKUPS = Counter(
+    "user_cache_lookups_total", "User record lookups, by key (id, username) and result (hit, miss).", ["key", "result"]
+)
+USER_CACHE_EVICTIONS = Counter(
+    "user_cache_evictions_total", "User cache entries dropped (capacity, expired, invalidated).", ["reason"]
+)
+USER_CACHE_ENTRIES = Gauge(
+    "user_cache_entries", "Users in the user cache.", multiprocess_mode="livesum"
+)
+
+# --- Database ---
+
+DB_OPERATION_DURATION = Histogram(
+    "db_operation_duration_seconds",
+    "Duration of DAO operations (e.g. history_load, message_insert).",
+    ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent getting a connection from the pool (including opening a new one).",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30),
+)
+
+
+def is_multiprocess_mode() -> bool:
+    """Whether server workers share metrics through files (see src/configs/runtime.py)."""
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def metrics_registry() -> CollectorRegistry:
+    """The registry /metrics renders: this process's, or the one aggregating all workers."""
+    if not is_multiprocess_mode():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def mark_metrics_process_dead() -> None:
+    """Drops the live gauges of this worker from the shared metrics when it exits."""
+    if is_multiprocess_mode():
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def timed_db_operation(operation: str):
+    """Decorator observing the duration of an async DAO function."""
+    histogram = DB_OPERATION_DURATION.labels(operation)
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,136 @@
+import glob
+import math
+import os
+import tempfile
+from typing import Optional
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+
+# Environment variables overriding the `server` config section, e.g. set by the
+# container platform (PORT on Cloud Run, WEB_CONCURRENCY by convention).
+_ENV_OVERRIDES = {
+    "host": "SERVER_HOST",
+    "port": "PORT",
+    "workers": "WEB_CONCURRENCY",
+    "loop": "SERVER_LOOP",
+    "http": "SERVER_HTTP",
+    "backlog": "SERVER_BACKLOG",
+    "keep-alive": "SERVER_KEEP_ALIVE",
+    "limit-concurrency": "SERVER_LIMIT_CONCURRENCY",
+    "limit-max-requests": "SERVER_LIMIT_MAX_REQUESTS",
+}
+
+_DEFAULTS = {
+    "host": "0.0.0.0",
+    "port": 8000,
+    "workers": 1,
+    "loop": "uvloop",
+    "http": "httptools",
+    "backlog": 2048,
+    "keep-alive": 5,
+    "limit-concurrency": 0,
+    "limit-max-requests": 0,
+}
+
+
+def available_cpus() -> int:
+    """
+    CPUs this process may use: the cores it may run on, capped by the
+    container's CPU limit (cgroup v2 quota), which os.cpu_count() ignores.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def get_server_settings() -> dict:
+    """
+    Returns the `server` config section (the uvicorn runtime of `python server.py`),
+    each key overridable by its environment variable (see _ENV_OVERRIDES):
+    - host, port: where to listen,
+    - workers: server processes; 0 runs one per available CPU (see available_cpus),
+    - loop, http: event loop and HTTP parser implementations ("uvloop", "httptools"),
+    - backlog: pending TCP connections the kernel queues,
+    - keep-alive: seconds an idle connection is kept open; keep it above the
+      idle timeout of the load balancer in front,
+    - limit-concurrency: open connections per worker beyond which requests get
+      a 503 (0: unlimited),
+    - limit-max-requests: requests after which a worker is replaced (0: never).
+    """
+    server_config = yaml_configs.get("server", {})
+    settings = {}
+    for key, default in _DEFAULTS.items():
+        value = os.getenv(_ENV_OVERRIDES[key]) or server_config.get(key, default)
+        settings[key] = _parse_setting(key, value, default)
+    if settings["workers"] <= 0:
+        settings["workers"] = available_cpus()
+    return settings
+
+
+def _parse_setting(key: str, value, default):
+    """
+    `value` converted to the type of `default`. Whole numbers may be written
+    as floats ("5.0"), and keep-alive may be fractional (uvicorn accepts it);
+    anything else fails naming the setting and its environment variable.
+    """
+    if isinstance(default, str):
+        return str(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = math.nan
+    if key == "keep-alive" and math.isfinite(number):
+        return int(number) if number.is_integer() else number
+    if math.isfinite(number) and number.is_integer():
+        return int(number)
+    raise ValueError(
+        f"Invalid server setting {key}={value!r} (config `server.{key}` or ${_ENV_OVERRIDES[key]}): "
+        f"expected a whole number"
+    )
+
+
+def uvicorn_options(settings: dict, graceful_timeout: float) -> dict:
+    """Keyword arguments of uvicorn.run() for `settings` (see get_server_settings)."""
+    return {
+        "host": settings["host"],
+        "port": settings["port"],
+        "workers": settings["workers"],
+        "loop": settings["loop"],
+        "http": settings["http"],
+        "backlog": settings["backlog"],
+        "timeout_keep_alive": settings["keep-alive"],
+        "limit_concurrency": settings["limit-concurrency"] or None,
+        "limit_max_requests": settings["limit-max-requests"] or None,
+        "timeout_graceful_shutdown": graceful_timeout,
+    }
+
+
+def prepare_multiprocess_metrics(workers: int) -> Optional[str]:
+    """
+    With several workers, makes them share Prometheus metrics through files in
+    PROMETHEUS_MULTIPROC_DIR (a temporary directory unless it is set), so that
+    /metrics reports the whole server whichever worker answers. Must run in the
+    parent process before the workers start. Returns the directory, or None
+    with a single worker.
+    """
+    if workers <= 1:
+        return None
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        # Files of a previous run would be added to this one's values.
+        os.makedirs(directory, exist_ok=True)
+        for stale in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(stale)
+    else:
+        directory = tempfile.mkdtemp(prefix="prometheus-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+    logger.info(f"Prometheus multiprocess metrics in {directory}")
+    return directory
@@ -0,0 +1,110 @@
+import contextlib
+
+from loguru import logger
+
+# OpenTelemetry is optional: without the SDK installed (or with tracing disabled)
+# every helper below degrades to a no-op that costs a function call.
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+except ImportError:  # pragma: no cover - depends on the environment
+    trace = None
+
+_tracer = None
+_provider = None
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off."""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _build_exporter(tracing_config: dict):
+    exporter_name = tracing_config.get("exporter", "otlp")
+    if exporter_name == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter()
+    if exporter_name == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=tracing_config.get("endpoint", "http://localhost:4317"), insecure=True)
+    raise ValueError(f"Unknown tracing exporter '{exporter_name}'.")
+
+
+def setup_tracing(tracing_config: dict | None, exporter=None) -> bool:
+    """
+    Configures tracing from the optional `tracing` section of the YAML config:
+    - enabled: off by default,
+    - sample-ratio: fraction of new traces recorded (parent-based), e.g. 0.05,
+    - exporter: "otlp" (needs opentelemetry-exporter-otlp) or "console",
+    - endpoint: OTLP collector address, defaults to http://localhost:4317.
+
+    Passing `exporter` (e.g. an InMemorySpanExporter in tests) bypasses the config
+    and exports every span synchronously. Returns whether tracing is active.
+    """
+    global _tracer, _provider
+    tracing_config = tracing_config or {}
+
+    if exporter is None and not tracing_config.get("enabled", False):
+        return False
+    if trace is None:
+        logger.warning("Tracing is enabled but opentelemetry-sdk is not installed; tracing stays off.")
+        return False
+
+    try:
+        if exporter is not None:
+            processor = SimpleSpanProcessor(exporter)
+        else:
+            processor = BatchSpanProcessor(_build_exporter(tracing_config))
+    except Exception as e:
+        logger.error(f"Failed to create the tracing exporter, tracing stays off: {e}")
+        return False
+
+    sample_ratio = float(tracing_config.get("sample-ratio", 1.0 if exporter is not None else 0.05))
+    _provider = TracerProvider(
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+        resource=Resource.create({"service.name": tracing_config.get("service-name", "chat-api-svc")}),
+    )
+    _provider.add_span_processor(processor)
+    _tracer = _provider.get_tracer("src.chat")
+    logger.info(f"Tracing enabled with sample ratio {sample_ratio}.")
+    return True
+
+
+def shutdown_tracing():
+    """Flushes buffered spans and turns tracing off."""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = None
+    _provider = None
+
+
+def span(name: str, attributes: dict | None = None):
+    """Context manager running its block inside a new current span."""
+    if _tracer is None:
+        return contextlib.nullcontext(_NOOP_SPAN)
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def start_span(name: str, attributes: dict | None = None):
+    """
+    Starts a span without making it current, for intervals that do not map onto
+    a block (e.g. time to first token). The caller must call `end()`.
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.start_span(name, attributes=attributes)
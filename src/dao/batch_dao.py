@@ -0,0 +1,130 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, insert, or_, select, update
+from typing import List
+
+from src.configs.metrics import timed_db_operation
+from src.models.tables import batch_items_table, batch_jobs_table
+from src.schemas.batch import BatchPrompt
+
+@timed_db_operation("batch_job_insert")
+async def create_job(db: AsyncSession, prompts: List[BatchPrompt]) -> dict:
+    """
+    Creates a batch job and its items (all pending) in one transaction.
+    """
+    result = await db.execute(
+        insert(batch_jobs_table).values(total=len(prompts)).returning(batch_jobs_table)
+    )
+    job = result.first()._asdict()
+    # executemany: one statement for all the items
+    await db.execute(
+        insert(batch_items_table),
+        [
+            {
+                "job_id": job["id"],
+                "item_index": index,
+                "custom_id": prompt.custom_id,
+                "model": prompt.model,
+                "prompt": prompt.prompt,
+            }
+            for index, prompt in enumerate(prompts)
+        ],
+    )
+    await db.commit()
+    return job
+
+@timed_db_operation("batch_job_get")
+async def get_job(db: AsyncSession, job_id: int) -> dict | None:
+    """
+    Fetches a batch job with its item counts per status.
+    """
+    result = await db.execute(select(batch_jobs_table).where(batch_jobs_table.c.id == job_id))
+    job = result.first()
+    if not job:
+        return None
+    counts = await db.execute(
+        select(batch_items_table.c.status, func.count())
+        .where(batch_items_table.c.job_id == job_id)
+        .group_by(batch_items_table.c.status)
+    )
+    job = job._asdict()
+    job.update({"pending": 0, "running": 0, "completed": 0, "failed": 0})
+    job.update({status: count for status, count in counts.all()})
+    return job
+
+@timed_db_operation("batch_items_get")
+async def get_items(db: AsyncSession, job_id: int, statuses: List[str]) -> List[dict]:
+    """
+    Fetches the items of a job having one of `statuses`, in submission order.
+    """
+    query = select(batch_items_table).where(
+        batch_items_table.c.job_id == job_id,
+        batch_items_table.c.status.in_(statuses),
+    ).order_by(batch_items_table.c.item_index)
+    result = await db.execute(query)
+    return [item._asdict() for item in result.fetchall()]
+
+@timed_db_operation("batch_item_models")
+async def get_item_models(db: AsyncSession, job_id: int, statuses: List[str]) -> List[str]:
+    """
+    The distinct models of the items of a job that claim_items may claim with
+    `statuses` (running ones included, in case their claim is stale).
+    """
+    query = select(batch_items_table.c.model).distinct().where(
+        batch_items_table.c.job_id == job_id,
+        batch_items_table.c.status.in_([*statuses, "running"]),
+    )
+    result = await db.execute(query)
+    return list(result.scalars())
+
+@timed_db_operation("batch_items_claim")
+async def claim_items(db: AsyncSession, job_id: int, statuses: List[str], stale_seconds: float) -> List[dict]:
+    """
+    Marks the items of a job having one of `statuses` as running, and those
+    running for more than `stale_seconds` (their run died), in one statement;
+    returns them in submission order. A concurrent claim waits for the row
+    locks of this one and then no longer matches them, so each item is claimed
+    by a single run.
+    """
+    items = batch_items_table.c
+    query = (
+        update(batch_items_table)
+        .where(
+            items.job_id == job_id,
+            or_(
+                items.status.in_(statuses),
+                (items.status == "running")
+                & (items.claimed_at < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, stale_seconds)),
+            ),
+        )
+        .values(status="running", claimed_at=func.now())
+        .returning(batch_items_table)
+    )
+    result = await db.execute(query)
+    claimed = [item._asdict() for item in result.fetchall()]
+    await db.commit()
+    return sorted(claimed, key=lambda item: item["item_index"])
+
+@timed_db_operation("batch_items_release")
+async def release_items(db: AsyncSession, item_ids: List[int]) -> None:
+    """
+    Puts claimed items that did not get a result back to pending (their run was
+    interrupted), for the next resume.
+    """
+    await db.execute(
+        update(batch_items_table)
+        .where(batch_items_table.c.id.in_(item_ids), batch_items_table.c.status == "running")
+        .values(status="pending", claimed_at=None)
+    )
+    await db.commit()
+
+@timed_db_operation("batch_item_update")
+async def save_item_result(db: AsyncSession, item_id: int, status: str, response: str = None, error: str = None) -> None:
+    """
+    Stores the outcome of one item.
+    """
+    await db.execute(
+        update(batch_items_table)
+        .where(batch_items_table.c.id == item_id)
+        .values(status=status, response=response, error=error, completed_at=func.now(), claimed_at=None)
+    )
+    await db.commit()
@@ -1,11 +1,16 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, insert
-from typing import List
+from sqlalchemy import Integer, String, column, exists, func, insert, literal_column, select, update, values
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from typing import Dict, List
 from loguru import logger
 
-from src.models.tables import conversations_table
+from src.configs.metrics import timed_db_operation
+from src.dao.resource_versions import CONVERSATION, USER_CONVERSATIONS, resource_versions
+from src.models.tables import conversations_table, messages_table
 from src.schemas.conversation import ConversationCreateSchema
+from src.schemas.message import STATUS_STREAMING
 
+@timed_db_operation("conversation_insert")
 async def create_conversation(db: AsyncSession, conv: ConversationCreateSchema) -> dict:
     """
     Creates a new conversation for a user.
@@ -24,9 +29,11 @@ async def create_conversation(db: AsyncSession, conv: ConversationCreateSchema)
     logger.info("Committing transaction...")
     await db.commit()
     logger.info("Transaction committed.")
+    resource_versions.invalidate((USER_CONVERSATIONS, conv.user_id))
     
     return created_conv._asdict()
 
+@timed_db_operation("conversation_get")
 async def get_conversation(db: AsyncSession, conversation_id: int) -> dict | None:
     """
     Fetches a single conversation by its ID.
@@ -36,6 +43,7 @@ async def get_conversation(db: AsyncSession, conversation_id: int) -> dict | Non
     conv = result.first()
     return conv._asdict() if conv else None
 
+@timed_db_operation("conversation_list")
 async def get_conversations_by_user(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 10) -> List[dict]:
     """
     Fetches all conversations for a specific user.
@@ -47,3 +55,84 @@ async def get_conversations_by_user(db: AsyncSession, user_id: int, skip: int =
     result = await db.execute(query)
     conversations = result.fetchall()
     return [conv._asdict() for conv in conversations]
+
+@timed_db_operation("conversation_version")
+async def get_conversation_version(db: AsyncSession, conversation_id: int) -> dict | None:
+    """
+    What the ETag of a conversation and its messages is derived from, without
+    fetching the messages: its name, the id of its last message and whether an
+    answer is still streaming (its body then changes without a new message).
+    None if the conversation does not exist.
+    """
+    last_message_id = (
+        select(messages_table.c.id)
+        .where(messages_table.c.conversation_id == conversation_id)
+        .order_by(messages_table.c.created_at.desc(), messages_table.c.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    streaming = exists().where(
+        messages_table.c.conversation_id == conversation_id,
+        messages_table.c.status == STATUS_STREAMING,
+    )
+    query = select(
+        conversations_table.c.name,
+        last_message_id.label("last_message_id"),
+        streaming.label("streaming"),
+    ).where(conversations_table.c.id == conversation_id)
+    result = await db.execute(query)
+    version = result.first()
+    return version._asdict() if version else None
+
+@timed_db_operation("conversation_list_version")
+async def get_user_conversations_version(db: AsyncSession, user_id: int) -> dict:
+    """
+    What the ETag of a user's conversation list is derived from: the number of
+    conversations, the last id and a digest of their names.
+    """
+    names = func.string_agg(
+        func.coalesce(conversations_table.c.name, ""),
+        aggregate_order_by(literal_column("'|'"), conversations_table.c.id),
+    )
+    query = select(
+        func.count().label("count"),
+        func.max(conversations_table.c.id).label("last_id"),
+        func.md5(names).label("names_digest"),
+    ).where(conversations_table.c.user_id == user_id)
+    result = await db.execute(query)
+    return result.first()._asdict()
+
+@timed_db_operation("conversation_untitled")
+async def get_untitled_conversations(db: AsyncSession, conversation_ids: List[int]) -> Dict[int, int]:
+    """
+    The conversations of `conversation_ids` that still have no name, with
+    their user: conversation id -> user id.
+    """
+    query = select(conversations_table.c.id, conversations_table.c.user_id).where(
+        conversations_table.c.id.in_(conversation_ids),
+        conversations_table.c.name.is_(None),
+    )
+    result = await db.execute(query)
+    return {row.id: row.user_id for row in result}
+
+@timed_db_operation("conversation_set_names")
+async def set_untitled_conversation_names(db: AsyncSession, names: Dict[int, str]) -> List[dict]:
+    """
+    Names the conversations of `names` (id -> name) in one statement, except
+    those that got a name in the meantime. Returns the id and user_id of the
+    conversations named.
+    """
+    new_names = values(column("id", Integer), column("name", String), name="new_names").data(list(names.items()))
+    query = (
+        update(conversations_table)
+        .where(conversations_table.c.id == new_names.c.id, conversations_table.c.name.is_(None))
+        .values(name=new_names.c.name)
+        .returning(conversations_table.c.id, conversations_table.c.user_id)
+    )
+    result = await db.execute(query)
+    named = [row._asdict() for row in result.fetchall()]
+    await db.commit()
+    for conv in named:
+        resource_versions.invalidate((CONVERSATION, conv["id"]))
+        resource_versions.invalidate((USER_CONVERSATIONS, conv["user_id"]))
+    return named
@@ -0,0 +1,82 @@
+from functools import lru_cache
+from typing import Optional
+
+import zstandard
+from sqlalchemy import func
+
+from src.configs.config import yaml_configs
+from src.configs.metrics import MESSAGE_CONTENT_BYTES
+
+ZSTD = "zstd"
+
+# Compressed bodies must save at least this fraction, or they are stored plain.
+_MIN_SAVING = 0.1
+
+# Characters of a body indexed for search: PostgreSQL rejects a tsvector over
+# 1 MB, which an unbounded answer can reach, so only its start is searchable.
+SEARCH_MAX_CHARS = 100_000
+
+
+def get_compression_settings() -> dict:
+    """
+    Returns the `message-compression` config section:
+    - enabled: compress new message bodies (reading compressed ones always works),
+    - min-bytes: smallest UTF-8 body compressed; short messages are not worth it,
+    - level: zstd level (1-22); 3 is the zstd default, fast on both ends.
+    """
+    compression_config = yaml_configs.get("message-compression", {})
+    return {
+        "enabled": bool(compression_config.get("enabled", False)),
+        "min-bytes": int(compression_config.get("min-bytes", 4096)),
+        "level": int(compression_config.get("level", 3)),
+    }
+
+
+@lru_cache()
+def _compressor(level: int) -> zstandard.ZstdCompressor:
+    return zstandard.ZstdCompressor(level=level)
+
+
+@lru_cache()
+def _decompressor() -> zstandard.ZstdDecompressor:
+    return zstandard.ZstdDecompressor()
+
+
+def encode_content(content: str, settings: Optional[dict] = None) -> dict:
+    """
+    Returns the column values storing a message body: plain in `content`, or
+    zstd-compressed in `content_compressed` when it is large enough and
+    compresses well. The search vector is always built from the plain text,
+its first SEARCH_MAX_CHARS characters, which an insert of a compressed body
+sends as well: compression saves storage and reads, not insert bytes.
+    """
+    settings = settings or get_compression_settings()
+    values = {
+        "content": content,
+        "content_encoding": None,
+        "content_compressed": None,
+        "content_tsv": func.to_tsvector("english", content[:SEARCH_MAX_CHARS]),
+    }
+    if not settings["enabled"]:
+        return values
+    raw = content.encode("utf-8")
+    if len(raw) < settings["min-bytes"]:
+        return values
+    compressed = _compressor(settings["level"]).compress(raw)
+    if len(compressed) > len(raw) * (1 - _MIN_SAVING):
+        return values
+    MESSAGE_CONTENT_BYTES.labels("raw").inc(len(raw))
+    MESSAGE_CONTENT_BYTES.labels("stored").inc(len(compressed))
+    values.update(content="", content_encoding=ZSTD, content_compressed=compressed)
+    return values
+
+
+def decode_row(row: dict) -> dict:
+    """Turns a stored message row back into the plain message (codec columns dropped)."""
+    encoding = row.pop("content_encoding", None)
+    compressed = row.pop("content_compressed", None)
+    if encoding == ZSTD:
+        row["content"] = _decompressor().decompress(compressed).decode("utf-8")
+    elif encoding is not None:
+        raise ValueError(f"Unknown content encoding {encoding!r} for message {row.get('id')}")
+    return row
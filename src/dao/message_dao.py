@@ -1,33 +1,232 @@
+import html
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, insert
-from typing import List
+from sqlalchemy import select, insert, update, delete, func, literal_column, case, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.types import Text
+from typing import List, Optional
 
-from src.models.tables import messages_table
-from src.schemas.message import MessageCreateSchema
+from src.configs.metrics import timed_db_operation
+from src.dao.message_codec import SEARCH_MAX_CHARS, decode_row, encode_content
+from src.dao.resource_versions import CONVERSATION, resource_versions
+from src.models.tables import conversations_table, message_columns, message_idempotency_keys_table, messages_table
+from src.schemas.message import STATUS_COMPLETE, STATUS_PARTIAL, STATUS_STREAMING, MessageCreateSchema
 
-async def create_message(db: AsyncSession, message: MessageCreateSchema) -> dict:
-    """
-    Creates a new message in a conversation.
-    """
+def _content_values(content: str, status: str) -> dict:
+    # Checkpoints of a streaming answer are rewritten often: store them plain and
+    # leave compression and the search vector to the final write.
+    if status == STATUS_STREAMING:
+        return {"content": content, "content_encoding": None, "content_compressed": None, "content_tsv": None}
+    return encode_content(content)
+
+async def _insert_message(db: AsyncSession, message: MessageCreateSchema, status: str = STATUS_COMPLETE) -> dict:
     query = insert(messages_table).values(
         conversation_id=message.conversation_id,
         role=message.role,
-        content=message.content
-    ).returning(messages_table)
+        status=status,
+        **_content_values(message.content, status)
+    ).returning(*message_columns)
     
     result = await db.execute(query)
-    created_message = result.first()
+    created_message = result.first()._asdict()
+    created_message.pop("content_encoding")
+    created_message.pop("content_compressed")
+    created_message["content"] = message.content
+    return created_message
+
+@timed_db_operation("message_insert")
+async def create_message(
+    db: AsyncSession, message: MessageCreateSchema, idempotency_key: Optional[str] = None, status: str = STATUS_COMPLETE
+) -> dict:
+    """
+    Creates a new message in a conversation.
+    Large bodies are stored compressed when `message-compression` is enabled.
+    An assistant message saved with the idempotency key of its turn becomes
+    the answer replayed to retries of that turn (the first one saved wins).
+    A "streaming" message is the first checkpoint of an answer being generated,
+    completed later with update_message_content.
+    """
+    created_message = await _insert_message(db, message, status)
+    if idempotency_key is not None and message.role == "assistant":
+        await db.execute(
+            update(message_idempotency_keys_table)
+            .where(
+                message_idempotency_keys_table.c.conversation_id == message.conversation_id,
+                message_idempotency_keys_table.c.idempotency_key == idempotency_key,
+                message_idempotency_keys_table.c.assistant_message_id.is_(None),
+            )
+            .values(assistant_message_id=created_message["id"])
+        )
     await db.commit()
-    return created_message._asdict()
+    resource_versions.invalidate((CONVERSATION, message.conversation_id))
+    return created_message
 
+@timed_db_operation("message_update")
+async def update_message_content(
+    db: AsyncSession, message_id: int, created_at: datetime, content: str, status: str
+) -> None:
+    """
+    Rewrites the body and status of a message, e.g. a checkpoint of a streaming
+    answer. `created_at` (as returned at insert) lets PostgreSQL go straight to
+    its partition when messages is partitioned.
+    """
+    await db.execute(
+        update(messages_table)
+        .where(messages_table.c.id == message_id, messages_table.c.created_at == created_at)
+        .values(status=status, **_content_values(content, status))
+    )
+    await db.commit()
+
+@timed_db_operation("message_append")
+async def append_message_content(db: AsyncSession, message_id: int, created_at: datetime, delta: str) -> bool:
+    """
+    Appends `delta` to the body of an answer still streaming, so that a
+    checkpoint sends and writes only the characters generated since the
+    previous one rather than the whole body. Returns False, writing nothing,
+    when the message is no longer streaming.
+    """
+    result = await db.execute(
+        update(messages_table)
+        .where(
+            messages_table.c.id == message_id,
+            messages_table.c.created_at == created_at,
+            messages_table.c.status == STATUS_STREAMING,
+        )
+        .values(content=messages_table.c.content.concat(delta))
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+@timed_db_operation("message_mark_interrupted")
+async def mark_interrupted_messages(db: AsyncSession, older_than_seconds: float) -> int:
+    """
+    Marks as partial the answers still "streaming" after `older_than_seconds`:
+    their process died before finishing them. Returns how many were marked.
+    Their last checkpoint stays searchable once marked.
+    """
+    result = await db.execute(
+        update(messages_table)
+        .where(
+            messages_table.c.status == STATUS_STREAMING,
+            messages_table.c.created_at < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, older_than_seconds),
+        )
+        .values(status=STATUS_PARTIAL, content_tsv=func.to_tsvector(
+            "english", func.left(messages_table.c.content, SEARCH_MAX_CHARS),
+        ))
+    )
+    await db.commit()
+    return result.rowcount
+
+@timed_db_operation("message_insert_idempotent")
+async def create_message_once(db: AsyncSession, message: MessageCreateSchema, idempotency_key: str) -> Optional[dict]:
+    """
+    Claims `idempotency_key` for the conversation and saves the (user) message
+    of the turn, in one transaction. Returns the message, or None when the key
+    was already claimed: nothing is written and the caller is a retry.
+    """
+    claim = await db.execute(
+        pg_insert(message_idempotency_keys_table)
+        .values(conversation_id=message.conversation_id, idempotency_key=idempotency_key)
+        .on_conflict_do_nothing()
+        .returning(message_idempotency_keys_table.c.conversation_id)
+    )
+    if claim.first() is None:
+        await db.rollback()
+        return None
+    created_message = await _insert_message(db, message)
+    await db.execute(
+        update(message_idempotency_keys_table)
+        .where(
+            message_idempotency_keys_table.c.conversation_id == message.conversation_id,
+            message_idempotency_keys_table.c.idempotency_key == idempotency_key,
+        )
+        .values(user_message_id=created_message["id"])
+    )
+    await db.commit()
+    resource_versions.invalidate((CONVERSATION, message.conversation_id))
+    return created_message
+
+@timed_db_operation("idempotency_key_get")
+async def get_idempotent_turn(db: AsyncSession, conversation_id: int, idempotency_key: str) -> Optional[dict]:
+    """
+    Returns the turn claimed with `idempotency_key` (created_at, user_message_id,
+    assistant_message_id), with its stored `answer` message, or None when the
+    answer is not saved yet. Returns None for an unknown key.
+    """
+    key = (await db.execute(
+        select(message_idempotency_keys_table).where(
+            message_idempotency_keys_table.c.conversation_id == conversation_id,
+            message_idempotency_keys_table.c.idempotency_key == idempotency_key,
+        )
+    )).first()
+    if key is None:
+        return None
+    turn = key._asdict()
+    turn["answer"] = None
+    if turn["assistant_message_id"] is not None:
+        # The answer is younger than the key: the bound prunes older partitions.
+        answer = (await db.execute(
+            select(*message_columns).where(
+                messages_table.c.id == turn["assistant_message_id"],
+                messages_table.c.created_at >= turn["created_at"],
+            )
+        )).first()
+        turn["answer"] = decode_row(answer._asdict()) if answer else None
+    return turn
+
+@timed_db_operation("idempotency_key_take_over")
+async def take_over_idempotent_turn(db: AsyncSession, conversation_id: int, idempotency_key: str, stale_seconds: float) -> bool:
+    """
+    Re-claims a turn that got no answer within `stale_seconds` (its generation
+    died with its process), so that exactly one retry generates it again.
+    """
+    result = await db.execute(
+        update(message_idempotency_keys_table)
+        .where(
+            message_idempotency_keys_table.c.conversation_id == conversation_id,
+            message_idempotency_keys_table.c.idempotency_key == idempotency_key,
+            message_idempotency_keys_table.c.assistant_message_id.is_(None),
+            message_idempotency_keys_table.c.created_at < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, stale_seconds),
+        )
+        .values(created_at=func.now())
+        .returning(message_idempotency_keys_table.c.conversation_id)
+    )
+    taken_over = result.first() is not None
+    await db.commit()
+    return taken_over
+
+@timed_db_operation("idempotency_key_purge")
+async def delete_expired_idempotency_keys(db: AsyncSession, retention_hours: float) -> int:
+    """Forgets the keys of turns older than `retention_hours`; returns how many were deleted."""
+    result = await db.execute(
+        delete(message_idempotency_keys_table).where(
+            message_idempotency_keys_table.c.created_at < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, retention_hours * 3600)
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+@timed_db_operation("history_load")
 async def get_messages_by_conversation(db: AsyncSession, conversation_id: int, limit: int = None) -> List[dict]:
     """
     Fetches messages for a specific conversation.
     If a limit is provided, fetches the most recent messages up to that limit, ordered descending.
     Otherwise, fetches all messages in chronological order (ascending).
+
+    No message is older than its conversation: bounding created_at by the
+    conversation's creation time lets PostgreSQL skip (prune) the monthly
+    partitions before it when messages is partitioned. Messages of an unknown
+    conversation id are not bounded.
     """
-    query = select(messages_table).where(
-        messages_table.c.conversation_id == conversation_id
+    conversation_start = func.coalesce(
+        select(conversations_table.c.created_at)
+        .where(conversations_table.c.id == conversation_id)
+        .scalar_subquery(),
+        literal_column("'-infinity'::timestamptz"),
+    )
+    query = select(*message_columns).where(
+        messages_table.c.conversation_id == conversation_id,
+        messages_table.c.created_at >= conversation_start,
     )
     
     if limit:
@@ -37,4 +236,82 @@ async def get_messages_by_conversation(db: AsyncSession, conversation_id: int, l
     
     result = await db.execute(query)
     messages = result.fetchall()
-    return [msg._asdict() for msg in messages]
+    return [decode_row(msg._asdict()) for msg in messages]
+
+# Private-use characters delimiting matches in ts_headline output, so the rest
+# of the snippet can be HTML-escaped before they become <mark> tags.
+_MATCH_START, _MATCH_END = "\ue000", "\ue001"
+_HEADLINE_OPTIONS = f"StartSel={_MATCH_START}, StopSel={_MATCH_END}, MaxWords=30, MinWords=10, MaxFragments=2"
+
+def _render_snippet(headline: str) -> str:
+    return html.escape(headline).replace(_MATCH_START, "<mark>").replace(_MATCH_END, "</mark>")
+
+@timed_db_operation("message_search")
+async def search_messages(db: AsyncSession, user_id: int, text: str, skip: int = 0, limit: int = 20) -> List[dict]:
+    """
+    Full-text search over the messages of a user's conversations, best match first.
+    `text` uses web search syntax ("quoted phrases", -excluded, or).
+
+    Matching uses the GIN index on messages.content_tsv; the page is selected
+    and ranked first, so the (costly) snippet is only built for its rows.
+    Returns up to `limit + 1` rows, the extra one telling the caller there is
+    a next page. Snippets are HTML-escaped with matches wrapped in <mark>.
+    The snippets of compressed bodies are built from their decompressed text
+    in a second statement.
+    """
+    tsquery = func.websearch_to_tsquery("english", text)
+    rank = func.ts_rank_cd(messages_table.c.content_tsv, tsquery).label("rank")
+    page = (
+        select(
+            messages_table.c.id,
+            messages_table.c.conversation_id,
+            conversations_table.c.name.label("conversation_name"),
+            messages_table.c.role,
+            messages_table.c.content,
+            messages_table.c.content_encoding,
+            messages_table.c.content_compressed,
+            messages_table.c.created_at,
+            rank,
+        )
+        .join(conversations_table, conversations_table.c.id == messages_table.c.conversation_id)
+        .where(
+            conversations_table.c.user_id == user_id,
+            messages_table.c.content_tsv.bool_op("@@")(tsquery),
+        )
+        .order_by(rank.desc(), messages_table.c.id.desc())
+        .offset(skip)
+        .limit(limit + 1)
+        .subquery()
+    )
+    query = select(
+        page.c.id,
+        page.c.conversation_id,
+        page.c.conversation_name,
+        page.c.role,
+        page.c.created_at,
+        page.c.rank,
+        page.c.content_encoding,
+        case(
+            (page.c.content_encoding.is_(None), func.ts_headline("english", page.c.content, tsquery, _HEADLINE_OPTIONS)),
+        ).label("snippet"),
+        case((page.c.content_encoding.is_not(None), page.c.content_compressed)).label("content_compressed"),
+    ).order_by(page.c.rank.desc(), page.c.id.desc())
+
+    result = await db.execute(query)
+    hits = [decode_row(row._asdict()) for row in result.fetchall()]
+
+    compressed = [hit for hit in hits if "content" in hit]
+    if compressed:
+        texts = bindparam("texts", [hit.pop("content") for hit in compressed], type_=ARRAY(Text))
+        unnested = func.unnest(texts).table_valued("body", with_ordinality="n").render_derived()
+        headlines = await db.execute(
+            select(func.ts_headline("english", unnested.c.body, tsquery, _HEADLINE_OPTIONS))
+            .select_from(unnested)
+            .order_by(unnested.c.n)
+        )
+        for hit, headline in zip(compressed, headlines.scalars()):
+            hit["snippet"] = headline
+
+    for hit in hits:
+        hit["snippet"] = _render_snippet(hit["snippet"])
+    return hits
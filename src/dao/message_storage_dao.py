@@ -0,0 +1,174 @@
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import zstandard
+from sqlalchemy import delete, exists, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from src.configs.metrics import timed_db_operation
+from src.dao.message_codec import decode_row, encode_content
+from src.models.tables import archived_conversations_table, message_columns, messages_table
+from src.schemas.message import STATUS_COMPLETE
+
+# --- Maintenance lock ---
+
+# Key of the PostgreSQL advisory lock held by the process running the maintenance
+MAINTENANCE_LOCK_KEY = 727_001_041
+
+async def try_lock_maintenance(conn: AsyncConnection) -> bool:
+    """
+    Takes the maintenance lock for the session of `conn`, without waiting;
+    False when another process holds it. The lock outlives transactions: it
+    is held until unlock_maintenance, or until the connection is closed.
+    """
+    result = await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+    locked = bool(result.scalar())
+    await conn.commit()
+    return locked
+
+async def unlock_maintenance(conn: AsyncConnection) -> None:
+    await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+    await conn.commit()
+
+# --- Monthly partitions of messages ---
+
+def partition_name(month_start: datetime) -> str:
+    return f"messages_y{month_start.year:04d}m{month_start.month:02d}"
+
+def month_starts(first: datetime, count: int) -> List[datetime]:
+    """The first instants (UTC) of `count` consecutive months, starting with the month of `first`."""
+    year, month = first.year, first.month
+    starts = []
+    for _ in range(count):
+        starts.append(datetime(year, month, 1, tzinfo=timezone.utc))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return starts
+
+async def is_messages_partitioned(db: AsyncSession) -> bool:
+    """
+    Checks whether messages has been converted to a partitioned table
+    (tbl_creation/partition_messages.sql).
+    """
+    result = await db.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('messages'))"
+    ))
+    return bool(result.scalar())
+
+@timed_db_operation("partition_create")
+async def create_month_partitions(db: AsyncSession, months: List[datetime]) -> List[str]:
+    """
+    Creates the missing monthly partitions of messages; returns their names.
+    """
+    existing = set((await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('messages')"
+    ))).scalars())
+    created = []
+    for month_start in months:
+        name = partition_name(month_start)
+        if name in existing:
+            continue
+        month_end = month_starts(month_start, 2)[1]
+        # DDL cannot take bind parameters; both bounds are generated here.
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF messages "
+            f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{month_end.isoformat()}')"
+        ))
+        created.append(name)
+    await db.commit()
+    return created
+
+# --- Archival of inactive conversations ---
+
+def _pack(rows: List[dict]) -> bytes:
+    document = [{**row, "created_at": row["created_at"].isoformat()} for row in rows]
+    return zstandard.ZstdCompressor(level=10).compress(json.dumps(document, ensure_ascii=False).encode())
+
+def _unpack(blob: bytes) -> List[dict]:
+    document = json.loads(zstandard.ZstdDecompressor().decompress(blob))
+    return [{**row, "created_at": datetime.fromisoformat(row["created_at"])} for row in document]
+
+@timed_db_operation("archive_candidates")
+async def find_inactive_conversations(db: AsyncSession, inactive_days: float, limit: int) -> List[int]:
+    """
+    Fetches ids of conversations whose last message is older than `inactive_days`.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=inactive_days)
+    newer = messages_table.alias("newer")
+    query = (
+        select(messages_table.c.conversation_id)
+        .where(
+            messages_table.c.created_at < cutoff,
+            ~exists().where(
+                newer.c.conversation_id == messages_table.c.conversation_id,
+                newer.c.created_at >= cutoff,
+            ),
+        )
+        .distinct()
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return list(result.scalars())
+
+@timed_db_operation("conversation_archive")
+async def archive_conversation(db: AsyncSession, conversation_id: int, inactive_days: float) -> int:
+    """
+    Moves the messages of a conversation into archived_conversations, in one
+    transaction; returns the number of archived messages. Does nothing (0) if
+    the conversation received a message in the meantime.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=inactive_days)
+    result = await db.execute(
+        delete(messages_table)
+        .where(messages_table.c.conversation_id == conversation_id)
+        .returning(*message_columns)
+    )
+    # Archived as plain text: the document is compressed as a whole.
+    rows = sorted((decode_row(row._asdict()) for row in result.fetchall()), key=lambda row: (row["created_at"], row["id"]))
+    if not rows or rows[-1]["created_at"] >= cutoff:
+        await db.rollback()
+        return 0
+
+    # Messages added to an archived conversation without rehydrating it join its archive.
+    previous = await db.execute(
+        select(archived_conversations_table.c.messages)
+        .where(archived_conversations_table.c.conversation_id == conversation_id)
+        .with_for_update()
+    )
+    blob = previous.scalar()
+    if blob is not None:
+        rows = _unpack(blob) + rows
+    values = {"message_count": len(rows), "last_message_at": rows[-1]["created_at"], "messages": _pack(rows)}
+    await db.execute(
+        pg_insert(archived_conversations_table)
+        .values(conversation_id=conversation_id, **values)
+        .on_conflict_do_update(index_elements=["conversation_id"], set_=values)
+    )
+    await db.commit()
+    return len(rows)
+
+@timed_db_operation("conversation_rehydrate")
+async def rehydrate_conversation(db: AsyncSession, conversation_id: int) -> int:
+    """
+    Moves an archived conversation's messages back into messages (with their
+    original ids and timestamps); returns their number, 0 if it was not archived.
+    """
+    result = await db.execute(
+        delete(archived_conversations_table)
+        .where(archived_conversations_table.c.conversation_id == conversation_id)
+        .returning(archived_conversations_table.c.messages)
+    )
+    blob = result.scalar()
+    if blob is None:
+        await db.rollback()
+        return 0
+    # Archives written before messages.status existed only hold finished messages.
+    rows = [{"status": STATUS_COMPLETE, **row, **encode_content(row["content"])} for row in _unpack(blob)]
+    # Multi-row VALUES (not executemany), so the search vector expressions can be used;
+    # chunked to stay below the bind parameter limit.
+    for start in range(0, len(rows), 1000):
+        await db.execute(insert(messages_table).values(rows[start:start + 1000]))
+    await db.commit()
+    return len(rows)
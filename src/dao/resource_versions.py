@@ -0,0 +1,62 @@
+import time
+from typing import Hashable, Optional
+
+# Keys of the versioned resources.
+CONVERSATION = "conversation"            # ("conversation", conversation_id): a conversation and its messages
+USER_CONVERSATIONS = "user_conversations"  # ("user_conversations", user_id): a user's conversation list
+USER = "user"                            # ("user", username)
+
+
+class ResourceVersions:
+    """
+    In-process map of the current version (ETag) of the resources served with
+    conditional GETs.
+
+    The DAOs drop the entries a write affects once it is committed, so within
+    this process a stored version is never stale. Writes made by other worker
+    processes are not seen: readers pass a `max_age` after which an entry is
+    queried again. Bounded to `max_entries`, the oldest stored first out.
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._writes = 0
+
+    @property
+    def writes(self) -> int:
+        """Number of invalidations so far: read it before querying a version to `set`."""
+        return self._writes
+
+    def get(self, key: Hashable, max_age: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        version, stored_at = entry
+        if time.monotonic() - stored_at > max_age:
+            del self._entries[key]
+            return None
+        return version
+
+    def set(self, key: Hashable, version: str, writes: int) -> None:
+        """
+        Stores a version queried when `writes` was current. Skipped if anything
+        was invalidated since: the query may have read the state before that write.
+        """
+        if writes != self._writes:
+            return
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (version, time.monotonic())
+
+    def invalidate(self, key: Hashable) -> None:
+        self._writes += 1
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._writes += 1
+        self._entries.clear()
+
+
+resource_versions = ResourceVersions()
@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+from src.configs.config import yaml_configs
+from src.configs.metrics import USER_CACHE_ENTRIES, USER_CACHE_EVICTIONS, USER_CACHE_LOOKUPS
+
+
+def get_user_cache_settings() -> dict:
+    """
+    Returns the `user-cache` config section (user records kept in process,
+    looked up by id and by username):
+    - enabled: off, every lookup queries the database,
+    - max-entries: users kept, the least recently used dropped first,
+    - ttl-seconds: how long a record is served before it is read again.
+    """
+    cache_config = yaml_configs.get("user-cache", {})
+    return {
+        "enabled": bool(cache_config.get("enabled", False)),
+        "max-entries": int(cache_config.get("max-entries", 10_000)),
+        "ttl-seconds": float(cache_config.get("ttl-seconds", 300)),
+    }
+
+
+class UserCache:
+    """
+    Bounded LRU cache of user rows (as user_dao returns them) with a TTL,
+    indexed by id and by username. Only existing users are cached: a user
+    created later is never hidden by a cached miss.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._by_id: "OrderedDict[int, tuple]" = OrderedDict()
+        self._ids_by_username = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get_by_id(self, user_id: int) -> Optional[dict]:
+        return self._get(user_id, "id")
+
+    def get_by_username(self, username: str) -> Optional[dict]:
+        return self._get(self._ids_by_username.get(username), "username")
+
+    def _get(self, user_id: Optional[int], key: str) -> Optional[dict]:
+        entry = self._by_id.get(user_id) if user_id is not None else None
+        if entry is not None and entry[1] < time.monotonic():
+            self._drop(user_id, "expired")
+            entry = None
+        if entry is None:
+            USER_CACHE_LOOKUPS.labels(key, "miss").inc()
+            return None
+        USER_CACHE_LOOKUPS.labels(key, "hit").inc()
+        self._by_id.move_to_end(user_id)
+        return dict(entry[0])
+
+    def put(self, user: dict) -> None:
+        if user["id"] in self._by_id:
+            self._drop(user["id"], None)
+        while len(self._by_id) >= self.max_entries:
+            self._drop(next(iter(self._by_id)), "capacity")
+        self._by_id[user["id"]] = (dict(user), time.monotonic() + self.ttl_seconds)
+        self._ids_by_username[user["username"]] = user["id"]
+        USER_CACHE_ENTRIES.inc()
+
+    def invalidate(self, user_id: Optional[int] = None, username: Optional[str] = None) -> None:
+        """Drops a user, by id or by username."""
+        if user_id is None:
+            user_id = self._ids_by_username.get(username)
+        if user_id in self._by_id:
+            self._drop(user_id, "invalidated")
+
+    def clear(self) -> None:
+        for user_id in list(self._by_id):
+            self._drop(user_id, "invalidated")
+
+    def _drop(self, user_id: int, reason: Optional[str]) -> None:
+        user, _ = self._by_id.pop(user_id)
+        if self._ids_by_username.get(user["username"]) == user_id:
+            del self._ids_by_username[user["username"]]
+        USER_CACHE_ENTRIES.dec()
+        if reason is not None:
+            USER_CACHE_EVICTIONS.labels(reason).inc()
+
+
+@lru_cache()
+def get_user_cache() -> UserCache:
+    """Returns the process-wide user cache, sized from the `user-cache` config section."""
+    settings = get_user_cache_settings()
+    return UserCache(max_entries=settings["max-entries"], ttl_seconds=settings["ttl-seconds"])
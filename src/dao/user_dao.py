@@ -1,10 +1,15 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, insert
-from typing import Optional
+from sqlalchemy import exists, false, select, insert, true, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Optional, Tuple
 
+from src.configs.metrics import timed_db_operation
+from src.dao.resource_versions import USER, resource_versions
+from src.dao.user_cache import get_user_cache, get_user_cache_settings
 from src.models.tables import users_table
 from src.schemas.user import UserCreateSchema
 
+@timed_db_operation("user_get")
 async def get_user_by_username(db: AsyncSession, username: str) -> Optional[dict]:
     """
     Fetches a user by their username.
@@ -14,6 +19,48 @@ async def get_user_by_username(db: AsyncSession, username: str) -> Optional[dict
     user = result.first()
     return user._asdict() if user else None
 
+@timed_db_operation("user_get_by_id")
+async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[dict]:
+    """
+    Fetches a user by their id.
+    """
+    query = select(users_table).where(users_table.c.id == user_id)
+    result = await db.execute(query)
+    user = result.first()
+    return user._asdict() if user else None
+
+async def get_cached_user_by_username(db: AsyncSession, username: str) -> Optional[dict]:
+    """get_user_by_username, answered from the user cache when `user-cache` is enabled."""
+    if not get_user_cache_settings()["enabled"]:
+        return await get_user_by_username(db, username)
+    cache = get_user_cache()
+    user = cache.get_by_username(username)
+    if user is None:
+        user = await get_user_by_username(db, username)
+        if user is not None:
+            cache.put(user)
+    return user
+
+async def get_cached_user(db: AsyncSession, user_id: int) -> Optional[dict]:
+    """get_user_by_id, answered from the user cache when `user-cache` is enabled."""
+    if not get_user_cache_settings()["enabled"]:
+        return await get_user_by_id(db, user_id)
+    cache = get_user_cache()
+    user = cache.get_by_id(user_id)
+    if user is None:
+        user = await get_user_by_id(db, user_id)
+        if user is not None:
+            cache.put(user)
+    return user
+
+def _user_written(user: dict) -> None:
+    cache = get_user_cache()
+    cache.invalidate(username=user["username"])
+    if get_user_cache_settings()["enabled"]:
+        cache.put(user)
+    resource_versions.invalidate((USER, user["username"]))
+
+@timed_db_operation("user_insert")
 async def create_user(db: AsyncSession, user: UserCreateSchema) -> dict:
     """
     Creates a new user in the database.
@@ -22,8 +69,46 @@ async def create_user(db: AsyncSession, user: UserCreateSchema) -> dict:
         username=user.username,
         email=user.email
     ).returning(users_table)
-    
+
+    result = await db.execute(query)
+    created_user = result.first()._asdict()
+    await db.commit()
+    _user_written(created_user)
+    return created_user
+
+@timed_db_operation("user_upsert")
+async def get_or_create_user(db: AsyncSession, user: UserCreateSchema) -> Tuple[dict, bool]:
+    """
+    Creates a user unless the username is taken, in one statement; returns the
+    new or existing row and whether it was created. Unlike a SELECT then an
+    INSERT, two concurrent calls cannot both see the name free: one of them
+    gets the other's row. An existing user is only read, never rewritten, so
+    repeating the call neither writes a row version nor invalidates its cache
+    entry and ETag. An email used by another user still raises IntegrityError.
+    """
+    inserted = (
+        pg_insert(users_table)
+        .values(username=user.username, email=user.email)
+        .on_conflict_do_nothing(index_elements=["username"])
+        .returning(*users_table.c)
+        .cte("inserted")
+    )
+    # The existing row when nothing was inserted; both branches run on the statement's snapshot.
+    query = union_all(
+        select(*inserted.c, true().label("created")),
+        select(*users_table.c, false().label("created")).where(
+            users_table.c.username == user.username, ~exists(select(inserted.c.id))
+        ),
+    )
     result = await db.execute(query)
-    created_user = result.first()
+    row = result.first()
     await db.commit()
-    return created_user._asdict()
+    if row is None:
+        # Inserted by a concurrent call that committed after this statement's
+        # snapshot was taken: its row is visible to a new statement.
+        return await get_user_by_username(db, user.username), False
+    row = row._asdict()
+    created = row.pop("created")
+    if created:
+        _user_written(row)
+    return row, created
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, List, Optional, Set, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from loguru import logger
+
+from src.configs.config import yaml_configs
+from src.configs.metrics import CONTEXT_CACHE_EVENTS
+
+
+class ContextCacheUnsupported(Exception):
+    """Raised by a CacheAPI when the provider or model does not support context caching."""
+
+
+class CacheAPI(ABC):
+    """The provider's cached-content API (create/delete)."""
+
+    @abstractmethod
+    async def create(self, model: str, messages: List[BaseMessage], ttl_seconds: int) -> str:
+        """Caches `messages` for `model` and returns the cache name to pass as `cached_content`."""
+
+    @abstractmethod
+    async def delete(self, name: str) -> None:
+        """Deletes a cache before its expiry."""
+
+
+class GeminiCacheAPI(CacheAPI):
+    """CacheAPI backed by the Generative Language API's CacheService."""
+
+    def __init__(self, api_key: str):
+        self._api_key = api_key
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from google.ai.generativelanguage_v1beta import CacheServiceAsyncClient
+
+            self._client = CacheServiceAsyncClient(client_options={"api_key": self._api_key})
+        return self._client
+
+    async def create(self, model: str, messages: List[BaseMessage], ttl_seconds: int) -> str:
+        from google.ai.generativelanguage_v1beta import CachedContent
+        from google.api_core import exceptions
+        from langchain_google_genai.chat_models import _parse_chat_history
+
+        if not model.startswith("models/"):
+            model = f"models/{model}"
+        system_instruction, contents = _parse_chat_history(messages, model=model)
+        cached_content = CachedContent(model=model, contents=contents, ttl={"seconds": ttl_seconds})
+        if system_instruction:
+            cached_content.system_instruction = system_instruction
+        try:
+            cache = await self._get_client().create_cached_content(cached_content=cached_content)
+        except (exceptions.InvalidArgument, exceptions.NotFound, exceptions.MethodNotImplemented) as e:
+            # Model without caching support, or a prefix below the model's minimum token count.
+            raise ContextCacheUnsupported(str(e)) from e
+        return cache.name
+
+    async def delete(self, name: str) -> None:
+        await self._get_client().delete_cached_content(name=name)
+
+
+def message_digest(message: BaseMessage) -> str:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, sort_keys=True, default=str)
+    return hashlib.sha1(f"{message.type}\x00{content}".encode()).hexdigest()
+
+
+def _message_chars(message: BaseMessage) -> int:
+    return len(message.content) if isinstance(message.content, str) else len(str(message.content))
+
+
+@dataclass
+class CacheHandle:
+    name: str
+    digests: Tuple[str, ...]  # digests of the cached messages, oldest first
+    expires_at: float
+
+
+class ContextCache:
+    """
+    Tracks provider-side context caches per conversation.
+
+    Every turn resends the conversation, and everything but the newest exchange
+    was already sent on the previous turn. Once that prefix is long enough, a
+    cache is created for it in the background; the next turns send only the
+    messages after it, with `cached_content` pointing at the cache. A cache is
+    still used when the history window has slid past its first messages (the
+    model then sees slightly more context than the window). Caches are replaced
+    once the uncached part grows past `refresh_chars`.
+
+    Failures never reach the caller: a failed creation just means no cache (and
+    after an "unsupported" answer caching is paused for `disable_seconds`).
+    """
+
+    def __init__(
+        self,
+        api: CacheAPI,
+        model: str,
+        ttl_seconds: int = 3600,
+        min_prefix_chars: int = 16000,
+        refresh_chars: int = 8000,
+        max_conversations: int = 1000,
+        disable_seconds: float = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.api = api
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.min_prefix_chars = min_prefix_chars
+        self.refresh_chars = refresh_chars
+        self.max_conversations = max_conversations
+        self.disable_seconds = disable_seconds
+        self._clock = clock
+        self._handles: "OrderedDict[object, CacheHandle]" = OrderedDict()
+        self._creating: Set[object] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._disabled_until = 0.0
+
+    def _valid_handle(self, key) -> Optional[CacheHandle]:
+        handle = self._handles.get(key)
+        if handle is None:
+            return None
+        # Stop using a cache a little before the provider expires it.
+        if self._clock() >= handle.expires_at - 30:
+            del self._handles[key]
+            CONTEXT_CACHE_EVENTS.labels("expired").inc()
+            return None
+        self._handles.move_to_end(key)
+        return handle
+
+    @staticmethod
+    def _covered(cached: Tuple[str, ...], current: List[str]) -> int:
+        """Number of leading messages of `current` contained in the cache."""
+        if len(current) >= len(cached) and tuple(current[:len(cached)]) == cached:
+            return len(cached)
+        # History window slid: the cache still ends with the first messages of the request.
+        for overlap in range(min(len(cached), len(current)), 0, -1):
+            if cached[-overlap:] == tuple(current[:overlap]):
+                return overlap
+        return 0
+
+    @staticmethod
+    def _last_human_index(messages: List[BaseMessage]) -> int:
+        for index in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[index], HumanMessage):
+                return index
+        return len(messages)
+
+    def lookup(self, key, messages: List[BaseMessage]) -> Tuple[Optional[str], List[BaseMessage]]:
+        """
+        Returns (cache name, messages to send). Without a usable cache the name
+        is None and `messages` is returned unchanged.
+        """
+        handle = self._valid_handle(key)
+        if handle is not None:
+            # The newest user message is always sent, never served from the cache.
+            boundary = self._last_human_index(messages)
+            covered = self._covered(handle.digests, [message_digest(m) for m in messages[:boundary]])
+            if covered:
+                CONTEXT_CACHE_EVENTS.labels("hit").inc()
+                return handle.name, messages[covered:]
+        CONTEXT_CACHE_EVENTS.labels("miss").inc()
+        return None, messages
+
+    def refresh(self, key, messages: List[BaseMessage]) -> None:
+        """
+        Called after a successful turn with the messages it sent: caches them in
+        the background when they are long enough and not (mostly) cached already.
+        """
+        if self._clock() < self._disabled_until or key in self._creating:
+            return
+        if sum(_message_chars(m) for m in messages) < self.min_prefix_chars:
+            return
+        handle = self._valid_handle(key)
+        if handle is not None:
+            covered = self._covered(handle.digests, [message_digest(m) for m in messages])
+            if sum(_message_chars(m) for m in messages[covered:]) < self.refresh_chars:
+                return
+        self._creating.add(key)
+        task = asyncio.create_task(self._create(key, list(messages)), name=f"context-cache-{key}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def invalidate(self, key) -> None:
+        """Forgets the cache of `key`, e.g. after the provider rejected it."""
+        self._handles.pop(key, None)
+
+    async def _create(self, key, messages: List[BaseMessage]) -> None:
+        try:
+            expires_at = self._clock() + self.ttl_seconds
+            name = await self.api.create(self.model, messages, self.ttl_seconds)
+        except ContextCacheUnsupported as e:
+            self._disabled_until = self._clock() + self.disable_seconds
+            CONTEXT_CACHE_EVENTS.labels("create_failed").inc()
+            logger.warning(f"Context caching unsupported for {self.model}, paused for {self.disable_seconds}s: {e}")
+            return
+        except Exception as e:
+            CONTEXT_CACHE_EVENTS.labels("create_failed").inc()
+            logger.warning(f"Context cache creation failed for conversation {key}: {e}")
+            return
+        finally:
+            self._creating.discard(key)
+
+        CONTEXT_CACHE_EVENTS.labels("created").inc()
+        logger.info(f"Context cache {name} created for conversation {key} ({len(messages)} messages)")
+        previous = self._handles.pop(key, None)
+        self._handles[key] = CacheHandle(name, tuple(message_digest(m) for m in messages), expires_at)
+        if previous is not None:
+            await self._delete(previous.name)
+        while len(self._handles) > self.max_conversations:
+            _, evicted = self._handles.popitem(last=False)
+            CONTEXT_CACHE_EVENTS.labels("evicted").inc()
+            await self._delete(evicted.name)
+
+    async def _delete(self, name: str) -> None:
+        try:
+            await self.api.delete(name)
+        except Exception as e:
+            # The cache expires on its own anyway.
+            logger.debug(f"Could not delete context cache {name}: {e}")
+
+    async def aclose(self) -> None:
+        """Waits for cache creations still in flight."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def is_context_cache_enabled() -> bool:
+    return bool(yaml_configs.get("gemini", {}).get("context-cache", {}).get("enabled", False))
+
+
+@lru_cache()
+def get_context_cache() -> ContextCache:
+    """Returns the process-wide Gemini context cache configured by `gemini.context-cache`."""
+    gemini_config = yaml_configs.get("gemini", {})
+    cache_config = gemini_config.get("context-cache", {})
+    api_key = os.getenv(gemini_config.get("api-key", "GEMINI_API_KEY"), "")
+    return ContextCache(
+        api=GeminiCacheAPI(api_key),
+        model=gemini_config.get("model-name", "gemini-2.5-pro"),
+        ttl_seconds=cache_config.get("ttl-seconds", 3600),
+        min_prefix_chars=cache_config.get("min-prefix-chars", 16000),
+        refresh_chars=cache_config.get("refresh-chars", 8000),
+        max_conversations=cache_config.get("max-conversations", 1000),
+    )
@@ -0,0 +1,146 @@
+import asyncio
+import random
+import time
+from functools import lru_cache
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from loguru import logger
+from pydantic import PrivateAttr
+
+from src.configs.config import yaml_configs
+
+# Words the fake answers are made of; cycled to build responses of any length.
+_WORDS = (
+    "the quick brown fox jumps over the lazy dog while streaming tokens "
+    "arrive at a steady pace for benchmarking purposes"
+).split()
+
+
+class FakeLLMError(RuntimeError):
+    """Raised by FakeStreamingChatModel when a failure is injected."""
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    A deterministic chat model for load tests and benchmarks: no network, a
+    configurable pace, and optional failure injection.
+
+    - response_tokens: words per answer,
+    - chunk_size: words per streamed chunk,
+    - tokens_per_second: streaming pace (0 means as fast as possible),
+    - first_token_delay: seconds before the first chunk,
+    - failure_rate: probability that an answer fails after `fail_after_chunks` chunks.
+    """
+    response_tokens: int = 200
+    chunk_size: int = 4
+    tokens_per_second: float = 100.0
+    first_token_delay: float = 0.5
+    failure_rate: float = 0.0
+    fail_after_chunks: int = 3
+    seed: int = 42
+
+    _rng: random.Random = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._rng = random.Random(self.seed)
+
+    def _chunks(self) -> List[str]:
+        words = [_WORDS[i % len(_WORDS)] for i in range(self.response_tokens)]
+        return [
+            " ".join(words[i:i + self.chunk_size]) + " "
+            for i in range(0, len(words), self.chunk_size)
+        ]
+
+    def _should_fail(self) -> bool:
+        return self.failure_rate > 0 and self._rng.random() < self.failure_rate
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        fail = self._should_fail()
+        interval = self.chunk_size / self.tokens_per_second if self.tokens_per_second else 0
+        time.sleep(self.first_token_delay)
+        for index, text in enumerate(self._chunks()):
+            if fail and index == self.fail_after_chunks:
+                raise FakeLLMError("Injected failure from the fake LLM.")
+            if index and interval:
+                time.sleep(interval)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        fail = self._should_fail()
+        interval = self.chunk_size / self.tokens_per_second if self.tokens_per_second else 0
+        await asyncio.sleep(self.first_token_delay)
+        for index, text in enumerate(self._chunks()):
+            if fail and index == self.fail_after_chunks:
+                raise FakeLLMError("Injected failure from the fake LLM.")
+            if index:
+                # Always yield control, even when unthrottled, like a real network stream.
+                await asyncio.sleep(interval)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        content = "".join(chunk.message.content for chunk in self._stream(messages, stop))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        content = "".join([chunk.message.content async for chunk in self._astream(messages, stop)])
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake_streaming_chat_model"
+
+
+def is_fake_llm_enabled() -> bool:
+    return bool(yaml_configs.get("fake-llm", {}).get("enabled", False))
+
+
+@lru_cache()
+def get_fake_llm():
+    """
+    Returns the shared fake model configured by the `fake-llm` YAML section.
+    A single instance is reused so that failure injection follows one seeded sequence.
+    """
+    fake_config = yaml_configs.get("fake-llm", {})
+    llm = FakeStreamingChatModel(
+        response_tokens=fake_config.get("response-tokens", 200),
+        chunk_size=fake_config.get("chunk-size", 4),
+        tokens_per_second=fake_config.get("tokens-per-second", 100.0),
+        first_token_delay=fake_config.get("first-token-delay", 0.5),
+        failure_rate=fake_config.get("failure-rate", 0.0),
+        fail_after_chunks=fake_config.get("fail-after-chunks", 3),
+        seed=fake_config.get("seed", 42),
+    )
+    logger.warning("Fake LLM enabled: responses are synthetic (benchmark/test mode).")
+    return llm
@@ -1,58 +1,97 @@
+import json
 import os
 import typing
 from typing import Any, List, Optional, Sequence, Callable
 from loguru import logger
 
-from langchain_core.runnables import Runnable
+from langchain_core.runnables import Runnable, RunnableConfig
 from langchain_core.tools import BaseTool
 from langchain_core.callbacks.manager import (
     AsyncCallbackManagerForLLMRun,
     CallbackManagerForLLMRun,
 )
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import AIMessageChunk, BaseMessage, BaseMessageChunk
 from langchain_core.outputs import ChatResult, ChatGenerationChunk
-from langchain_google_genai import ChatGoogleGenerativeAI, HarmBlockThreshold, HarmCategory
+from pydantic import PrivateAttr
 from src.configs.config import yaml_configs
+from src.configs.metrics import CONTEXT_CACHE_EVENTS
+from src.llm.context_cache import get_context_cache, is_context_cache_enabled
+from src.llm.http_session import get_http_session
 from typing import AsyncIterator
 
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+_HARM_CATEGORIES = (
+    "HARM_CATEGORY_HARASSMENT",
+    "HARM_CATEGORY_HATE_SPEECH",
+    "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+    "HARM_CATEGORY_DANGEROUS_CONTENT",
+)
+_ROLES = {"human": "user", "ai": "model"}
+
+
+class GeminiAPIError(RuntimeError):
+    """Raised when the Gemini API answers a streaming request with an error status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Gemini API error {status}: {message}")
+        self.status = status
+
+
 class GeminiChatModel(BaseChatModel):
     """
     A custom Gemini LLM class that integrates with LangChain's BaseChatModel.
     It reads configuration from the project's YAML files.
+
+    With transport "native", text conversations are streamed
+    straight from the REST API (streamGenerateContent, SSE) over a persistent
+    aiohttp session: one chunk object per provider event and a single layer of
+    callback handling. Other transports ("rest", the default, "grpc", "grpc_asyncio"), tool
+    binding, non-streaming calls and non-text content go through a wrapped
+    ChatGoogleGenerativeAI, built on first use.
     """
     client: Any = None
     model: str = "gemini-2.5-pro"
     temperature: float = 0.7
+    transport: str = "rest"
+    base_url: str = DEFAULT_BASE_URL
+
+    _api_key: str = PrivateAttr()
 
     def __init__(self, **kwargs: Any):
         super().__init__(**kwargs)
-        
+
         # Get API key env var name from config
         api_key_env_var = yaml_configs.get("gemini", {}).get("api-key", "GEMINI_API_KEY")
         resolved_api_key = os.getenv(api_key_env_var)
-        
+
         if not resolved_api_key:
             logger.error(f"CRITICAL: Environment variable '{api_key_env_var}' for Gemini not found!")
             raise ValueError(f"{api_key_env_var} not found in environment variables.")
 
-        safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
-        
-        # Let BaseChatModel handle the kwargs. The actual model and temperature
-        # are accessed via self.model and self.temperature.
-        self.client = ChatGoogleGenerativeAI(
-            model=self.model,
-            google_api_key=resolved_api_key,
-            temperature=self.temperature,
-            transport="rest",
-            safety_settings=safety_settings
-        )
-        logger.info(f"GeminiChatModel initialized with model: {self.model}")
+        self._api_key = resolved_api_key
+        logger.info(f"GeminiChatModel initialized with model: {self.model} (transport: {self.transport})")
+
+    def _get_client(self):
+        """The wrapped ChatGoogleGenerativeAI; langchain_google_genai is only imported here."""
+        if self.client is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI, HarmBlockThreshold, HarmCategory
+
+            safety_settings = {
+                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+            }
+            self.client = ChatGoogleGenerativeAI(
+                model=self.model,
+                google_api_key=self._api_key,
+                temperature=self.temperature,
+                transport="rest" if self.transport == "native" else self.transport,
+                safety_settings=safety_settings
+            )
+        return self.client
 
     def _generate(
         self,
@@ -61,7 +100,7 @@ class GeminiChatModel(BaseChatModel):
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> ChatResult:
-        llm_result = self.client.generate([messages], stop=stop, callbacks=run_manager, **kwargs)
+        llm_result = self._get_client().generate([messages], stop=stop, callbacks=run_manager, **kwargs)
         return ChatResult(generations=llm_result.generations[0])
 
     async def _agenerate(
@@ -71,9 +110,26 @@ class GeminiChatModel(BaseChatModel):
         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> ChatResult:
-        llm_result = await self.client.agenerate([messages], stop=stop, callbacks=run_manager, **kwargs)
+        llm_result = await self._get_client().agenerate([messages], stop=stop, callbacks=run_manager, **kwargs)
         return ChatResult(generations=llm_result.generations[0])
 
+    async def astream(
+        self,
+        input: Any,
+        config: Optional[RunnableConfig] = None,
+        *,
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[BaseMessageChunk]:
+        # Callers identify the conversation through run metadata
+        # (config={"metadata": {"conversation_id": ...}}), which BaseChatModel does
+        # not hand to _astream; forward it as a keyword argument instead.
+        conversation_id = ((config or {}).get("metadata") or {}).get("conversation_id")
+        if conversation_id is not None:
+            kwargs["conversation_id"] = conversation_id
+        async for chunk in super().astream(input, config, stop=stop, **kwargs):
+            yield chunk
+
     async def _astream(
         self,
         messages: List[BaseMessage],
@@ -81,9 +137,132 @@ class GeminiChatModel(BaseChatModel):
         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> AsyncIterator[ChatGenerationChunk]:
-        async for chunk in self.client.astream(messages, stop=stop, callbacks=run_manager, **kwargs):
+        conversation_id = kwargs.pop("conversation_id", None)
+        if conversation_id is None or "cached_content" in kwargs or not is_context_cache_enabled():
+            async for chunk in self._provider_stream(messages, stop, run_manager, **kwargs):
+                yield chunk
+            return
+
+        context_cache = get_context_cache()
+        cached_content, request_messages = context_cache.lookup(conversation_id, messages)
+        if cached_content is not None:
+            started = False
+            try:
+                async for chunk in self._provider_stream(
+                    request_messages, stop, run_manager, cached_content=cached_content, **kwargs
+                ):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started:
+                    raise
+                # Cache expired or deleted on the provider side: resend the full history.
+                logger.warning(f"Context cache {cached_content} rejected, falling back to full history: {e}")
+                CONTEXT_CACHE_EVENTS.labels("fallback").inc()
+                context_cache.invalidate(conversation_id)
+            else:
+                context_cache.refresh(conversation_id, messages)
+                return
+
+        async for chunk in self._provider_stream(messages, stop, run_manager, **kwargs):
+            yield chunk
+        context_cache.refresh(conversation_id, messages)
+
+    def _provider_stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        cached_content: Optional[str] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self.transport == "native" and not kwargs and all(isinstance(m.content, str) for m in messages):
+            return self._native_stream(messages, stop, cached_content)
+        if cached_content is not None:
+            kwargs["cached_content"] = cached_content
+        return self._wrapped_stream(messages, stop, run_manager, **kwargs)
+
+    async def _wrapped_stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in self._get_client().astream(messages, stop=stop, callbacks=run_manager, **kwargs):
             yield ChatGenerationChunk(message=chunk)
 
+    def _request_body(self, messages: List[BaseMessage], stop: Optional[List[str]], cached_content: Optional[str]) -> dict:
+        contents = []
+        system_parts = []
+        for message in messages:
+            if message.type == "system":
+                system_parts.append({"text": message.content})
+            elif message.content:
+                contents.append({"role": _ROLES.get(message.type, "user"), "parts": [{"text": message.content}]})
+
+        generation_config = {"temperature": self.temperature}
+        if stop:
+            generation_config["stopSequences"] = stop
+        body = {
+            "contents": contents,
+            "generationConfig": generation_config,
+            "safetySettings": [{"category": category, "threshold": "BLOCK_NONE"} for category in _HARM_CATEGORIES],
+        }
+        if cached_content is not None:
+            # The system instruction is part of the cached content.
+            body["cachedContent"] = cached_content
+        elif system_parts:
+            body["systemInstruction"] = {"parts": system_parts}
+        return body
+
+    async def _native_stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        cached_content: Optional[str] = None,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        model = self.model if self.model.startswith("models/") else f"models/{self.model}"
+        url = f"{self.base_url}/{model}:streamGenerateContent"
+        async with get_http_session().post(
+            url,
+            params={"alt": "sse"},
+            headers={"x-goog-api-key": self._api_key},
+            json=self._request_body(messages, stop, cached_content),
+        ) as response:
+            if response.status >= 400:
+                body = await response.text()
+                try:
+                    message = json.loads(body)["error"]["message"]
+                except (ValueError, KeyError, TypeError):
+                    message = body[:500]
+                raise GeminiAPIError(response.status, message)
+
+            async for line in response.content:
+                if not line.startswith(b"data:"):
+                    continue
+                event = json.loads(line[5:])
+                text = ""
+                candidates = event.get("candidates")
+                if candidates:
+                    parts = candidates[0].get("content", {}).get("parts", ())
+                    text = "".join(part.get("text", "") for part in parts if not part.get("thought"))
+                usage = event.get("usageMetadata")
+                final = usage is not None and candidates and candidates[0].get("finishReason")
+                if not text and not final:
+                    continue
+                message = AIMessageChunk(content=text)
+                if final:
+                    # Usage is cumulative; report it once, on the final event.
+                    message.usage_metadata = {
+                        "input_tokens": usage.get("promptTokenCount", 0),
+                        "output_tokens": usage.get("candidatesTokenCount", 0),
+                        "total_tokens": usage.get("totalTokenCount", 0),
+                        "input_token_details": {"cache_read": usage.get("cachedContentTokenCount", 0)},
+                    }
+                # BaseChatModel.astream reports the token to the callbacks.
+                yield ChatGenerationChunk(message=message)
+
     def bind_tools(
         self,
         tools: Sequence[typing.Dict[str, Any] | type | Callable | BaseTool],
@@ -91,7 +270,7 @@ class GeminiChatModel(BaseChatModel):
         tool_choice: str | None = None,
         **kwargs: Any,
     ) -> Runnable:
-        return self.client.bind_tools(tools, tool_choice=tool_choice, **kwargs)
+        return self._get_client().bind_tools(tools, tool_choice=tool_choice, **kwargs)
 
     @property
     def _llm_type(self) -> str:
@@ -101,10 +280,13 @@ def get_gemini_llm():
     """
     Initializes and returns a GeminiChatModel instance.
     """
-    model = yaml_configs.get("gemini", {}).get("model-name", "gemini-2.5-pro")
-    temperature = yaml_configs.get("gemini", {}).get("temperature", 0.7)
-    
+    gemini_config = yaml_configs.get("gemini", {})
+    model = gemini_config.get("model-name", "gemini-2.5-pro")
+    temperature = gemini_config.get("temperature", 0.7)
+
     return GeminiChatModel(
         model=model,
-        temperature=temperature
+        temperature=temperature,
+        transport=gemini_config.get("transport", "rest"),
+        base_url=gemini_config.get("base-url", DEFAULT_BASE_URL),
     )
@@ -0,0 +1,45 @@
+import asyncio
+import weakref
+
+import aiohttp
+from loguru import logger
+
+from src.configs.config import yaml_configs
+
+# One session per event loop: an aiohttp session (and its keep-alive pool) is
+# bound to the loop it was created on, and tests/benchmarks run several loops.
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Returns the persistent HTTP session used to stream from LLM providers, so
+    that turns reuse warm TLS connections instead of opening one per request.
+    Configured by the `llm.http` section (max-connections, connect-timeout, read-timeout).
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        http_config = yaml_configs.get("llm", {}).get("http", {})
+        connector = aiohttp.TCPConnector(
+            limit=http_config.get("max-connections", 100),
+            keepalive_timeout=http_config.get("keepalive-timeout", 60),
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=http_config.get("connect-timeout", 10),
+            sock_read=http_config.get("read-timeout", 300),
+        )
+        # Large read buffer: a single SSE event can exceed aiohttp's 64 KiB default line limit.
+        # trust_env: honour HTTP(S)_PROXY, set from the `proxy` config section by apply_proxy.
+        session = aiohttp.ClientSession(connector=connector, timeout=timeout, read_bufsize=2**20, trust_env=True)
+        _sessions[loop] = session
+    return session
+
+
+async def aclose_http_session() -> None:
+    """Closes the session of the running event loop, if any."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+        logger.info("LLM HTTP session closed.")
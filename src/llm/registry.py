@@ -0,0 +1,49 @@
+import importlib
+from typing import Dict, Tuple
+
+from langchain_core.language_models import BaseChatModel
+
+from src.llm.fake_chat_model import get_fake_llm, is_fake_llm_enabled
+
+
+class UnknownModelError(ValueError):
+    """Raised when a request asks for a model that is not available."""
+
+
+# Model name -> (module, factory function). Provider SDKs are heavy to import
+# (langchain_google_genai and langchain_deepseek alone take over a second), so the
+# module is only imported the first time its model is requested.
+_FACTORIES: Dict[str, Tuple[str, str]] = {
+    "gemini": ("src.llm.gemini_chat_model", "get_gemini_llm"),
+    "deepseek": ("src.llm.deepseek_chat_model", "get_deepseek_llm"),
+}
+
+
+def available_models() -> list:
+    models = list(_FACTORIES)
+    if is_fake_llm_enabled():
+        models.append("fake")
+    return models
+
+
+def get_llm(model_name: str) -> BaseChatModel:
+    """
+    Returns the chat model for a request's `model` field.
+    The "fake" model is only available when the `fake-llm` config section enables it.
+    """
+    if model_name == "fake" and is_fake_llm_enabled():
+        return get_fake_llm()
+    if model_name not in _FACTORIES:
+        raise UnknownModelError(
+            f"Invalid model '{model_name}'. Please use " + " or ".join(f"'{m}'" for m in available_models()) + "."
+        )
+    module_name, factory_name = _FACTORIES[model_name]
+    factory = getattr(importlib.import_module(module_name), factory_name)
+    return factory()
+
+
+def preload_models(model_names) -> None:
+    """Imports the provider modules of `model_names` ahead of the first request."""
+    for model_name in model_names:
+        if model_name in _FACTORIES:
+            importlib.import_module(_FACTORIES[model_name][0])
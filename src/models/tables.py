@@ -1,13 +1,18 @@
 from sqlalchemy import (
     Table,
     Column,
+    Index,
     Integer,
+    LargeBinary,
     String,
     Text,
     DateTime,
     MetaData,
+    UniqueConstraint,
     func,
+    text,
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 # Create a MetaData instance
 metadata = MetaData()
@@ -32,13 +37,81 @@ conversations_table = Table(
     Column("created_at", DateTime(timezone=True), server_default=func.now()),
 )
 
-# Define the 'messages' table
+# Define the 'messages' table.
+# In production it can be range-partitioned by month on created_at
+# (tbl_creation/partition_messages.sql); queries are the same either way.
 messages_table = Table(
     "messages",
     metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
     Column("conversation_id", Integer, nullable=False, index=True),
     Column("role", String, nullable=False),
+    # Empty when the body is stored compressed (content_encoding is set)
     Column("content", Text, nullable=False),
     Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("content_encoding", String, nullable=True),
+    Column("content_compressed", LargeBinary, nullable=True),
+    # Set by the DAO from the plain text (compressed bodies included); only used by full-text search
+    Column("content_tsv", TSVECTOR, nullable=True),
+    # streaming (being generated and checkpointed), complete or partial
+    Column("status", String, nullable=False, server_default="complete"),
+    Index("ix_messages_content_tsv", "content_tsv", postgresql_using="gin"),
+    Index("ix_messages_streaming", "created_at", postgresql_where=text("status = 'streaming'")),
+)
+
+# Columns of a stored message the DAO reads (everything but the search vector)
+message_columns = [column for column in messages_table.c if column.name != "content_tsv"]
+
+# Define the 'archived_conversations' table: cold storage of the messages of
+# inactive conversations, as one zstd-compressed JSON document per conversation
+archived_conversations_table = Table(
+    "archived_conversations",
+    metadata,
+    Column("conversation_id", Integer, primary_key=True, autoincrement=False),
+    Column("message_count", Integer, nullable=False),
+    Column("last_message_at", DateTime(timezone=True), nullable=False),
+    Column("messages", LargeBinary, nullable=False),
+    Column("archived_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+# Define the 'message_idempotency_keys' table: the client-supplied key of a chat
+# turn and the messages it produced, so that a retried turn is not generated twice.
+# It is a table of its own because a unique index on a partitioned messages table
+# would have to include created_at, which differs between a request and its retry.
+message_idempotency_keys_table = Table(
+    "message_idempotency_keys",
+    metadata,
+    Column("conversation_id", Integer, primary_key=True, autoincrement=False),
+    Column("idempotency_key", String, primary_key=True),
+    Column("user_message_id", Integer, nullable=True),
+    Column("assistant_message_id", Integer, nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+# Define the 'batch_jobs' table
+batch_jobs_table = Table(
+    "batch_jobs",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("total", Integer, nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+# Define the 'batch_items' table: one row per prompt of a batch job
+batch_items_table = Table(
+    "batch_items",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("job_id", Integer, nullable=False, index=True),
+    Column("item_index", Integer, nullable=False),
+    Column("custom_id", String, nullable=True),
+    Column("model", String, nullable=False),
+    Column("prompt", Text, nullable=False),
+    Column("status", String, nullable=False, server_default="pending"),
+    Column("response", Text, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("completed_at", DateTime(timezone=True), nullable=True),
+    # When a run claimed the item (status "running")
+    Column("claimed_at", DateTime(timezone=True), nullable=True),
+    UniqueConstraint("job_id", "item_index", name="uq_batch_items_job_id_item_index"),
 )
@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.responses import StreamingResponse
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.db import get_db_session
+from src.configs.metrics import CHAT_REQUESTS, CHAT_REQUESTS_REJECTED
+from src.dao import batch_dao
+from src.routers.chat_router import build_llm_service, ensure_accepting_chats
+from src.schemas.batch import BatchJobSchema, BatchRequest
+from src.services import batch_service
+
+router = APIRouter(
+    prefix="/api/v1",
+    tags=["Batch"],
+)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def build_llm_services(models) -> dict:
+    """One LLMService per distinct model of the job (400 on an unknown model)."""
+    return {model: build_llm_service(model, "batch") for model in set(models)}
+
+@router.post("/batch")
+async def create_batch(
+    request: BatchRequest,
+    db: AsyncSession = Depends(get_db_session),
+):
+    """
+    Runs a list of prompts concurrently and streams the results as NDJSON, one
+    line per prompt in completion order. The job and its results are stored,
+    so an interrupted job can be continued with POST /batch/{job_id}/resume.
+    """
+    ensure_accepting_chats("batch")
+    max_items = batch_service.get_batch_settings()["max-items"]
+    if len(request.prompts) > max_items:
+        CHAT_REQUESTS_REJECTED.labels("batch", "too_large").inc()
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {max_items} prompts.")
+    llm_services = build_llm_services(prompt.model for prompt in request.prompts)
+
+    job = await batch_dao.create_job(db, request.prompts)
+    items = await batch_dao.claim_items(
+        db, job["id"], ["pending"], batch_service.get_batch_settings()["claim-timeout"]
+    )
+    logger.info(f"Created batch job {job['id']} with {len(items)} prompts")
+    for model in llm_services:
+        CHAT_REQUESTS.labels("batch", model).inc()
+
+    return StreamingResponse(
+        batch_service.stream_batch(job["id"], items, llm_services),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+@router.post("/batch/{job_id}/resume")
+async def resume_batch(
+    job_id: int,
+    retry_failed: bool = False,
+    include_completed: bool = False,
+    db: AsyncSession = Depends(get_db_session),
+):
+    """
+    Runs the prompts of a job that have no result yet (and the failed ones with
+    `retry_failed`), streaming NDJSON like POST /batch. With `include_completed`,
+    the stored results are replayed first. Prompts being run by another
+    request for the job are left to it: each prompt is claimed by one run.
+    """
+    ensure_accepting_chats("batch")
+    job = await batch_dao.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    statuses = ["pending", "failed"] if retry_failed else ["pending"]
+    # Before claiming, like create_batch: an unknown model must not leave items claimed.
+    llm_services = build_llm_services(await batch_dao.get_item_models(db, job_id, statuses))
+    items = await batch_dao.claim_items(db, job_id, statuses, batch_service.get_batch_settings()["claim-timeout"])
+    try:
+        replayed = []
+        if include_completed:
+            replayed = await batch_dao.get_items(db, job_id, ["completed"] if retry_failed else ["completed", "failed"])
+        logger.info(f"Resuming batch job {job_id}: {len(items)} prompts to run")
+        return StreamingResponse(
+            batch_service.stream_batch(job_id, items, llm_services, replayed=replayed),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+    except Exception:
+        # stream_batch never started: it would have released them at its end.
+        await batch_service.release_unfinished_items(job_id, [item["id"] for item in items])
+        raise
+
+@router.get("/batch/{job_id}", response_model=BatchJobSchema)
+async def get_batch(job_id: int, db: AsyncSession = Depends(get_db_session)):
+    """
+    Returns the progress of a batch job.
+    """
+    job = await batch_dao.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
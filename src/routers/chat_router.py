@@ -3,17 +3,22 @@ from starlette.responses import StreamingResponse
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, WebSocket
 from starlette.responses import StreamingResponse
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.llm.deepseek_chat_model import get_deepseek_llm
-from src.llm.gemini_chat_model import get_gemini_llm
+from src.llm.registry import UnknownModelError, get_llm
 from src.services.llm_service import LLMService
 from src.configs.db import get_db_session
+from src.configs.metrics import CHAT_REQUESTS, CHAT_REQUESTS_REJECTED
 from src.schemas.chat import ChatRequest, PureChatRequest
 from src.services import chat_service
+from src.services.generation_worker import GenerationPoolFull, get_generation_pool, is_worker_mode_enabled
+from src.services.task_supervisor import get_task_supervisor
+from src.services.ws_chat_service import ChatConnection
 
 # Create an API router
 router = APIRouter(
@@ -21,32 +26,60 @@ router = APIRouter(
     tags=["Chat"],
 )
 
+def ensure_accepting_chats(endpoint: str):
+    """Rejects new chats once the instance has started draining for shutdown."""
+    if not get_task_supervisor().accepting:
+        CHAT_REQUESTS_REJECTED.labels(endpoint, "draining").inc()
+        raise HTTPException(status_code=503, detail="Server is shutting down, please retry.")
+
+def build_llm_service(model: str, endpoint: str) -> LLMService:
+    """Resolves the requested model, mapping unknown models to 400 and init failures to 500."""
+    try:
+        llm = get_llm(model)
+    except UnknownModelError as e:
+        CHAT_REQUESTS_REJECTED.labels(endpoint, "invalid_model").inc()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to initialize LLM service for request: {e}")
+        raise HTTPException(status_code=500, detail="Failed to initialize LLM service.")
+    return LLMService(llm=llm)
+
 # --- API Endpoint ---
 @router.post("/chat")
 async def chat(
     request: ChatRequest,
     db: AsyncSession = Depends(get_db_session),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=255),
 ):
     """
     Receives a user message, saves it, retrieves conversation history,
     and returns the model's response as a stream of Server-Sent Events (SSE).
     The assistant's final response is also saved to the database.
+
+    With an idempotency key (`idempotency_key` in the body or the
+    `Idempotency-Key` header), a retried turn is not generated again: it
+    follows the running generation, or replays the stored answer.
     """
+    if request.idempotency_key is None and idempotency_key is not None:
+        request = request.model_copy(update={"idempotency_key": idempotency_key})
     logger.info(f"Received chat request for conv {request.conversation_id} with model: {request.model}")
+    ensure_accepting_chats("chat")
+    llm_service = build_llm_service(request.model, "chat")
 
-    try:
-        if request.model == "gemini":
-            llm = get_gemini_llm()
-        elif request.model == "deepseek":
-            llm = get_deepseek_llm()
-        else:
-            raise HTTPException(status_code=400, detail=f"Invalid model '{request.model}'. Please use 'gemini' or 'deepseek'.")
-        
-        llm_service = LLMService(llm=llm)
-
-    except Exception as e:
-        logger.error(f"Failed to initialize LLM service for request: {e}")
-        raise HTTPException(status_code=500, detail="Failed to initialize LLM service.")
+    CHAT_REQUESTS.labels("chat", request.model).inc()
+    if is_worker_mode_enabled():
+        # The worker pool owns the generation and its persistence; this handler
+        # only relays the frames, so a disconnect no longer aborts the turn.
+        try:
+            job_id = get_generation_pool().submit_chat(request, llm_service)
+        except GenerationPoolFull as e:
+            logger.warning(f"Rejecting chat request for conv {request.conversation_id}: {e}")
+            CHAT_REQUESTS_REJECTED.labels("chat", "pool_full").inc()
+            raise HTTPException(status_code=503, detail="Server is busy, please retry later.")
+        return StreamingResponse(
+            get_generation_pool().subscribe(job_id),
+            media_type="text/event-stream"
+        )
 
     return StreamingResponse(
         chat_service.stream_chat_response(request, llm_service, db),
@@ -62,22 +95,39 @@ async def pure_chat(
     stream of Server-Sent Events (SSE) without any database interaction.
     """
     logger.info(f"Received pure chat request with model: {request.model}")
-    
-    try:
-        if request.model == "gemini":
-            llm = get_gemini_llm()
-        elif request.model == "deepseek":
-            llm = get_deepseek_llm()
-        else:
-            raise HTTPException(status_code=400, detail=f"Invalid model '{request.model}'. Please use 'gemini' or 'deepseek'.")
+    ensure_accepting_chats("purechat")
+    llm_service = build_llm_service(request.model, "purechat")
 
-        llm_service = LLMService(llm=llm)
-
-    except Exception as e:
-        logger.error(f"Failed to initialize LLM service for request: {e}")
-        raise HTTPException(status_code=500, detail="Failed to initialize LLM service.")
+    CHAT_REQUESTS.labels("purechat", request.model).inc()
+    if is_worker_mode_enabled():
+        try:
+            job_id = get_generation_pool().submit_pure_chat(request, llm_service)
+        except GenerationPoolFull as e:
+            logger.warning(f"Rejecting pure chat request: {e}")
+            CHAT_REQUESTS_REJECTED.labels("purechat", "pool_full").inc()
+            raise HTTPException(status_code=503, detail="Server is busy, please retry later.")
+        return StreamingResponse(
+            get_generation_pool().subscribe(job_id),
+            media_type="text/event-stream"
+        )
 
     return StreamingResponse(
         chat_service.stream_pure_chat_response(request, llm_service),
         media_type="text/event-stream"
     )
+
+@router.websocket("/ws/chat")
+async def ws_chat(websocket: WebSocket, conversation_id: int):
+    """
+    Chat over one WebSocket per conversation (`?conversation_id=`), as an
+    alternative to one POST /chat per turn: turns are sent as messages, tagged
+    with a turn id, can be cancelled, and reuse the conversation state kept by
+    the connection. See ChatConnection for the message format.
+    """
+    if not get_task_supervisor().accepting:
+        CHAT_REQUESTS_REJECTED.labels("ws_chat", "draining").inc()
+        await websocket.close(code=1013, reason="Server is shutting down, please retry.")
+        return
+    await websocket.accept()
+    logger.info(f"WebSocket chat opened for conv {conversation_id}")
+    await ChatConnection(websocket, conversation_id).serve()
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 from src.configs.db import get_db_session
+from src.configs.fast_json import FastJSONResponse, as_schema_dicts, get_fast_json_settings
 from src.schemas.conversation import ConversationSchema, ConversationCreateSchema, ConversationWithMessagesSchema
-from src.schemas.message import MessageSchema
-from src.dao import conversation_dao, message_dao
+from src.schemas.message import MessageSchema, MessageSearchResults
+from src.dao import conversation_dao, message_dao, user_dao
+from src.services.conditional_get import cache_headers, conversation_etag, not_modified_response, user_conversations_etag
+from src.services.history_prefetch import prefetch_history
+from src.services.message_storage import rehydrate_if_archived
 
 router = APIRouter(
     prefix="/api/v1",
@@ -19,29 +23,67 @@ async def create_conversation_endpoint(
     """
     Create a new conversation for a user.
     """
-    # In a real app, you'd verify the user exists first.
+    if await user_dao.get_cached_user(db, conv.user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
     created_conv = await conversation_dao.create_conversation(db=db, conv=conv)
+    # Its first chat turn usually follows: it will not need to load the (empty) history.
+    prefetch_history(created_conv["id"], [])
     return created_conv
 
 @router.get("/users/{user_id}/conversations", response_model=List[ConversationSchema])
 async def get_user_conversations_endpoint(
+    request: Request, response: Response,
     user_id: int, skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db_session)
 ):
     """
     Get all conversations for a specific user.
+    Answers 304 when If-None-Match holds the list's current ETag.
     """
+    etag = await user_conversations_etag(db, user_id)
+    not_modified = not_modified_response(request, "user_conversations", etag)
+    if not_modified is not None:
+        return not_modified
+
     conversations = await conversation_dao.get_conversations_by_user(
         db=db, user_id=user_id, skip=skip, limit=limit
     )
+    if get_fast_json_settings()["enabled"]:
+        return FastJSONResponse(as_schema_dicts(conversations, ConversationSchema), headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
     return conversations
 
+@router.get("/users/{user_id}/messages/search", response_model=MessageSearchResults)
+async def search_user_messages_endpoint(
+    user_id: int,
+    q: str = Query(..., min_length=1, max_length=256),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """
+    Full-text search over the messages of a user's conversations, best match first.
+    Supports "quoted phrases", -excluded words and `or`.
+    """
+    hits = await message_dao.search_messages(db=db, user_id=user_id, text=q, skip=skip, limit=limit)
+    return MessageSearchResults(
+        query=q, skip=skip, limit=limit, has_more=len(hits) > limit, hits=hits[:limit]
+    )
+
 @router.get("/conversations/{conversation_id}", response_model=ConversationWithMessagesSchema)
 async def get_conversation_with_messages_endpoint(
-    conversation_id: int, db: AsyncSession = Depends(get_db_session)
+    request: Request, response: Response, conversation_id: int, db: AsyncSession = Depends(get_db_session)
 ):
     """
     Get a single conversation with all its messages.
+    Answers 304, without fetching them, when If-None-Match holds the current ETag.
+    Opening a conversation also prefetches its history for the next chat turn.
     """
+    etag = await conversation_etag(db, conversation_id)
+    not_modified = not_modified_response(request, "conversation", etag)
+    if not_modified is not None:
+        prefetch_history(conversation_id)
+        return not_modified
+
     # This is not the most efficient way, but it's simple.
     # A single query with a JOIN would be better.
     conv_dict = await conversation_dao.get_conversation(db, conversation_id)
@@ -51,7 +93,19 @@ async def get_conversation_with_messages_endpoint(
     messages = await message_dao.get_messages_by_conversation(
         db=db, conversation_id=conversation_id
     )
-    
+    if not messages and await rehydrate_if_archived(db, conversation_id):
+        messages = await message_dao.get_messages_by_conversation(
+            db=db, conversation_id=conversation_id
+        )
+    prefetch_history(conversation_id, messages)
+
+    if get_fast_json_settings()["enabled"]:
+        # The rows are already typed by the database: skip the model validation
+        # (thousands of messages for a long conversation) and render them directly.
+        (response_data,) = as_schema_dicts([conv_dict], ConversationSchema)
+        response_data["messages"] = as_schema_dicts(messages, MessageSchema)
+        return FastJSONResponse(response_data, headers=cache_headers(etag))
+
     # Manually construct the final response model
     response_data = {
         "id": conv_dict['id'],
@@ -60,4 +114,5 @@ async def get_conversation_with_messages_endpoint(
         "created_at": conv_dict['created_at'],
         "messages": messages
     }
+    response.headers.update(cache_headers(etag))
     return ConversationWithMessagesSchema(**response_data)
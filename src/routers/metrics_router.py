@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from starlette.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from src.configs.metrics import metrics_registry
+
+router = APIRouter(
+    tags=["Metrics"],
+)
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Exposes the Prometheus metrics of this process, or of all the server's
+    workers when it runs several.
+    Declared as a sync endpoint so rendering runs in the threadpool, not on the event loop.
+    """
+    return Response(content=generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
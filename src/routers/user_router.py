@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 from src.configs.db import get_db_session
 from src.schemas.user import UserSchema, UserCreateSchema
 from src.dao import user_dao
+from src.services.conditional_get import cache_headers, not_modified_response, user_etag
 
 router = APIRouter(
     prefix="/api/v1",
@@ -18,18 +20,30 @@ async def create_user_endpoint(
     """
     Create a new user.
     """
-    db_user = await user_dao.get_user_by_username(db, username=user.username)
-    if db_user:
+    try:
+        created_user, created = await user_dao.get_or_create_user(db=db, user=user)
+    except IntegrityError:
+        # The username is free, but the email belongs to another user
+        raise HTTPException(status_code=400, detail="Email already registered")
+    if not created:
         raise HTTPException(status_code=400, detail="Username already registered")
-    created_user = await user_dao.create_user(db=db, user=user)
     return created_user
 
 @router.get("/users/{username}", response_model=UserSchema)
-async def get_user_endpoint(username: str, db: AsyncSession = Depends(get_db_session)):
+async def get_user_endpoint(
+    request: Request, response: Response, username: str, db: AsyncSession = Depends(get_db_session)
+):
     """
     Get a single user by username.
+    Answers 304 when If-None-Match holds the user's current ETag.
     """
-    db_user = await user_dao.get_user_by_username(db, username=username)
+    etag = await user_etag(db, username)
+    not_modified = not_modified_response(request, "user", etag)
+    if not_modified is not None:
+        return not_modified
+
+    db_user = await user_dao.get_cached_user_by_username(db, username=username)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    response.headers.update(cache_headers(etag))
     return db_user
@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class BatchPrompt(BaseModel):
+    prompt: str
+    model: Optional[str] = Field("gemini", description="The model to use, e.g., 'gemini' or 'deepseek'")
+    custom_id: Optional[str] = Field(None, description="Client-side identifier echoed back with the result")
+
+class BatchRequest(BaseModel):
+    prompts: List[BatchPrompt] = Field(..., min_length=1)
+
+class BatchJobSchema(BaseModel):
+    id: int
+    total: int
+    pending: int
+    running: int = 0
+    completed: int
+    failed: int
@@ -5,6 +5,14 @@ class ChatRequest(BaseModel):
     conversation_id: int
     message: str
     model: Optional[str] = Field("gemini", description="The model to use, e.g., 'gemini' or 'deepseek'")
+    idempotency_key: Optional[str] = Field(
+        None,
+        min_length=1,
+        max_length=255,
+        description="Client-generated id of this turn (e.g. a UUID). A retry with the same key "
+        "attaches to the running generation or replays the stored answer instead of generating again "
+        "(with finish_reason \"partial\" if it was cut short).",
+    )
 
 class PureChatRequest(BaseModel):
     message: str
@@ -1,5 +1,13 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
+
+# Values of messages.status. An assistant answer is "streaming" while it is being
+# generated (and checkpointed), then "complete", or "partial" when the stream was
+# cut short (client gone, timeout, error, or the process died).
+STATUS_STREAMING = "streaming"
+STATUS_COMPLETE = "complete"
+STATUS_PARTIAL = "partial"
 
 class MessageBase(BaseModel):
     role: str
@@ -12,3 +20,20 @@ class MessageSchema(MessageBase):
     id: int
     conversation_id: int
     created_at: datetime
+    status: str = STATUS_COMPLETE
+
+class MessageSearchHit(BaseModel):
+    id: int
+    conversation_id: int
+    conversation_name: Optional[str] = None
+    role: str
+    created_at: datetime
+    rank: float
+    snippet: str
+
+class MessageSearchResults(BaseModel):
+    query: str
+    skip: int
+    limit: int
+    has_more: bool
+    hits: List[MessageSearchHit] = []
@@ -0,0 +1,135 @@
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Iterator, List
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+from src.configs.db import AsyncSessionFactory
+from src.configs.metrics import BATCH_ITEMS
+from src.dao import batch_dao
+from src.services.llm_service import LLMService
+from src.services.task_supervisor import get_task_supervisor
+
+
+def get_batch_settings() -> dict:
+    """
+    Returns the `batch` config section:
+    - max-concurrency: prompts of one job sent to the LLMs at the same time,
+    - max-items: largest accepted job,
+    - item-timeout: seconds allowed per prompt before it is marked failed,
+    - claim-timeout: seconds after which a prompt still marked running (its
+      process died) is run again by a resume.
+    """
+    batch_config = yaml_configs.get("batch", {})
+    return {
+        "max-concurrency": int(batch_config.get("max-concurrency", 16)),
+        "max-items": int(batch_config.get("max-items", 5000)),
+        "item-timeout": float(batch_config.get("item-timeout", 300)),
+        "claim-timeout": float(batch_config.get("claim-timeout", 900)),
+    }
+
+
+def _line(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+def _result_line(job_id: int, item: dict, status: str, content: str = None, error: str = None) -> str:
+    return _line({
+        "type": "result",
+        "job_id": job_id,
+        "index": item["item_index"],
+        "custom_id": item.get("custom_id"),
+        "model": item["model"],
+        "status": status,
+        "content": content,
+        "error": error,
+    })
+
+
+async def _run_item(job_id: int, item: dict, llm_services: Dict[str, LLMService], timeout: float) -> tuple:
+    """Runs one prompt and stores its outcome; returns (status, NDJSON line)."""
+    try:
+        response = await asyncio.wait_for(llm_services[item["model"]].ainvoke(item["prompt"]), timeout)
+        status, content, error = "completed", response.text, None
+    except asyncio.TimeoutError:
+        status, content, error = "failed", None, f"Timed out after {timeout}s"
+    except Exception as e:
+        status, content, error = "failed", None, str(e) or type(e).__name__
+
+    try:
+        async with AsyncSessionFactory() as session:
+            await batch_dao.save_item_result(session, item["id"], status, response=content, error=error)
+    except Exception as e:
+        # The item stays running in the table: a resume runs it again after `claim-timeout`.
+        logger.error(f"Failed to store result of batch {job_id} item {item['item_index']}: {e}")
+
+    BATCH_ITEMS.labels(item["model"], status).inc()
+    return status, _result_line(job_id, item, status, content, error)
+
+
+async def release_unfinished_items(job_id: int, item_ids: List[int]) -> None:
+    """Background task putting the claimed items of an interrupted run back to pending."""
+    try:
+        async with AsyncSessionFactory() as session:
+            await batch_dao.release_items(session, item_ids)
+    except Exception as e:
+        logger.error(f"Failed to release {len(item_ids)} item(s) of batch {job_id}: {e}")
+
+
+async def stream_batch(
+    job_id: int,
+    items: List[dict],
+    llm_services: Dict[str, LLMService],
+    replayed: List[dict] = (),
+) -> AsyncIterator[str]:
+    """
+    Runs the `items` of a batch job (claimed by batch_dao.claim_items) through
+    LLMService.ainvoke and yields NDJSON:
+    a "job" line, one "result" line per item as soon as it completes (after the
+    `replayed` results already stored), and a final "summary" line.
+
+    `max-concurrency` workers pull items from a shared iterator, so a job of
+    thousands of prompts holds at most that many calls (and tasks) at a time.
+    If the client disconnects, the workers are cancelled and the unfinished
+    items are put back to pending for a later resume.
+    """
+    settings = get_batch_settings()
+    results: asyncio.Queue = asyncio.Queue()
+    pending_items: Iterator[dict] = iter(items)
+    finished = set()
+
+    async def worker():
+        for item in pending_items:
+            result = await _run_item(job_id, item, llm_services, settings["item-timeout"])
+            finished.add(item["id"])
+            await results.put(result)
+
+    workers = [
+        asyncio.create_task(worker(), name=f"batch-{job_id}-worker-{n}")
+        for n in range(min(settings["max-concurrency"], len(items)))
+    ]
+    counts = {"completed": 0, "failed": 0}
+    try:
+        yield _line({"type": "job", "job_id": job_id, "remaining": len(items), "replayed": len(replayed)})
+        for item in replayed:
+            counts[item["status"]] += 1
+            yield _result_line(job_id, item, item["status"], item["response"], item["error"])
+
+        for _ in range(len(items)):
+            status, line = await results.get()
+            counts[status] += 1
+            yield line
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        unfinished = [item["id"] for item in items if item["id"] not in finished]
+        if unfinished:
+            # Its own session, like the partial saves of a cancelled chat stream.
+            get_task_supervisor().spawn(
+                release_unfinished_items(job_id, unfinished), name=f"batch-{job_id}-release"
+            )
+
+    logger.info(f"Batch {job_id} finished: {counts['completed']} completed, {counts['failed']} failed")
+    yield _line({"type": "summary", "job_id": job_id, **counts})
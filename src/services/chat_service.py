@@ -1,52 +1,209 @@
 import asyncio
-import json
 import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
 
 from src.services.llm_service import LLMService
 from src.schemas.chat import ChatRequest, PureChatRequest
 from src.dao import message_dao
-from src.schemas.message import MessageCreateSchema
+from src.schemas.message import STATUS_COMPLETE, STATUS_PARTIAL, STATUS_STREAMING, MessageCreateSchema
+from src.configs import tracing
+from src.configs.config import yaml_configs
 from src.configs.db import AsyncSessionFactory
+from src.configs.fast_json import sse_frame
+from src.configs.log_config import should_log_chunk
+from src.configs.metrics import (
+    PARTIAL_SAVES,
+    RESPONSE_CHARACTERS,
+    RESPONSE_CHUNKS,
+    RESPONSE_TRUNCATIONS,
+    IDEMPOTENT_RETRIES,
+    STREAM_CANCELLATIONS,
+    STREAM_DURATION,
+    STREAM_TIMEOUTS,
+    TIME_TO_FIRST_TOKEN,
+)
+from src.services.conversation_state import MAX_HISTORY_LENGTH, ConversationState
+from src.services.conversation_titles import submit_for_title
+from src.services.history_prefetch import get_history_prefetch_settings, take_current_history
+from src.services.message_storage import rehydrate_if_archived
+from src.services.response_buffer import ResponseBuffer, get_response_size_settings
+from src.services.response_checkpoint import QuestionNotSaved, ResponseCheckpointer, get_checkpoint_settings
+from src.services.semantic_cache import get_semantic_cache, is_semantic_cache_enabled
+from src.services.task_supervisor import get_task_supervisor
 
 from sqlalchemy.exc import InterfaceError, OperationalError
 
-async def save_partial_response_task(conversation_id: int, content: str):
+# Seconds between two checks for the answer of a turn generated elsewhere.
+IDEMPOTENT_POLL_INTERVAL = 0.5
+# finish_reason of a replayed answer that was cut short when first generated.
+PARTIAL_FINISH_REASON = "partial"
+
+def get_idempotency_settings() -> dict:
+    """
+    Returns the `idempotency` config section (retries of /chat with a known idempotency key):
+    - wait-timeout: seconds a retry waits for the answer of a turn still being
+      generated by another process (in-process ones are attached to directly),
+    - stale-after: seconds after which a turn still without answer is considered
+      lost (its process died) and generated again by the next retry.
+    """
+    idempotency_config = yaml_configs.get("idempotency", {})
+    return {
+        "wait-timeout": float(idempotency_config.get("wait-timeout", 60)),
+        "stale-after": float(idempotency_config.get("stale-after", 600)),
+    }
+
+async def save_partial_response_task(checkpointer: ResponseCheckpointer, content: str):
     """
     Background task to save partial response when stream is cancelled.
     Creates a fresh DB session. Includes a retry mechanism to handle potential
     connection race conditions (e.g., picking up a closing connection).
+    The answer's checkpoint, if any, is completed rather than saved again.
     """
-    for attempt in range(3):
-        try:
-            async with AsyncSessionFactory() as session:
-                assistant_message_to_save = MessageCreateSchema(
-                    conversation_id=conversation_id,
-                    role="assistant",
-                    content=content,
-                )
-                await message_dao.create_message(session, message=assistant_message_to_save)
-                logger.info(f"Saved partial assistant response in background task: conv={conversation_id} len={len(content)}")
-                return  # Success, exit loop
-        except (InterfaceError, OperationalError, OSError) as e:
-            if attempt < 2:
-                logger.warning(f"Failed to save partial response (attempt {attempt + 1}), retrying in 0.1s: {e}")
-                await asyncio.sleep(0.1)  # Small delay before retry
-            else:
-                logger.error(f"Failed to save partial response after {attempt + 1} attempts: {e}")
-        except Exception as e:
-            logger.error(f"Failed to save partial response due to unexpected error: {e}")
-            break  # Don't retry on unknown errors
+    conversation_id = checkpointer.conversation_id
+    with tracing.span("chat.save_partial", {"chat.conversation_id": conversation_id}) as save_span:
+        for attempt in range(3):
+            try:
+                async with AsyncSessionFactory() as session:
+                    await checkpointer.finish(session, content, STATUS_PARTIAL)
+                    logger.info(f"Saved partial assistant response in background task: conv={conversation_id} len={len(content)}")
+                    return  # Success, exit loop
+            except (InterfaceError, OperationalError, OSError) as e:
+                save_span.record_exception(e)
+                if attempt < 2:
+                    logger.warning(f"Failed to save partial response (attempt {attempt + 1}), retrying in 0.1s: {e}")
+                    await asyncio.sleep(0.1)  # Small delay before retry
+                else:
+                    logger.error(f"Failed to save partial response after {attempt + 1} attempts: {e}")
+            except Exception as e:
+                save_span.record_exception(e)
+                logger.error(f"Failed to save partial response due to unexpected error: {e}")
+                break  # Don't retry on unknown errors
+
+async def save_user_message_task(message: MessageCreateSchema) -> dict:
+    """
+    Background insert of the user message of a turn whose history was
+    prefetched (see `history-prefetch.write-behind`), on its own DB session,
+    retried like save_partial_response_task on connection errors.
+    The answer of the turn is inserted after it, see ResponseCheckpointer: if
+    this fails, the turn fails and its answer is not saved.
+    """
+    with tracing.span("chat.insert_user_message", {"chat.write_behind": True}) as insert_span:
+        for attempt in range(3):
+            try:
+                async with AsyncSessionFactory() as session:
+                    return await message_dao.create_message(session, message=message)
+            except (InterfaceError, OperationalError, OSError) as e:
+                insert_span.record_exception(e)
+                if attempt == 2:
+                    raise
+                logger.warning(f"Failed to save user message (attempt {attempt + 1}), retrying in 0.1s: {e}")
+                await asyncio.sleep(0.1)
+
+async def lookup_semantic_cache(model: str, prompt: str, llm_service: LLMService):
+    """
+    Looks a stateless prompt up in the semantic cache. Returns None when the
+    cache is off (or fails), so callers simply go to the LLM.
+    """
+    if not is_semantic_cache_enabled(model):
+        return None
+    cache = get_semantic_cache()
+    try:
+        lookup = await cache.lookup(model, prompt)
+    except Exception as e:
+        logger.warning(f"Semantic cache lookup failed, calling the model: {e}")
+        return None
+    if lookup is not None and lookup.hit and cache.should_verify():
+        get_task_supervisor().spawn(cache.verify(lookup, llm_service), name="semantic-cache-verify")
+    return lookup
+
+async def _poll_idempotent_turn(request: ChatRequest, stale_after: float, abandoned_after: float) -> tuple:
+    """One check of wait_for_idempotent_answer: (done, answer), see there."""
+    async with AsyncSessionFactory() as session:
+        turn = await message_dao.get_idempotent_turn(session, request.conversation_id, request.idempotency_key)
+        if turn is None or (turn["assistant_message_id"] is not None and turn["answer"] is None):
+            # The key expired, or the answer was archived since: nothing left to replay.
+            return True, None
+        answer = turn["answer"]
+        if answer is not None:
+            if answer["status"] != STATUS_STREAMING:
+                return True, answer
+            if datetime.now(timezone.utc) - answer["created_at"] > timedelta(seconds=abandoned_after):
+                # Still streaming past the maintenance threshold: its process died, replay what was saved.
+                return True, {**answer, "status": STATUS_PARTIAL}
+        elif await message_dao.take_over_idempotent_turn(
+            session, request.conversation_id, request.idempotency_key, stale_after
+        ):
+            return True, None
+        return False, None
+
+async def wait_for_idempotent_answer(request: ChatRequest) -> Optional[dict]:
+    """
+    Waits for the stored answer of a turn whose idempotency key is already
+    claimed, and returns it (content and status) once it is no longer
+    streaming, or once it is abandoned (see `response-checkpoint.abandoned-after`,
+    the threshold the maintenance marks it partial at): it is then replayed as
+    partial. Returns None when the turn must be generated again: it got no
+    answer at all (see `stale-after`) and this retry took it over.
+    Raises asyncio.TimeoutError after `wait-timeout` seconds.
+
+    Each check runs on its own short-lived session: a retry waiting for a
+    long answer does not hold a pooled connection (idle in transaction) meanwhile.
+    """
+    settings = get_idempotency_settings()
+    abandoned_after = get_checkpoint_settings()["abandoned-after"]
+    deadline = time.monotonic() + settings["wait-timeout"]
+    while True:
+        done, answer = await _poll_idempotent_turn(request, settings["stale-after"], abandoned_after)
+        if done:
+            return answer
+        if time.monotonic() >= deadline:
+            raise asyncio.TimeoutError(f"Turn {request.idempotency_key!r} is still being generated.")
+        await asyncio.sleep(IDEMPOTENT_POLL_INTERVAL)
+
+async def stop_at_size_limit(stream_iter, endpoint: str, model: str, length: int):
+    """Stops the LLM stream of an answer that reached `response-size.max-chars`."""
+    logger.warning(f"Response reached the size limit ({length} chars), stopping generation")
+    RESPONSE_TRUNCATIONS.labels(endpoint, model).inc()
+    aclose = getattr(stream_iter, "aclose", None)
+    if aclose is not None:
+        # Closing the generator ends the upstream request instead of reading it to the end.
+        await aclose()
+
+async def replay_cached_answer(content: str):
+    """Stands in for an LLM stream when the answer comes from the semantic cache."""
+    yield AIMessageChunk(content=content)
+
+def _chat_frame(request: ChatRequest, content: str, finish_reason: Optional[str] = None) -> str:
+    chunk_data = {
+        "id": f"chatcmpl-{request.conversation_id}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": request.model,
+        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": finish_reason}]
+    }
+    return sse_frame(chunk_data)
 
 async def stream_chat_response(
-    request: ChatRequest, llm_service: LLMService, db: AsyncSession
+    request: ChatRequest, llm_service: LLMService, db: AsyncSession, state: Optional[ConversationState] = None
 ):
     """
     Handles the logic of saving messages, retrieving history,
     streaming the LLM response, and saving the final response.
+    With a loaded `state`, the history comes from it instead of the database.
     """
+    # One trace span per chat turn; the DB and LLM steps below are its children.
+    with tracing.span("chat.turn", {"chat.conversation_id": request.conversation_id, "llm.model": request.model}):
+        async for frame in _stream_chat_turn(request, llm_service, db, state):
+            yield frame
+
+
+async def _stream_chat_turn(
+    request: ChatRequest, llm_service: LLMService, db: AsyncSession, state: Optional[ConversationState] = None
+):
     if not llm_service:
         error_message = "LLM Service is not available."
         logger.error(error_message)
@@ -59,21 +216,85 @@ async def stream_chat_response(
             "model": request.model,
             "choices": [{"index": 0, "delta": {"content": error_message}, "finish_reason": "stop"}]
         }
-        yield f"data: {json.dumps(error_data)}\n\n"
+        yield sse_frame(error_data)
         yield "data: [DONE]\n\n"
         return
 
-    # 1. Save user message
+    stream_start = time.perf_counter()
+    first_chunk_seen = False
+    chunk_count = 0
+
+    # A history loaded when the conversation was opened (or created) spares the DB round trips below.
+    history_prefetched = False
+    if state is None or not state.loaded:
+        prefetched = await take_current_history(db, request.conversation_id)
+        if prefetched is not None:
+            history_prefetched = True
+            if state is None:
+                state = prefetched
+            else:
+                state.load(prefetched.recent_messages())
+
+    # 1. Save user message (once per idempotency key)
     user_message_to_save = MessageCreateSchema(
         conversation_id=request.conversation_id, role="user", content=request.message
     )
-    await message_dao.create_message(db, message=user_message_to_save)
+    user_insert = user_message = None
+    with tracing.span("chat.insert_user_message"):
+        if request.idempotency_key is None and history_prefetched and get_history_prefetch_settings()["write-behind"]:
+            # Nothing below reads it back: insert it while the LLM answers.
+            first_attempt = True
+            user_insert = get_task_supervisor().spawn(
+                save_user_message_task(user_message_to_save), name=f"save-user-message-{request.conversation_id}"
+            )
+        elif request.idempotency_key is None:
+            first_attempt = True
+            user_message = await message_dao.create_message(db, message=user_message_to_save)
+        else:
+            user_message = await message_dao.create_message_once(db, user_message_to_save, request.idempotency_key)
+            first_attempt = user_message is not None
 
-    # 2. Define history limit and load conversation history from DB
-    MAX_HISTORY_LENGTH = 20
-    history_from_db = await message_dao.get_messages_by_conversation(
-        db, conversation_id=request.conversation_id, limit=MAX_HISTORY_LENGTH
-    )
+    if not first_attempt:
+        # A retry: replay the answer of the original attempt rather than generating it again.
+        if state is not None:
+            state.reset()  # the original attempt may have run elsewhere
+        try:
+            answer = await wait_for_idempotent_answer(request)
+        except asyncio.TimeoutError:
+            IDEMPOTENT_RETRIES.labels("pending").inc()
+            yield _chat_frame(request, "This message is still being answered, please retry later.", "stop")
+            yield "data: [DONE]\n\n"
+            return
+        if answer is not None:
+            IDEMPOTENT_RETRIES.labels("replayed").inc()
+            logger.info(f"Replaying the answer of turn {request.idempotency_key!r} for conversation {request.conversation_id}")
+            # An answer cut short (disconnect, timeout, size limit) is replayed as such.
+            partial = answer["status"] == STATUS_PARTIAL
+            yield _chat_frame(request, answer["content"], PARTIAL_FINISH_REASON if partial else None)
+            yield "data: [DONE]\n\n"
+            return
+        IDEMPOTENT_RETRIES.labels("regenerated").inc()
+        logger.warning(f"Generating turn {request.idempotency_key!r} of conversation {request.conversation_id} again: its answer was lost")
+
+    # 2. Load conversation history from the cached state, or from DB
+    with tracing.span("chat.load_history") as history_span:
+        if state is not None and state.loaded:
+            state.append("user", request.message, user_message["id"] if user_message else None)
+            history_from_db = state.recent_messages()
+            history_span.set_attribute("chat.history_cached", True)
+            history_span.set_attribute("chat.history_prefetched", history_prefetched)
+        else:
+            history_from_db = await message_dao.get_messages_by_conversation(
+                db, conversation_id=request.conversation_id, limit=MAX_HISTORY_LENGTH
+            )
+            # Only the message just saved: a new conversation, or an archived one being reopened.
+            if len(history_from_db) <= 1 and await rehydrate_if_archived(db, request.conversation_id):
+                history_from_db = await message_dao.get_messages_by_conversation(
+                    db, conversation_id=request.conversation_id, limit=MAX_HISTORY_LENGTH
+                )
+            if state is not None:
+                state.load(history_from_db)
+        history_span.set_attribute("chat.history_messages", len(history_from_db))
     
     # Reverse the list to restore chronological order (oldest first)
     history_from_db.reverse()
@@ -87,16 +308,35 @@ async def stream_chat_response(
             chat_history.append(AIMessage(content=msg['content']))
 
     logger.info(f"Initiating true stream for conversation {request.conversation_id} with {len(chat_history)} messages in history.")
+
+    # A fresh conversation (only the message just saved) is a stateless prompt: try the semantic cache.
+    semantic_lookup = None
+    if len(chat_history) == 1:
+        semantic_lookup = await lookup_semantic_cache(request.model, request.message, llm_service)
     
-    full_response_content = ""
+    response = ResponseBuffer(get_response_size_settings()["max-chars"])
     response_saved = False
+    # Whether the turn ended normally, leaving `state` in sync with the database
+    turn_completed = False
+    # Saves the answer while it streams; completes or marks it partial at the end.
+    checkpointer = ResponseCheckpointer(request.conversation_id, request.idempotency_key, after=user_insert)
+    first_token_span = tracing.start_span("llm.first_token", {"llm.model": request.model})
+    llm_stream_span = tracing.start_span("llm.stream", {"llm.model": request.model})
+    llm_stream_ended = False
     try:
         # 3. Call the astream method on the service with history
-        llm_stream = llm_service.llm.astream(chat_history)
+        # The conversation id lets providers keep per-conversation state (e.g. Gemini context caches)
+        if semantic_lookup is not None and semantic_lookup.hit:
+            llm_stream = replay_cached_answer(semantic_lookup.response)
+        else:
+            llm_stream = llm_service.llm.astream(
+                chat_history, config={"metadata": {"conversation_id": request.conversation_id}}
+            )
         
         # 4. Iterate over the stream with timeout protection (300 seconds = 5 minutes per chunk)
         stream_iter = llm_stream.__aiter__()
         timeout_seconds = 300.0
+        chunk_index = 0
         
         while True:
             try:
@@ -104,9 +344,17 @@ async def stream_chat_response(
                 chunk_task = asyncio.create_task(stream_iter.__anext__())
                 chunk = await asyncio.wait_for(chunk_task, timeout=timeout_seconds)
                 
-                logger.debug(f"Received chunk of type {type(chunk)}: {chunk}")
+                if should_log_chunk(chunk_index):
+                    logger.debug("Received chunk #{} of type {} ({} chars)", chunk_index, type(chunk).__name__, len(getattr(chunk, "content", None) or ""))
+                chunk_index += 1
                 if hasattr(chunk, 'content') and chunk.content:
-                    full_response_content += chunk.content
+                    if not first_chunk_seen:
+                        first_chunk_seen = True
+                        first_token_span.end()
+                        TIME_TO_FIRST_TOKEN.labels("chat", request.model).observe(time.perf_counter() - stream_start)
+                    chunk_count += 1
+                    content = response.append(chunk.content)
+                    checkpointer.update(response)
                     
                     # Construct OpenAI-compatible SSE chunk
                     chunk_data = {
@@ -118,24 +366,33 @@ async def stream_chat_response(
                             {
                                 "index": 0,
                                 "delta": {
-                                    "content": chunk.content
+                                    "content": content
                                 },
                                 "finish_reason": None
                             }
                         ]
                     }
-                    yield f"data: {json.dumps(chunk_data)}\n\n"
+                    yield sse_frame(chunk_data)
+                    if response.limit_reached:
+                        await stop_at_size_limit(stream_iter, "chat", request.model, len(response))
+                        yield _chat_frame(request, "", "length")
+                        break
             except StopAsyncIteration:
                 # Stream ended normally
                 break
             except asyncio.TimeoutError:
-                logger.warning(f"LLM stream timeout for conversation {request.conversation_id}, partial response length={len(full_response_content)}")
-                if full_response_content:
+                logger.warning(f"LLM stream timeout for conversation {request.conversation_id}, partial response length={len(response)}")
+                STREAM_TIMEOUTS.labels(request.model).inc()
+                if response:
                     # Save partial response on timeout
                     # Use background task here too for safety, although loop is still running
-                    asyncio.create_task(save_partial_response_task(request.conversation_id, full_response_content))
+                    get_task_supervisor().spawn(
+                        save_partial_response_task(checkpointer, response.getvalue()),
+                        name=f"save-partial-{request.conversation_id}",
+                    )
+                    PARTIAL_SAVES.labels(request.model, "timeout").inc()
                     response_saved = True
-                    logger.info(f"Triggered background save for partial response due to timeout: conv={request.conversation_id} len={len(full_response_content)}")
+                    logger.info(f"Triggered background save for partial response due to timeout: conv={request.conversation_id} len={len(response)}")
                 
                 # Send timeout message as content
                 timeout_data = {
@@ -153,39 +410,68 @@ async def stream_chat_response(
                         }
                     ]
                 }
-                yield f"data: {json.dumps(timeout_data)}\n\n"
+                yield sse_frame(timeout_data)
                 yield "data: [DONE]\n\n"
                 return
         
         logger.info("Streaming finished.")
+        llm_stream_span.set_attribute("llm.chunks", chunk_count)
+        llm_stream_span.set_attribute("llm.response_chars", len(response))
+        llm_stream_span.end()
+        llm_stream_ended = True
+        # The user message saved in the background must be in before the client is told the turn succeeded.
+        await checkpointer.wait_after()
         yield "data: [DONE]\n\n"
         
         # 5. Save assistant's full response
-        if full_response_content:
-            logger.info(f"Saving assistant response conv={request.conversation_id} len={len(full_response_content)} preview={full_response_content[:100]}")
-            assistant_message_to_save = MessageCreateSchema(
-                conversation_id=request.conversation_id,
-                role="assistant",
-                content=full_response_content,
-            )
-            await message_dao.create_message(db, message=assistant_message_to_save)
+        if response:
+            logger.info("Saving assistant response conv={} len={}", request.conversation_id, len(response))
+            logger.opt(lazy=True).debug("Assistant response preview: {}", lambda: response.preview(100))
+            # An answer cut at `response-size.max-chars` is kept, as partial.
+            status = STATUS_PARTIAL if response.limit_reached else STATUS_COMPLETE
+            with tracing.span("chat.save_response"):
+                await checkpointer.finish(db, response.getvalue(), status)
             response_saved = True
+            if semantic_lookup is not None and not semantic_lookup.hit and not response.limit_reached:
+                get_semantic_cache().store(semantic_lookup, response.getvalue())
+            if state is not None:
+                state.append("assistant", response.getvalue(), checkpointer.message["id"])
+            if len(chat_history) == 1 and status == STATUS_COMPLETE:
+                # The first answer of the conversation: name it in the background.
+                submit_for_title(request.conversation_id, request.message, response.getvalue())
+        turn_completed = True
+
+    except QuestionNotSaved as e:
+        # Nothing of the turn is saved: the client must send its message again.
+        logger.error(f"Turn of conversation {request.conversation_id} failed: {e}")
+        yield _chat_frame(request, "\n\nYour message could not be saved, please send it again.", "stop")
+        yield "data: [DONE]\n\n"
 
     except asyncio.CancelledError:
         # Client disconnected, save partial response if available
-        logger.warning(f"Stream cancelled (client disconnected) for conversation {request.conversation_id}, partial response length={len(full_response_content)}")
-        if full_response_content and not response_saved:
+        logger.warning(f"Stream cancelled (client disconnected) for conversation {request.conversation_id}, partial response length={len(response)}")
+        STREAM_CANCELLATIONS.labels(request.model).inc()
+        if response and not response_saved:
             # Use a background task with a fresh session to save, as the current session/task is cancelled
-            asyncio.create_task(save_partial_response_task(request.conversation_id, full_response_content))
+            get_task_supervisor().spawn(
+                save_partial_response_task(checkpointer, response.getvalue()),
+                name=f"save-partial-{request.conversation_id}",
+            )
+            PARTIAL_SAVES.labels(request.model, "cancelled").inc()
         raise  # Re-raise to properly clean up
 
     except Exception as e:
         error_message = f"An error occurred during streaming: {e}"
         logger.exception(error_message)
+        llm_stream_span.record_exception(e)
         # Try to save partial response on other errors
-        if full_response_content and not response_saved:
+        if response and not response_saved:
             # Also use background task for consistency, though current session might be valid depending on error
-            asyncio.create_task(save_partial_response_task(request.conversation_id, full_response_content))
+            get_task_supervisor().spawn(
+                save_partial_response_task(checkpointer, response.getvalue()),
+                name=f"save-partial-{request.conversation_id}",
+            )
+            PARTIAL_SAVES.labels(request.model, "error").inc()
         
         # Send error as content
         error_data = {
@@ -203,9 +489,35 @@ async def stream_chat_response(
                 }
             ]
         }
-        yield f"data: {json.dumps(error_data)}\n\n"
+        yield sse_frame(error_data)
         yield "data: [DONE]\n\n"
 
+    finally:
+        if state is not None and not turn_completed:
+            # A partial answer may or may not be saved yet: reload the history next turn.
+            state.reset()
+        if not first_chunk_seen:
+            first_token_span.end()
+        if not llm_stream_ended:
+            llm_stream_span.set_attribute("llm.chunks", chunk_count)
+            llm_stream_span.set_attribute("llm.response_chars", len(response))
+            llm_stream_span.end()
+        STREAM_DURATION.labels("chat", request.model).observe(time.perf_counter() - stream_start)
+        RESPONSE_CHUNKS.labels("chat", request.model).observe(chunk_count)
+        RESPONSE_CHARACTERS.labels("chat", request.model).observe(len(response))
+
+
+async def run_chat_generation(
+    request: ChatRequest, llm_service: LLMService, state: Optional[ConversationState] = None
+):
+    """
+    Runs a full chat turn with its own DB session, so it can be executed outside
+    the scope of an HTTP request (e.g. by the generation worker pool).
+    """
+    async with AsyncSessionFactory() as session:
+        async for frame in stream_chat_response(request, llm_service, session, state):
+            yield frame
+
 
 async def stream_pure_chat_response(
     request: PureChatRequest, llm_service: LLMService
@@ -223,19 +535,37 @@ async def stream_pure_chat_response(
             "model": request.model,
             "choices": [{"index": 0, "delta": {"content": error_message}, "finish_reason": "stop"}]
         }
-        yield f"data: {json.dumps(error_data)}\n\n"
+        yield sse_frame(error_data)
         yield "data: [DONE]\n\n"
         return
 
-    logger.info(f"Initiating pure stream with message: '{request.message}'")
+    logger.info("Initiating pure stream with message of {} chars", len(request.message))
     
+    stream_start = time.perf_counter()
+    chunk_count = 0
+    response = ResponseBuffer(get_response_size_settings()["max-chars"], retain=False)
     try:
-        # Call the astream method on the service with just the user's message
-        llm_stream = llm_service.astream(request.message)
+        semantic_lookup = await lookup_semantic_cache(request.model, request.message, llm_service)
+        # The text is only needed to store the answer in the semantic cache.
+        response.retain = semantic_lookup is not None
+        if semantic_lookup is not None and semantic_lookup.hit:
+            llm_stream = replay_cached_answer(semantic_lookup.response)
+        else:
+            # Call the astream method on the service with just the user's message
+            llm_stream = llm_service.astream(request.message)
         
         # Iterate over the stream and yield each chunk formatted as an SSE event
-        async for chunk in llm_stream:
+        chunk_index = 0
+        stream_iter = llm_stream.__aiter__()
+        async for chunk in stream_iter:
+            if should_log_chunk(chunk_index):
+                logger.debug("Received pure chunk #{} of type {} ({} chars)", chunk_index, type(chunk).__name__, len(getattr(chunk, "content", None) or ""))
+            chunk_index += 1
             if hasattr(chunk, 'content') and chunk.content:
+                if chunk_count == 0:
+                    TIME_TO_FIRST_TOKEN.labels("purechat", request.model).observe(time.perf_counter() - stream_start)
+                chunk_count += 1
+                content = response.append(chunk.content)
                 chunk_data = {
                     "id": "chatcmpl-pure",
                     "object": "chat.completion.chunk",
@@ -245,16 +575,23 @@ async def stream_pure_chat_response(
                         {
                             "index": 0,
                             "delta": {
-                                "content": chunk.content
+                                "content": content
                             },
                             "finish_reason": None
                         }
                     ]
                 }
-                yield f"data: {json.dumps(chunk_data)}\n\n"
+                yield sse_frame(chunk_data)
+                if response.limit_reached:
+                    await stop_at_size_limit(stream_iter, "purechat", request.model, len(response))
+                    chunk_data["choices"][0].update(delta={"content": ""}, finish_reason="length")
+                    yield sse_frame(chunk_data)
+                    break
         
         logger.info("Pure streaming finished.")
         yield "data: [DONE]\n\n"
+        if semantic_lookup is not None and not semantic_lookup.hit and not response.limit_reached:
+            get_semantic_cache().store(semantic_lookup, response.getvalue())
 
     except Exception as e:
         error_message = f"An error occurred during pure streaming: {e}"
@@ -275,5 +612,14 @@ async def stream_pure_chat_response(
                 }
             ]
         }
-        yield f"data: {json.dumps(error_data)}\n\n"
+        yield sse_frame(error_data)
         yield "data: [DONE]\n\n"
+
+    except asyncio.CancelledError:
+        STREAM_CANCELLATIONS.labels(request.model).inc()
+        raise
+
+    finally:
+        STREAM_DURATION.labels("purechat", request.model).observe(time.perf_counter() - stream_start)
+        RESPONSE_CHUNKS.labels("purechat", request.model).observe(chunk_count)
+        RESPONSE_CHARACTERS.labels("purechat", request.model).observe(len(response))
@@ -0,0 +1,113 @@
+import zlib
+from typing import Awaitable, Callable, Hashable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import yaml_configs
+from src.configs.metrics import CONDITIONAL_GETS, RESOURCE_VERSION_LOOKUPS
+from src.dao import conversation_dao, user_dao
+from src.dao.resource_versions import CONVERSATION, USER, USER_CONVERSATIONS, resource_versions
+
+
+def get_conditional_get_settings() -> dict:
+    """
+    Returns the `conditional-get` config section (weak ETags and If-None-Match
+    on the conversation and user endpoints polled by the UI):
+    - enabled: off, no ETag is sent and every GET is answered in full,
+    - cache-control: Cache-Control of the versioned responses,
+    - version-ttl-seconds: how long a version kept in the in-process map is
+      trusted before it is queried again; bounds how long a write made by
+      another worker process can go unseen (writes of this process are seen at once).
+    """
+    conditional_config = yaml_configs.get("conditional-get", {})
+    return {
+        "enabled": bool(conditional_config.get("enabled", False)),
+        "cache-control": conditional_config.get("cache-control", "private, no-cache"),
+        "version-ttl-seconds": float(conditional_config.get("version-ttl-seconds", 5)),
+    }
+
+
+async def _current_etag(key: Hashable, load_etag: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+    settings = get_conditional_get_settings()
+    if not settings["enabled"]:
+        return None
+    etag = resource_versions.get(key, settings["version-ttl-seconds"])
+    if etag is not None:
+        RESOURCE_VERSION_LOOKUPS.labels("map").inc()
+        return etag
+    RESOURCE_VERSION_LOOKUPS.labels("db").inc()
+    writes = resource_versions.writes
+    etag = await load_etag()
+    if etag is not None:
+        resource_versions.set(key, etag, writes)
+    return etag
+
+
+async def conversation_etag(db: AsyncSession, conversation_id: int) -> Optional[str]:
+    """
+    The ETag of a conversation and its messages; None when disabled, when the
+    conversation does not exist or while an answer is streaming into it.
+    """
+    async def load() -> Optional[str]:
+        version = await conversation_dao.get_conversation_version(db, conversation_id)
+        if version is None or version["streaming"]:
+            return None
+        name_crc = zlib.crc32((version["name"] or "").encode())
+        return f'W/"c{conversation_id}.{version["last_message_id"] or 0}.{name_crc:x}"'
+
+    return await _current_etag((CONVERSATION, conversation_id), load)
+
+
+async def user_conversations_etag(db: AsyncSession, user_id: int) -> Optional[str]:
+    """The ETag of a user's conversation list (all its pages); None when disabled."""
+    async def load() -> str:
+        version = await conversation_dao.get_user_conversations_version(db, user_id)
+        return f'W/"l{user_id}.{version["count"]}.{version["last_id"] or 0}.{(version["names_digest"] or "")[:12]}"'
+
+    return await _current_etag((USER_CONVERSATIONS, user_id), load)
+
+
+async def user_etag(db: AsyncSession, username: str) -> Optional[str]:
+    """The ETag of a user; None when disabled or when there is no such user."""
+    async def load() -> Optional[str]:
+        user = await user_dao.get_cached_user_by_username(db, username)
+        return None if user is None else f'W/"u{user["id"]}"'
+
+    return await _current_etag((USER, username), load)
+
+
+def _opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header with the current ETag."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or _opaque_tag(etag) in {_opaque_tag(tag) for tag in tags}
+
+
+def cache_headers(etag: Optional[str]) -> dict:
+    """Headers of a full response with this ETag (none without one)."""
+    if etag is None:
+        return {}
+    return {"ETag": etag, "Cache-Control": get_conditional_get_settings()["cache-control"]}
+
+
+def not_modified_response(request: Request, endpoint: str, etag: Optional[str]) -> Optional[Response]:
+    """
+    A 304 when the request's If-None-Match holds the current ETag, else None:
+    the caller answers in full, with cache_headers(etag).
+    """
+    if not get_conditional_get_settings()["enabled"]:
+        return None
+    if etag is None:
+        CONDITIONAL_GETS.labels(endpoint, "uncacheable").inc()
+        return None
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        CONDITIONAL_GETS.labels(endpoint, "not_modified").inc()
+        return Response(status_code=304, headers=cache_headers(etag))
+    CONDITIONAL_GETS.labels(endpoint, "full").inc()
+    return None
@@ -0,0 +1,52 @@
+from collections import deque
+from typing import Deque, List, Optional
+
+# Messages of a conversation sent to the LLM with each turn (the new one included).
+MAX_HISTORY_LENGTH = 20
+
+
+class ConversationState:
+    """
+    The latest messages of one conversation, kept in memory between its turns so
+    that a turn does not reload its history from the database.
+
+    The state remembers the id of the last message it reflects, so that its
+    owner (e.g. a WebSocket connection, see ws_chat_service) can compare it with
+    the conversation's (conversation_dao.get_conversation_version) before a
+    turn and reset it when another writer added messages meanwhile. A turn
+    that does not end normally resets the state too, and the next turn loads
+    the history from the database again.
+    """
+
+    def __init__(self, conversation_id: int, max_messages: int = MAX_HISTORY_LENGTH):
+        self.conversation_id = conversation_id
+        self.max_messages = max_messages
+        # Oldest first; None until loaded
+        self._messages: Optional[Deque[dict]] = None
+        # Id of the newest message, when known
+        self.last_message_id: Optional[int] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._messages is not None
+
+    def load(self, messages: List[dict]) -> None:
+        """Replaces the state with `messages`, newest first (as message_dao returns them)."""
+        self._messages = deque(
+            ({"role": m["role"], "content": m["content"]} for m in reversed(messages)), maxlen=self.max_messages
+        )
+        self.last_message_id = messages[0].get("id") if messages else None
+
+    def append(self, role: str, content: str, message_id: Optional[int] = None) -> None:
+        """Records a message saved to the conversation, with its id when known (ignored until loaded)."""
+        if self._messages is not None:
+            self._messages.append({"role": role, "content": content})
+            self.last_message_id = message_id
+
+    def recent_messages(self) -> List[dict]:
+        """The latest messages, newest first (as message_dao returns them)."""
+        return list(reversed(self._messages)) if self._messages is not None else []
+
+    def reset(self) -> None:
+        self._messages = None
+        self.last_message_id = None
@@ -0,0 +1,213 @@
+import asyncio
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from loguru import logger
+
+from src.configs.config import yaml_configs
+from src.configs.db import AsyncSessionFactory
+from src.configs.metrics import CONVERSATION_TITLES, TITLE_BATCH_SIZE
+from src.configs.runtime import get_server_settings
+from src.dao import conversation_dao
+from src.llm.registry import get_llm
+
+_TITLE_PROMPT = (
+    "Write a short title, at most six words, for each of the conversations below. "
+    "Answer with one line per conversation, as \"<number>. <title>\", and nothing else.\n"
+)
+_TITLE_LINE = re.compile(r"^\s*(\d+)\s*[.):-]\s*(.+?)\s*$")
+
+
+def get_auto_title_settings() -> dict:
+    """
+    Returns the `auto-title` config section (conversation names generated in
+    the background after the first answer of a conversation):
+    - enabled: off, conversations keep the name they were created with,
+    - model: model writing the titles; a cheap one is enough,
+    - batch-size: conversations titled per LLM call,
+    - batch-wait-seconds: how long the first conversation of a batch waits for others,
+    - max-calls-per-minute: rate limit of the LLM calls of the whole server;
+      conversations queue meanwhile. Each worker process titles its own
+      conversations, so it gets an equal share of it (see get_server_settings),
+    - max-pending: conversations waiting beyond this are not titled,
+    - call-timeout: seconds allowed per LLM call,
+    - max-excerpt-chars: characters of the first question and answer sent per conversation,
+    - max-title-chars: longer titles are cut.
+    """
+    title_config = yaml_configs.get("auto-title", {})
+    return {
+        "enabled": bool(title_config.get("enabled", False)),
+        "model": title_config.get("model", "gemini"),
+        "batch-size": int(title_config.get("batch-size", 8)),
+        "batch-wait-seconds": float(title_config.get("batch-wait-seconds", 2)),
+        "max-calls-per-minute": float(title_config.get("max-calls-per-minute", 30)) / get_server_settings()["workers"],
+        "max-pending": int(title_config.get("max-pending", 1000)),
+        "call-timeout": float(title_config.get("call-timeout", 30)),
+        "max-excerpt-chars": int(title_config.get("max-excerpt-chars", 500)),
+        "max-title-chars": int(title_config.get("max-title-chars", 60)),
+    }
+
+
+def build_title_prompt(excerpts: List[Tuple[str, str]], max_chars: int) -> str:
+    parts = [_TITLE_PROMPT]
+    for number, (question, answer) in enumerate(excerpts, 1):
+        parts.append(f"\n{number}.\nUser: {question[:max_chars]}\nAssistant: {answer[:max_chars]}\n")
+    return "".join(parts)
+
+
+def parse_titles(text: str, count: int, max_chars: int) -> Dict[int, str]:
+    """Titles found in the model's answer, by position (0-based); unparsable lines are skipped."""
+    titles = {}
+    for line in text.splitlines():
+        match = _TITLE_LINE.match(line)
+        if not match:
+            continue
+        index = int(match.group(1)) - 1
+        title = match.group(2).strip().strip("\"'*").strip()
+        if 0 <= index < count and title and index not in titles:
+            titles[index] = title[:max_chars].rstrip()
+    return titles
+
+
+class ConversationTitler:
+    """
+    Names new conversations from their first question and answer, off the
+    request path: submit() only queues the conversation. One background task
+    gathers up to `batch-size` conversations (waiting `batch-wait-seconds` for
+    more after the first) and asks the model for the titles of each user's
+    conversations in one call, at most `max-calls-per-minute` calls: under
+    load, batches just get bigger. A prompt never holds the conversations of
+    different users. Conversations named in the meantime (by their user) are
+    left alone.
+    """
+
+    def __init__(self, llm: BaseChatModel, settings: Optional[dict] = None, session_factory=None):
+        self.llm = llm
+        self.settings = settings or get_auto_title_settings()
+        self.session_factory = session_factory or AsyncSessionFactory
+        self._queue: asyncio.Queue = asyncio.Queue(self.settings["max-pending"])
+        self._queued = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last_call = None
+
+    def submit(self, conversation_id: int, question: str, answer: str) -> bool:
+        """Queues a conversation for a title; returns False if it was dropped (queue full)."""
+        if conversation_id in self._queued:
+            return True
+        try:
+            self._queue.put_nowait((conversation_id, question, answer))
+        except asyncio.QueueFull:
+            CONVERSATION_TITLES.labels("dropped").inc()
+            return False
+        self._queued.add(conversation_id)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="conversation-titler")
+        return True
+
+    async def stop(self) -> None:
+        """Stops the background task; queued conversations are not titled."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._title_batch(batch)
+            except Exception as e:
+                logger.error(f"Titling {len(batch)} conversation(s) failed: {e}")
+                CONVERSATION_TITLES.labels("failed").inc(len(batch))
+            finally:
+                self._queued.difference_update(conversation_id for conversation_id, _, _ in batch)
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        # Earliest time the rate limit allows the next call: keep gathering until then.
+        ready_at = loop.time()
+        if self._last_call is not None:
+            ready_at = self._last_call + 60 / self.settings["max-calls-per-minute"]
+        deadline = max(loop.time() + self.settings["batch-wait-seconds"], ready_at)
+        while len(batch) < self.settings["batch-size"]:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _title_batch(self, batch: list) -> None:
+        async with self.session_factory() as session:
+            owners = await conversation_dao.get_untitled_conversations(
+                session, [conversation_id for conversation_id, _, _ in batch]
+            )
+        CONVERSATION_TITLES.labels("named").inc(len(batch) - len(owners))
+        by_user: Dict[int, list] = {}
+        for item in batch:
+            if item[0] in owners:
+                by_user.setdefault(owners[item[0]], []).append(item)
+        for user_id, user_batch in by_user.items():
+            try:
+                await self._title_user_batch(user_batch)
+            except Exception as e:
+                logger.error(f"Titling {len(user_batch)} conversation(s) of user {user_id} failed: {e}")
+                CONVERSATION_TITLES.labels("failed").inc(len(user_batch))
+
+    async def _wait_for_call(self) -> None:
+        """Waits until the rate limit allows the next LLM call, and counts that call."""
+        loop = asyncio.get_running_loop()
+        if self._last_call is not None:
+            await asyncio.sleep(max(0, self._last_call + 60 / self.settings["max-calls-per-minute"] - loop.time()))
+        self._last_call = loop.time()
+
+    async def _title_user_batch(self, batch: list) -> None:
+        """Titles conversations of one user in one call."""
+        prompt = build_title_prompt([(q, a) for _, q, a in batch], self.settings["max-excerpt-chars"])
+        await self._wait_for_call()
+        TITLE_BATCH_SIZE.observe(len(batch))
+        response = await asyncio.wait_for(self.llm.ainvoke(prompt), self.settings["call-timeout"])
+        titles = parse_titles(response.text, len(batch), self.settings["max-title-chars"])
+        names = {batch[index][0]: title for index, title in titles.items()}
+        CONVERSATION_TITLES.labels("failed").inc(len(batch) - len(names))
+        if names:
+            async with self.session_factory() as session:
+                named = await conversation_dao.set_untitled_conversation_names(session, names)
+            CONVERSATION_TITLES.labels("titled").inc(len(named))
+            logger.info(f"Titled {len(named)} conversation(s) in one call")
+
+
+@lru_cache()
+def get_conversation_titler() -> ConversationTitler:
+    """Returns the process-wide titler, using the model of the `auto-title` config section."""
+    settings = get_auto_title_settings()
+    return ConversationTitler(get_llm(settings["model"]), settings)
+
+
+async def stop_conversation_titler() -> None:
+    """
+    Stops the titler at shutdown, if this process built one; never builds it
+    (nor its model) just to stop it, and never raises.
+    """
+    if not get_conversation_titler.cache_info().currsize:
+        return
+    try:
+        await get_conversation_titler().stop()
+    except Exception as e:
+        logger.error(f"Stopping the conversation titler failed: {e}")
+
+
+def submit_for_title(conversation_id: int, question: str, answer: str) -> None:
+    """Queues a conversation that just got its first answer, when `auto-title` is enabled."""
+    if not get_auto_title_settings()["enabled"]:
+        return
+    try:
+        get_conversation_titler().submit(conversation_id, question, answer)
+    except Exception as e:
+        # Never fail a chat turn over its title (e.g. the title model is not configured).
+        logger.warning(f"Could not queue conversation {conversation_id} for a title: {e}")
@@ -0,0 +1,202 @@
+import asyncio
+import time
+import uuid
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+from src.configs.fast_json import sse_frame
+from src.configs.metrics import GENERATION_JOBS, IDEMPOTENT_RETRIES
+from src.schemas.chat import ChatRequest, PureChatRequest
+from src.services import chat_service
+from src.services.conversation_state import ConversationState
+from src.services.llm_service import LLMService
+from src.services.pubsub import InMemoryPubSub
+
+
+class GenerationPoolFull(Exception):
+    """Raised when a backend cannot accept another generation job."""
+
+
+class GenerationBackend(ABC):
+    """
+    Owns LLM generations and their persistence, independently of HTTP connections.
+
+    HTTP handlers submit a job and then only subscribe to its SSE frames. A client
+    that disconnects simply stops listening; the generation keeps running and its
+    result is still saved.
+
+    The in-process implementation runs jobs as asyncio tasks. An implementation
+    backed by a separate worker process only needs the (serialisable) request
+    objects: it builds the LLM on its side and publishes frames back under the
+    returned job id.
+    """
+
+    @abstractmethod
+    def submit_chat(
+        self, request: ChatRequest, llm_service: LLMService, state: Optional[ConversationState] = None
+    ) -> str:
+        """
+        Starts a chat turn (with persistence) and returns its job id. A retry of a
+        turn (same idempotency key) still running returns the id of that job.
+        `state` is the cached history of a connection that owns the conversation.
+        """
+
+    @abstractmethod
+    def submit_pure_chat(self, request: PureChatRequest, llm_service: LLMService) -> str:
+        """Starts a stateless chat completion and returns its job id."""
+
+    @abstractmethod
+    def subscribe(self, job_id: str) -> AsyncIterator[str]:
+        """Yields the SSE frames of a job, from the first one, until it finishes."""
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> bool:
+        """
+        Stops a job (its partial answer is saved like on a disconnect); its
+        subscribers see the stream end without [DONE]. Returns False for an
+        unknown or finished job.
+        """
+
+    @abstractmethod
+    async def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Waits for running jobs up to `timeout` seconds, then cancels the rest."""
+
+
+class InProcessGenerationPool(GenerationBackend):
+    """
+    Runs generations as asyncio tasks on the current event loop.
+
+    At most `max_concurrency` jobs talk to an LLM at the same time, the others wait
+    for a slot. `max_pending` bounds running plus waiting jobs so that a burst of
+    requests is rejected early instead of piling up.
+    """
+
+    def __init__(self, max_concurrency: int = 32, max_pending: int = 256):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self._pubsub = InMemoryPubSub()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Running chat turns by (conversation id, idempotency key)
+        self._turns: Dict[Tuple[int, str], str] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def submit_chat(
+        self, request: ChatRequest, llm_service: LLMService, state: Optional[ConversationState] = None
+    ) -> str:
+        turn = (request.conversation_id, request.idempotency_key)
+        # Not a job whose stream already ended (its answer is saved): the new turn replays it.
+        if request.idempotency_key is not None and self._pubsub.is_open(self._turns.get(turn, "")):
+            job_id = self._turns[turn]
+            IDEMPOTENT_RETRIES.labels("attached").inc()
+            logger.info(f"Attaching retry of turn {request.idempotency_key!r} (conv={request.conversation_id}) to job {job_id}")
+            return job_id
+
+        job_id = self._submit(
+            lambda: chat_service.run_chat_generation(request, llm_service, state),
+            model=request.model,
+            label=f"conv={request.conversation_id}",
+        )
+        if request.idempotency_key is not None:
+            self._turns[turn] = job_id
+            self._tasks[job_id].add_done_callback(lambda _: self._turns.pop(turn, None))
+        return job_id
+
+    def submit_pure_chat(self, request: PureChatRequest, llm_service: LLMService) -> str:
+        return self._submit(
+            lambda: chat_service.stream_pure_chat_response(request, llm_service),
+            model=request.model,
+            label="pure",
+        )
+
+    def subscribe(self, job_id: str) -> AsyncIterator[str]:
+        return self._pubsub.subscribe(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        logger.info(f"Cancelling generation job {job_id} on request")
+        task.cancel()
+        return True
+
+    async def shutdown(self, timeout: Optional[float] = None) -> None:
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        logger.info(f"Waiting for {len(tasks)} generation job(s) to finish (timeout={timeout}s)...")
+        _, still_running = await asyncio.wait(tasks, timeout=timeout)
+        if still_running:
+            logger.warning(f"Cancelling {len(still_running)} generation job(s) still running after timeout.")
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*still_running, return_exceptions=True)
+
+    def _submit(self, frames_factory, model: Optional[str], label: str) -> str:
+        if self.pending >= self.max_pending:
+            raise GenerationPoolFull(f"Generation pool is full ({self.pending}/{self.max_pending} jobs).")
+
+        if self._semaphore is None:
+            # Created lazily so that it binds to the running event loop.
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        job_id = uuid.uuid4().hex
+        self._pubsub.open(job_id)
+        task = asyncio.create_task(self._run(job_id, frames_factory, model), name=f"generation-{job_id}")
+        self._tasks[job_id] = task
+        GENERATION_JOBS.inc()
+        task.add_done_callback(lambda _: self._finish(job_id))
+        logger.info(f"Submitted generation job {job_id} ({label}), pending={self.pending}")
+        return job_id
+
+    def _finish(self, job_id: str) -> None:
+        self._tasks.pop(job_id, None)
+        # A job cancelled before it started never ran _run(): end its stream here.
+        self._pubsub.close(job_id)
+        GENERATION_JOBS.dec()
+
+    async def _run(self, job_id: str, frames_factory, model: Optional[str]) -> None:
+        try:
+            async with self._semaphore:
+                async for frame in frames_factory():
+                    self._pubsub.publish(job_id, frame)
+        except asyncio.CancelledError:
+            logger.warning(f"Generation job {job_id} cancelled.")
+            raise
+        except Exception as e:
+            logger.exception(f"Generation job {job_id} failed: {e}")
+            error_data = {
+                "id": f"chatcmpl-{job_id}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": f"\n\nAn error occurred during generation: {e}"}, "finish_reason": "stop"}]
+            }
+            self._pubsub.publish(job_id, sse_frame(error_data))
+            self._pubsub.publish(job_id, "data: [DONE]\n\n")
+        finally:
+            self._pubsub.close(job_id)
+
+
+def is_worker_mode_enabled() -> bool:
+    """Whether chat generations run in the worker pool instead of the request handler."""
+    return yaml_configs.get("generation", {}).get("mode", "worker") == "worker"
+
+
+@lru_cache()
+def get_generation_pool() -> GenerationBackend:
+    """Returns the process-wide generation backend, configured from YAML."""
+    generation_config = yaml_configs.get("generation", {})
+    pool = InProcessGenerationPool(
+        max_concurrency=generation_config.get("max-concurrency", 32),
+        max_pending=generation_config.get("max-pending", 256),
+    )
+    logger.info(f"Generation pool created: max_concurrency={pool.max_concurrency}, max_pending={pool.max_pending}")
+    return pool
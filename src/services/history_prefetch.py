@@ -0,0 +1,152 @@
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import yaml_configs
+from src.configs.db import AsyncSessionFactory
+from src.configs.metrics import HISTORY_PREFETCHES
+from src.dao import conversation_dao, message_dao
+from src.schemas.message import STATUS_STREAMING
+from src.services.conversation_state import MAX_HISTORY_LENGTH, ConversationState
+from src.services.task_supervisor import get_task_supervisor
+
+
+def get_history_prefetch_settings() -> dict:
+    """
+    Returns the `history-prefetch` config section (the history of a conversation
+    kept in memory when it is opened or created, for its next chat turn):
+    - enabled: off, every turn loads its history from the database,
+    - ttl-seconds: how long a prefetched history is kept for its turn (which
+      checks it is still current before using it),
+    - max-conversations: histories kept, the oldest dropped first,
+    - write-behind: a turn using a prefetched history saves its user message in
+      the background instead of before calling the LLM (not with an idempotency key).
+    """
+    prefetch_config = yaml_configs.get("history-prefetch", {})
+    return {
+        "enabled": bool(prefetch_config.get("enabled", False)),
+        "ttl-seconds": float(prefetch_config.get("ttl-seconds", 30)),
+        "max-conversations": int(prefetch_config.get("max-conversations", 1000)),
+        "write-behind": bool(prefetch_config.get("write-behind", True)),
+    }
+
+
+class HistoryPrefetcher:
+    """
+    Conversation histories loaded ahead of their next chat turn, used once.
+
+    A history is warmed from the messages GET /conversations/{id} just fetched
+    (or loaded in the background when that GET was answered 304), and as empty
+    for a conversation just created. The next turn takes it, and uses it only
+    if the conversation's last message is still the one it ends with (see
+    take_current_history): another worker process, or a turn that did not
+    take it, may have written the conversation since. A background load that
+    finishes after a turn took (or skipped) the conversation is discarded.
+    """
+
+    def __init__(self, max_conversations: int = 1000, ttl_seconds: float = 30):
+        self.max_conversations = max_conversations
+        self.ttl_seconds = ttl_seconds
+        self._histories: "OrderedDict[int, tuple]" = OrderedDict()
+        # Conversations being loaded in the background, with a token per load
+        self._loading: Dict[int, object] = {}
+
+    def __len__(self) -> int:
+        return len(self._histories)
+
+    def warm(self, conversation_id: int, messages: List[dict]) -> None:
+        """Keeps the history of `messages`, newest first (as message_dao returns them with a limit)."""
+        if any(message.get("status") == STATUS_STREAMING for message in messages):
+            return  # an answer still being written: its final text is not known yet
+        self._histories.pop(conversation_id, None)
+        while len(self._histories) >= self.max_conversations:
+            self._histories.popitem(last=False)
+            HISTORY_PREFETCHES.labels("evicted").inc()
+        state = ConversationState(conversation_id)
+        state.load(messages[:MAX_HISTORY_LENGTH])
+        self._histories[conversation_id] = (state, time.monotonic() + self.ttl_seconds)
+        HISTORY_PREFETCHES.labels("warmed").inc()
+
+    def take(self, conversation_id: int) -> Optional[ConversationState]:
+        """The prefetched history of the conversation, removed; None if there is none or it expired."""
+        self._loading.pop(conversation_id, None)
+        entry = self._histories.pop(conversation_id, None)
+        if entry is None:
+            return None
+        state, expires_at = entry
+        if expires_at < time.monotonic():
+            HISTORY_PREFETCHES.labels("expired").inc()
+            return None
+        return state
+
+    def load_in_background(self, conversation_id: int) -> None:
+        if conversation_id in self._loading or conversation_id in self._histories:
+            return
+        token = self._loading[conversation_id] = object()
+        get_task_supervisor().spawn(self._load(conversation_id, token), name=f"prefetch-history-{conversation_id}")
+
+    async def _load(self, conversation_id: int, token: object) -> None:
+        try:
+            async with AsyncSessionFactory() as session:
+                messages = await message_dao.get_messages_by_conversation(
+                    session, conversation_id=conversation_id, limit=MAX_HISTORY_LENGTH
+                )
+        except Exception as e:
+            logger.warning(f"Prefetching the history of conversation {conversation_id} failed: {e}")
+            messages = None
+        # Not if a turn started meanwhile: it may have written messages this load missed.
+        if self._loading.get(conversation_id) is not token:
+            return
+        del self._loading[conversation_id]
+        # No messages may be an archived conversation: left to the turn, which rehydrates it.
+        if messages:
+            self.warm(conversation_id, messages)
+
+
+@lru_cache()
+def get_history_prefetcher() -> HistoryPrefetcher:
+    """Returns the process-wide prefetcher, sized from the `history-prefetch` config section."""
+    settings = get_history_prefetch_settings()
+    return HistoryPrefetcher(settings["max-conversations"], settings["ttl-seconds"])
+
+
+def prefetch_history(conversation_id: int, messages: Optional[List[dict]] = None) -> None:
+    """
+    Warms the history of a conversation being opened, when `history-prefetch`
+    is enabled: from `messages` (all of them, oldest first, as the conversation
+    endpoint fetches them), or loaded in the background when None.
+    """
+    if not get_history_prefetch_settings()["enabled"]:
+        return
+    if messages is None:
+        get_history_prefetcher().load_in_background(conversation_id)
+    else:
+        get_history_prefetcher().warm(conversation_id, messages[::-1])
+
+
+def take_prefetched_history(conversation_id: int) -> Optional[ConversationState]:
+    """The history prefetched for the conversation's next turn, if any; None when disabled."""
+    if not get_history_prefetch_settings()["enabled"]:
+        return None
+    return get_history_prefetcher().take(conversation_id)
+
+
+async def take_current_history(db: AsyncSession, conversation_id: int) -> Optional[ConversationState]:
+    """
+    take_prefetched_history, checked against the conversation's last message
+    id and streaming flag (one cheap query rather than loading the history):
+    None when the conversation changed since the history was prefetched.
+    """
+    state = take_prefetched_history(conversation_id)
+    if state is None:
+        return None
+    version = await conversation_dao.get_conversation_version(db, conversation_id)
+    if version is None or version["streaming"] or version["last_message_id"] != state.last_message_id:
+        HISTORY_PREFETCHES.labels("stale").inc()
+        return None
+    HISTORY_PREFETCHES.labels("used").inc()
+    return state
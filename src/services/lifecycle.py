@@ -0,0 +1,82 @@
+import asyncio
+import signal
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+from src.configs.db import get_async_engine
+from src.configs.log_config import flush_logs
+from src.configs.tracing import shutdown_tracing
+from src.services.generation_worker import get_generation_pool
+from src.services.semantic_cache import get_semantic_cache, is_semantic_cache_enabled
+from src.services.task_supervisor import get_task_supervisor
+
+
+def get_shutdown_settings() -> dict:
+    """
+    Returns the shutdown deadlines in seconds:
+    - graceful-timeout: how long uvicorn waits for open HTTP streams to finish,
+    - stream-timeout: how long remaining generations may run once HTTP is closed,
+    - flush-timeout: how long pending message writes may take before the engine is disposed.
+    """
+    shutdown_config = yaml_configs.get("shutdown", {})
+    return {
+        "graceful-timeout": float(shutdown_config.get("graceful-timeout", 20)),
+        "stream-timeout": float(shutdown_config.get("stream-timeout", 5)),
+        "flush-timeout": float(shutdown_config.get("flush-timeout", 3)),
+    }
+
+
+def install_drain_signal_handler() -> None:
+    """
+    Chains a SIGTERM handler in front of the server's own one, so that new chats
+    are rejected as soon as the orchestrator asks the pod to stop, while the
+    streams already running are left to finish.
+    """
+    previous_handler = signal.getsignal(signal.SIGTERM)
+
+    def handle_sigterm(signum, frame):
+        get_task_supervisor().stop_accepting()
+        if callable(previous_handler):
+            previous_handler(signum, frame)
+
+    try:
+        signal.signal(signal.SIGTERM, handle_sigterm)
+    except ValueError:
+        # Signal handlers can only be installed from the main thread.
+        logger.warning("Not running in the main thread, SIGTERM drain handler not installed.")
+
+
+async def drain_and_shutdown(stream_timeout: float, flush_timeout: float) -> None:
+    """
+    Shuts the application down without losing in-flight work:
+    stop accepting chats, let running generations finish (cancelled ones save
+    their partial response), flush pending background writes, dispose the engine,
+    then close the HTTP session once context cache creations in flight ended.
+    """
+    supervisor = get_task_supervisor()
+    supervisor.stop_accepting()
+
+    await get_generation_pool().shutdown(timeout=stream_timeout)
+    await supervisor.drain(timeout=flush_timeout)
+
+    await get_async_engine().dispose()
+    if is_semantic_cache_enabled():
+        try:
+            await asyncio.to_thread(get_semantic_cache().save)
+        except Exception as e:
+            logger.error(f"Failed to persist the semantic cache: {e}")
+    from src.llm.context_cache import get_context_cache, is_context_cache_enabled
+    from src.llm.http_session import aclose_http_session
+
+    if is_context_cache_enabled() and get_context_cache.cache_info().currsize:
+        try:
+            # Cache creations still in flight use the HTTP session: let them end first.
+            await asyncio.wait_for(get_context_cache().aclose(), flush_timeout)
+        except Exception as e:
+            logger.error(f"Failed to wait for context cache creations: {e}")
+    await aclose_http_session()
+    shutdown_tracing()
+    logger.info("Graceful shutdown complete.")
+    # Flush records still queued for the background log writer.
+    flush_logs()
@@ -9,12 +9,14 @@ class LLMService:
         logger.info("LLMService initialized.")
 
     async def ainvoke(self, prompt: str):
-        logger.info(f"LLMService ainvoking with prompt: {prompt}")
+        logger.info("LLMService ainvoking with prompt of {} chars", len(prompt))
+        logger.opt(lazy=True).debug("LLMService prompt: {}", lambda: prompt[:200])
         response = await self.llm.ainvoke(prompt)
         logger.info("LLMService ainvocation complete.")
         return response
 
     def astream(self, prompt: str):
         """Streams the response from the LLM."""
-        logger.info(f"LLMService astreaming with prompt: {prompt}")
+        logger.info("LLMService astreaming with prompt of {} chars", len(prompt))
+        logger.opt(lazy=True).debug("LLMService prompt: {}", lambda: prompt[:200])
         return self.llm.astream(prompt)
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import yaml_configs
+from src.configs.db import AsyncSessionFactory, get_async_engine
+from src.configs.metrics import ARCHIVED_CONVERSATIONS
+from src.dao import message_dao, message_storage_dao
+from src.services.response_checkpoint import get_checkpoint_settings
+
+
+def get_message_storage_settings() -> dict:
+    """
+    Returns the `message-storage` config section:
+    - maintenance: run partition creation, archival, the marking of abandoned
+      streaming answers and the deletion of expired idempotency keys
+      periodically; every worker process runs the loop, but a run is skipped
+      while another process (of this or another instance) holds the lock,
+    - maintenance-interval: seconds between two runs,
+    - partition-months-ahead: monthly partitions of messages created in advance
+      (only once messages is partitioned, see tbl_creation/partition_messages.sql),
+    - archive-after-days: archive conversations without messages for that long;
+      0 disables archival and rehydration,
+    - archive-batch-size: conversations archived per run,
+    - idempotency-key-retention-hours: how long the idempotency keys of chat
+      turns are kept (a retry after that generates the turn again).
+    """
+    storage_config = yaml_configs.get("message-storage", {})
+    return {
+        "maintenance": bool(storage_config.get("maintenance", False)),
+        "maintenance-interval": float(storage_config.get("maintenance-interval", 3600)),
+        "partition-months-ahead": int(storage_config.get("partition-months-ahead", 2)),
+        "archive-after-days": float(storage_config.get("archive-after-days", 0)),
+        "archive-batch-size": int(storage_config.get("archive-batch-size", 200)),
+        "idempotency-key-retention-hours": float(storage_config.get("idempotency-key-retention-hours", 24)),
+    }
+
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int, now: Optional[datetime] = None) -> list:
+    """Creates the partitions of the current and next `months_ahead` months, if messages is partitioned."""
+    if not await message_storage_dao.is_messages_partitioned(db):
+        return []
+    months = message_storage_dao.month_starts(now or datetime.now(timezone.utc), months_ahead + 1)
+    created = await message_storage_dao.create_month_partitions(db, months)
+    if created:
+        logger.info(f"Created message partitions: {', '.join(created)}")
+    return created
+
+
+async def archive_inactive(db: AsyncSession, inactive_days: float, batch_size: int) -> int:
+    """Archives up to `batch_size` inactive conversations; returns how many were archived."""
+    archived = 0
+    for conversation_id in await message_storage_dao.find_inactive_conversations(db, inactive_days, batch_size):
+        try:
+            if await message_storage_dao.archive_conversation(db, conversation_id, inactive_days):
+                archived += 1
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Failed to archive conversation {conversation_id}: {e}")
+    if archived:
+        ARCHIVED_CONVERSATIONS.labels("archived").inc(archived)
+        logger.info(f"Archived {archived} conversation(s) inactive for {inactive_days} days")
+    return archived
+
+
+async def rehydrate_if_archived(db: AsyncSession, conversation_id: int) -> int:
+    """
+    Restores the messages of an archived conversation; returns their number
+    (0 when it is not archived, or archival is disabled).
+    Callers use it when a conversation's history comes back empty or almost.
+    """
+    if get_message_storage_settings()["archive-after-days"] <= 0:
+        return 0
+    restored = await message_storage_dao.rehydrate_conversation(db, conversation_id)
+    if restored:
+        ARCHIVED_CONVERSATIONS.labels("rehydrated").inc()
+        logger.info(f"Rehydrated conversation {conversation_id} ({restored} messages) from the archive")
+    return restored
+
+
+async def run_maintenance(settings: dict) -> bool:
+    """
+    Runs the maintenance once, holding the database-wide maintenance lock so
+    that the workers of all instances do not run it concurrently. Returns
+    False, doing nothing, when another process is running it.
+    """
+    async with get_async_engine().connect() as lock_connection:
+        if not await message_storage_dao.try_lock_maintenance(lock_connection):
+            logger.debug("Message storage maintenance skipped: another process is running it")
+            return False
+        try:
+            async with AsyncSessionFactory() as session:
+                await _run_maintenance_tasks(session, settings)
+        finally:
+            await message_storage_dao.unlock_maintenance(lock_connection)
+    return True
+
+
+async def _run_maintenance_tasks(session: AsyncSession, settings: dict) -> None:
+    await ensure_partitions(session, settings["partition-months-ahead"])
+    if settings["archive-after-days"] > 0:
+        await archive_inactive(session, settings["archive-after-days"], settings["archive-batch-size"])
+    interrupted = await message_dao.mark_interrupted_messages(session, get_checkpoint_settings()["abandoned-after"])
+    if interrupted:
+        logger.warning(f"Marked {interrupted} answer(s) interrupted while streaming as partial")
+    expired = await message_dao.delete_expired_idempotency_keys(session, settings["idempotency-key-retention-hours"])
+    if expired:
+        logger.info(f"Deleted {expired} expired idempotency key(s)")
+
+
+async def _maintenance_loop(settings: dict) -> None:
+    while True:
+        try:
+            await run_maintenance(settings)
+        except Exception as e:
+            logger.error(f"Message storage maintenance failed: {e}")
+        await asyncio.sleep(settings["maintenance-interval"])
+
+
+def start_maintenance() -> Optional[asyncio.Task]:
+    """
+    Starts the periodic maintenance when enabled. The task is not tracked by
+    the task supervisor (it never finishes); cancel it before draining.
+    """
+    settings = get_message_storage_settings()
+    if not settings["maintenance"]:
+        return None
+    return asyncio.create_task(_maintenance_loop(settings), name="message-storage-maintenance")
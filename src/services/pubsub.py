@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from loguru import logger
+
+# Sentinel pushed to subscriber queues once a topic is closed.
+_CLOSED = object()
+
+
+class _Topic:
+    def __init__(self):
+        self.backlog: List[Any] = []
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.closed = False
+
+
+class InMemoryPubSub:
+    """
+    A minimal in-process publish/subscribe hub used to fan out generation events
+    to HTTP handlers.
+
+    Every topic keeps the events already published to it, so a subscriber that
+    attaches after the producer has started still receives the whole stream.
+    Publishing never blocks: each subscriber owns an unbounded queue, which keeps
+    a slow client from stalling the generation that feeds it.
+    """
+
+    def __init__(self):
+        self._topics: Dict[str, _Topic] = {}
+
+    def open(self, topic: str) -> None:
+        """Registers a topic. Must be called before the first publish."""
+        if topic in self._topics:
+            raise ValueError(f"Topic '{topic}' is already open.")
+        self._topics[topic] = _Topic()
+
+    def is_open(self, topic: str) -> bool:
+        return topic in self._topics
+
+    def publish(self, topic: str, event: Any) -> None:
+        state = self._topics.get(topic)
+        if state is None:
+            logger.warning(f"Dropping event for unknown topic '{topic}'.")
+            return
+        state.backlog.append(event)
+        for queue in state.subscribers:
+            queue.put_nowait(event)
+
+    def close(self, topic: str) -> None:
+        """Ends a topic: current subscribers finish, the backlog is released."""
+        state = self._topics.pop(topic, None)
+        if state is None:
+            return
+        state.closed = True
+        for queue in state.subscribers:
+            queue.put_nowait(_CLOSED)
+
+    def subscribe(self, topic: str) -> AsyncIterator[Any]:
+        """
+        Returns an iterator over every event of the topic, starting from the
+        first one, until the topic is closed. Subscribing to an unknown topic
+        yields nothing.
+
+        The subscriber is registered here, not on the first iteration: a caller
+        that hands the iterator over (e.g. to a StreamingResponse, which only
+        starts reading it after the handler returned) still gets a topic closed
+        meanwhile in full.
+        """
+        state = self._topics.get(topic)
+        queue: asyncio.Queue = asyncio.Queue()
+        if state is None:
+            queue.put_nowait(_CLOSED)
+            return self._drain(None, queue)
+
+        for event in state.backlog:
+            queue.put_nowait(event)
+        if state.closed:
+            queue.put_nowait(_CLOSED)
+        else:
+            state.subscribers.add(queue)
+        return self._drain(state, queue)
+
+    @staticmethod
+    async def _drain(state: Optional[_Topic], queue: asyncio.Queue) -> AsyncIterator[Any]:
+        try:
+            while True:
+                event = await queue.get()
+                if event is _CLOSED:
+                    return
+                yield event
+        finally:
+            if state is not None:
+                state.subscribers.discard(queue)
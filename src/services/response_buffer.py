@@ -0,0 +1,66 @@
+from typing import List, Optional
+
+from src.configs.config import yaml_configs
+
+
+def get_response_size_settings() -> dict:
+    """
+    Returns the `response-size` config section (how long a streamed answer may get):
+    - max-chars: characters after which generation is stopped and the answer
+      ends with finish_reason "length" (0: unlimited).
+    """
+    size_config = yaml_configs.get("response-size", {})
+    return {
+        "max-chars": int(size_config.get("max-chars", 400_000)),
+    }
+
+
+class ResponseBuffer:
+    """
+    Accumulates the chunks of a streamed answer.
+
+    Chunks are kept in a list and only joined when the text is needed (a
+    checkpoint, the final save), instead of rebuilding a growing string on
+    every chunk. The length is tracked as chunks arrive, so size checks and
+    logs never touch the text.
+
+    With `max_chars`, the chunk crossing the limit is cut and `limit_reached`
+    becomes True: the caller stops generating. With `retain=False` only the
+    length is tracked (the text is not needed, e.g. /purechat without cache).
+    """
+
+    def __init__(self, max_chars: Optional[int] = None, retain: bool = True):
+        self.max_chars = max_chars or None
+        self.retain = retain
+        self.limit_reached = False
+        self._parts: List[str] = []
+        self._length = 0
+
+    def append(self, text: str) -> str:
+        """Adds a chunk and returns the part of it that was kept (all of it below the limit)."""
+        if self.max_chars is not None and self._length + len(text) >= self.max_chars:
+            text = text[:self.max_chars - self._length]
+            self.limit_reached = True
+        if self.retain and text:
+            self._parts.append(text)
+        self._length += len(text)
+        return text
+
+    def getvalue(self) -> str:
+        """The answer so far. Joined chunks are kept joined, so repeated calls only join what is new."""
+        if len(self._parts) > 1:
+            self._parts[:] = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def preview(self, chars: int = 100) -> str:
+        """The first `chars` characters, without joining the whole answer."""
+        head, length = [], 0
+        for part in self._parts:
+            if length >= chars:
+                break
+            head.append(part[:chars - length])
+            length += len(head[-1])
+        return "".join(head)
+
+    def __len__(self) -> int:
+        return self._length
@@ -0,0 +1,150 @@
+import asyncio
+import time
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import yaml_configs
+from src.configs.db import AsyncSessionFactory
+from src.configs.metrics import RESPONSE_CHECKPOINTS
+from src.dao import message_dao
+from src.schemas.message import STATUS_STREAMING, MessageCreateSchema
+from src.services.response_buffer import ResponseBuffer
+
+
+def get_checkpoint_settings() -> dict:
+    """
+    Returns the `response-checkpoint` config section (saving assistant answers
+    while they stream, so that a killed process loses at most one interval):
+    - enabled: off, an answer is only written once it ends,
+    - every-chars: new characters that trigger a checkpoint,
+    - every-chars-growth: for long answers, the new characters that trigger a
+      checkpoint are at least this fraction of those already saved, so that an
+      answer of n characters gets O(log n) checkpoints rather than O(n),
+    - every-seconds: time after which new characters are checkpointed anyway,
+    - abandoned-after: seconds after which an answer still "streaming" is
+      marked partial by the message storage maintenance.
+    """
+    checkpoint_config = yaml_configs.get("response-checkpoint", {})
+    return {
+        "enabled": bool(checkpoint_config.get("enabled", True)),
+        "every-chars": int(checkpoint_config.get("every-chars", 2000)),
+        "every-chars-growth": float(checkpoint_config.get("every-chars-growth", 0.25)),
+        "every-seconds": float(checkpoint_config.get("every-seconds", 5)),
+        "abandoned-after": float(checkpoint_config.get("abandoned-after", 3600)),
+    }
+
+
+class QuestionNotSaved(Exception):
+    """The user message an answer follows was not saved, so the answer is not saved either."""
+
+
+class ResponseCheckpointer:
+    """
+    Persists one assistant answer while it streams.
+
+    The first checkpoint inserts the message with status "streaming", the next
+    ones append the characters generated since the last one that landed, so a
+    long answer is not rewritten at every checkpoint; finish() writes the final
+    body and status. Short answers that end before the first checkpoint are
+    inserted once, as before.
+
+    Checkpoints run in the background, on their own session, so the stream
+    never waits for the database; a checkpoint due while the previous one is
+    still being written is skipped (the next one carries its characters).
+
+    `after` is a task the answer must be inserted after (the user message of
+    the turn, when it is saved in the background): the first write waits for
+    it, and raises QuestionNotSaved rather than insert an orphan answer when
+    it failed.
+    """
+
+    def __init__(self, conversation_id: int, idempotency_key: Optional[str] = None, settings: Optional[dict] = None,
+                 after: Optional[asyncio.Task] = None):
+        self.conversation_id = conversation_id
+        self.idempotency_key = idempotency_key
+        self.settings = settings or get_checkpoint_settings()
+        self.after = after
+        # The stored message, once inserted
+        self.message: Optional[dict] = None
+        self._saved_length = 0
+        self._saved_at = time.monotonic()
+        # Characters of the answer stored by the checkpoints that succeeded
+        self._stored_length = 0
+        self._pending: Optional[asyncio.Task] = None
+
+    def update(self, response: ResponseBuffer) -> None:
+        """
+        Called with the answer so far after each chunk; starts a checkpoint when
+        one is due. The text is only joined then: most calls just compare lengths.
+        """
+        if not self.settings["enabled"] or (self._pending is not None and not self._pending.done()):
+            return
+        new_chars = len(response) - self._saved_length
+        if new_chars <= 0:
+            return
+        every_chars = max(self.settings["every-chars"], self._saved_length * self.settings["every-chars-growth"])
+        if new_chars < every_chars and time.monotonic() - self._saved_at < self.settings["every-seconds"]:
+            return
+        content = response.getvalue()
+        self._saved_length, self._saved_at = len(content), time.monotonic()
+        self._pending = asyncio.create_task(self._checkpoint(content), name=f"checkpoint-{self.conversation_id}")
+
+    async def finish(self, db: AsyncSession, content: str, status: str) -> None:
+        """Writes the final body and status, after the checkpoint in flight if any."""
+        await self._wait_pending()
+        await self._write(db, content, status)
+
+    async def _wait_pending(self) -> None:
+        if self._pending is None:
+            return
+        try:
+            # Shielded: a cancelled stream still lets its last checkpoint land.
+            await asyncio.shield(self._pending)
+        except Exception:
+            pass  # already logged; finish() writes everything anyway
+
+    async def _checkpoint(self, content: str) -> None:
+        start = time.perf_counter()
+        try:
+            async with AsyncSessionFactory() as session:
+                await self._write(session, content, STATUS_STREAMING)
+        except Exception as e:
+            RESPONSE_CHECKPOINTS.labels("failed").inc()
+            logger.warning(f"Checkpoint of the answer in conversation {self.conversation_id} failed: {e}")
+            return
+        RESPONSE_CHECKPOINTS.labels("saved").inc()
+        logger.debug("Checkpointed {} chars of conv={} in {:.1f} ms", len(content), self.conversation_id,
+                     (time.perf_counter() - start) * 1000)
+
+    async def wait_after(self) -> None:
+        """Waits for the `after` task; raises QuestionNotSaved if it failed."""
+        if self.after is None:
+            return
+        try:
+            # Shielded, like the checkpoints: a cancelled stream does not cancel the insert.
+            await asyncio.shield(self.after)
+        except Exception as e:
+            raise QuestionNotSaved(f"the user message of the answer in conversation {self.conversation_id} "
+                                   f"was not saved: {e}") from e
+        self.after = None
+
+    async def _write(self, db: AsyncSession, content: str, status: str) -> None:
+        if self.message is None:
+            await self.wait_after()
+            self.message = await message_dao.create_message(
+                db,
+                message=MessageCreateSchema(conversation_id=self.conversation_id, role="assistant", content=content),
+                idempotency_key=self.idempotency_key,
+                status=status,
+            )
+        elif status == STATUS_STREAMING:
+            # Checkpoints run one at a time, from the stored length on: a failed
+            # one leaves its characters to the next.
+            await message_dao.append_message_content(
+                db, self.message["id"], self.message["created_at"], content[self._stored_length:]
+            )
+        else:
+            await message_dao.update_message_content(db, self.message["id"], self.message["created_at"], content, status)
+        self._stored_length = len(content)
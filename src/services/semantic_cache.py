@@ -0,0 +1,175 @@
+import asyncio
+import importlib.util
+import os
+import random
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+from src.configs.config import project_path, yaml_configs
+from src.configs.metrics import (
+    SEMANTIC_CACHE_ENTRIES,
+    SEMANTIC_CACHE_EVICTIONS,
+    SEMANTIC_CACHE_HIT_AGREEMENT,
+    SEMANTIC_CACHE_LOOKUPS,
+    SEMANTIC_CACHE_SIMILARITY,
+)
+from src.services.llm_service import LLMService
+
+# NumPy (and an embedding model) are only imported once the cache is enabled,
+# see get_semantic_cache().
+
+
+@dataclass
+class SemanticLookup:
+    model: str
+    prompt: str
+    vector: Any
+    similarity: float
+    entry: Optional[dict] = field(default=None, repr=False)
+
+    @property
+    def hit(self) -> bool:
+        return self.entry is not None
+
+    @property
+    def response(self) -> Optional[str]:
+        return self.entry["response"] if self.entry else None
+
+
+class SemanticCache:
+    """
+    Serves a stored answer when a new stateless prompt (/purechat, or the first
+    turn of a conversation) is close enough to one already answered by the same
+    model.
+
+    Prompts are embedded on the local CPU (in a worker thread) and matched in an
+    in-process VectorIndex scoped per model. A hit needs a cosine similarity of
+    at least `threshold`. To watch the quality of hits, a `verify_sample_rate`
+    fraction of them is also answered by the model in the background: the
+    similarity of both answers is recorded, and entries whose answer disagrees
+    (below `min_agreement`) are replaced by the fresh one.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        index,
+        threshold: float = 0.92,
+        max_prompt_chars: int = 2000,
+        verify_sample_rate: float = 0.0,
+        min_agreement: float = 0.6,
+        persist_path: Optional[str] = None,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.embedder = embedder
+        self.index = index
+        self.threshold = threshold
+        self.max_prompt_chars = max_prompt_chars
+        self.verify_sample_rate = verify_sample_rate
+        self.min_agreement = min_agreement
+        self.persist_path = persist_path
+        self._rng = rng
+
+    async def lookup(self, model: str, prompt: str) -> Optional[SemanticLookup]:
+        """Returns None for prompts that are not cached at all (empty or too long)."""
+        if not prompt.strip() or len(prompt) > self.max_prompt_chars:
+            return None
+        vector = await asyncio.to_thread(self.embedder.embed, prompt)
+        entry, similarity = self.index.search(model, vector)
+        result = "hit" if entry is not None and similarity >= self.threshold else "miss"
+        SEMANTIC_CACHE_LOOKUPS.labels(model, result).inc()
+        if entry is not None:
+            SEMANTIC_CACHE_SIMILARITY.labels(model, result).observe(similarity)
+        if result == "miss":
+            return SemanticLookup(model, prompt, vector, similarity)
+        self.index.touch(entry)
+        logger.info(f"Semantic cache hit for model {model} (similarity {similarity:.3f})")
+        return SemanticLookup(model, prompt, vector, similarity, entry)
+
+    def store(self, lookup: SemanticLookup, response: str) -> None:
+        """Caches the answer to a missed lookup."""
+        if not response:
+            return
+        evicted = self.index.add(lookup.model, lookup.vector, lookup.prompt, response)
+        if evicted:
+            SEMANTIC_CACHE_EVICTIONS.labels(lookup.model, "capacity").inc(evicted)
+        SEMANTIC_CACHE_ENTRIES.labels(lookup.model).set(self.index.size(lookup.model))
+
+    def should_verify(self) -> bool:
+        return self.verify_sample_rate > 0 and self._rng() < self.verify_sample_rate
+
+    async def verify(self, lookup: SemanticLookup, llm_service: LLMService) -> float:
+        """Compares a served cached answer with a fresh one; returns their similarity."""
+        from src.llm.embeddings import similarity
+
+        fresh = (await llm_service.ainvoke(lookup.prompt)).text
+        cached_vector, fresh_vector = await asyncio.to_thread(
+            lambda: (self.embedder.embed(lookup.response), self.embedder.embed(fresh))
+        )
+        agreement = similarity(cached_vector, fresh_vector)
+        SEMANTIC_CACHE_HIT_AGREEMENT.labels(lookup.model).observe(agreement)
+        if agreement < self.min_agreement:
+            logger.warning(f"Semantic cache answer disagrees with a fresh one ({agreement:.3f}), replacing it")
+            self.index.remove(lookup.model, lookup.entry)
+            SEMANTIC_CACHE_EVICTIONS.labels(lookup.model, "disagreement").inc()
+            self.store(lookup, fresh)
+        return agreement
+
+    def load(self) -> None:
+        if self.persist_path and self.index.load(self.persist_path, self.embedder.name):
+            for model in self.index.scopes():
+                SEMANTIC_CACHE_ENTRIES.labels(model).set(self.index.size(model))
+            logger.info(f"Semantic cache loaded from {self.persist_path}")
+
+    def save(self) -> None:
+        if self.persist_path:
+            self.index.save(self.persist_path, self.embedder.name)
+            logger.info(f"Semantic cache saved to {self.persist_path}")
+
+
+def is_semantic_cache_enabled(model: Optional[str] = None) -> bool:
+    """True when the `semantic-cache` section enables the cache (for `model`, if given)."""
+    cache_config = yaml_configs.get("semantic-cache", {})
+    if not cache_config.get("enabled", False):
+        return False
+    if importlib.util.find_spec("numpy") is None:
+        logger.warning("semantic-cache is enabled but numpy is not installed; the cache stays off.")
+        return False
+    models = cache_config.get("models")
+    return model is None or not models or model in models
+
+
+@lru_cache()
+def get_semantic_cache() -> SemanticCache:
+    """
+    Builds the process-wide semantic cache from the `semantic-cache` config section and loads it from disk.
+    Each server worker has its own, filled by the requests it answers; all of
+    them start from the saved file, which the last worker to stop overwrites.
+    """
+    from src.llm.embeddings import build_embedder
+    from src.services.vector_index import VectorIndex
+
+    cache_config = yaml_configs.get("semantic-cache", {})
+    embedder = build_embedder(cache_config.get("embedding", {}))
+    index = VectorIndex(
+        dim=embedder.dim,
+        max_entries=int(cache_config.get("max-entries", 10000)),
+        ttl_seconds=float(cache_config.get("ttl-seconds", 7 * 24 * 3600)),
+    )
+    persist_path = cache_config.get("persist-path")
+    if persist_path and not os.path.isabs(persist_path):
+        persist_path = os.path.join(project_path, persist_path)
+    cache = SemanticCache(
+        embedder,
+        index,
+        threshold=float(cache_config.get("threshold", 0.92)),
+        max_prompt_chars=int(cache_config.get("max-prompt-chars", 2000)),
+        verify_sample_rate=float(cache_config.get("verify-sample-rate", 0.0)),
+        min_agreement=float(cache_config.get("min-agreement", 0.6)),
+        persist_path=persist_path,
+    )
+    cache.load()
+    return cache
@@ -0,0 +1,64 @@
+import asyncio
+from functools import lru_cache
+from typing import Coroutine, Optional, Set
+
+from loguru import logger
+
+
+class TaskSupervisor:
+    """
+    Keeps a strong reference to background tasks (e.g. partial-response saves)
+    so they are neither garbage collected mid-flight nor lost on shutdown, and
+    holds the "accepting new chats" switch flipped when the pod starts draining.
+    """
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self.accepting = True
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        """Starts `coro` as a tracked task. Always allowed, even while draining."""
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        return task
+
+    def stop_accepting(self) -> None:
+        if self.accepting:
+            logger.warning("Task supervisor is draining: new chat requests will be rejected.")
+        self.accepting = False
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """Waits for tracked tasks up to `timeout` seconds, then cancels the rest."""
+        # Tasks may spawn further tasks while we wait (e.g. a cancelled stream
+        # scheduling its partial save), so keep waiting until the set is empty.
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while self._tasks:
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+            logger.info(f"Waiting for {len(self._tasks)} background task(s) to finish...")
+            await asyncio.wait(set(self._tasks), timeout=remaining)
+
+        if self._tasks:
+            leftovers = set(self._tasks)
+            logger.error(f"Cancelling {len(leftovers)} background task(s) still running after {timeout}s.")
+            for task in leftovers:
+                task.cancel()
+            await asyncio.gather(*leftovers, return_exceptions=True)
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background task {task.get_name()} failed: {task.exception()}")
+
+
+@lru_cache()
+def get_task_supervisor() -> TaskSupervisor:
+    """Returns the process-wide task supervisor."""
+    return TaskSupervisor()
@@ -0,0 +1,145 @@
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+class _Shard:
+    """Vectors and entries of one scope; rows [0, size) are in use."""
+
+    def __init__(self, dim: int):
+        self.vectors = np.zeros((16, dim), dtype=np.float32)
+        self.entries: List[dict] = []
+
+    @property
+    def size(self) -> int:
+        return len(self.entries)
+
+    def append(self, vector: np.ndarray, entry: dict) -> None:
+        if self.size == len(self.vectors):
+            grown = np.zeros((len(self.vectors) * 2, self.vectors.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.vectors
+            self.vectors = grown
+        self.vectors[self.size] = vector
+        self.entries.append(entry)
+
+    def remove(self, index: int) -> None:
+        # Swap with the last row, so removal is O(dim).
+        last = self.size - 1
+        if index != last:
+            self.vectors[index] = self.vectors[last]
+            self.entries[index] = self.entries[last]
+        self.entries.pop()
+
+
+class VectorIndex:
+    """
+    In-process nearest-neighbour index, one shard per scope (the model name).
+
+    Brute force: a single matrix-vector product over the shard. At the bounded
+    shard sizes used here (thousands of 512-dimensional float32 rows) this is
+    well under a millisecond, so no approximate structure (IVF) is needed.
+    Entries expire after `ttl_seconds`; when a shard is full the least recently
+    used entry is evicted. Persists to a single .npz file.
+    """
+
+    def __init__(self, dim: int, max_entries: int = 10000, ttl_seconds: float = 7 * 24 * 3600,
+                 clock: Callable[[], float] = time.time):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._shards: Dict[str, _Shard] = {}
+
+    def size(self, scope: str) -> int:
+        shard = self._shards.get(scope)
+        return shard.size if shard else 0
+
+    def scopes(self) -> List[str]:
+        return list(self._shards)
+
+    def _expired(self, entry: dict) -> bool:
+        return self._clock() - entry["created_at"] > self.ttl_seconds
+
+    def search(self, scope: str, vector: np.ndarray) -> Tuple[Optional[dict], float]:
+        """Returns the most similar live entry of `scope` and its cosine similarity."""
+        shard = self._shards.get(scope)
+        while shard is not None and shard.size:
+            similarities = shard.vectors[:shard.size] @ vector
+            best = int(np.argmax(similarities))
+            entry = shard.entries[best]
+            if self._expired(entry):
+                shard.remove(best)
+                continue
+            return entry, float(similarities[best])
+        return None, 0.0
+
+    def touch(self, entry: dict) -> None:
+        entry["last_used"] = self._clock()
+        entry["hits"] += 1
+
+    def add(self, scope: str, vector: np.ndarray, prompt: str, response: str) -> int:
+        """Adds an entry (replacing a near-identical one); returns the number of evicted entries."""
+        shard = self._shards.setdefault(scope, _Shard(self.dim))
+        now = self._clock()
+        entry = {"prompt": prompt, "response": response, "created_at": now, "last_used": now, "hits": 0}
+        if shard.size:
+            similarities = shard.vectors[:shard.size] @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= 0.999:
+                shard.vectors[best] = vector
+                shard.entries[best] = entry
+                return 0
+
+        evicted = 0
+        while shard.size >= self.max_entries:
+            shard.remove(min(range(shard.size), key=lambda i: shard.entries[i]["last_used"]))
+            evicted += 1
+        shard.append(vector, entry)
+        return evicted
+
+    def remove(self, scope: str, entry: dict) -> None:
+        shard = self._shards.get(scope)
+        if shard is not None:
+            for index, candidate in enumerate(shard.entries):
+                if candidate is entry:
+                    shard.remove(index)
+                    return
+
+    def save(self, path: str, embedder_name: str) -> None:
+        """Writes the index atomically (temporary file + rename)."""
+        scopes = [scope for scope, shard in self._shards.items() if shard.size]
+        meta = {
+            "embedder": embedder_name,
+            "dim": self.dim,
+            "scopes": {scope: self._shards[scope].entries for scope in scopes},
+        }
+        arrays = {f"scope_{i}": self._shards[scope].vectors[:self._shards[scope].size] for i, scope in enumerate(scopes)}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Per process: the workers of a server all save their index on shutdown.
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str, embedder_name: str) -> bool:
+        """Loads a saved index; ignores files written with another embedder."""
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["embedder"] != embedder_name or meta["dim"] != self.dim:
+                logger.warning(f"Ignoring vector index {path}: built with {meta['embedder']}, not {embedder_name}.")
+                return False
+            self._shards = {}
+            for i, (scope, entries) in enumerate(meta["scopes"].items()):
+                shard = _Shard(self.dim)
+                for vector, entry in zip(data[f"scope_{i}"], entries):
+                    if not self._expired(entry):
+                        shard.append(vector, entry)
+                self._shards[scope] = shard
+        return True
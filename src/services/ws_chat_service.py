@@ -0,0 +1,247 @@
+import asyncio
+import json
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+from loguru import logger
+from pydantic import ValidationError
+
+from src.configs.config import yaml_configs
+from src.configs.db import AsyncSessionFactory
+from src.configs.metrics import CHAT_REQUESTS, CHAT_REQUESTS_REJECTED, WEBSOCKET_CONNECTIONS
+from src.dao import conversation_dao
+from src.llm.registry import UnknownModelError, get_llm
+from src.schemas.chat import ChatRequest
+from src.services import chat_service
+from src.services.conversation_state import ConversationState
+from src.services.generation_worker import GenerationPoolFull, get_generation_pool, is_worker_mode_enabled
+from src.services.llm_service import LLMService
+from src.services.task_supervisor import get_task_supervisor
+
+ENDPOINT = "ws_chat"
+
+
+def get_websocket_settings() -> dict:
+    """
+    Returns the `websocket` config section (the /ws/chat transport):
+    - max-queued-turns: turns a connection may have waiting behind the running
+      one; further ones are rejected with an error message.
+    """
+    websocket_config = yaml_configs.get("websocket", {})
+    return {
+        "max-queued-turns": int(websocket_config.get("max-queued-turns", 8)),
+    }
+
+
+class TurnRejected(Exception):
+    """A chat message that cannot start a turn; its text is sent back to the client."""
+
+
+class ChatConnection:
+    """
+    One /ws/chat WebSocket, bound to one conversation for its whole life.
+
+    Client messages are JSON objects:
+    - {"type": "chat", "turn_id": "...", "message": "...", "model": "...",
+      "idempotency_key": "..."} queues a turn (turn_id defaults to a sequence
+      number, idempotency_key is optional),
+    - {"type": "cancel", "turn_id": "..."} stops a running turn (its partial
+      answer is saved, as on a disconnect) or drops a queued one.
+
+    Turns run one at a time, in the order received: each one sees the answer of
+    the previous one. Server messages carry the turn_id they belong to:
+    - {"type": "chunk", "data": {...}}: a chat.completion.chunk, as sent over SSE,
+    - {"type": "done"}: the turn ended,
+    - {"type": "cancelled"}: the turn was cancelled,
+    - {"type": "error", "detail": "..."}: the message did not start a turn.
+
+    Between turns the connection keeps what /chat sets up on every request: the
+    conversation's recent history (ConversationState), the LLM service of each
+    model and, with inline generation, its DB session. Before each turn, the
+    kept history is checked against the id of the conversation's last message,
+    and reloaded when another writer (/chat, another connection or process)
+    added messages since.
+    """
+
+    def __init__(self, websocket: WebSocket, conversation_id: int, settings: Optional[dict] = None):
+        self.websocket = websocket
+        self.conversation_id = conversation_id
+        self.settings = settings or get_websocket_settings()
+        self.state = ConversationState(conversation_id)
+        self._llm_services: Dict[str, LLMService] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._queued: Set[str] = set()
+        self._cancelled: Set[str] = set()
+        self._running: Optional[Tuple[str, Callable[[], object]]] = None
+        self._turn_count = 0
+        self._send_lock = asyncio.Lock()
+        self._session = None
+
+    async def serve(self) -> None:
+        """Handles the messages of the (accepted) WebSocket until it closes."""
+        WEBSOCKET_CONNECTIONS.inc()
+        runner = asyncio.create_task(self._run_turns(), name=f"ws-chat-{self.conversation_id}")
+        try:
+            while True:
+                await self._handle(await self.websocket.receive_text())
+        except WebSocketDisconnect:
+            logger.info(f"WebSocket of conversation {self.conversation_id} closed")
+        finally:
+            # With inline generation, this cancels the running turn like an SSE disconnect does.
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+            if self._session is not None:
+                await self._session.close()
+            WEBSOCKET_CONNECTIONS.dec()
+
+    async def _handle(self, raw: str) -> None:
+        try:
+            message = json.loads(raw)
+            if not isinstance(message, dict):
+                raise ValueError("not an object")
+        except ValueError:
+            await self._send_event("error", None, detail="Messages must be JSON objects.")
+            return
+        turn_id = message.get("turn_id")
+        if message.get("type") == "cancel":
+            self._cancel(str(turn_id))
+        elif message.get("type") == "chat":
+            self._turn_count += 1
+            turn_id = str(turn_id) if turn_id is not None else str(self._turn_count)
+            try:
+                self._queue_turn(turn_id, message)
+            except TurnRejected as e:
+                await self._send_event("error", turn_id, detail=str(e))
+        else:
+            await self._send_event("error", turn_id, detail=f"Unknown message type {message.get('type')!r}.")
+
+    def _queue_turn(self, turn_id: str, message: dict) -> None:
+        if not get_task_supervisor().accepting:
+            CHAT_REQUESTS_REJECTED.labels(ENDPOINT, "draining").inc()
+            raise TurnRejected("Server is shutting down, please retry.")
+        if turn_id in self._queued or (self._running is not None and self._running[0] == turn_id):
+            raise TurnRejected(f"Turn {turn_id!r} is already in progress.")
+        if len(self._queued) >= self.settings["max-queued-turns"]:
+            CHAT_REQUESTS_REJECTED.labels(ENDPOINT, "queue_full").inc()
+            raise TurnRejected("Too many turns queued on this connection, please retry later.")
+        try:
+            request = ChatRequest(
+                conversation_id=self.conversation_id,
+                **{field: message[field] for field in ("message", "model", "idempotency_key") if field in message},
+            )
+        except ValidationError as e:
+            raise TurnRejected(f"Invalid chat message: {e.errors(include_url=False)}")
+        llm_service = self._llm_service(request.model)
+        CHAT_REQUESTS.labels(ENDPOINT, request.model).inc()
+        self._queued.add(turn_id)
+        self._queue.put_nowait((turn_id, request, llm_service))
+
+    def _llm_service(self, model: str) -> LLMService:
+        if model not in self._llm_services:
+            try:
+                self._llm_services[model] = LLMService(llm=get_llm(model))
+            except UnknownModelError as e:
+                CHAT_REQUESTS_REJECTED.labels(ENDPOINT, "invalid_model").inc()
+                raise TurnRejected(str(e))
+            except Exception as e:
+                logger.error(f"Failed to initialize LLM service for WebSocket turn: {e}")
+                raise TurnRejected("Failed to initialize LLM service.")
+        return self._llm_services[model]
+
+    def _cancel(self, turn_id: str) -> None:
+        if self._running is not None and self._running[0] == turn_id:
+            logger.info(f"Cancelling turn {turn_id!r} of conversation {self.conversation_id}")
+            self._running[1]()
+        elif turn_id in self._queued:
+            self._cancelled.add(turn_id)
+
+    async def _run_turns(self) -> None:
+        while True:
+            turn_id, request, llm_service = await self._queue.get()
+            self._queued.discard(turn_id)
+            if turn_id in self._cancelled:
+                self._cancelled.discard(turn_id)
+                await self._send_event("cancelled", turn_id)
+                continue
+            try:
+                completed = await self._run_turn(turn_id, request, llm_service)
+            except TurnRejected as e:
+                await self._send_event("error", turn_id, detail=str(e))
+                continue
+            finally:
+                self._running = None
+            if not completed:
+                await self._send_event("cancelled", turn_id)
+
+    async def _run_turn(self, turn_id: str, request: ChatRequest, llm_service: LLMService) -> bool:
+        """Runs one turn, relaying its frames. Returns False when it was cancelled before its end."""
+        await self._drop_stale_state()
+        if is_worker_mode_enabled():
+            # The pool keeps its concurrency limit and runs the turn on its own session.
+            pool = get_generation_pool()
+            try:
+                job_id = pool.submit_chat(request, llm_service, self.state)
+            except GenerationPoolFull as e:
+                logger.warning(f"Rejecting WebSocket turn for conv {self.conversation_id}: {e}")
+                CHAT_REQUESTS_REJECTED.labels(ENDPOINT, "pool_full").inc()
+                raise TurnRejected("Server is busy, please retry later.")
+            frames = pool.subscribe(job_id)
+            cancel = lambda: pool.cancel(job_id)
+        else:
+            if self._session is None:
+                self._session = AsyncSessionFactory()
+            frames = chat_service.stream_chat_response(request, llm_service, self._session, self.state)
+            cancel = None
+
+        relay = asyncio.create_task(self._relay(turn_id, frames))
+        self._running = (turn_id, cancel or relay.cancel)
+        try:
+            await asyncio.wait({relay})
+        except asyncio.CancelledError:
+            relay.cancel()
+            raise
+        return not relay.cancelled() and relay.result()
+
+    async def _drop_stale_state(self) -> None:
+        """Resets the kept history when the conversation's last message is not the one it ends with."""
+        if not self.state.loaded:
+            return
+        try:
+            async with AsyncSessionFactory() as session:
+                version = await conversation_dao.get_conversation_version(session, self.conversation_id)
+        except Exception as e:
+            logger.warning(f"Checking the history of conversation {self.conversation_id} failed, reloading it: {e}")
+            version = None
+        if version is None or version["last_message_id"] != self.state.last_message_id:
+            logger.info(f"Conversation {self.conversation_id} changed since the last WebSocket turn, reloading its history")
+            self.state.reset()
+
+    async def _relay(self, turn_id: str, frames) -> bool:
+        """
+        Sends the SSE frames of a turn as chunk messages, and "done" at [DONE].
+        The frames are read to their end: the answer is saved after [DONE], and
+        the next turn must see it. Returns whether [DONE] was reached.
+        """
+        turn_json = json.dumps(turn_id)
+        completed = False
+        async for frame in frames:
+            payload = frame[len("data: "):-2]
+            if payload == "[DONE]":
+                completed = True
+                self._running = None  # too late to cancel
+                await self._send_event("done", turn_id)
+                continue
+            # The chunk is already JSON: embed it rather than decoding it again.
+            await self._send(f'{{"type": "chunk", "turn_id": {turn_json}, "data": {payload}}}')
+        return completed
+
+    async def _send_event(self, event_type: str, turn_id: Optional[str], **fields) -> None:
+        await self._send(json.dumps({"type": event_type, "turn_id": turn_id, **fields}))
+
+    async def _send(self, text: str) -> None:
+        async with self._send_lock:
+            try:
+                await self.websocket.send_text(text)
+            except (WebSocketDisconnect, RuntimeError):
+                # The client is gone; serve() cleans up once its receive loop notices.
+                pass
@@ -1,5 +1,5 @@
 -- SQL script to create the initial database schema for the chat application.
--- This script is designed for PostgreSQL and is idempotent (re-runnable).
+-- This script is designed for PostgreSQL (13+) and is idempotent (re-runnable).
 
 -- Create the users table if it does not exist
 CREATE TABLE IF NOT EXISTS users (
@@ -32,6 +32,76 @@ CREATE TABLE IF NOT EXISTS messages (
 -- Create an index on messages.conversation_id if it does not exist
 CREATE INDEX IF NOT EXISTS ix_messages_conversation_id ON messages (conversation_id);
 
+-- Add the optional compression of message bodies if it does not exist
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS content_encoding VARCHAR(16);
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS content_compressed BYTEA;
+
+-- Add the full-text search vector of messages if it does not exist. It is written
+-- by the application, which has the plain text of compressed bodies; messages
+-- stored before it existed are indexed once here, their first 100000 characters
+-- as the application does (a tsvector cannot exceed 1 MB).
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS content_tsv TSVECTOR;
+UPDATE messages SET content_tsv = to_tsvector('english', left(content, 100000))
+    WHERE content_tsv IS NULL AND content_encoding IS NULL;
+
+-- Create a GIN index on messages.content_tsv if it does not exist
+CREATE INDEX IF NOT EXISTS ix_messages_content_tsv ON messages USING GIN (content_tsv);
+
+-- Add the status of messages if it does not exist: assistant answers are
+-- checkpointed while they stream (a constant default does not rewrite the table)
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS status VARCHAR(16) NOT NULL DEFAULT 'complete';
+
+-- Create a partial index on the messages still streaming if it does not exist
+CREATE INDEX IF NOT EXISTS ix_messages_streaming ON messages (created_at) WHERE status = 'streaming';
+
+-- Create the archived_conversations table if it does not exist
+CREATE TABLE IF NOT EXISTS archived_conversations (
+    conversation_id INTEGER PRIMARY KEY,
+    message_count INTEGER NOT NULL,
+    last_message_at TIMESTAMPTZ NOT NULL,
+    messages BYTEA NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Create the message_idempotency_keys table if it does not exist
+CREATE TABLE IF NOT EXISTS message_idempotency_keys (
+    conversation_id INTEGER NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    user_message_id INTEGER,
+    assistant_message_id INTEGER,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (conversation_id, idempotency_key)
+);
+
+-- Create the batch_jobs table if it does not exist
+CREATE TABLE IF NOT EXISTS batch_jobs (
+    id SERIAL PRIMARY KEY,
+    total INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Create the batch_items table if it does not exist
+CREATE TABLE IF NOT EXISTS batch_items (
+    id SERIAL PRIMARY KEY,
+    job_id INTEGER NOT NULL,
+    item_index INTEGER NOT NULL,
+    custom_id VARCHAR(255),
+    model VARCHAR(255) NOT NULL,
+    prompt TEXT NOT NULL,
+    status VARCHAR(32) NOT NULL DEFAULT 'pending',
+    response TEXT,
+    error TEXT,
+    completed_at TIMESTAMPTZ,
+    CONSTRAINT uq_batch_items_job_id_item_index UNIQUE (job_id, item_index)
+);
+
+-- Create an index on batch_items.job_id if it does not exist
+CREATE INDEX IF NOT EXISTS ix_batch_items_job_id ON batch_items (job_id);
+
+-- Add the claim time of batch items if it does not exist: a run marks the items
+-- it takes as 'running', so that concurrent resumes of a job do not run them twice
+ALTER TABLE batch_items ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ;
+
 -- Optional: Add comments to describe the tables and columns
 COMMENT ON TABLE users IS 'Stores user information.';
 COMMENT ON COLUMN users.username IS 'Unique username for each user.';
@@ -43,3 +113,20 @@ COMMENT ON COLUMN conversations.user_id IS 'The ID of the user who owns this con
 COMMENT ON TABLE messages IS 'Stores individual messages within a conversation.';
 COMMENT ON COLUMN messages.conversation_id IS 'The ID of the conversation this message belongs to (soft reference).';
 COMMENT ON COLUMN messages.role IS 'The role of the message sender, e.g., ''user'' or ''assistant''.';
+COMMENT ON COLUMN messages.content IS 'The message body; empty when it is stored compressed.';
+COMMENT ON COLUMN messages.content_encoding IS 'NULL for a plain body in content, ''zstd'' for a body in content_compressed.';
+COMMENT ON COLUMN messages.content_tsv IS 'English tsvector of the (uncompressed) body, used by message search; NULL while an answer streams.';
+COMMENT ON COLUMN messages.status IS '''streaming'' while an answer is generated and checkpointed, then ''complete'', or ''partial'' if it was cut short.';
+
+COMMENT ON TABLE archived_conversations IS 'Cold storage of the messages of inactive conversations, restored when a conversation is reopened.';
+COMMENT ON COLUMN archived_conversations.messages IS 'zstd-compressed JSON array of the archived message rows.';
+
+COMMENT ON TABLE message_idempotency_keys IS 'Client-supplied idempotency keys of chat turns; a retried turn replays its stored answer instead of generating again.';
+COMMENT ON COLUMN message_idempotency_keys.assistant_message_id IS 'The (possibly partial) answer of the turn; NULL while it is being generated.';
+
+COMMENT ON TABLE batch_jobs IS 'Stores batch completion jobs submitted through /api/v1/batch.';
+
+COMMENT ON TABLE batch_items IS 'Stores the prompts of a batch job and their results.';
+COMMENT ON COLUMN batch_items.job_id IS 'The ID of the batch job this item belongs to (soft reference).';
+COMMENT ON COLUMN batch_items.status IS 'pending, running, completed or failed; pending items (and running ones claimed too long ago) are run again when the job is resumed.';
+COMMENT ON COLUMN batch_items.claimed_at IS 'When the run currently executing the item claimed it; NULL unless running.';
@@ -0,0 +1,71 @@
+-- SQL script converting the messages table to a table range-partitioned by
+-- month on created_at (PostgreSQL 13+). Run it after init_schema.sql, during a
+-- maintenance window: rows are copied into the new table in one transaction.
+-- It does nothing if messages is already partitioned (re-runnable).
+--
+-- Partitions are named messages_yYYYYmMM. This script creates them for every
+-- month holding data plus the next two; the application creates the following
+-- ones ahead of time (message-storage.partition-months-ahead). Rows outside
+-- every partition go to messages_default.
+
+DO $$
+DECLARE
+    month_start TIMESTAMPTZ;
+    last_month TIMESTAMPTZ;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'messages'::regclass) THEN
+        RAISE NOTICE 'messages is already partitioned';
+        RETURN;
+    END IF;
+
+    ALTER TABLE messages RENAME TO messages_unpartitioned;
+    ALTER INDEX IF EXISTS messages_pkey RENAME TO messages_unpartitioned_pkey;
+    ALTER INDEX IF EXISTS ix_messages_conversation_id RENAME TO ix_messages_unpartitioned_conversation_id;
+    ALTER INDEX IF EXISTS ix_messages_content_tsv RENAME TO ix_messages_unpartitioned_content_tsv;
+    ALTER INDEX IF EXISTS ix_messages_streaming RENAME TO ix_messages_unpartitioned_streaming;
+    -- Keep the id sequence when the old table is dropped
+    ALTER SEQUENCE messages_id_seq OWNED BY NONE;
+
+    -- The partition key has to be part of the primary key
+    CREATE TABLE messages (
+        id INTEGER NOT NULL DEFAULT nextval('messages_id_seq'),
+        conversation_id INTEGER NOT NULL,
+        role VARCHAR(255) NOT NULL,
+        content TEXT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        content_encoding VARCHAR(16),
+        content_compressed BYTEA,
+        content_tsv TSVECTOR,
+        status VARCHAR(16) NOT NULL DEFAULT 'complete',
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    ALTER SEQUENCE messages_id_seq OWNED BY messages.id;
+
+    -- History is read per conversation, newest first: index both columns
+    CREATE INDEX ix_messages_conversation_id ON messages (conversation_id, created_at);
+    CREATE INDEX ix_messages_content_tsv ON messages USING GIN (content_tsv);
+    CREATE INDEX ix_messages_streaming ON messages (created_at) WHERE status = 'streaming';
+
+    CREATE TABLE messages_default PARTITION OF messages DEFAULT;
+
+    SELECT date_trunc('month', COALESCE(MIN(created_at), NOW()), 'UTC') INTO month_start FROM messages_unpartitioned;
+    last_month := date_trunc('month', NOW(), 'UTC') + INTERVAL '2 months';
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+            'messages_' || to_char(month_start AT TIME ZONE 'UTC', '"y"YYYY"m"MM'),
+            month_start,
+            month_start + INTERVAL '1 month'
+        );
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+
+    INSERT INTO messages (id, conversation_id, role, content, created_at, content_encoding, content_compressed, content_tsv, status)
+    SELECT id, conversation_id, role, content, COALESCE(created_at, NOW()), content_encoding, content_compressed, content_tsv, status
+    FROM messages_unpartitioned;
+
+    DROP TABLE messages_unpartitioned;
+END
+$$;
+
+COMMENT ON TABLE messages IS 'Stores individual messages within a conversation, partitioned by month on created_at.';
@@ -0,0 +1,53 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.configs.fast_json import FastJSONResponse, as_schema_dicts, dumps, sse_frame
+from src.schemas.conversation import ConversationSchema, ConversationWithMessagesSchema
+from src.schemas.message import MessageSchema
+
+CREATED_AT = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def message_row(i: int) -> dict:
+    # As decode_row returns them: extra columns next to the schema fields.
+    return {
+        "id": i, "conversation_id": 7, "role": "user" if i % 2 == 0 else "assistant",
+        "content": f"message {i} — naïve «quotes» \"escaped\"\n", "created_at": CREATED_AT,
+        "status": "complete", "idempotency_key": None,
+    }
+
+
+def test_rows_render_like_the_validated_response_model():
+    conversation = {"id": 7, "user_id": 3, "name": None, "created_at": CREATED_AT, "archived_at": None}
+    messages = [message_row(i) for i in range(20)]
+
+    (payload,) = as_schema_dicts([conversation], ConversationSchema)
+    payload["messages"] = as_schema_dicts(messages, MessageSchema)
+
+    expected = ConversationWithMessagesSchema(**conversation, messages=messages).model_dump_json()
+    assert dumps(payload) == expected.encode()
+    assert FastJSONResponse(payload).body == expected.encode()
+
+
+def test_missing_optional_fields_get_their_defaults():
+    row = {key: value for key, value in message_row(1).items() if key != "status"}
+
+    (message,) = as_schema_dicts([row], MessageSchema)
+
+    assert message["status"] == "complete"
+    assert json.loads(dumps(message)) == json.loads(MessageSchema(**row).model_dump_json())
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_sse_frames_carry_the_same_payload_either_way(monkeypatch, enabled):
+    monkeypatch.setitem(yaml_configs, "fast-json", {"enabled": enabled})
+    chunk = {"id": "chatcmpl-1", "choices": [{"index": 0, "delta": {"content": "héllo \"x\""}, "finish_reason": None}]}
+
+    frame = sse_frame(chunk)
+
+    assert frame.startswith("data: ") and frame.endswith("\n\n")
+    assert json.loads(frame[len("data: "):-2]) == chunk
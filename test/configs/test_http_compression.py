@@ -0,0 +1,87 @@
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+
+import src.configs.config
+from src.configs.http_compression import CompressionMiddleware, choose_encoding
+
+SETTINGS = {"enabled": True, "min-bytes": 100, "gzip-level": 5, "brotli-quality": 4}
+
+
+def sse_app(frames):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8")]})
+        for frame in frames:
+            await send({"type": "http.response.body", "body": frame.encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+    return app
+
+
+def json_app(payload):
+    body = json.dumps(payload).encode()
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+def call(app, accept_encoding="gzip"):
+    """Runs one request through the middleware; returns the response start and its body messages."""
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(CompressionMiddleware(app, SETTINGS)(scope, None, send))
+    return dict(sent[0]["headers"]), [m["body"] for m in sent[1:]]
+
+
+def test_each_sse_chunk_is_flushed_and_decodable_on_arrival():
+    frames = [f'data: {{"object": "chat.completion.chunk", "choices": [{{"delta": {{"content": "w{i}"}}}}]}}\n\n'
+              for i in range(50)]
+
+    headers, bodies = call(sse_app(frames))
+
+    assert headers[b"content-encoding"] == b"gzip" and headers[b"vary"] == b"Accept-Encoding"
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Every chunk decodes to its frame as soon as it is received, without waiting for the next.
+    assert [decoder.decompress(body).decode() for body in bodies[:-1]] == frames
+    assert sum(map(len, bodies)) < sum(map(len, frames)) / 3
+
+
+def test_json_responses_are_compressed_whole_and_small_ones_passed_through():
+    messages = {"messages": [{"id": i, "role": "user", "content": "hello there"} for i in range(100)]}
+
+    headers, bodies = call(json_app(messages))
+    assert b"content-length" not in headers
+    assert json.loads(gzip.decompress(b"".join(bodies))) == messages
+
+    headers, bodies = call(json_app({"id": 1}))
+    assert b"content-encoding" not in headers and bodies == [b'{"id": 1}']
+
+
+def test_clients_without_a_supported_encoding_get_the_original_body():
+    frames = ["data: one\n\n", "data: two\n\n"]
+
+    headers, bodies = call(sse_app(frames), accept_encoding="identity, gzip;q=0")
+
+    assert b"content-encoding" not in headers
+    assert bodies == [b"data: one\n\n", b"data: two\n\n", b""]
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate", "gzip"),
+    ("*", "gzip"),
+    ("deflate", None),
+    ("gzip;q=0", None),
+    ("", None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
@@ -0,0 +1,36 @@
+import io
+
+from loguru import logger
+
+from src.configs import log_config
+from src.configs.log_config import BackgroundLogWriter, make_level_filter, should_log_chunk
+
+
+def make_record(level: str, route=None, name="src.services.chat_service"):
+    return {"name": name, "message": "x", "level": logger.level(level), "extra": {"route": route} if route else {}}
+
+
+def test_route_level_overrides_base_level():
+    level_filter = make_level_filter("DEBUG", {"/api/v1": "WARNING", "/api/v1/chat": "INFO"})
+
+    assert level_filter(make_record("DEBUG"))
+    assert not level_filter(make_record("INFO", route="/api/v1/users/bob"))
+    # The longest matching prefix wins.
+    assert level_filter(make_record("INFO", route="/api/v1/chat"))
+    assert not level_filter(make_record("DEBUG", route="/api/v1/chat"))
+
+
+def test_chunk_log_sampling(monkeypatch):
+    monkeypatch.setattr(log_config, "_chunk_log_every", 50)
+    assert [i for i in range(200) if should_log_chunk(i)] == [0, 50, 100, 150]
+
+
+def test_background_writer_flushes_in_order():
+    stream = io.StringIO()
+    writer = BackgroundLogWriter(stream.write)
+    for i in range(100):
+        writer(f"{i}\n")
+
+    assert writer.flush(timeout=2)
+    assert stream.getvalue().splitlines() == [str(i) for i in range(100)]
+    writer.stop()
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+import src.configs.config
+from src.configs import runtime
+from src.configs.config import yaml_configs
+from src.configs.runtime import get_server_settings, prepare_multiprocess_metrics, uvicorn_options
+
+
+def test_environment_overrides_the_server_config(monkeypatch):
+    monkeypatch.setitem(yaml_configs, "server", {"workers": 2, "keep-alive": 620, "backlog": 4096})
+    monkeypatch.setenv("WEB_CONCURRENCY", "6")
+    monkeypatch.setenv("PORT", "8080")
+    monkeypatch.delenv("SERVER_BACKLOG", raising=False)
+
+    settings = get_server_settings()
+    options = uvicorn_options(settings, graceful_timeout=20)
+
+    assert (settings["workers"], settings["port"], settings["keep-alive"], settings["backlog"]) == (6, 8080, 620, 4096)
+    assert options["loop"] == "uvloop" and options["http"] == "httptools"
+    assert options["timeout_keep_alive"] == 620
+    # 0 means no limit for uvicorn's None
+    assert options["limit_concurrency"] is None and options["limit_max_requests"] is None
+
+
+def test_zero_workers_runs_one_per_available_cpu(monkeypatch):
+    monkeypatch.setitem(yaml_configs, "server", {"workers": 0})
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setattr(runtime, "available_cpus", lambda: 3)
+
+    assert get_server_settings()["workers"] == 3
+
+
+def test_multiprocess_metrics_start_from_a_clean_directory(monkeypatch, tmp_path):
+    stale = tmp_path / "counter_123.db"
+    stale.write_bytes(b"old")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    assert prepare_multiprocess_metrics(workers=1) is None
+    assert stale.exists()
+    assert prepare_multiprocess_metrics(workers=4) == str(tmp_path)
+    assert not stale.exists()
+
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR")
+    directory = prepare_multiprocess_metrics(workers=4)
+    assert os.path.isdir(directory) and os.environ["PROMETHEUS_MULTIPROC_DIR"] == directory
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def test_numbers_are_parsed_tolerantly_or_rejected_clearly(monkeypatch):
+    monkeypatch.setitem(yaml_configs, "server", {"workers": "2.0"})
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setenv("SERVER_KEEP_ALIVE", "5.5")
+
+    settings = get_server_settings()
+    assert (settings["workers"], settings["keep-alive"]) == (2, 5.5)
+
+    monkeypatch.setenv("SERVER_BACKLOG", "lots")
+    with pytest.raises(ValueError, match="SERVER_BACKLOG"):
+        get_server_settings()
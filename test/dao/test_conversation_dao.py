@@ -7,7 +7,8 @@ from src.configs.db import DATABASE_URL
 from src.models.tables import metadata
 from src.schemas.user import UserCreateSchema
 from src.schemas.conversation import ConversationCreateSchema
-from src.dao import user_dao, conversation_dao
+from src.schemas.message import STATUS_STREAMING, MessageCreateSchema
+from src.dao import user_dao, conversation_dao, message_dao
 
 @pytest.fixture(scope="function")
 async def managed_db_session():
@@ -76,3 +77,31 @@ async def test_get_conversations_for_user_with_no_conversations(managed_db_sessi
     # 3. Assertions
     assert conversations is not None
     assert len(conversations) == 0
+
+@pytest.mark.asyncio
+async def test_versions_change_with_new_messages_and_conversations(managed_db_session: AsyncSession):
+    """
+    Test the version queries behind the conversation and conversation list ETags.
+    """
+    created_user = await user_dao.create_user(managed_db_session, user=UserCreateSchema(username="version_user"))
+    user_id = created_user["id"]
+    assert await conversation_dao.get_conversation_version(managed_db_session, 12345) is None
+    assert (await conversation_dao.get_user_conversations_version(managed_db_session, user_id))["count"] == 0
+
+    conv = await conversation_dao.create_conversation(
+        managed_db_session, conv=ConversationCreateSchema(user_id=user_id, name="Versions")
+    )
+    empty = await conversation_dao.get_conversation_version(managed_db_session, conv["id"])
+    assert empty == {"name": "Versions", "last_message_id": None, "streaming": False}
+
+    message = await message_dao.create_message(
+        managed_db_session, MessageCreateSchema(conversation_id=conv["id"], role="assistant", content="..."),
+        status=STATUS_STREAMING,
+    )
+    streaming = await conversation_dao.get_conversation_version(managed_db_session, conv["id"])
+    assert streaming["last_message_id"] == message["id"] and streaming["streaming"] is True
+
+    list_version = await conversation_dao.get_user_conversations_version(managed_db_session, user_id)
+    await conversation_dao.create_conversation(managed_db_session, conv=ConversationCreateSchema(user_id=user_id))
+    new_list_version = await conversation_dao.get_user_conversations_version(managed_db_session, user_id)
+    assert new_list_version["count"] == 2 and new_list_version != list_version
@@ -0,0 +1,60 @@
+import secrets
+
+import pytest
+
+import src.configs.config
+from src.dao.message_codec import SEARCH_MAX_CHARS, ZSTD, decode_row, encode_content
+
+SETTINGS = {"enabled": True, "min-bytes": 1024, "level": 3}
+
+
+def test_large_bodies_are_compressed_and_decoded_back():
+    body = "Use a connection pool per worker. " * 200
+
+    values = encode_content(body, SETTINGS)
+
+    assert values["content"] == "" and values["content_encoding"] == ZSTD
+    assert len(values["content_compressed"]) < len(body) / 5
+    # The search vector is still built from the plain text.
+    assert values["content_tsv"].name == "to_tsvector"
+    assert values["content_tsv"].clauses.clauses[1].value == body
+
+    row = {"id": 1, "content": values["content"], "content_encoding": ZSTD,
+           "content_compressed": values["content_compressed"]}
+    assert decode_row(row) == {"id": 1, "content": body}
+
+
+@pytest.mark.parametrize("body, settings", [
+    ("short message", SETTINGS),
+    ("x" * 4096, {**SETTINGS, "enabled": False}),
+    (secrets.token_urlsafe(32), {**SETTINGS, "min-bytes": 16}),  # the zstd frame would not save enough
+], ids=["short", "disabled", "incompressible"])
+def test_small_disabled_or_incompressible_bodies_stay_plain(body, settings):
+    values = encode_content(body, settings)
+
+    assert values["content"] == body
+    assert values["content_encoding"] is None and values["content_compressed"] is None
+
+
+def test_only_the_start_of_oversized_bodies_is_indexed():
+    # Distinct words, so that all of them would become lexemes of the vector.
+    body = " ".join(f"word{i}" for i in range(SEARCH_MAX_CHARS // 4))
+
+    values = encode_content(body, {**SETTINGS, "enabled": False})
+
+    assert values["content"] == body
+    assert values["content_tsv"].clauses.clauses[1].value == body[:SEARCH_MAX_CHARS]
+
+
+def test_compressed_bodies_index_the_same_bounded_prefix():
+    body = "Use a connection pool per worker. " * (SEARCH_MAX_CHARS // 16)
+
+    values = encode_content(body, SETTINGS)
+
+    assert values["content_encoding"] == ZSTD
+    assert values["content_tsv"].clauses.clauses[1].value == body[:SEARCH_MAX_CHARS]
+
+
+def test_unknown_encodings_are_rejected():
+    with pytest.raises(ValueError):
+        decode_row({"id": 5, "content": "", "content_encoding": "lz4", "content_compressed": b"?"})
@@ -71,3 +71,163 @@ async def test_get_messages_for_empty_conversation(managed_db_session: AsyncSess
     # 3. Assertions
     assert messages is not None
     assert len(messages) == 0
+
+@pytest.mark.asyncio
+async def test_search_messages_ranks_highlights_and_scopes_to_the_user(managed_db_session: AsyncSession):
+    """
+    Test full-text search over a user's messages.
+    """
+    # 1. Two users, each with a conversation
+    alice = await user_dao.create_user(managed_db_session, user=UserCreateSchema(username="search_alice"))
+    bob = await user_dao.create_user(managed_db_session, user=UserCreateSchema(username="search_bob"))
+    alice_conv = await conversation_dao.create_conversation(
+        managed_db_session, conv=ConversationCreateSchema(user_id=alice["id"], name="Databases")
+    )
+    bob_conv = await conversation_dao.create_conversation(managed_db_session, conv=ConversationCreateSchema(user_id=bob["id"]))
+
+    contents = [
+        (alice_conv["id"], "How do I size a connection pool for Postgres & pgbouncer?"),
+        (alice_conv["id"], "A connection pool keeps connections open; size the connection pool per worker."),
+        (alice_conv["id"], "Unrelated question about cooking pasta."),
+        (bob_conv["id"], "Bob also asks about the connection pool."),
+    ]
+    created = [
+        await message_dao.create_message(
+            managed_db_session, message=MessageCreateSchema(conversation_id=conv_id, role="user", content=content)
+        )
+        for conv_id, content in contents
+    ]
+
+    # 2. Search alice's messages
+    hits = await message_dao.search_messages(managed_db_session, user_id=alice["id"], text="connection pools")
+
+    # 3. Only alice's matching messages, the denser match first, highlighted and escaped
+    assert len(hits) == 2
+    assert all(hit["conversation_id"] == alice_conv["id"] for hit in hits)
+    assert [hit["id"] for hit in hits] == [created[1]["id"], created[0]["id"]]
+    assert hits[0]["rank"] > hits[1]["rank"]
+    assert "<mark>connection</mark> <mark>pool</mark>" in hits[1]["snippet"]
+    assert "&amp; pgbouncer" in hits[1]["snippet"]
+    assert hits[0]["conversation_name"] == "Databases"
+    assert "content_tsv" not in (await message_dao.get_messages_by_conversation(managed_db_session, alice_conv["id"]))[0]
+
+    # 4. Pagination returns one extra row when there is a next page
+    first_page = await message_dao.search_messages(managed_db_session, user_id=alice["id"], text="pool", limit=1)
+    second_page = await message_dao.search_messages(managed_db_session, user_id=alice["id"], text="pool", skip=1, limit=1)
+    assert len(first_page) == 2 and len(second_page) == 1
+    assert first_page[1]["id"] == second_page[0]["id"]
+    assert await message_dao.search_messages(managed_db_session, user_id=alice["id"], text="\"pool pasta\"") == []
+
+def test_search_endpoint_reports_next_page_and_validates_the_query(monkeypatch):
+    """
+    Test the search endpoint on top of a stubbed DAO (no database needed).
+    """
+    from datetime import datetime, timezone
+    from fastapi.testclient import TestClient
+    from server import app
+    from src.configs.db import get_db_session
+
+    async def search_messages(db, user_id, text, skip=0, limit=20):
+        return [
+            {"id": i, "conversation_id": 1, "conversation_name": None, "role": "user",
+             "created_at": datetime.now(timezone.utc), "rank": 1.0 / (i + 1), "snippet": f"<mark>{text}</mark>"}
+            for i in range(skip, skip + limit + 1)
+        ]
+
+    monkeypatch.setattr(message_dao, "search_messages", search_messages)
+    app.dependency_overrides[get_db_session] = lambda: None
+    try:
+        client = TestClient(app)
+        body = client.get("/api/v1/users/7/messages/search", params={"q": "pool", "skip": 2, "limit": 3}).json()
+        assert body["has_more"] is True
+        assert [hit["id"] for hit in body["hits"]] == [2, 3, 4]
+        assert body["hits"][0]["snippet"] == "<mark>pool</mark>"
+
+        assert client.get("/api/v1/users/7/messages/search", params={"q": ""}).status_code == 422
+        assert client.get("/api/v1/users/7/messages/search", params={"q": "x", "limit": 500}).status_code == 422
+    finally:
+        app.dependency_overrides.clear()
+
+@pytest.mark.asyncio
+async def test_compressed_messages_read_back_and_stay_searchable(managed_db_session: AsyncSession, monkeypatch):
+    """
+    Test that large bodies stored compressed are transparent to readers and search.
+    """
+    from src.configs.config import yaml_configs
+
+    monkeypatch.setitem(yaml_configs, "message-compression", {"enabled": True, "min-bytes": 1024, "level": 3})
+    user = await user_dao.create_user(managed_db_session, user=UserCreateSchema(username="compressed_user"))
+    conv = await conversation_dao.create_conversation(managed_db_session, conv=ConversationCreateSchema(user_id=user["id"]))
+    long_answer = "Size the connection pool per worker process. " * 100
+
+    created = await message_dao.create_message(
+        managed_db_session, message=MessageCreateSchema(conversation_id=conv["id"], role="assistant", content=long_answer)
+    )
+    await message_dao.create_message(
+        managed_db_session, message=MessageCreateSchema(conversation_id=conv["id"], role="user", content="Thanks!")
+    )
+
+    assert created["content"] == long_answer and "content_compressed" not in created
+    messages = await message_dao.get_messages_by_conversation(managed_db_session, conversation_id=conv["id"])
+    assert [m["content"] for m in messages] == [long_answer, "Thanks!"]
+
+    hits = await message_dao.search_messages(managed_db_session, user_id=user["id"], text="connection pool")
+    assert [hit["id"] for hit in hits] == [created["id"]]
+    assert "<mark>connection</mark> <mark>pool</mark>" in hits[0]["snippet"]
+
+@pytest.mark.asyncio
+async def test_idempotency_key_is_claimed_once_and_links_the_answer(managed_db_session: AsyncSession):
+    """
+    Test that a turn's idempotency key stores its user message once and points to its first answer.
+    """
+    user = await user_dao.create_user(managed_db_session, user=UserCreateSchema(username="idempotent_user"))
+    conv = await conversation_dao.create_conversation(managed_db_session, conv=ConversationCreateSchema(user_id=user["id"]))
+    question = MessageCreateSchema(conversation_id=conv["id"], role="user", content="Hello")
+
+    created = await message_dao.create_message_once(managed_db_session, question, "turn-1")
+    assert await message_dao.create_message_once(managed_db_session, question, "turn-1") is None
+    turn = await message_dao.get_idempotent_turn(managed_db_session, conv["id"], "turn-1")
+    assert turn["user_message_id"] == created["id"] and turn["answer"] is None
+    assert not await message_dao.take_over_idempotent_turn(managed_db_session, conv["id"], "turn-1", stale_seconds=60)
+
+    for content in ("Hi!", "Hi again!"):
+        await message_dao.create_message(
+            managed_db_session,
+            message=MessageCreateSchema(conversation_id=conv["id"], role="assistant", content=content),
+            idempotency_key="turn-1",
+        )
+
+    turn = await message_dao.get_idempotent_turn(managed_db_session, conv["id"], "turn-1")
+    assert turn["answer"]["content"] == "Hi!"
+    assert await message_dao.get_idempotent_turn(managed_db_session, conv["id"], "turn-2") is None
+    messages = await message_dao.get_messages_by_conversation(managed_db_session, conversation_id=conv["id"])
+    assert [m["role"] for m in messages] == ["user", "assistant", "assistant"]
+
+@pytest.mark.asyncio
+async def test_streaming_checkpoint_is_updated_then_completed(managed_db_session: AsyncSession):
+    """
+    Test that an answer inserted while streaming is rewritten in place, and that abandoned ones get marked partial.
+    """
+    user = await user_dao.create_user(managed_db_session, user=UserCreateSchema(username="checkpoint_user"))
+    conv = await conversation_dao.create_conversation(managed_db_session, conv=ConversationCreateSchema(user_id=user["id"]))
+    answer = MessageCreateSchema(conversation_id=conv["id"], role="assistant", content="The answer so")
+
+    created = await message_dao.create_message(managed_db_session, answer, status="streaming")
+    assert created["status"] == "streaming"
+    assert await message_dao.mark_interrupted_messages(managed_db_session, older_than_seconds=3600) == 0
+    assert await message_dao.append_message_content(managed_db_session, created["id"], created["created_at"], " far")
+    messages = await message_dao.get_messages_by_conversation(managed_db_session, conversation_id=conv["id"])
+    assert messages[0]["content"] == "The answer so far"
+
+    await message_dao.update_message_content(
+        managed_db_session, created["id"], created["created_at"], "The answer so far, complete.", "complete"
+    )
+    messages = await message_dao.get_messages_by_conversation(managed_db_session, conversation_id=conv["id"])
+    assert [(m["content"], m["status"]) for m in messages] == [("The answer so far, complete.", "complete")]
+    # A completed answer is no longer appended to.
+    assert not await message_dao.append_message_content(managed_db_session, created["id"], created["created_at"], "!")
+
+    await message_dao.create_message(managed_db_session, answer, status="streaming")
+    assert await message_dao.mark_interrupted_messages(managed_db_session, older_than_seconds=0) == 1
+    messages = await message_dao.get_messages_by_conversation(managed_db_session, conversation_id=conv["id"])
+    assert [m["status"] for m in messages] == ["complete", "partial"]
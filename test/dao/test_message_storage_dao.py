@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+# Ensure config is loaded before other imports
+import src.configs.config
+from src.configs.db import DATABASE_URL
+from src.models.tables import conversations_table, messages_table, metadata
+from src.schemas.user import UserCreateSchema
+from src.dao import user_dao, message_dao, message_storage_dao
+
+@pytest.fixture(scope="function")
+async def managed_db_session():
+    """
+    A fixture that provides a clean database and a session for each test.
+    """
+    engine = create_async_engine(DATABASE_URL)
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.drop_all)
+        await conn.run_sync(metadata.create_all)
+
+    async with AsyncSession(engine) as session:
+        yield session
+
+    await engine.dispose()
+
+async def create_old_conversation(db: AsyncSession, user_id: int, days_ago: int, contents: list) -> int:
+    """Creates a conversation whose messages were written `days_ago` days ago."""
+    started = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    result = await db.execute(
+        insert(conversations_table).values(user_id=user_id, created_at=started).returning(conversations_table.c.id)
+    )
+    conversation_id = result.scalar()
+    await db.execute(insert(messages_table), [
+        {"conversation_id": conversation_id, "role": role, "content": content,
+         "created_at": started + timedelta(minutes=i)}
+        for i, (role, content) in enumerate(contents)
+    ])
+    await db.commit()
+    return conversation_id
+
+@pytest.mark.asyncio
+async def test_archive_and_rehydrate_inactive_conversation(managed_db_session: AsyncSession):
+    """
+    Test moving an inactive conversation to cold storage and back.
+    """
+    # 1. An inactive and an active conversation
+    user = await user_dao.create_user(managed_db_session, user=UserCreateSchema(username="archive_user"))
+    contents = [("user", "Remember the number 42."), ("assistant", "I will remember 42.")]
+    inactive_id = await create_old_conversation(managed_db_session, user["id"], 120, contents)
+    active_id = await create_old_conversation(managed_db_session, user["id"], 2, contents)
+    before = await message_dao.get_messages_by_conversation(managed_db_session, inactive_id)
+
+    # 2. Only the inactive one is archived
+    assert await message_storage_dao.find_inactive_conversations(managed_db_session, 90, 10) == [inactive_id]
+    assert await message_storage_dao.archive_conversation(managed_db_session, inactive_id, 90) == 2
+    assert await message_storage_dao.archive_conversation(managed_db_session, active_id, 90) == 0
+    assert await message_dao.get_messages_by_conversation(managed_db_session, inactive_id) == []
+    assert len(await message_dao.get_messages_by_conversation(managed_db_session, active_id)) == 2
+
+    # 3. Rehydration restores the same rows, once
+    assert await message_storage_dao.rehydrate_conversation(managed_db_session, inactive_id) == 2
+    assert await message_dao.get_messages_by_conversation(managed_db_session, inactive_id) == before
+    assert await message_storage_dao.rehydrate_conversation(managed_db_session, inactive_id) == 0
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.dao import user_dao
+from src.dao.user_cache import UserCache, get_user_cache
+
+
+def user(user_id: int, username: str) -> dict:
+    return {"id": user_id, "username": username, "email": None, "created_at": None}
+
+
+def test_users_are_found_by_id_and_username():
+    cache = UserCache()
+    cache.put(user(1, "alice"))
+
+    assert cache.get_by_id(1) == cache.get_by_username("alice") == user(1, "alice")
+    assert cache.get_by_id(2) is None and cache.get_by_username("bob") is None
+
+    cache.invalidate(username="alice")
+    assert cache.get_by_id(1) is None and len(cache) == 0
+
+
+def test_least_recently_used_users_are_dropped_first():
+    cache = UserCache(max_entries=2)
+    cache.put(user(1, "alice"))
+    cache.put(user(2, "bob"))
+    cache.get_by_username("alice")
+
+    cache.put(user(3, "carol"))
+
+    assert cache.get_by_username("bob") is None
+    assert [u and u["id"] for u in map(cache.get_by_id, (1, 2, 3))] == [1, None, 3]
+
+
+def test_expired_users_are_read_again():
+    cache = UserCache(ttl_seconds=-1)
+    cache.put(user(1, "alice"))
+
+    assert cache.get_by_username("alice") is None and len(cache) == 0
+
+
+def test_returned_records_cannot_change_the_cached_ones():
+    cache = UserCache()
+    cache.put(user(1, "alice"))
+
+    cache.get_by_id(1)["username"] = "mallory"
+
+    assert cache.get_by_id(1)["username"] == "alice"
+
+
+@pytest.mark.parametrize("enabled, queries", [(True, 1), (False, 3)])
+def test_cached_lookups_query_once(monkeypatch, enabled, queries):
+    monkeypatch.setitem(yaml_configs, "user-cache", {"enabled": enabled})
+    get_user_cache().clear()
+    calls = []
+
+    async def get_user_by_username(db, username):
+        calls.append(username)
+        return user(7, username) if username == "dave" else None
+
+    monkeypatch.setattr(user_dao, "get_user_by_username", get_user_by_username)
+
+    async def lookups():
+        return [await user_dao.get_cached_user_by_username(None, "dave") for _ in range(3)]
+
+    assert [u["id"] for u in asyncio.run(lookups())] == [7, 7, 7]
+    assert len(calls) == queries
+
+    # Unknown users are not cached: they may be created later.
+    asyncio.run(user_dao.get_cached_user_by_username(None, "nobody"))
+    asyncio.run(user_dao.get_cached_user_by_username(None, "nobody"))
+    assert calls.count("nobody") == 2
+    get_user_cache().clear()
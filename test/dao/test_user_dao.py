@@ -9,6 +9,7 @@ from src.configs.db import DATABASE_URL
 from src.models.tables import metadata
 from src.schemas.user import UserCreateSchema
 from src.dao import user_dao
+from src.dao.resource_versions import resource_versions
 
 @pytest.fixture(scope="function")
 async def managed_db_session():
@@ -75,3 +76,29 @@ async def test_create_duplicate_user_fails(managed_db_session: AsyncSession):
     # Attempt to create the same user again
     with pytest.raises(IntegrityError):
         await user_dao.create_user(managed_db_session, user=user_to_create)
+
+@pytest.mark.asyncio
+async def test_get_or_create_user_returns_the_existing_user(managed_db_session: AsyncSession):
+    """
+    Test that the upsert creates a user once, then returns it unchanged.
+    """
+    created_user, created = await user_dao.get_or_create_user(
+        managed_db_session, user=UserCreateSchema(username="upsertuser", email="upsert@example.com")
+    )
+    assert created is True
+    assert created_user["username"] == "upsertuser"
+
+    writes = resource_versions.writes
+    existing_user, created = await user_dao.get_or_create_user(
+        managed_db_session, user=UserCreateSchema(username="upsertuser", email="other@example.com")
+    )
+    assert created is False
+    assert existing_user == created_user
+    # Only read: the cached user and its ETag stay valid.
+    assert resource_versions.writes == writes
+
+    # A free username with a taken email still fails.
+    with pytest.raises(IntegrityError):
+        await user_dao.get_or_create_user(
+            managed_db_session, user=UserCreateSchema(username="upsertuser2", email="upsert@example.com")
+        )
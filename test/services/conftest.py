@@ -0,0 +1,83 @@
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import List
+
+import pytest
+
+import src.configs.config
+from src.dao import conversation_dao, message_dao
+from src.services import chat_service, history_prefetch, response_checkpoint
+
+
+@asynccontextmanager
+async def no_session():
+    yield None
+
+
+class FakeMessageStore:
+    """
+    Messages of all conversations, in memory, behind the message_dao functions
+    a chat turn uses. `delay` is the seconds each insert takes (a database
+    round trip); `loads` lists the conversations whose history was loaded.
+    """
+
+    def __init__(self):
+        self.messages: List[dict] = []
+        self.loads: List[int] = []
+        self.delay = 0.0
+        self._ids = itertools.count(1)
+
+    def of(self, conversation_id: int) -> List[dict]:
+        """The messages of a conversation, oldest first."""
+        return [m for m in self.messages if m["conversation_id"] == conversation_id]
+
+    async def create_message(self, db, message, idempotency_key=None, status="complete") -> dict:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        row = {"id": next(self._ids), "created_at": datetime.now(timezone.utc), "status": status,
+               **message.model_dump()}
+        self.messages.append(row)
+        return dict(row)
+
+    def get(self, message_id: int) -> dict:
+        return next(m for m in self.messages if m.get("id") == message_id)
+
+    async def update_message_content(self, db, message_id, created_at, content, status) -> None:
+        self.get(message_id).update(content=content, status=status)
+
+    async def append_message_content(self, db, message_id, created_at, delta) -> bool:
+        row = self.get(message_id)
+        if row["status"] != "streaming":
+            return False
+        row["content"] += delta
+        return True
+
+    async def get_conversation_version(self, db, conversation_id) -> dict:
+        messages = self.of(conversation_id)
+        return {
+            "name": None,
+            "last_message_id": messages[-1].get("id") if messages else None,
+            "streaming": any(m.get("status") == "streaming" for m in messages),
+        }
+
+    async def get_messages_by_conversation(self, db, conversation_id, limit=None) -> List[dict]:
+        self.loads.append(conversation_id)
+        newest_first = [dict(m) for m in reversed(self.of(conversation_id))]
+        return newest_first[:limit] if limit else newest_first
+
+
+@pytest.fixture
+def message_store(monkeypatch) -> FakeMessageStore:
+    """
+    An in-memory FakeMessageStore in place of the message DAO (and of the
+    conversation version it derives), and no database sessions.
+    """
+    store = FakeMessageStore()
+    for name in ("create_message", "update_message_content", "append_message_content", "get_messages_by_conversation"):
+        monkeypatch.setattr(message_dao, name, getattr(store, name))
+    monkeypatch.setattr(conversation_dao, "get_conversation_version", store.get_conversation_version)
+    for module in (chat_service, history_prefetch, response_checkpoint):
+        monkeypatch.setattr(module, "AsyncSessionFactory", no_session)
+    return store
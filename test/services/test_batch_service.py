@@ -0,0 +1,255 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, List, Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.configs.db import get_db_session
+from src.dao import batch_dao
+from src.llm.fake_chat_model import get_fake_llm
+from src.services import batch_service
+from src.services.llm_service import LLMService
+
+
+class EchoChatModel(BaseChatModel):
+    """Answers "echo: <prompt>" after `delay` seconds; prompts containing "boom" fail."""
+    delay: float = 0.01
+    running: int = 0
+    max_running: int = 0
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        prompt = messages[-1].content
+        if "boom" in prompt:
+            raise RuntimeError("model exploded")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"echo: {prompt}"))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo_fake"
+
+
+@pytest.fixture
+def batch_store(monkeypatch):
+    """Replaces the batch tables with in-memory lists."""
+    store = {"jobs": {}, "items": []}
+
+    async def create_job(db, prompts):
+        job = {"id": len(store["jobs"]) + 1, "total": len(prompts)}
+        store["jobs"][job["id"]] = job
+        for index, prompt in enumerate(prompts):
+            store["items"].append({
+                "id": len(store["items"]) + 1, "job_id": job["id"], "item_index": index,
+                "custom_id": prompt.custom_id, "model": prompt.model, "prompt": prompt.prompt,
+                "status": "pending", "response": None, "error": None,
+            })
+        return job
+
+    async def get_job(db, job_id):
+        job = store["jobs"].get(job_id)
+        if job is None:
+            return None
+        counts = {"pending": 0, "running": 0, "completed": 0, "failed": 0}
+        for item in store["items"]:
+            if item["job_id"] == job_id:
+                counts[item["status"]] += 1
+        return {**job, **counts}
+
+    async def get_items(db, job_id, statuses):
+        return [dict(i) for i in store["items"] if i["job_id"] == job_id and i["status"] in statuses]
+
+    async def get_item_models(db, job_id, statuses):
+        return sorted({i["model"] for i in store["items"]
+                       if i["job_id"] == job_id and i["status"] in [*statuses, "running"]})
+
+    async def claim_items(db, job_id, statuses, stale_seconds):
+        claimed = []
+        for item in store["items"]:
+            stale = item["status"] == "running" and time.monotonic() - item["claimed_at"] > stale_seconds
+            if item["job_id"] == job_id and (item["status"] in statuses or stale):
+                item.update(status="running", claimed_at=time.monotonic())
+                claimed.append(dict(item))
+        return claimed
+
+    async def release_items(db, item_ids):
+        for item_id in item_ids:
+            if store["items"][item_id - 1]["status"] == "running":
+                store["items"][item_id - 1].update(status="pending", claimed_at=None)
+
+    async def save_item_result(db, item_id, status, response=None, error=None):
+        store["items"][item_id - 1].update(status=status, response=response, error=error, claimed_at=None)
+
+    @asynccontextmanager
+    async def fake_session_factory():
+        yield None
+
+    monkeypatch.setattr(batch_dao, "create_job", create_job)
+    monkeypatch.setattr(batch_dao, "get_job", get_job)
+    monkeypatch.setattr(batch_dao, "get_items", get_items)
+    monkeypatch.setattr(batch_dao, "get_item_models", get_item_models)
+    monkeypatch.setattr(batch_dao, "claim_items", claim_items)
+    monkeypatch.setattr(batch_dao, "release_items", release_items)
+    monkeypatch.setattr(batch_dao, "save_item_result", save_item_result)
+    monkeypatch.setattr(batch_service, "AsyncSessionFactory", fake_session_factory)
+    return store
+
+
+def parse(lines) -> List[dict]:
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+@pytest.mark.asyncio
+async def test_stream_batch_runs_items_concurrently_under_the_limit(batch_store, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "batch", {"max-concurrency": 3})
+    from src.schemas.batch import BatchPrompt
+
+    job = await batch_dao.create_job(None, [BatchPrompt(prompt=f"p{i}", model="echo") for i in range(10)])
+    items = await batch_dao.get_items(None, job["id"], ["pending"])
+    llm = EchoChatModel()
+
+    lines = parse([line async for line in batch_service.stream_batch(job["id"], items, {"echo": LLMService(llm)})])
+
+    assert lines[0] == {"type": "job", "job_id": job["id"], "remaining": 10, "replayed": 0}
+    results = [line for line in lines if line["type"] == "result"]
+    assert sorted(r["content"] for r in results) == sorted(f"echo: p{i}" for i in range(10))
+    assert lines[-1] == {"type": "summary", "job_id": job["id"], "completed": 10, "failed": 0}
+    assert llm.max_running == 3
+    assert all(item["status"] == "completed" for item in batch_store["items"])
+
+
+@pytest.mark.asyncio
+async def test_failed_and_timed_out_items_are_reported_and_stored(batch_store, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "batch", {"item-timeout": 0.05})
+    from src.schemas.batch import BatchPrompt
+
+    prompts = [BatchPrompt(prompt="fine", model="echo"), BatchPrompt(prompt="boom", model="echo"),
+               BatchPrompt(prompt="slow", model="slow", custom_id="req-3")]
+    job = await batch_dao.create_job(None, prompts)
+    items = await batch_dao.get_items(None, job["id"], ["pending"])
+    services = {"echo": LLMService(EchoChatModel()), "slow": LLMService(EchoChatModel(delay=1))}
+
+    lines = parse([line async for line in batch_service.stream_batch(job["id"], items, services)])
+
+    by_index = {line["index"]: line for line in lines if line["type"] == "result"}
+    assert by_index[0]["status"] == "completed"
+    assert by_index[1]["status"] == "failed" and by_index[1]["error"] == "model exploded"
+    assert by_index[2]["status"] == "failed" and by_index[2]["custom_id"] == "req-3"
+    assert lines[-1]["failed"] == 2
+    assert [item["status"] for item in batch_store["items"]] == ["completed", "failed", "failed"]
+
+
+@pytest.fixture
+def client(batch_store, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "fake-llm", {"enabled": True, "first-token-delay": 0, "tokens-per-second": 0,
+                                                   "response-tokens": 4})
+    get_fake_llm.cache_clear()
+    from server import app
+
+    app.dependency_overrides[get_db_session] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    get_fake_llm.cache_clear()
+
+
+def test_batch_endpoint_streams_ndjson_and_records_the_job(client, batch_store):
+    prompts = [{"prompt": f"question {i}", "model": "fake", "custom_id": f"q{i}"} for i in range(5)]
+    response = client.post("/api/v1/batch", json={"prompts": prompts})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = parse(response.text.splitlines())
+    assert {line["custom_id"] for line in lines if line["type"] == "result"} == {f"q{i}" for i in range(5)}
+    assert lines[-1]["completed"] == 5
+
+    job = client.get(f"/api/v1/batch/{lines[0]['job_id']}").json()
+    assert job == {"id": 1, "total": 5, "pending": 0, "running": 0, "completed": 5, "failed": 0}
+
+
+def test_resume_runs_only_unfinished_items(client, batch_store):
+    client.post("/api/v1/batch", json={"prompts": [{"prompt": f"q{i}", "model": "fake"} for i in range(4)]})
+    # Simulate an interrupted job: two items never got a result, one failed.
+    batch_store["items"][1].update(status="pending", response=None)
+    batch_store["items"][2].update(status="pending", response=None)
+    batch_store["items"][3].update(status="failed", response=None, error="boom")
+
+    lines = parse(client.post("/api/v1/batch/1/resume").text.splitlines())
+    assert sorted(line["index"] for line in lines if line["type"] == "result") == [1, 2]
+
+    lines = parse(client.post("/api/v1/batch/1/resume?retry_failed=true&include_completed=true").text.splitlines())
+    assert lines[0] == {"type": "job", "job_id": 1, "remaining": 1, "replayed": 3}
+    assert sorted(line["index"] for line in lines if line["type"] == "result") == [0, 1, 2, 3]
+    assert lines[-1]["completed"] == 4
+
+
+def test_resume_claims_nothing_when_it_cannot_start(client, batch_store, monkeypatch):
+    client.post("/api/v1/batch", json={"prompts": [{"prompt": f"q{i}", "model": "fake"} for i in range(2)]})
+    batch_store["items"][0].update(status="pending", response=None)
+    batch_store["items"][1].update(status="pending", response=None, model="nope")
+
+    # An unknown model is rejected before any item is claimed.
+    assert client.post("/api/v1/batch/1/resume").status_code == 400
+    assert [item["status"] for item in batch_store["items"]] == ["pending", "pending"]
+
+    # A failure after the claim releases it.
+    batch_store["items"][1]["model"] = "fake"
+
+    async def get_items(db, job_id, statuses):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(batch_dao, "get_items", get_items)
+    with pytest.raises(RuntimeError):
+        client.post("/api/v1/batch/1/resume?include_completed=true")
+    assert [item["status"] for item in batch_store["items"]] == ["pending", "pending"]
+
+
+def test_batch_rejects_unknown_models_before_creating_a_job(client, batch_store):
+    response = client.post("/api/v1/batch", json={"prompts": [{"prompt": "hi", "model": "nope"}]})
+    assert response.status_code == 400
+    assert batch_store["jobs"] == {}
+    assert client.get("/api/v1/batch/1").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_of_a_job_claim_each_item_once(batch_store):
+    from src.schemas.batch import BatchPrompt
+
+    job = await batch_dao.create_job(None, [BatchPrompt(prompt=f"p{i}", model="echo") for i in range(4)])
+    first = await batch_dao.claim_items(None, job["id"], ["pending"], stale_seconds=900)
+    second = await batch_dao.claim_items(None, job["id"], ["pending"], stale_seconds=900)
+    assert len(first) == 4 and second == []
+
+    # Items of a run that died are run again once their claim is stale.
+    assert len(await batch_dao.claim_items(None, job["id"], ["pending"], stale_seconds=-1)) == 4
+
+
+@pytest.mark.asyncio
+async def test_interrupted_run_puts_its_unfinished_items_back_to_pending(batch_store):
+    from src.schemas.batch import BatchPrompt
+    from src.services.task_supervisor import get_task_supervisor
+
+    job = await batch_dao.create_job(None, [BatchPrompt(prompt=f"p{i}", model="echo") for i in range(3)])
+    items = await batch_dao.claim_items(None, job["id"], ["pending"], stale_seconds=900)
+    stream = batch_service.stream_batch(job["id"], items, {"echo": LLMService(EchoChatModel(delay=10))})
+
+    await anext(stream)  # the "job" line; the prompts are running
+    await stream.aclose()  # the client disconnects
+    await get_task_supervisor().drain(timeout=1)
+
+    assert [item["status"] for item in batch_store["items"]] == ["pending"] * 3
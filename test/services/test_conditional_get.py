@@ -0,0 +1,143 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.configs.db import get_db_session
+from src.dao import conversation_dao, message_dao, user_dao
+from src.dao.resource_versions import CONVERSATION, ResourceVersions, resource_versions
+from src.routers import conversation_router, user_router
+from src.services.conditional_get import etag_matches
+
+CREATED_AT = "2024-05-01T12:00:00Z"
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """One conversation served by fake DAOs; counts the version queries and the row fetches."""
+    state = {
+        "conversation": {"id": 1, "user_id": 3, "name": "chat", "created_at": CREATED_AT},
+        "messages": [{"id": 10, "conversation_id": 1, "role": "user", "content": "hi", "created_at": CREATED_AT,
+                      "status": "complete"}],
+        "version_queries": 0,
+        "fetches": 0,
+    }
+
+    async def get_conversation_version(db, conversation_id):
+        state["version_queries"] += 1
+        messages = state["messages"]
+        return {
+            "name": state["conversation"]["name"],
+            "last_message_id": messages[-1]["id"] if messages else None,
+            "streaming": any(m["status"] == "streaming" for m in messages),
+        }
+
+    async def get_conversation(db, conversation_id):
+        state["fetches"] += 1
+        return state["conversation"]
+
+    async def get_messages_by_conversation(db, conversation_id, limit=None):
+        return state["messages"]
+
+    async def get_user_by_username(db, username):
+        if username != "alice":
+            return None
+        return {"id": 3, "username": "alice", "email": None, "created_at": CREATED_AT}
+
+    monkeypatch.setattr(conversation_dao, "get_conversation_version", get_conversation_version)
+    monkeypatch.setattr(conversation_dao, "get_conversation", get_conversation)
+    monkeypatch.setattr(message_dao, "get_messages_by_conversation", get_messages_by_conversation)
+    monkeypatch.setattr(user_dao, "get_user_by_username", get_user_by_username)
+    monkeypatch.setitem(yaml_configs, "conditional-get", {"enabled": True, "version-ttl-seconds": 60})
+    monkeypatch.setitem(yaml_configs, "user-cache", {"enabled": False})
+    resource_versions.clear()
+    return state
+
+
+@pytest.fixture(params=[False, True], ids=["pydantic", "fast-json"])
+def client(request, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "fast-json", {"enabled": request.param})
+
+    async def no_session():
+        yield None
+
+    app = FastAPI()
+    app.include_router(conversation_router.router)
+    app.include_router(user_router.router)
+    app.dependency_overrides[get_db_session] = no_session
+    return TestClient(app)
+
+
+def test_unchanged_conversation_is_answered_304_from_the_version_map(store, client):
+    first = client.get("/api/v1/conversations/1")
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "private, no-cache"
+    etag = first.headers["etag"]
+
+    again = client.get("/api/v1/conversations/1", headers={"If-None-Match": etag})
+
+    assert again.status_code == 304 and again.headers["etag"] == etag and again.content == b""
+    assert store["fetches"] == 1 and store["version_queries"] == 1
+
+
+def test_a_new_message_changes_the_etag(store, client):
+    etag = client.get("/api/v1/conversations/1").headers["etag"]
+
+    store["messages"].append({**store["messages"][0], "id": 11, "role": "assistant", "content": "hello"})
+    resource_versions.invalidate((CONVERSATION, 1))  # as message_dao.create_message does
+    changed = client.get("/api/v1/conversations/1", headers={"If-None-Match": etag})
+
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert [m["id"] for m in changed.json()["messages"]] == [10, 11]
+
+
+def test_conversations_being_answered_are_not_cached(store, client):
+    store["messages"].append({**store["messages"][0], "id": 11, "role": "assistant", "status": "streaming"})
+
+    response = client.get("/api/v1/conversations/1", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200 and "etag" not in response.headers
+    client.get("/api/v1/conversations/1")
+    assert store["version_queries"] == 2
+
+
+def test_user_etags_and_unknown_users(store, client):
+    etag = client.get("/api/v1/users/alice").headers["etag"]
+    assert client.get("/api/v1/users/alice", headers={"If-None-Match": f'"x", {etag}'}).status_code == 304
+    assert client.get("/api/v1/users/bob").status_code == 404
+
+
+def test_disabled_sends_no_etag(store, client, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "conditional-get", {"enabled": False})
+
+    response = client.get("/api/v1/conversations/1", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200 and "etag" not in response.headers
+    assert store["version_queries"] == 0
+
+
+def test_versions_read_before_a_write_are_not_stored():
+    versions = ResourceVersions(max_entries=2)
+    writes = versions.writes
+    versions.invalidate(("conversation", 1))
+    versions.set(("conversation", 2), 'W/"stale"', writes)
+    assert versions.get(("conversation", 2), max_age=60) is None
+
+    for i in range(3):
+        versions.set(("conversation", i), f'W/"{i}"', versions.writes)
+    assert versions.get(("conversation", 0), max_age=60) is None
+    assert versions.get(("conversation", 2), max_age=60) == 'W/"2"'
+    assert versions.get(("conversation", 2), max_age=-1) is None
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('W/"c1.10.0"', True),
+    ('"c1.10.0"', True),
+    ('W/"other", W/"c1.10.0"', True),
+    ("*", True),
+    ('W/"c1.9.0"', False),
+    (None, False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, 'W/"c1.10.0"') is expected
@@ -0,0 +1,287 @@
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+import src.configs.config
+from src.llm import gemini_chat_model
+from src.llm.context_cache import CacheAPI, ContextCache, ContextCacheUnsupported
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeCacheAPI(CacheAPI):
+    """In-memory stand-in for the provider's cached-content API."""
+
+    def __init__(self, unsupported=False):
+        self.caches = {}
+        self.deleted = []
+        self.create_calls = 0
+        self.unsupported = unsupported
+
+    async def create(self, model, messages, ttl_seconds):
+        self.create_calls += 1
+        if self.unsupported:
+            raise ContextCacheUnsupported("caching not supported for this model")
+        name = f"cachedContents/{self.create_calls}"
+        self.caches[name] = list(messages)
+        return name
+
+    async def delete(self, name):
+        self.deleted.append(name)
+        self.caches.pop(name, None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def conversation(turns, size=100):
+    messages = []
+    for turn in range(turns):
+        messages.append(HumanMessage(content=f"question {turn} " + "q" * size))
+        messages.append(AIMessage(content=f"answer {turn} " + "a" * size))
+    return messages
+
+
+def make_cache(api, **kwargs):
+    options = dict(min_prefix_chars=1000, refresh_chars=500, ttl_seconds=600)
+    options.update(kwargs)
+    return ContextCache(api, "gemini-test", **options)
+
+
+async def test_long_prefix_is_cached_and_only_new_messages_are_sent():
+    api = FakeCacheAPI()
+    cache = make_cache(api)
+    history = conversation(6)
+    first_turn = history + [HumanMessage(content="next question")]
+
+    assert cache.lookup("conv-1", first_turn) == (None, first_turn)
+    cache.refresh("conv-1", first_turn)
+    await cache.aclose()
+    assert api.caches["cachedContents/1"] == first_turn
+
+    second_turn = first_turn + [AIMessage(content="next answer"), HumanMessage(content="follow-up")]
+    name, to_send = cache.lookup("conv-1", second_turn)
+    assert name == "cachedContents/1"
+    assert [m.content for m in to_send] == ["next answer", "follow-up"]
+
+
+async def test_short_conversations_are_not_cached():
+    api = FakeCacheAPI()
+    cache = make_cache(api)
+    cache.refresh("conv-1", conversation(1) + [HumanMessage(content="hi")])
+    await cache.aclose()
+    assert api.create_calls == 0
+
+
+async def test_cache_still_used_when_history_window_slides():
+    api = FakeCacheAPI()
+    cache = make_cache(api)
+    first_turn = conversation(6) + [HumanMessage(content="next question")]
+    cache.refresh("conv-1", first_turn)
+    await cache.aclose()
+
+    # The oldest exchange dropped out of the window.
+    second_turn = first_turn[2:] + [AIMessage(content="next answer"), HumanMessage(content="follow-up")]
+    name, to_send = cache.lookup("conv-1", second_turn)
+    assert name == "cachedContents/1"
+    assert [m.content for m in to_send] == ["next answer", "follow-up"]
+
+
+async def test_unrelated_history_is_a_miss():
+    api = FakeCacheAPI()
+    cache = make_cache(api)
+    cache.refresh("conv-1", conversation(6) + [HumanMessage(content="next question")])
+    await cache.aclose()
+
+    other = [HumanMessage(content="something else"), AIMessage(content="ok"), HumanMessage(content="and?")]
+    assert cache.lookup("conv-1", other) == (None, other)
+
+
+async def test_expired_handles_are_dropped():
+    api = FakeCacheAPI()
+    clock = FakeClock()
+    cache = make_cache(api, clock=clock)
+    turn = conversation(6) + [HumanMessage(content="next question")]
+    cache.refresh("conv-1", turn)
+    await cache.aclose()
+
+    clock.now += 600
+    name, _ = cache.lookup("conv-1", turn + [AIMessage(content="a"), HumanMessage(content="b")])
+    assert name is None
+
+
+async def test_cache_is_replaced_once_enough_history_is_uncached():
+    api = FakeCacheAPI()
+    cache = make_cache(api)
+    turn = conversation(6) + [HumanMessage(content="next question")]
+    cache.refresh("conv-1", turn)
+    await cache.aclose()
+
+    cache.refresh("conv-1", turn + [AIMessage(content="short")])
+    await cache.aclose()
+    assert api.create_calls == 1
+
+    longer = turn + conversation(3, size=200)
+    cache.refresh("conv-1", longer)
+    await cache.aclose()
+    assert api.create_calls == 2
+    assert api.deleted == ["cachedContents/1"]
+
+
+async def test_unsupported_model_pauses_caching():
+    api = FakeCacheAPI(unsupported=True)
+    cache = make_cache(api)
+    turn = conversation(6) + [HumanMessage(content="next question")]
+    cache.refresh("conv-1", turn)
+    await cache.aclose()
+    cache.refresh("conv-2", turn)
+    await cache.aclose()
+
+    assert api.create_calls == 1
+    assert cache.lookup("conv-1", turn) == (None, turn)
+
+
+async def test_least_recently_used_conversations_are_evicted():
+    api = FakeCacheAPI()
+    cache = make_cache(api, max_conversations=1)
+    for key in ("conv-1", "conv-2"):
+        cache.refresh(key, conversation(6) + [HumanMessage(content=f"question for {key}")])
+        await cache.aclose()
+
+    assert api.deleted == ["cachedContents/1"]
+
+
+class FakeGeminiClient:
+    """Replaces ChatGoogleGenerativeAI: records requests, optionally rejects cached_content."""
+
+    def __init__(self, reject_cache=False):
+        self.requests = []
+        self.reject_cache = reject_cache
+
+    async def astream(self, messages, stop=None, callbacks=None, cached_content=None, **kwargs):
+        self.requests.append((cached_content, list(messages)))
+        if cached_content and self.reject_cache:
+            raise RuntimeError("404 CachedContent not found")
+        yield AIMessageChunk(content="reply")
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    api = FakeCacheAPI()
+    cache = make_cache(api)
+    monkeypatch.setattr(gemini_chat_model, "is_context_cache_enabled", lambda: True)
+    monkeypatch.setattr(gemini_chat_model, "get_context_cache", lambda: cache)
+    llm = gemini_chat_model.GeminiChatModel(model="gemini-test")
+    return llm, cache
+
+
+async def _stream(llm, messages, conversation_id):
+    config = {"metadata": {"conversation_id": conversation_id}}
+    return [chunk.content async for chunk in llm.astream(messages, config=config) if chunk.content]
+
+
+async def test_gemini_model_sends_only_uncached_messages(gemini):
+    llm, cache = gemini
+    llm.client = FakeGeminiClient()
+    first_turn = conversation(6) + [HumanMessage(content="next question")]
+
+    assert await _stream(llm, first_turn, 7) == ["reply"]
+    await cache.aclose()
+    second_turn = first_turn + [AIMessage(content="reply"), HumanMessage(content="follow-up")]
+    assert await _stream(llm, second_turn, 7) == ["reply"]
+
+    (first_cache, first_sent), (second_cache, second_sent) = llm.client.requests
+    assert first_cache is None and len(first_sent) == len(first_turn)
+    assert second_cache == "cachedContents/1"
+    assert [m.content for m in second_sent] == ["reply", "follow-up"]
+
+
+async def test_gemini_model_falls_back_when_cache_is_rejected(gemini):
+    llm, cache = gemini
+    llm.client = FakeGeminiClient(reject_cache=True)
+    first_turn = conversation(6) + [HumanMessage(content="next question")]
+    await _stream(llm, first_turn, 7)
+    await cache.aclose()
+
+    second_turn = first_turn + [AIMessage(content="reply"), HumanMessage(content="follow-up")]
+    assert await _stream(llm, second_turn, 7) == ["reply"]
+
+    rejected, fallback = llm.client.requests[1:]
+    assert rejected[0] == "cachedContents/1"
+    assert fallback[0] is None and len(fallback[1]) == len(second_turn)
+
+
+async def test_gemini_model_without_conversation_id_skips_caching(gemini):
+    llm, cache = gemini
+    llm.client = FakeGeminiClient()
+    turn = conversation(6) + [HumanMessage(content="next question")]
+    assert [c.content async for c in llm.astream(turn) if c.content] == ["reply"]
+    await cache.aclose()
+    assert cache.api.create_calls == 0
+
+
+@pytest.fixture
+async def native_gemini(monkeypatch):
+    """GeminiChatModel on the native transport, against the local Gemini stub."""
+    from aiohttp.test_utils import TestServer
+
+    from benchmarks.gemini_stub import make_stub_app
+    from src.llm.http_session import aclose_http_session
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    cache = make_cache(FakeCacheAPI())
+    monkeypatch.setattr(gemini_chat_model, "is_context_cache_enabled", lambda: True)
+    monkeypatch.setattr(gemini_chat_model, "get_context_cache", lambda: cache)
+    servers = []
+
+    async def start(**stub_options):
+        app = make_stub_app(chunks=1, **stub_options)
+        server = TestServer(app)
+        await server.start_server()
+        servers.append(server)
+        llm = gemini_chat_model.GeminiChatModel(
+            model="gemini-test", transport="native", base_url=str(server.make_url("/v1beta"))
+        )
+        return llm, cache, app
+
+    yield start
+    await aclose_http_session()
+    for server in servers:
+        await server.close()
+
+
+async def test_native_transport_sends_only_uncached_messages(native_gemini):
+    from benchmarks.gemini_stub import REQUESTS
+
+    llm, cache, app = await native_gemini()
+    first_turn = conversation(6) + [HumanMessage(content="next question")]
+    await _stream(llm, first_turn, 7)
+    await cache.aclose()
+    second_turn = first_turn + [AIMessage(content="reply"), HumanMessage(content="follow-up")]
+    await _stream(llm, second_turn, 7)
+
+    first, second = app[REQUESTS]
+    assert "cachedContent" not in first and len(first["contents"]) == len(first_turn)
+    assert second["cachedContent"] == "cachedContents/1"
+    assert [c["parts"][0]["text"] for c in second["contents"]] == ["reply", "follow-up"]
+
+
+async def test_native_transport_falls_back_when_cache_is_rejected(native_gemini):
+    from benchmarks.gemini_stub import REQUESTS
+
+    llm, cache, app = await native_gemini(reject_cached_content=True)
+    first_turn = conversation(6) + [HumanMessage(content="next question")]
+    await _stream(llm, first_turn, 7)
+    await cache.aclose()
+
+    second_turn = first_turn + [AIMessage(content="reply"), HumanMessage(content="follow-up")]
+    assert await _stream(llm, second_turn, 7)
+
+    rejected, fallback = app[REQUESTS][1:]
+    assert rejected["cachedContent"] == "cachedContents/1"
+    assert "cachedContent" not in fallback and len(fallback["contents"]) == len(second_turn)
@@ -0,0 +1,179 @@
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, List, Optional
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import src.configs.config
+from src.dao import conversation_dao
+from src.schemas.chat import ChatRequest
+from src.services import chat_service
+from src.services import conversation_titles
+from src.services.conversation_titles import ConversationTitler, get_auto_title_settings, parse_titles
+from src.services.llm_service import LLMService
+
+
+class TitleModel(BaseChatModel):
+    """Answers "<n>. Title <n>" for every conversation of the prompt; records the prompts and call times."""
+    prompts: List[str] = []
+    call_times: List[float] = []
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = messages[0].content
+        self.prompts.append(prompt)
+        self.call_times.append(time.monotonic())
+        numbers = re.findall(r"^(\d+)\.$", prompt, re.MULTILINE)
+        answer = "\n".join(f"{n}. Title {n}" for n in numbers)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+    @property
+    def _llm_type(self) -> str:
+        return "title_fake"
+
+
+@pytest.fixture
+def conversations(monkeypatch):
+    """Conversation names, by id, behind fake DAO functions; None is untitled. Ids from 100 belong to user 2."""
+    names = {}
+
+    async def get_untitled_conversations(db, conversation_ids):
+        return {conv_id: 1 if conv_id < 100 else 2 for conv_id in conversation_ids if names.get(conv_id) is None}
+
+    async def set_untitled_conversation_names(db, new_names):
+        named = [conv_id for conv_id in new_names if names.get(conv_id) is None]
+        names.update({conv_id: new_names[conv_id] for conv_id in named})
+        return [{"id": conv_id, "user_id": 1} for conv_id in named]
+
+    monkeypatch.setattr(conversation_dao, "get_untitled_conversations", get_untitled_conversations)
+    monkeypatch.setattr(conversation_dao, "set_untitled_conversation_names", set_untitled_conversation_names)
+    return names
+
+
+@asynccontextmanager
+async def no_session():
+    yield None
+
+
+def titler(model: BaseChatModel, **settings) -> ConversationTitler:
+    return ConversationTitler(
+        model,
+        {**get_auto_title_settings(), "batch-wait-seconds": 0.05, "max-calls-per-minute": 6000, **settings},
+        session_factory=no_session,
+    )
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def test_conversations_are_titled_in_one_batched_call(conversations):
+    model = TitleModel(prompts=[], call_times=[])
+    titles = titler(model)
+
+    for conv_id in (1, 2, 3):
+        assert titles.submit(conv_id, f"question {conv_id}", f"answer {conv_id}")
+    await wait_for(lambda: len(conversations) == 3)
+    await titles.stop()
+
+    assert len(model.prompts) == 1
+    assert "User: question 2\nAssistant: answer 2" in model.prompts[0]
+    assert conversations == {1: "Title 1", 2: "Title 2", 3: "Title 3"}
+
+
+async def test_a_prompt_only_holds_the_conversations_of_one_user(conversations):
+    model = TitleModel(prompts=[], call_times=[])
+    titles = titler(model)
+
+    for conv_id in (1, 101, 2):
+        titles.submit(conv_id, f"question {conv_id}", "answer")
+    await wait_for(lambda: len(conversations) == 3)
+    await titles.stop()
+
+    assert [re.findall(r"question (\d+)", prompt) for prompt in model.prompts] == [["1", "2"], ["101"]]
+    assert conversations == {1: "Title 1", 2: "Title 2", 101: "Title 1"}
+
+
+async def test_calls_are_rate_limited_and_batches_bounded(conversations):
+    model = TitleModel(prompts=[], call_times=[])
+    titles = titler(model, **{"batch-size": 2, "max-calls-per-minute": 300})
+
+    for conv_id in range(1, 6):
+        titles.submit(conv_id, "q", "a")
+    await wait_for(lambda: len(conversations) == 5)
+    await titles.stop()
+
+    assert [prompt.count("User: ") for prompt in model.prompts] == [2, 2, 1]
+    gaps = [b - a for a, b in zip(model.call_times, model.call_times[1:])]
+    assert min(gaps) >= 0.2 * 0.9
+
+
+async def test_conversations_named_meanwhile_are_not_sent(conversations):
+    conversations[2] = "Named by the user"
+    model = TitleModel(prompts=[], call_times=[])
+    titles = titler(model)
+
+    titles.submit(1, "first", "answer")
+    titles.submit(2, "second", "answer")
+    await wait_for(lambda: 1 in conversations)
+    await titles.stop()
+
+    assert "second" not in model.prompts[0]
+    assert conversations == {1: "Title 1", 2: "Named by the user"}
+
+
+async def test_a_full_queue_drops_conversations(conversations):
+    titles = titler(TitleModel(prompts=[], call_times=[]), **{"max-pending": 1})
+
+    assert titles.submit(1, "q", "a")
+    assert titles.submit(1, "q", "a")  # already queued
+    assert not titles.submit(2, "q", "a")
+    await titles.stop()
+
+
+def test_parse_titles():
+    text = '1. "Sorting a list"\n\nHere you go:\n2) **Tuples vs lists**\n3. \n9. Out of range\n2. Duplicate'
+
+    assert parse_titles(text, count=3, max_chars=10) == {0: "Sorting a", 1: "Tuples vs"}
+
+
+async def test_stopping_never_builds_the_titler_nor_raises(monkeypatch):
+    def no_model(name):
+        raise ValueError(f"Unknown model {name!r}")
+
+    monkeypatch.setattr(conversation_titles, "get_llm", no_model)
+    conversation_titles.get_conversation_titler.cache_clear()
+    await conversation_titles.stop_conversation_titler()
+    assert conversation_titles.get_conversation_titler.cache_info().currsize == 0
+
+    async def failing_stop(self):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(conversation_titles, "get_llm", lambda name: TitleModel())
+    monkeypatch.setattr(ConversationTitler, "stop", failing_stop)
+    conversation_titles.get_conversation_titler()
+    try:
+        await conversation_titles.stop_conversation_titler()
+    finally:
+        conversation_titles.get_conversation_titler.cache_clear()
+
+
+async def test_only_the_first_answer_of_a_conversation_is_submitted(message_store, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(chat_service, "submit_for_title", lambda *args: submitted.append(args))
+    llm = LLMService(GenericFakeChatModel(messages=iter(["first answer", "second answer"])))
+
+    for text in ("hello", "and then?"):
+        request = ChatRequest(conversation_id=4, message=text, model="fake")
+        [frame async for frame in chat_service.stream_chat_response(request, llm, db=None)]
+
+    assert submitted == [(4, "hello", "first answer")]
@@ -0,0 +1,27 @@
+import pytest
+
+import src.configs.config
+from src.llm.fake_chat_model import FakeLLMError, FakeStreamingChatModel
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_fake_model_streams_deterministic_chunks():
+    llm = FakeStreamingChatModel(response_tokens=10, chunk_size=4, tokens_per_second=0, first_token_delay=0)
+
+    chunks = [chunk.content async for chunk in llm.astream("hi") if chunk.content]
+
+    assert len(chunks) == 3
+    assert len("".join(chunks).split()) == 10
+    assert chunks == [chunk.content async for chunk in llm.astream("hi again") if chunk.content]
+
+
+async def test_fake_model_injects_failures():
+    llm = FakeStreamingChatModel(response_tokens=40, chunk_size=4, tokens_per_second=0, first_token_delay=0,
+                                 failure_rate=1.0, fail_after_chunks=2)
+    received = []
+    with pytest.raises(FakeLLMError):
+        async for chunk in llm.astream("hi"):
+            if chunk.content:
+                received.append(chunk.content)
+    assert len(received) == 2
@@ -0,0 +1,82 @@
+import pytest
+from aiohttp.test_utils import TestServer
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+import src.configs.config
+from benchmarks.gemini_stub import REQUESTS, make_stub_app, replay_events
+from src.llm.gemini_chat_model import GeminiAPIError, GeminiChatModel
+from src.llm.http_session import aclose_http_session, get_http_session
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+
+
+async def start(app):
+    server = TestServer(app)
+    await server.start_server()
+    return server, GeminiChatModel(model="gemini-test", transport="native", base_url=str(server.make_url("/v1beta")))
+
+
+async def test_native_stream_replays_recorded_response():
+    server, llm = await start(make_stub_app(chunks=5))
+    try:
+        chunks = [chunk async for chunk in llm.astream([HumanMessage(content="hi")])]
+    finally:
+        await aclose_http_session()
+        await server.close()
+
+    expected = [e["candidates"][0]["content"]["parts"][0]["text"] for e in replay_events(5)[:-1]]
+    assert [c.content for c in chunks if c.content] == expected
+    usage = [c.usage_metadata for c in chunks if c.usage_metadata]
+    assert usage == [{"input_tokens": 1842, "output_tokens": 41, "total_tokens": 2377,
+                      "input_token_details": {"cache_read": 0}}]
+
+
+async def test_native_request_body():
+    app = make_stub_app(chunks=1)
+    server, llm = await start(app)
+    messages = [
+        SystemMessage(content="be brief"),
+        HumanMessage(content="hi"),
+        AIMessage(content="hello"),
+        HumanMessage(content="bye"),
+    ]
+    try:
+        [chunk async for chunk in llm.astream(messages, stop=["END"])]
+        [chunk async for chunk in llm._native_stream(messages[1:], None, cached_content="cachedContents/1")]
+    finally:
+        await aclose_http_session()
+        await server.close()
+
+    plain, cached = app[REQUESTS]
+    assert plain["systemInstruction"] == {"parts": [{"text": "be brief"}]}
+    assert [c["role"] for c in plain["contents"]] == ["user", "model", "user"]
+    assert plain["generationConfig"] == {"temperature": 0.7, "stopSequences": ["END"]}
+    assert {s["threshold"] for s in plain["safetySettings"]} == {"BLOCK_NONE"}
+    assert cached["cachedContent"] == "cachedContents/1"
+    assert "systemInstruction" not in cached
+
+
+async def test_native_stream_raises_api_errors():
+    server, llm = await start(make_stub_app(error_status=400))
+    try:
+        with pytest.raises(GeminiAPIError, match="stubbed error") as error:
+            [chunk async for chunk in llm.astream([HumanMessage(content="hi")])]
+    finally:
+        await aclose_http_session()
+        await server.close()
+    assert error.value.status == 400
+
+
+async def test_http_session_is_reused():
+    session = get_http_session()
+    try:
+        assert get_http_session() is session
+        assert session.trust_env  # the configured proxy applies to provider calls
+    finally:
+        await aclose_http_session()
+    assert session.closed
@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+import src.configs.config
+from src.schemas.chat import PureChatRequest
+from src.services.generation_worker import GenerationPoolFull, InProcessGenerationPool
+from src.services.llm_service import LLMService
+from src.services.pubsub import InMemoryPubSub
+
+pytestmark = pytest.mark.asyncio
+
+
+def fake_llm_service(text: str) -> LLMService:
+    """An LLMService whose model streams `text` word by word."""
+    return LLMService(llm=GenericFakeChatModel(messages=iter([text])))
+
+
+def collect_content(frames) -> str:
+    content = ""
+    for frame in frames:
+        data_str = frame[len("data: "):-2]
+        if data_str == "[DONE]":
+            break
+        content += json.loads(data_str)["choices"][0]["delta"].get("content", "")
+    return content
+
+
+async def test_pubsub_late_subscriber_receives_backlog():
+    pubsub = InMemoryPubSub()
+    pubsub.open("job")
+    pubsub.publish("job", "a")
+    pubsub.publish("job", "b")
+
+    async def consume():
+        return [event async for event in pubsub.subscribe("job")]
+
+    consumer = asyncio.create_task(consume())
+    await asyncio.sleep(0)
+    pubsub.publish("job", "c")
+    pubsub.close("job")
+
+    assert await consumer == ["a", "b", "c"]
+    assert not pubsub.is_open("job")
+    assert [event async for event in pubsub.subscribe("job")] == []
+
+
+async def test_pool_streams_generation_to_subscriber():
+    pool = InProcessGenerationPool(max_concurrency=2, max_pending=4)
+    request = PureChatRequest(message="hi", model="fake")
+
+    job_id = pool.submit_pure_chat(request, fake_llm_service("hello from the worker"))
+    frames = [frame async for frame in pool.subscribe(job_id)]
+
+    assert frames[-1] == "data: [DONE]\n\n"
+    assert collect_content(frames) == "hello from the worker"
+    await pool.shutdown(timeout=1)
+    assert pool.pending == 0
+
+
+async def test_generation_survives_subscriber_disconnect():
+    pool = InProcessGenerationPool(max_concurrency=1, max_pending=4)
+    job_id = pool.submit_pure_chat(PureChatRequest(message="hi"), fake_llm_service("one two three"))
+
+    subscription = pool.subscribe(job_id)
+    await anext(subscription)
+    await subscription.aclose()
+
+    # The job keeps running without listeners and completes normally.
+    await pool.shutdown(timeout=1)
+    assert pool.pending == 0
+
+
+async def test_pool_rejects_jobs_beyond_max_pending():
+    pool = InProcessGenerationPool(max_concurrency=1, max_pending=1)
+    pool.submit_pure_chat(PureChatRequest(message="hi"), fake_llm_service("a b c"))
+
+    with pytest.raises(GenerationPoolFull):
+        pool.submit_pure_chat(PureChatRequest(message="hi"), fake_llm_service("d e f"))
+
+    await pool.shutdown(timeout=1)
+
+
+async def test_subscriber_gets_a_job_finished_before_it_reads():
+    pool = InProcessGenerationPool(max_concurrency=1, max_pending=4)
+    job_id = pool.submit_pure_chat(PureChatRequest(message="hi"), fake_llm_service("quick"))
+
+    # Like a StreamingResponse: subscribed in the handler, read once the job already ended.
+    subscription = pool.subscribe(job_id)
+    await pool.shutdown(timeout=1)
+    frames = [frame async for frame in subscription]
+
+    assert collect_content(frames) == "quick"
+    assert frames[-1] == "data: [DONE]\n\n"
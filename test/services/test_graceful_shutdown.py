@@ -0,0 +1,100 @@
+import asyncio
+from typing import Any, AsyncIterator, List, Optional
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.llm import context_cache
+from src.schemas.chat import ChatRequest
+from src.services import chat_service, lifecycle
+from src.services.generation_worker import InProcessGenerationPool
+from src.services.llm_service import LLMService
+from src.services.task_supervisor import TaskSupervisor
+
+pytestmark = pytest.mark.asyncio
+
+
+class SlowChatModel(BaseChatModel):
+    """Streams `chunks` words, sleeping `delay` seconds before each one."""
+    chunks: int = 5
+    delay: float = 0.01
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        for i in range(self.chunks):
+            await asyncio.sleep(self.delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"w{i} "))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow_fake"
+
+
+@pytest.fixture
+def fresh_runtime(monkeypatch):
+    """A private pool and supervisor, so the test does not touch process-wide singletons."""
+    pool = InProcessGenerationPool(max_concurrency=16, max_pending=64)
+    supervisor = TaskSupervisor()
+    monkeypatch.setattr(lifecycle, "get_generation_pool", lambda: pool)
+    monkeypatch.setattr(lifecycle, "get_task_supervisor", lambda: supervisor)
+    monkeypatch.setattr(chat_service, "get_task_supervisor", lambda: supervisor)
+    return pool, supervisor
+
+
+async def test_shutdown_under_load_keeps_finished_and_partial_responses(message_store, fresh_runtime):
+    pool, supervisor = fresh_runtime
+    message_store.delay = 0.01  # a write takes a little while
+
+    # 6 short generations that finish within the deadline, 3 long ones that do not.
+    for conv_id in range(1, 7):
+        pool.submit_chat(ChatRequest(conversation_id=conv_id, message="hi"),
+                         LLMService(llm=SlowChatModel(chunks=3, delay=0.01)))
+    for conv_id in range(101, 104):
+        pool.submit_chat(ChatRequest(conversation_id=conv_id, message="hi"),
+                         LLMService(llm=SlowChatModel(chunks=1000, delay=0.01)))
+    await asyncio.sleep(0.1)
+
+    await lifecycle.drain_and_shutdown(stream_timeout=0.3, flush_timeout=2)
+
+    assert not supervisor.accepting
+    assert pool.pending == 0
+    assert supervisor.pending == 0
+
+    assistant_replies = {m["conversation_id"]: m["content"] for m in message_store.messages if m["role"] == "assistant"}
+    for conv_id in range(1, 7):
+        assert assistant_replies[conv_id] == "w0 w1 w2 "
+    for conv_id in range(101, 104):
+        # Cancelled at the deadline, but the partial answer was flushed before exit.
+        assert assistant_replies[conv_id].startswith("w0 w1 ")
+
+
+async def test_supervisor_drain_cancels_tasks_past_deadline():
+    supervisor = TaskSupervisor()
+    finished = supervisor.spawn(asyncio.sleep(0.01))
+    stuck = supervisor.spawn(asyncio.sleep(10))
+
+    await supervisor.drain(timeout=0.1)
+
+    assert finished.done() and not finished.cancelled()
+    assert stuck.cancelled()
+    assert supervisor.pending == 0
+
+
+async def test_shutdown_waits_for_context_cache_creations(fresh_runtime, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "gemini", {"context-cache": {"enabled": True}})
+    context_cache.get_context_cache.cache_clear()
+    cache = context_cache.get_context_cache()
+    creation = asyncio.create_task(asyncio.sleep(0.05))
+    cache._tasks.add(creation)
+    try:
+        await lifecycle.drain_and_shutdown(stream_timeout=0.1, flush_timeout=1)
+        assert creation.done() and not creation.cancelled()
+    finally:
+        context_cache.get_context_cache.cache_clear()
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.dao import message_dao
+from src.schemas.chat import ChatRequest
+from src.services import chat_service
+from src.services.history_prefetch import HistoryPrefetcher, get_history_prefetcher, prefetch_history
+from src.services.llm_service import LLMService
+
+
+def message(role: str, content: str, status: str = "complete") -> dict:
+    return {"role": role, "content": content, "status": status}
+
+
+@pytest.fixture
+def store(message_store, monkeypatch):
+    """The in-memory messages, inserts taking a database round trip, with history-prefetch enabled."""
+    message_store.delay = 0.01
+    monkeypatch.setattr(chat_service, "submit_for_title", lambda *args: None)
+    monkeypatch.setitem(yaml_configs, "history-prefetch", {"enabled": True})
+    get_history_prefetcher().__init__()
+    yield message_store
+    get_history_prefetcher().__init__()
+
+
+async def chat(text: str, answer: str, conversation_id: int = 1) -> list:
+    llm = LLMService(GenericFakeChatModel(messages=iter([answer])))
+    request = ChatRequest(conversation_id=conversation_id, message=text, model="fake")
+    return [frame async for frame in chat_service.stream_chat_response(request, llm, db=None)]
+
+
+async def test_a_prefetched_first_turn_does_not_load_its_history(store):
+    prefetch_history(1, [message("user", "hi"), message("assistant", "hello")])
+
+    frames = await chat("how are you?", "fine")
+
+    assert store.loads == []
+    assert frames[-1] == "data: [DONE]\n\n"
+    # The user message, inserted in the background, still lands before the answer.
+    assert [(m["role"], m["content"]) for m in store.messages] == [("user", "how are you?"), ("assistant", "fine")]
+
+    # Used once: the next turn loads its history again.
+    await chat("and now?", "still fine")
+    assert store.loads == [1]
+
+
+async def test_prefetched_history_is_sent_to_the_model(store, monkeypatch):
+    prompts = []
+    prefetch_history(1, [message("user", "hi"), message("assistant", "hello")])
+    llm = LLMService(GenericFakeChatModel(messages=iter(["fine"])))
+    astream = llm.llm.astream
+
+    def record(history, **kwargs):
+        prompts.append([m.content for m in history])
+        return astream(history, **kwargs)
+
+    monkeypatch.setattr(type(llm.llm), "astream", lambda self, history, **kwargs: record(history, **kwargs))
+    request = ChatRequest(conversation_id=1, message="how are you?", model="fake")
+    [frame async for frame in chat_service.stream_chat_response(request, llm, db=None)]
+
+    assert prompts == [["hi", "hello", "how are you?"]]
+
+
+async def test_conversations_still_answering_are_not_prefetched(store):
+    prefetch_history(1, [message("user", "hi"), message("assistant", "hel", status="streaming")])
+
+    assert get_history_prefetcher().take(1) is None
+
+
+async def test_a_background_load_is_dropped_once_a_turn_started(store):
+    store.messages.append({"conversation_id": 1, **message("user", "hi")})
+    prefetcher = get_history_prefetcher()
+
+    prefetch_history(1)
+    assert prefetcher.take(1) is None  # a turn starts before the load ends
+    await asyncio.sleep(0.01)
+    assert len(prefetcher) == 0
+
+    prefetch_history(1)
+    await asyncio.sleep(0.01)
+    assert prefetcher.take(1).recent_messages() == [{"role": "user", "content": "hi"}]
+
+
+def test_expired_and_oldest_histories_are_dropped():
+    prefetcher = HistoryPrefetcher(max_conversations=2, ttl_seconds=-1)
+    for conversation_id in (1, 2, 3):
+        prefetcher.warm(conversation_id, [])
+
+    assert len(prefetcher) == 2
+    assert prefetcher.take(1) is None and prefetcher.take(2) is None  # evicted, then expired
+
+
+async def test_a_history_written_elsewhere_since_its_prefetch_is_not_used(store):
+    prefetch_history(1, [])  # a new conversation
+    # Its first turn runs on another worker process, which does not see this prefetch.
+    store.messages.append({"id": 50, "conversation_id": 1, "role": "user", "content": "hi", "status": "complete"})
+    store.messages.append({"id": 51, "conversation_id": 1, "role": "assistant", "content": "hello", "status": "complete"})
+
+    await chat("how are you?", "fine")
+
+    assert store.loads == [1]
+    assert len(get_history_prefetcher()) == 0
+
+
+async def test_a_failed_background_user_insert_fails_the_turn_without_saving_the_answer(store, monkeypatch):
+    create_message = message_dao.create_message
+
+    async def reject_user_messages(db, message, idempotency_key=None, status="complete"):
+        if message.role == "user":
+            raise ValueError("value too long")
+        return await create_message(db, message, idempotency_key, status)
+
+    monkeypatch.setattr(message_dao, "create_message", reject_user_messages)
+    prefetch_history(1, [])
+
+    frames = await chat("hi", "an answer nobody asked for")
+
+    assert "could not be saved" in frames[-2]
+    assert frames[-1] == "data: [DONE]\n\n"
+    assert store.messages == []
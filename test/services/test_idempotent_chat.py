@@ -0,0 +1,212 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.dao import message_dao
+from src.schemas.chat import ChatRequest
+from src.services import chat_service
+from src.services.generation_worker import InProcessGenerationPool
+from src.services.llm_service import LLMService
+
+pytestmark = pytest.mark.asyncio
+
+
+def collect_content(frames) -> str:
+    content = ""
+    for frame in frames:
+        data_str = frame[len("data: "):-2]
+        if data_str == "[DONE]":
+            break
+        content += json.loads(data_str)["choices"][0]["delta"].get("content", "")
+    return content
+
+
+class CountingLLM(GenericFakeChatModel):
+    """Streams the given answers, counting the generations it is asked for."""
+    calls: int = 0
+
+    async def _astream(self, *args, **kwargs):
+        self.calls += 1
+        async for chunk in super()._astream(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            yield chunk
+
+
+@pytest.fixture
+def store(message_store, monkeypatch):
+    """The in-memory messages, with idempotency keys in place of the message DAO's."""
+    state = {"messages": message_store.messages, "keys": {}, "stale": False}
+
+    async def create_message(db, message, idempotency_key=None, status="complete"):
+        row = await message_store.create_message(db, message, idempotency_key, status)
+        key = state["keys"].get((message.conversation_id, idempotency_key))
+        if key is not None and message.role == "assistant" and key["assistant_message_id"] is None:
+            key["assistant_message_id"] = row["id"]
+        return row
+
+    async def create_message_once(db, message, idempotency_key):
+        if (message.conversation_id, idempotency_key) in state["keys"]:
+            return None
+        row = await message_store.create_message(db, message)
+        state["keys"][(message.conversation_id, idempotency_key)] = {
+            "user_message_id": row["id"], "assistant_message_id": None,
+        }
+        return row
+
+    async def get_idempotent_turn(db, conversation_id, idempotency_key):
+        key = state["keys"].get((conversation_id, idempotency_key))
+        if key is None:
+            return None
+        answer_id = key["assistant_message_id"]
+        return {**key, "answer": message_store.get(answer_id) if answer_id else None}
+
+    async def take_over_idempotent_turn(db, conversation_id, idempotency_key, stale_seconds):
+        taken_over, state["stale"] = state["stale"], False
+        return taken_over
+
+    monkeypatch.setattr(message_dao, "create_message", create_message)
+    monkeypatch.setattr(message_dao, "create_message_once", create_message_once)
+    monkeypatch.setattr(message_dao, "get_idempotent_turn", get_idempotent_turn)
+    monkeypatch.setattr(message_dao, "take_over_idempotent_turn", take_over_idempotent_turn)
+    monkeypatch.setattr(chat_service, "IDEMPOTENT_POLL_INTERVAL", 0.01)
+    return state
+
+
+async def run_turn(request, llm) -> list:
+    return [frame async for frame in chat_service.stream_chat_response(request, LLMService(llm), db=None)]
+
+
+async def test_retry_of_a_completed_turn_replays_the_stored_answer(store):
+    llm = CountingLLM(messages=iter(["the first answer", "a second answer"]))
+    request = ChatRequest(conversation_id=1, message="hello", model="fake", idempotency_key="turn-1")
+
+    first = await run_turn(request, llm)
+    retry = await run_turn(request, llm)
+
+    assert llm.calls == 1
+    assert collect_content(retry) == collect_content(first) == "the first answer"
+    assert retry[-1] == "data: [DONE]\n\n"
+    assert [m["role"] for m in store["messages"]] == ["user", "assistant"]
+
+
+async def test_turns_without_key_or_with_another_key_are_generated(store):
+    llm = CountingLLM(messages=iter(["one", "two", "three"]))
+
+    await run_turn(ChatRequest(conversation_id=1, message="hi", model="fake"), llm)
+    await run_turn(ChatRequest(conversation_id=1, message="hi", model="fake"), llm)
+    await run_turn(ChatRequest(conversation_id=1, message="hi", model="fake", idempotency_key="a"), llm)
+
+    assert llm.calls == 3
+    assert len(store["messages"]) == 6
+
+
+async def test_retry_of_an_in_flight_turn_attaches_to_the_running_job(store):
+    pool = InProcessGenerationPool(max_concurrency=2, max_pending=4)
+    llm = CountingLLM(messages=iter(["streamed only once to both clients", "never generated"]))
+    request = ChatRequest(conversation_id=1, message="hello", model="fake", idempotency_key="turn-1")
+
+    job_id = pool.submit_chat(request, LLMService(llm))
+    first = pool.subscribe(job_id)
+    await anext(first)  # the original client got a frame, then its connection dropped
+    await first.aclose()
+    retry_job_id = pool.submit_chat(request, LLMService(llm))
+    retry = [frame async for frame in pool.subscribe(retry_job_id)]
+    await pool.shutdown(timeout=1)
+
+    assert retry_job_id == job_id
+    assert llm.calls == 1
+    assert collect_content(retry) == "streamed only once to both clients"
+    assert [m["role"] for m in store["messages"]] == ["user", "assistant"]
+
+
+async def test_retry_waits_for_a_turn_generated_by_another_process(store, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "idempotency", {"wait-timeout": 5})
+    llm = CountingLLM(messages=iter(["never generated"]))
+    store["keys"][(1, "turn-1")] = {"user_message_id": None, "assistant_message_id": None}
+    request = ChatRequest(conversation_id=1, message="hello", model="fake", idempotency_key="turn-1")
+
+    async def answer_later():
+        await asyncio.sleep(0.05)
+        await message_dao.create_message(
+            None, chat_service.MessageCreateSchema(conversation_id=1, role="assistant", content="from elsewhere"),
+            idempotency_key="turn-1",
+        )
+
+    answering = asyncio.create_task(answer_later())
+    retry = await run_turn(request, llm)
+    await answering
+
+    assert llm.calls == 0
+    assert collect_content(retry) == "from elsewhere"
+
+
+async def test_retry_gives_up_after_the_wait_timeout_and_regenerates_lost_turns(store, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "idempotency", {"wait-timeout": 0.05})
+    llm = CountingLLM(messages=iter(["generated again"]))
+    store["keys"][(1, "turn-1")] = {"user_message_id": None, "assistant_message_id": None}
+    request = ChatRequest(conversation_id=1, message="hello", model="fake", idempotency_key="turn-1")
+
+    pending = await run_turn(request, llm)
+    assert llm.calls == 0
+    assert "still being answered" in collect_content(pending)
+
+    store["stale"] = True
+    regenerated = await run_turn(request, llm)
+    assert llm.calls == 1
+    assert collect_content(regenerated) == "generated again"
+    assert store["keys"][(1, "turn-1")]["assistant_message_id"] is not None
+
+
+async def test_a_partial_answer_is_replayed_as_partial_on_short_lived_sessions(store, monkeypatch):
+    llm = CountingLLM(messages=iter(["never generated"]))
+    store["keys"][(1, "turn-1")] = {"user_message_id": None, "assistant_message_id": None}
+    await message_dao.create_message(
+        None, chat_service.MessageCreateSchema(conversation_id=1, role="assistant", content="cut sh"),
+        idempotency_key="turn-1", status="partial",
+    )
+    sessions = []
+
+    @asynccontextmanager
+    async def counting_session_factory():
+        sessions.append(1)
+        yield None
+
+    monkeypatch.setattr(chat_service, "AsyncSessionFactory", counting_session_factory)
+    request = ChatRequest(conversation_id=1, message="hello", model="fake", idempotency_key="turn-1")
+    retry = await run_turn(request, llm)
+
+    assert collect_content(retry) == "cut sh"
+    assert json.loads(retry[0][len("data: "):])["choices"][0]["finish_reason"] == "partial"
+    assert sessions == [1]  # the poll ran on its own session, not the request's
+
+
+async def test_a_long_but_live_answer_is_waited_for_rather_than_replayed_as_partial(store, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "idempotency", {"wait-timeout": 5, "stale-after": 600})
+    monkeypatch.setitem(yaml_configs, "response-checkpoint", {"abandoned-after": 3600})
+    llm = CountingLLM(messages=iter(["never generated"]))
+    store["keys"][(1, "turn-1")] = {"user_message_id": None, "assistant_message_id": None}
+    answer = await message_dao.create_message(
+        None, chat_service.MessageCreateSchema(conversation_id=1, role="assistant", content="a long"),
+        idempotency_key="turn-1", status="streaming",
+    )
+    # Streaming for 20 minutes: past `stale-after`, still checkpointed by its process.
+    store["messages"][-1]["created_at"] = datetime.now(timezone.utc) - timedelta(minutes=20)
+
+    async def finish_later():
+        await asyncio.sleep(0.05)
+        await message_dao.update_message_content(None, answer["id"], None, "a long answer", "complete")
+
+    finishing = asyncio.create_task(finish_later())
+    request = ChatRequest(conversation_id=1, message="hello", model="fake", idempotency_key="turn-1")
+    retry = await run_turn(request, llm)
+    await finishing
+
+    assert llm.calls == 0
+    assert collect_content(retry) == "a long answer"
+    assert json.loads(retry[-2][len("data: "):])["choices"][0]["finish_reason"] != "partial"
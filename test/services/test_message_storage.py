@@ -0,0 +1,154 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.dao import message_storage_dao
+from src.schemas.chat import ChatRequest
+from src.services import chat_service, message_storage
+from src.services.llm_service import LLMService
+
+
+@asynccontextmanager
+async def no_session():
+    yield None
+
+
+@pytest.mark.asyncio
+async def test_partitions_are_created_for_the_coming_months_only_when_partitioned(monkeypatch):
+    requested = []
+    partitioned = False
+
+    async def is_messages_partitioned(db):
+        return partitioned
+
+    async def create_month_partitions(db, months):
+        requested.extend(months)
+        return [message_storage_dao.partition_name(month) for month in months]
+
+    monkeypatch.setattr(message_storage_dao, "is_messages_partitioned", is_messages_partitioned)
+    monkeypatch.setattr(message_storage_dao, "create_month_partitions", create_month_partitions)
+    now = datetime(2026, 11, 19, 8, 30, tzinfo=timezone.utc)
+
+    assert await message_storage.ensure_partitions(None, months_ahead=2, now=now) == []
+
+    partitioned = True
+    created = await message_storage.ensure_partitions(None, months_ahead=2, now=now)
+    assert created == ["messages_y2026m11", "messages_y2026m12", "messages_y2027m01"]
+    assert requested[-1] == datetime(2027, 1, 1, tzinfo=timezone.utc)
+
+
+def test_archive_payload_round_trips():
+    rows = [
+        {"id": 1, "conversation_id": 3, "role": "user", "content": "héllo",
+         "created_at": datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)},
+        {"id": 2, "conversation_id": 3, "role": "assistant", "content": "hi " * 1000,
+         "created_at": datetime(2025, 1, 2, 3, 4, 6, tzinfo=timezone.utc)},
+    ]
+    blob = message_storage_dao._pack(rows)
+
+    assert len(blob) < len("hi " * 1000)
+    assert message_storage_dao._unpack(blob) == rows
+
+
+@pytest.mark.asyncio
+async def test_archive_inactive_skips_conversations_that_fail_or_became_active(monkeypatch):
+    async def find_inactive_conversations(db, inactive_days, limit):
+        return [1, 2, 3]
+
+    async def archive_conversation(db, conversation_id, inactive_days):
+        if conversation_id == 3:
+            raise RuntimeError("deadlock")
+        return 0 if conversation_id == 2 else 5
+
+    class Session:
+        async def rollback(self):
+            pass
+
+    monkeypatch.setattr(message_storage_dao, "find_inactive_conversations", find_inactive_conversations)
+    monkeypatch.setattr(message_storage_dao, "archive_conversation", archive_conversation)
+
+    assert await message_storage.archive_inactive(Session(), inactive_days=30, batch_size=10) == 1
+
+
+@pytest.mark.asyncio
+async def test_reopened_archived_conversation_is_rehydrated_before_the_llm_call(message_store, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "message-storage", {"archive-after-days": 30})
+    archive = {9: [
+        {"conversation_id": 9, "role": "user", "content": "My name is Ada."},
+        {"conversation_id": 9, "role": "assistant", "content": "Nice to meet you, Ada."},
+    ]}
+
+    async def rehydrate_conversation(db, conversation_id):
+        restored = archive.pop(conversation_id, [])
+        message_store.messages[:0] = restored
+        return len(restored)
+
+    monkeypatch.setattr(message_storage_dao, "rehydrate_conversation", rehydrate_conversation)
+    llm = GenericFakeChatModel(messages=iter(["Your name is Ada."]))
+    seen = []
+    original_astream = type(llm).astream
+
+    def astream(self, messages, *args, **kwargs):
+        seen.extend(messages)
+        return original_astream(self, messages, *args, **kwargs)
+
+    monkeypatch.setattr(type(llm), "astream", astream)
+    request = ChatRequest(conversation_id=9, message="What is my name?", model="fake")
+
+    async for _ in chat_service.stream_chat_response(request, LLMService(llm), db=None):
+        pass
+
+    assert archive == {}
+    assert [type(m) for m in seen] == [HumanMessage, AIMessage, HumanMessage]
+    assert seen[0].content == "My name is Ada."
+    assert message_store.messages[-1]["content"] == "Your name is Ada."
+
+
+@pytest.mark.asyncio
+async def test_rehydration_is_off_without_archival(monkeypatch):
+    monkeypatch.setitem(yaml_configs, "message-storage", {"archive-after-days": 0})
+
+    async def rehydrate_conversation(db, conversation_id):
+        raise AssertionError("should not be called")
+
+    monkeypatch.setattr(message_storage_dao, "rehydrate_conversation", rehydrate_conversation)
+    assert await message_storage.rehydrate_if_archived(None, 1) == 0
+
+
+@pytest.mark.asyncio
+async def test_maintenance_is_skipped_while_another_process_holds_its_lock(monkeypatch):
+    ran, unlocked = [], []
+    held = True
+
+    class Engine:
+        @asynccontextmanager
+        async def connect(self):
+            yield "lock-connection"
+
+    async def try_lock_maintenance(conn):
+        return not held
+
+    async def unlock_maintenance(conn):
+        unlocked.append(conn)
+
+    async def run_tasks(session, settings):
+        ran.append(settings)
+
+    monkeypatch.setattr(message_storage, "get_async_engine", Engine)
+    monkeypatch.setattr(message_storage, "AsyncSessionFactory", no_session)
+    monkeypatch.setattr(message_storage_dao, "try_lock_maintenance", try_lock_maintenance)
+    monkeypatch.setattr(message_storage_dao, "unlock_maintenance", unlock_maintenance)
+    monkeypatch.setattr(message_storage, "_run_maintenance_tasks", run_tasks)
+    settings = message_storage.get_message_storage_settings()
+
+    assert await message_storage.run_maintenance(settings) is False
+    assert ran == [] and unlocked == []
+
+    held = False
+    assert await message_storage.run_maintenance(settings) is True
+    assert ran == [settings] and unlocked == ["lock-connection"]
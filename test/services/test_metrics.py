@@ -0,0 +1,40 @@
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from prometheus_client import REGISTRY
+
+import src.configs.config
+from src.schemas.chat import PureChatRequest
+from src.services.chat_service import stream_pure_chat_response
+from src.services.llm_service import LLMService
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_pure_stream_records_latency_and_size_metrics():
+    labels = {"endpoint": "purechat", "model": "metrics-test"}
+    ttft_before = sample("chat_time_to_first_token_seconds_count", **labels)
+    chars_before = sample("chat_response_characters_sum", **labels)
+
+    llm_service = LLMService(llm=GenericFakeChatModel(messages=iter(["one two three"])))
+    request = PureChatRequest(message="hi", model="metrics-test")
+    async for _ in stream_pure_chat_response(request, llm_service):
+        pass
+
+    assert sample("chat_time_to_first_token_seconds_count", **labels) == ttft_before + 1
+    assert sample("chat_stream_duration_seconds_count", **labels) >= 1
+    assert sample("chat_response_characters_sum", **labels) == chars_before + len("one two three")
+
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    from server import app
+
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "chat_time_to_first_token_seconds" in response.text
+    assert "db_pool_checkout_wait_seconds" in response.text
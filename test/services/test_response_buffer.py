@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.schemas.chat import ChatRequest, PureChatRequest
+from src.services.chat_service import stream_chat_response, stream_pure_chat_response
+from src.services.llm_service import LLMService
+from src.services.response_buffer import ResponseBuffer
+
+
+class TrackingLLM(GenericFakeChatModel):
+    """Counts the chunks it produced, to check that generation stopped."""
+    produced: int = 0
+
+    async def _astream(self, *args, **kwargs):
+        async for chunk in super()._astream(*args, **kwargs):
+            self.produced += 1
+            yield chunk
+
+
+def test_buffer_tracks_length_and_joins_lazily():
+    response = ResponseBuffer()
+    for chunk in ("Hello", ", ", "world"):
+        response.append(chunk)
+
+    assert len(response) == 12 and response
+    assert response.preview(7) == "Hello, "
+    assert response.getvalue() == "Hello, world"
+    response.append("!")
+    assert response.getvalue() == "Hello, world!"
+    assert not ResponseBuffer()
+
+
+def test_buffer_cuts_the_chunk_crossing_the_limit():
+    response = ResponseBuffer(max_chars=8)
+
+    assert response.append("abcde") == "abcde" and not response.limit_reached
+    assert response.append("fghij") == "fgh" and response.limit_reached
+    assert response.getvalue() == "abcdefgh" and len(response) == 8
+
+
+def test_buffer_without_retain_only_counts():
+    response = ResponseBuffer(retain=False)
+    response.append("a" * 1000)
+
+    assert len(response) == 1000
+    assert response.getvalue() == ""
+
+
+@pytest.mark.asyncio
+async def test_pure_stream_stops_generation_at_the_size_limit(monkeypatch):
+    monkeypatch.setitem(yaml_configs, "response-size", {"max-chars": 10})
+    llm = TrackingLLM(messages=iter([" ".join(["word"] * 100)]))
+
+    frames = [frame async for frame in stream_pure_chat_response(PureChatRequest(message="hi", model="fake"), LLMService(llm))]
+
+    events = [json.loads(frame[len("data: "):]) for frame in frames[:-1]]
+    assert "".join(event["choices"][0]["delta"]["content"] for event in events) == "word word "
+    assert events[-1]["choices"][0]["finish_reason"] == "length"
+    assert frames[-1] == "data: [DONE]\n\n"
+    assert llm.produced < 10
+
+
+@pytest.mark.asyncio
+async def test_chat_answer_cut_at_the_size_limit_is_saved_as_partial(message_store, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "response-size", {"max-chars": 10})
+    llm = TrackingLLM(messages=iter([" ".join(["word"] * 100)]))
+    request = ChatRequest(conversation_id=1, message="hi", model="fake")
+
+    frames = [frame async for frame in stream_chat_response(request, LLMService(llm), db=None)]
+
+    assert json.loads(frames[-2][len("data: "):])["choices"][0]["finish_reason"] == "length"
+    saved = [(m["role"], m["content"], m["status"]) for m in message_store.messages]
+    assert saved == [("user", "hi", "complete"), ("assistant", "word word ", "partial")]
+    assert llm.produced < 10
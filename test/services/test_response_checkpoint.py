@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from src.dao import message_dao
+from src.services.response_buffer import ResponseBuffer
+from src.services.response_checkpoint import ResponseCheckpointer
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def writes(message_store, monkeypatch):
+    """Records the message writes of the checkpointer, in order, made to the in-memory store."""
+    log = []
+
+    async def create_message(db, message, idempotency_key=None, status="complete"):
+        log.append(("insert", message.content, status))
+        return await message_store.create_message(db, message, idempotency_key, status)
+
+    async def update_message_content(db, message_id, created_at, content, status):
+        await asyncio.sleep(0.01)
+        log.append(("update", content, status))
+        await message_store.update_message_content(db, message_id, created_at, content, status)
+
+    async def append_message_content(db, message_id, created_at, delta):
+        await asyncio.sleep(0.01)
+        log.append(("append", delta, "streaming"))
+        return await message_store.append_message_content(db, message_id, created_at, delta)
+
+    monkeypatch.setattr(message_dao, "create_message", create_message)
+    monkeypatch.setattr(message_dao, "update_message_content", update_message_content)
+    monkeypatch.setattr(message_dao, "append_message_content", append_message_content)
+    return log
+
+
+def buffer(content: str) -> ResponseBuffer:
+    response = ResponseBuffer()
+    response.append(content)
+    return response
+
+
+def settings(**overrides) -> dict:
+    return {"enabled": True, "every-chars": 10, "every-chars-growth": 0, "every-seconds": 60, "abandoned-after": 3600, **overrides}
+
+
+async def test_answer_is_inserted_streaming_then_updated_and_completed(writes):
+    checkpointer = ResponseCheckpointer(1, settings=settings())
+
+    checkpointer.update(buffer("0123456789"))
+    await asyncio.sleep(0)  # the first checkpoint runs in the background
+    checkpointer.update(buffer("0123456789abc"))  # below every-chars: not due
+    await asyncio.sleep(0.05)
+    checkpointer.update(buffer("0123456789abcdefghij"))
+    await checkpointer.finish(None, "0123456789abcdefghij!", "complete")
+
+    assert writes == [
+        ("insert", "0123456789", "streaming"),
+        ("append", "abcdefghij", "streaming"),
+        ("update", "0123456789abcdefghij!", "complete"),
+    ]
+    assert checkpointer.message["id"] == 1
+
+
+async def test_checkpoint_due_while_one_is_in_flight_is_skipped(writes):
+    checkpointer = ResponseCheckpointer(1, settings=settings())
+
+    checkpointer.update(buffer("0" * 10))
+    await asyncio.sleep(0.05)
+    checkpointer.update(buffer("0" * 20))  # update in flight for 10 ms
+    checkpointer.update(buffer("0" * 30))
+    await checkpointer.finish(None, "0" * 35, "partial")
+
+    assert [(kind, len(content), status) for kind, content, status in writes] == [
+        ("insert", 10, "streaming"),
+        ("append", 10, "streaming"),
+        ("update", 35, "partial"),
+    ]
+
+
+async def test_short_or_unchecked_answers_are_inserted_once(writes):
+    short = ResponseCheckpointer(1, settings=settings())
+    short.update(buffer("hi"))
+    await short.finish(None, "hi there", "complete")
+
+    disabled = ResponseCheckpointer(2, settings=settings(enabled=False))
+    disabled.update(buffer("0" * 100))
+    await disabled.finish(None, "0" * 100, "complete")
+
+    assert writes == [("insert", "hi there", "complete"), ("insert", "0" * 100, "complete")]
+
+
+async def test_a_failed_checkpoint_leaves_its_characters_to_the_next(writes, message_store, monkeypatch):
+    append = message_dao.append_message_content
+    failures = [ConnectionError("connection lost")]
+
+    async def flaky_append(db, message_id, created_at, delta):
+        if failures:
+            raise failures.pop()
+        return await append(db, message_id, created_at, delta)
+
+    monkeypatch.setattr(message_dao, "append_message_content", flaky_append)
+    checkpointer = ResponseCheckpointer(1, settings=settings())
+
+    for length in (10, 20, 30):
+        checkpointer.update(buffer("x" * length))
+        await asyncio.sleep(0.05)
+
+    assert [(kind, len(content)) for kind, content, status in writes] == [("insert", 10), ("append", 20)]
+    assert message_store.messages[0]["content"] == "x" * 30
@@ -0,0 +1,110 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+pytest.importorskip("numpy")
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.llm.embeddings import HashingEmbedder, similarity
+from src.schemas.chat import PureChatRequest
+from src.services import chat_service
+from src.services.llm_service import LLMService
+from src.services.semantic_cache import SemanticCache, get_semantic_cache
+from src.services.vector_index import VectorIndex
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def embedder():
+    return HashingEmbedder(dim=256)
+
+
+def test_hashing_embedder_matches_rephrasings_but_not_other_prompts(embedder):
+    prompt = embedder.embed("How do I reverse a list in Python?")
+
+    assert similarity(prompt, embedder.embed("how do I reverse a list in python")) == pytest.approx(1.0)
+    assert similarity(prompt, embedder.embed("Tell me a joke about cats")) < 0.3
+
+
+def test_index_evicts_least_recently_used_and_expired_entries(embedder):
+    clock = Clock()
+    index = VectorIndex(dim=embedder.dim, max_entries=2, ttl_seconds=60, clock=clock)
+    for text in ("alpha question", "beta question"):
+        index.add("m", embedder.embed(text), text, f"answer {text}")
+        clock.now += 1
+    entry, _ = index.search("m", embedder.embed("alpha question"))
+    index.touch(entry)
+
+    assert index.add("m", embedder.embed("gamma question"), "gamma question", "answer gamma") == 1
+    assert index.search("m", embedder.embed("beta question"))[0]["prompt"] != "beta question"
+    assert index.search("other", embedder.embed("alpha question")) == (None, 0.0)
+
+    clock.now += 120
+    assert index.search("m", embedder.embed("alpha question")) == (None, 0.0)
+    assert index.size("m") == 0
+
+
+def test_index_round_trips_through_disk_for_the_same_embedder(embedder, tmp_path):
+    path = str(tmp_path / "cache" / "index.npz")
+    index = VectorIndex(dim=embedder.dim)
+    index.add("gemini", embedder.embed("what is a monad"), "what is a monad", "a monoid in endofunctors")
+    index.save(path, embedder.name)
+
+    restored = VectorIndex(dim=embedder.dim)
+    assert restored.load(path, embedder.name)
+    entry, score = restored.search("gemini", embedder.embed("What is a monad?"))
+    assert entry["response"] == "a monoid in endofunctors" and score == pytest.approx(1.0)
+
+    assert not VectorIndex(dim=embedder.dim).load(path, "hashing-other")
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_above_threshold_and_per_model(embedder):
+    cache = SemanticCache(embedder, VectorIndex(dim=embedder.dim), threshold=0.9)
+
+    miss = await cache.lookup("gemini", "What is the capital of France?")
+    assert not miss.hit
+    cache.store(miss, "Paris")
+
+    hit = await cache.lookup("gemini", "what is the capital of france")
+    assert hit.hit and hit.response == "Paris"
+    assert not (await cache.lookup("deepseek", "what is the capital of france")).hit
+    assert not (await cache.lookup("gemini", "What is the capital of Spain?")).hit
+    assert await cache.lookup("gemini", "x" * 5000) is None
+
+
+@pytest.mark.asyncio
+async def test_verify_replaces_an_answer_that_disagrees_with_the_model(embedder):
+    cache = SemanticCache(embedder, VectorIndex(dim=embedder.dim), min_agreement=0.6)
+    miss = await cache.lookup("gemini", "Who wrote Hamlet?")
+    cache.store(miss, "Charles Dickens wrote it")
+    hit = await cache.lookup("gemini", "Who wrote Hamlet?")
+
+    fresh = LLMService(llm=GenericFakeChatModel(messages=iter(["William Shakespeare"])))
+    assert await cache.verify(hit, fresh) < 0.6
+
+    assert (await cache.lookup("gemini", "Who wrote Hamlet?")).response == "William Shakespeare"
+
+
+@pytest.mark.asyncio
+async def test_pure_chat_serves_a_repeated_prompt_from_the_cache(monkeypatch):
+    monkeypatch.setitem(yaml_configs, "semantic-cache", {"enabled": True, "threshold": 0.9})
+    get_semantic_cache.cache_clear()
+    llm = GenericFakeChatModel(messages=iter(["The answer is 42"]))
+    request = PureChatRequest(message="What is the meaning of life?", model="semantic-test")
+
+    first = [event async for event in chat_service.stream_pure_chat_response(request, LLMService(llm))]
+    # The fake model has no second answer: a call to it would fail the stream.
+    second = [event async for event in chat_service.stream_pure_chat_response(request, LLMService(llm))]
+
+    assert first[-1] == second[-1] == "data: [DONE]\n\n"
+    assert "The answer is 42" in "".join(second)
+    assert get_semantic_cache().index.size("semantic-test") == 1
+    get_semantic_cache.cache_clear()
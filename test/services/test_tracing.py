@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+pytest.importorskip("opentelemetry.sdk")
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+import src.configs.config
+from src.configs import tracing
+from src.schemas.chat import ChatRequest
+from src.services import chat_service
+from src.services.llm_service import LLMService
+from src.services.task_supervisor import TaskSupervisor
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def exporter():
+    span_exporter = InMemorySpanExporter()
+    assert tracing.setup_tracing(None, exporter=span_exporter)
+    yield span_exporter
+    tracing.shutdown_tracing()
+
+
+async def test_chat_turn_spans_are_children_of_the_turn(exporter, message_store):
+    llm_service = LLMService(llm=GenericFakeChatModel(messages=iter(["traced answer"])))
+    request = ChatRequest(conversation_id=7, message="hi", model="fake")
+
+    async for _ in chat_service.stream_chat_response(request, llm_service, db=None):
+        pass
+
+    spans = {s.name: s for s in exporter.get_finished_spans()}
+    turn = spans["chat.turn"]
+    for child in ("chat.insert_user_message", "chat.load_history", "llm.first_token", "llm.stream", "chat.save_response"):
+        assert spans[child].parent.span_id == turn.context.span_id
+        assert spans[child].context.trace_id == turn.context.trace_id
+    assert turn.attributes["chat.conversation_id"] == 7
+    assert spans["llm.stream"].attributes["llm.response_chars"] == len("traced answer")
+
+
+async def test_partial_save_span_is_propagated_to_background_task(exporter, message_store, monkeypatch):
+    supervisor = TaskSupervisor()
+    monkeypatch.setattr(chat_service, "get_task_supervisor", lambda: supervisor)
+    llm_service = LLMService(llm=GenericFakeChatModel(messages=iter(["a b c d e f"])))
+    request = ChatRequest(conversation_id=8, message="hi", model="fake")
+
+    stream = chat_service.stream_chat_response(request, llm_service, db=None)
+    await anext(stream)  # first content chunk
+    consumer = asyncio.create_task(anext(stream))
+    await asyncio.sleep(0)
+    consumer.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await consumer
+    await supervisor.drain(timeout=1)
+
+    spans = {s.name: s for s in exporter.get_finished_spans()}
+    assert spans["chat.save_partial"].context.trace_id == spans["llm.stream"].context.trace_id
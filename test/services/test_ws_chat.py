@@ -0,0 +1,154 @@
+import asyncio
+from typing import Any, AsyncIterator, List, Optional
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+import src.configs.config
+from src.configs.config import yaml_configs
+from src.llm.registry import UnknownModelError
+from src.routers import chat_router
+from src.services import ws_chat_service
+from src.services.generation_worker import InProcessGenerationPool
+
+
+class RecordingChatModel(BaseChatModel):
+    """Streams `chunks` words after `delay` seconds each, recording the history sizes it was given."""
+    chunks: int = 3
+    delay: float = 0.0
+    history_sizes: List[int] = []
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        self.history_sizes.append(len(messages))
+        for i in range(self.chunks):
+            await asyncio.sleep(self.delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"w{i} "))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording_fake"
+
+
+@pytest.fixture
+def store(message_store, monkeypatch):
+    """The in-memory messages, and no database sessions for the WebSocket connections either."""
+    class FakeSession:
+        async def __aenter__(self):
+            return None
+
+        async def __aexit__(self, *exc_info):
+            pass
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(ws_chat_service, "AsyncSessionFactory", FakeSession)
+    return message_store
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(chat_router.router)
+    return TestClient(app)
+
+
+def use_model(monkeypatch, llm: BaseChatModel):
+    def get_llm(model):
+        if model != "fake":
+            raise UnknownModelError(f"Unknown model {model!r}")
+        return llm
+
+    monkeypatch.setattr(ws_chat_service, "get_llm", get_llm)
+
+
+def receive_turn(ws) -> list:
+    """Messages of one turn, up to its "done" or "cancelled"."""
+    events = []
+    while not events or events[-1]["type"] not in ("done", "cancelled", "error"):
+        events.append(ws.receive_json())
+    return events
+
+
+def test_turns_on_one_connection_reuse_the_conversation_state(store, client, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "generation", {"mode": "inline"})
+    llm = RecordingChatModel(history_sizes=[])
+    use_model(monkeypatch, llm)
+
+    with client.websocket_connect("/api/v1/ws/chat?conversation_id=1") as ws:
+        ws.send_json({"type": "chat", "turn_id": "a", "message": "hello", "model": "fake"})
+        ws.send_json({"type": "chat", "turn_id": "b", "message": "again", "model": "fake"})
+        first, second = receive_turn(ws), receive_turn(ws)
+
+    assert [e["turn_id"] for e in first + second] == ["a"] * 4 + ["b"] * 4
+    assert "".join(e["data"]["choices"][0]["delta"]["content"] for e in first[:-1]) == "w0 w1 w2 "
+    assert second[-1]["type"] == "done"
+    assert llm.history_sizes == [1, 3]
+    assert len(store.loads) == 1
+    assert [m["role"] for m in store.messages] == ["user", "assistant", "user", "assistant"]
+
+
+def test_a_conversation_written_elsewhere_is_reloaded_before_the_next_turn(store, client, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "generation", {"mode": "inline"})
+    llm = RecordingChatModel(history_sizes=[])
+    use_model(monkeypatch, llm)
+
+    with client.websocket_connect("/api/v1/ws/chat?conversation_id=1") as ws:
+        ws.send_json({"type": "chat", "turn_id": "a", "message": "hello", "model": "fake"})
+        receive_turn(ws)
+        # A /chat turn of another client (or worker process) meanwhile
+        store.messages.append({"id": 100, "conversation_id": 1, "role": "user", "content": "from elsewhere"})
+        store.messages.append({"id": 101, "conversation_id": 1, "role": "assistant", "content": "seen"})
+        ws.send_json({"type": "chat", "turn_id": "b", "message": "again", "model": "fake"})
+        receive_turn(ws)
+        ws.send_json({"type": "chat", "turn_id": "c", "message": "and again", "model": "fake"})
+        receive_turn(ws)
+
+    assert llm.history_sizes == [1, 5, 7]
+    assert len(store.loads) == 2  # the second turn reloaded, the third used the state again
+
+
+@pytest.mark.parametrize("mode", ["inline", "worker"])
+def test_cancel_stops_the_running_turn(store, client, monkeypatch, mode):
+    monkeypatch.setitem(yaml_configs, "generation", {"mode": mode})
+    pool = InProcessGenerationPool()
+    monkeypatch.setattr(ws_chat_service, "get_generation_pool", lambda: pool)
+    llm = RecordingChatModel(chunks=100, delay=0.02, history_sizes=[])
+    use_model(monkeypatch, llm)
+
+    with client.websocket_connect("/api/v1/ws/chat?conversation_id=1") as ws:
+        ws.send_json({"type": "chat", "turn_id": "long", "message": "tell me everything", "model": "fake"})
+        assert ws.receive_json()["type"] == "chunk"
+        ws.send_json({"type": "cancel", "turn_id": "long"})
+        events = receive_turn(ws)
+        assert events[-1] == {"type": "cancelled", "turn_id": "long"}
+        assert len(events) < 50
+
+        # The state was reset: the next turn reloads its history.
+        llm.chunks, llm.delay = 2, 0
+        ws.send_json({"type": "chat", "turn_id": "next", "message": "short please", "model": "fake"})
+        assert receive_turn(ws)[-1] == {"type": "done", "turn_id": "next"}
+    assert len(store.loads) == 2
+
+
+def test_invalid_messages_get_an_error_and_keep_the_connection(store, client, monkeypatch):
+    monkeypatch.setitem(yaml_configs, "generation", {"mode": "inline"})
+    use_model(monkeypatch, RecordingChatModel(history_sizes=[]))
+
+    with client.websocket_connect("/api/v1/ws/chat?conversation_id=1") as ws:
+        ws.send_text("not json")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"type": "chat", "turn_id": "x", "message": "hi", "model": "unknown"})
+        assert ws.receive_json() == {"type": "error", "turn_id": "x", "detail": "Unknown model 'unknown'"}
+        ws.send_json({"type": "chat", "turn_id": "y", "model": "fake"})
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"type": "chat", "turn_id": "z", "message": "hi", "model": "fake"})
+        assert receive_turn(ws)[-1] == {"type": "done", "turn_id": "z"}
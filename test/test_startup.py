@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+from benchmarks.bench_startup import PROVIDER_MODULES, parse_importtime, run_import
+
+
+def _imported_modules(target: str) -> set:
+    _, stderr = run_import(target, importtime=True)
+    return {entry["module"] for entry in parse_importtime(stderr)}
+
+
+def test_importing_server_does_not_import_provider_sdks():
+    modules = _imported_modules("server")
+    assert "src.routers.chat_router" in modules
+    leaked = [m for m in modules if any(m == p or m.startswith(p + ".") for p in PROVIDER_MODULES)]
+    assert leaked == []
+
+
+def test_importing_config_and_db_has_no_side_effects():
+    code = (
+        "import src.configs.config as config, src.configs.db as db\n"
+        "assert not config._loaded\n"
+        "assert config.yaml_configs._data is None\n"
+        "assert db.get_async_engine.cache_info().currsize == 0\n"
+        "print('ok')\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.strip() == "ok"
+    # Nothing is logged before the app factory runs init_config().
+    assert "Application Environment" not in completed.stderr
+
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |   json.decoder\n"
+        "import time:       250 |        350 | json\n"
+    )
+    assert parse_importtime(stderr) == [
+        {"module": "json.decoder", "self_us": 100, "cumulative_us": 100, "depth": 1},
+        {"module": "json", "self_us": 250, "cumulative_us": 350, "depth": 0},
+    ]